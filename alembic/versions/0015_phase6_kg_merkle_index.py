@@ -0,0 +1,59 @@
+"""phase6 persistent kg merkle index
+
+Revision ID: 0015_phase6_kg_merkle_index
+Revises: 0014_phase6_kg_indexes
+Create Date: 2025-09-24
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0015_phase6_kg_merkle_index"
+down_revision = "0014_phase6_kg_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "kg_merkle_leaves",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("uid", sa.String(), nullable=False),
+        sa.Column("bucket", sa.Integer(), nullable=False),
+        sa.Column("leaf_key", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("leaf_hash", sa.String(), nullable=False),
+    )
+    op.create_index("ix_kg_merkle_leaves_uid", "kg_merkle_leaves", ["uid"], unique=False)
+    op.create_index("ix_kg_merkle_leaves_bucket", "kg_merkle_leaves", ["bucket"], unique=False)
+    op.create_index("ix_kg_merkle_leaves_leaf_key", "kg_merkle_leaves", ["leaf_key"], unique=False)
+    op.create_index("ix_kg_merkle_leaves_kind", "kg_merkle_leaves", ["kind"], unique=False)
+
+    op.create_table(
+        "kg_merkle_nodes",
+        sa.Column("level", sa.Integer(), primary_key=True),
+        sa.Column("idx", sa.Integer(), primary_key=True),
+        sa.Column("hash", sa.String(), nullable=False),
+    )
+
+    op.create_table(
+        "kg_merkle_dirty",
+        sa.Column("uid", sa.String(), primary_key=True),
+        sa.Column("marked_at", sa.String(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("kg_merkle_dirty")
+    op.drop_table("kg_merkle_nodes")
+    for name in [
+        "ix_kg_merkle_leaves_kind",
+        "ix_kg_merkle_leaves_leaf_key",
+        "ix_kg_merkle_leaves_bucket",
+        "ix_kg_merkle_leaves_uid",
+    ]:
+        try:
+            op.drop_index(name, table_name="kg_merkle_leaves")
+        except Exception:
+            pass
+    op.drop_table("kg_merkle_leaves")
@@ -0,0 +1,39 @@
+"""cohort metric stats summary table
+
+Revision ID: 0016_cohort_metric_stats
+Revises: 0015_phase6_kg_merkle_index
+Create Date: 2025-09-25
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0016_cohort_metric_stats"
+down_revision = "0015_phase6_kg_merkle_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cohort_metric_stats",
+        sa.Column("segment", sa.String(), primary_key=True),
+        sa.Column("week_start", sa.String(), primary_key=True),
+        sa.Column("metric", sa.String(), primary_key=True),
+        sa.Column("n", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("total_sq", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("mean", sa.Float(), nullable=True),
+        sa.Column("p50", sa.Float(), nullable=True),
+        sa.Column("p90", sa.Float(), nullable=True),
+        sa.Column("updated_at", sa.String(), nullable=True),
+    )
+    op.create_index("ix_cohort_metric_stats_week_start", "cohort_metric_stats", ["week_start"], unique=False)
+
+
+def downgrade() -> None:
+    try:
+        op.drop_index("ix_cohort_metric_stats_week_start", table_name="cohort_metric_stats")
+    except Exception:
+        pass
+    op.drop_table("cohort_metric_stats")
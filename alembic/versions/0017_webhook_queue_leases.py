@@ -0,0 +1,35 @@
+"""webhook queue leases and dead-letter error
+
+Revision ID: 0017_webhook_queue_leases
+Revises: 0016_cohort_metric_stats
+Create Date: 2025-09-26
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0017_webhook_queue_leases"
+down_revision = "0016_cohort_metric_stats"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("webhook_queue") as batch:
+        batch.add_column(sa.Column("lease_owner", sa.String(length=64), nullable=True))
+        batch.add_column(sa.Column("lease_until", sa.String(length=64), nullable=True))
+        batch.add_column(sa.Column("last_error", sa.Text(), nullable=True))
+    op.create_index("ix_webhook_queue_lease_owner", "webhook_queue", ["lease_owner"], unique=False)
+    op.create_index("ix_webhook_queue_status_next_at", "webhook_queue", ["status", "next_at"], unique=False)
+
+
+def downgrade() -> None:
+    for name in ["ix_webhook_queue_status_next_at", "ix_webhook_queue_lease_owner"]:
+        try:
+            op.drop_index(name, table_name="webhook_queue")
+        except Exception:
+            pass
+    with op.batch_alter_table("webhook_queue") as batch:
+        batch.drop_column("last_error")
+        batch.drop_column("lease_until")
+        batch.drop_column("lease_owner")
@@ -0,0 +1,36 @@
+"""usage counters per (period, tenant, product)
+
+Revision ID: 0018_usage_counters
+Revises: 0017_webhook_queue_leases
+Create Date: 2025-09-27
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0018_usage_counters"
+down_revision = "0017_webhook_queue_leases"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "usage_counters",
+        sa.Column("period_key", sa.String(), primary_key=True),
+        sa.Column("tenant_id", sa.String(), primary_key=True),
+        sa.Column("product", sa.String(), primary_key=True),
+        sa.Column("units", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.String(), nullable=True),
+    )
+    # Seed monthly (YYYY-MM) and daily (YYYY-MM-DD) totals from the existing event log
+    for n in (7, 10):
+        op.execute(
+            "INSERT INTO usage_counters (period_key, tenant_id, product, units, updated_at) "
+            f"SELECT substr(ts, 1, {n}), CAST(tenant_id AS TEXT), product, SUM(units), MAX(ts) FROM usage_events "
+            f"WHERE ts IS NOT NULL AND tenant_id IS NOT NULL AND product IS NOT NULL GROUP BY substr(ts, 1, {n}), CAST(tenant_id AS TEXT), product"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("usage_counters")
@@ -0,0 +1,28 @@
+"""shared sliding-window rate limit buckets
+
+Revision ID: 0019_rate_limit_buckets
+Revises: 0018_usage_counters
+Create Date: 2025-09-28
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0019_rate_limit_buckets"
+down_revision = "0018_usage_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("k", sa.String(), primary_key=True),
+        sa.Column("win", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cur", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("prev", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rate_limit_buckets")
@@ -0,0 +1,58 @@
+"""kg node property index
+
+Revision ID: 0020_kg_node_props
+Revises: 0019_rate_limit_buckets
+Create Date: 2025-09-29
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0020_kg_node_props"
+down_revision = "0019_rate_limit_buckets"
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_PAGE = 2000
+
+
+def _backfill() -> None:
+    """Index existing node versions so the first property search does not do it on the request path."""
+    # Same normalization as the app's incremental sync
+    from apps.api.aurora import kg_props  # type: ignore
+
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("kg_nodes"):
+        return
+    last = 0
+    while True:
+        rows = bind.execute(
+            sa.text("SELECT id, uid, properties_json FROM kg_nodes WHERE id > :last ORDER BY id LIMIT :lim"),
+            {"last": last, "lim": BACKFILL_PAGE},
+        ).fetchall()
+        if not rows:
+            break
+        kg_props.index_rows(bind, [(r[0], r[1], r[2]) for r in rows])
+        last = int(rows[-1][0])
+
+
+def upgrade() -> None:
+    # Rows are derived from kg_nodes.properties_json (see kg_props); backfilled below, then kept up by kg_props.sync.
+    op.create_table(
+        "kg_node_props",
+        sa.Column("node_id", sa.Integer(), primary_key=True),
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("val", sa.String(), primary_key=True),
+        sa.Column("uid", sa.String(), nullable=False),
+        sa.Column("num", sa.Float(), nullable=True),
+    )
+    op.create_index("ix_kg_node_props_key_val", "kg_node_props", ["key", "val"])
+    op.create_index("ix_kg_node_props_key_num", "kg_node_props", ["key", "num"])
+    _backfill()
+
+
+def downgrade() -> None:
+    op.drop_index("ix_kg_node_props_key_num", table_name="kg_node_props")
+    op.drop_index("ix_kg_node_props_key_val", table_name="kg_node_props")
+    op.drop_table("kg_node_props")
@@ -0,0 +1,25 @@
+"""typed timestamp columns for kg_nodes / kg_edges (deferred)
+
+Typed `*_ts` shadows of valid_from/valid_to/created_at, kept in sync by
+triggers, are deferred until the as-of reads move to them; no read uses them
+yet and the SQLite sync trigger doubled every insert. The revision stays so
+the chain to 0022 (temporal indexes on the string columns) is unchanged.
+
+Revision ID: 0021_kg_typed_timestamps
+Revises: 0020_kg_node_props
+Create Date: 2025-09-30
+"""
+
+# revision identifiers, used by Alembic.
+revision = "0021_kg_typed_timestamps"
+down_revision = "0020_kg_node_props"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    pass
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,44 @@
+"""composite as-of and open-row partial indexes for kg_nodes / kg_edges
+
+Revision ID: 0022_kg_temporal_indexes
+Revises: 0021_kg_typed_timestamps
+Create Date: 2025-09-30
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0022_kg_temporal_indexes"
+down_revision = "0021_kg_typed_timestamps"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial WHERE or None)
+INDEXES = (
+    ("ix_kg_nodes_uid_asof", "kg_nodes", ["uid", "valid_to", "valid_from"], None),
+    ("ix_kg_nodes_open_uid_type", "kg_nodes", ["uid", "type"], "valid_to IS NULL"),
+    ("ix_kg_edges_src_asof", "kg_edges", ["src_uid", "valid_to", "valid_from", "type"], None),
+    ("ix_kg_edges_dst_asof", "kg_edges", ["dst_uid", "valid_to", "valid_from", "type"], None),
+    ("ix_kg_edges_open_src_dst_type", "kg_edges", ["src_uid", "dst_uid", "type"], "valid_to IS NULL"),
+    ("ix_kg_edges_open_dst", "kg_edges", ["dst_uid"], "valid_to IS NULL"),
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # Build without blocking writers on large graphs
+        with op.get_context().autocommit_block():
+            for name, table, cols, where in INDEXES:
+                op.create_index(
+                    name, table, cols, unique=False, if_not_exists=True, postgresql_concurrently=True,
+                    postgresql_where=sa.text(where) if where else None,
+                )
+        return
+    for name, table, cols, where in INDEXES:
+        op.create_index(name, table, cols, unique=False, if_not_exists=True, sqlite_where=sa.text(where) if where else None)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,98 @@
+"""maintained kg_stats counters for /kg/stats
+
+Revision ID: 0023_kg_stats_counters
+Revises: 0022_kg_temporal_indexes
+Create Date: 2025-10-01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0023_kg_stats_counters"
+down_revision = "0022_kg_temporal_indexes"
+branch_labels = None
+depends_on = None
+
+TABLES = {"kg_nodes": "node", "kg_edges": "edge"}
+
+PG_FUNCTIONS = (
+    "CREATE OR REPLACE FUNCTION kg_stats_apply(k text, tk bigint, t text, dt int, dopen int, created text) RETURNS void AS $$ "
+    "BEGIN INSERT INTO kg_stats (kind, tenant_key, type, total_count, open_count, latest_created_at) "
+    "VALUES (k, tk, t, dt, dopen, created) ON CONFLICT (kind, tenant_key, type) DO UPDATE SET "
+    "total_count = kg_stats.total_count + EXCLUDED.total_count, open_count = kg_stats.open_count + EXCLUDED.open_count, "
+    "latest_created_at = CASE WHEN kg_stats.latest_created_at IS NULL OR EXCLUDED.latest_created_at > kg_stats.latest_created_at "
+    "THEN COALESCE(EXCLUDED.latest_created_at, kg_stats.latest_created_at) ELSE kg_stats.latest_created_at END; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE FUNCTION kg_stats_trg() RETURNS trigger AS $$ "
+    "DECLARE k text := CASE WHEN TG_TABLE_NAME = 'kg_nodes' THEN 'node' ELSE 'edge' END; BEGIN "
+    "IF TG_OP IN ('UPDATE', 'DELETE') THEN PERFORM kg_stats_apply(k, COALESCE(OLD.tenant_id, -1), COALESCE(OLD.type, ''), -1, "
+    "CASE WHEN OLD.valid_to IS NULL THEN -1 ELSE 0 END, NULL); END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN PERFORM kg_stats_apply(k, COALESCE(NEW.tenant_id, -1), COALESCE(NEW.type, ''), 1, "
+    "CASE WHEN NEW.valid_to IS NULL THEN 1 ELSE 0 END, NEW.created_at); END IF; "
+    "RETURN NULL; END $$ LANGUAGE plpgsql",
+)
+
+
+def _sqlite_apply(kind: str, ref: str, sign: int) -> str:
+    latest = (
+        f", latest_created_at = CASE WHEN latest_created_at IS NULL OR {ref}.created_at > latest_created_at "
+        f"THEN COALESCE({ref}.created_at, latest_created_at) ELSE latest_created_at END"
+        if sign > 0
+        else ""
+    )
+    return (
+        f"INSERT OR IGNORE INTO kg_stats (kind, tenant_key, type, total_count, open_count) "
+        f"VALUES ('{kind}', COALESCE({ref}.tenant_id, -1), COALESCE({ref}.type, ''), 0, 0); "
+        f"UPDATE kg_stats SET total_count = total_count + ({sign}), open_count = open_count + ({sign}) * ({ref}.valid_to IS NULL)"
+        f"{latest} WHERE kind = '{kind}' AND tenant_key = COALESCE({ref}.tenant_id, -1) AND type = COALESCE({ref}.type, '');"
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "kg_stats",
+        sa.Column("kind", sa.String(), primary_key=True),
+        sa.Column("tenant_key", sa.BigInteger(), primary_key=True),
+        sa.Column("type", sa.String(), primary_key=True),
+        sa.Column("total_count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("open_count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("latest_created_at", sa.String(), nullable=True),
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for stmt in PG_FUNCTIONS:
+            op.execute(stmt)
+    for table, kind in TABLES.items():
+        if dialect == "postgresql":
+            op.execute(
+                f"CREATE TRIGGER trg_{table}_stats AFTER INSERT OR DELETE OR UPDATE OF valid_to, type, tenant_id ON {table} "
+                f"FOR EACH ROW EXECUTE PROCEDURE kg_stats_trg()"
+            )
+        elif dialect == "sqlite":
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_ins AFTER INSERT ON {table} BEGIN {_sqlite_apply(kind, 'NEW', 1)} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_del AFTER DELETE ON {table} BEGIN {_sqlite_apply(kind, 'OLD', -1)} END")
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_upd AFTER UPDATE OF valid_to, type, tenant_id ON {table} "
+                f"BEGIN {_sqlite_apply(kind, 'OLD', -1)} {_sqlite_apply(kind, 'NEW', 1)} END"
+            )
+        # Seed from the existing rows (one grouped pass per table)
+        op.execute(
+            "INSERT INTO kg_stats (kind, tenant_key, type, total_count, open_count, latest_created_at) "
+            f"SELECT '{kind}', COALESCE(tenant_id, -1), COALESCE(type, ''), COUNT(1), "
+            f"SUM(CASE WHEN valid_to IS NULL THEN 1 ELSE 0 END), MAX(created_at) FROM {table} "
+            "GROUP BY COALESCE(tenant_id, -1), COALESCE(type, '')"
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table in TABLES:
+        if dialect == "postgresql":
+            op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_stats ON {table}")
+        elif dialect == "sqlite":
+            for suffix in ("ins", "del", "upd"):
+                op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_stats_{suffix}")
+    if dialect == "postgresql":
+        op.execute("DROP FUNCTION IF EXISTS kg_stats_trg()")
+        op.execute("DROP FUNCTION IF EXISTS kg_stats_apply(text, bigint, text, int, int, text)")
+    op.drop_table("kg_stats")
@@ -0,0 +1,118 @@
+"""sequenced kg_changes log for /daas/kg/changed
+
+Revision ID: 0024_kg_change_log
+Revises: 0023_kg_stats_counters
+Create Date: 2025-10-02
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0024_kg_change_log"
+down_revision = "0023_kg_stats_counters"
+branch_labels = None
+depends_on = None
+
+TABLES = {
+    "kg_nodes": ("node", "tenant_id, uid, type, properties_json, valid_from, valid_to"),
+    "kg_edges": ("edge", "tenant_id, src_uid, dst_uid, type, properties_json, valid_from, valid_to"),
+}
+
+SQLITE_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+PG_NOW = "to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.MS\"Z\"')"
+
+PG_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION kg_changes_trg() RETURNS trigger AS $$ "
+    "DECLARE k text := CASE WHEN TG_TABLE_NAME = 'kg_nodes' THEN 'node' ELSE 'edge' END; BEGIN "
+    "IF TG_OP = 'DELETE' THEN "
+    f"INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at, txid) VALUES (k, 'delete', OLD.id, OLD.tenant_id, {PG_NOW}, txid_current()); "
+    "ELSIF TG_OP = 'INSERT' THEN "
+    f"INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at, txid) VALUES (k, 'insert', NEW.id, NEW.tenant_id, {PG_NOW}, txid_current()); "
+    "ELSE "
+    "INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at, txid) VALUES (k, "
+    "CASE WHEN OLD.valid_to IS NULL AND NEW.valid_to IS NOT NULL THEN 'close' ELSE 'update' END, "
+    f"NEW.id, NEW.tenant_id, {PG_NOW}, txid_current()); "
+    "END IF; RETURN NULL; END $$ LANGUAGE plpgsql"
+)
+
+
+def _sqlite_append(kind: str, op_sql: str, ref: str) -> str:
+    return (
+        f"INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at) "
+        f"VALUES ('{kind}', {op_sql}, {ref}.id, {ref}.tenant_id, {SQLITE_NOW});"
+    )
+
+
+def _normalized_at(dialect: str) -> str:
+    raw = "COALESCE(created_at, valid_from, '')"
+    if dialect == "sqlite":
+        return f"COALESCE(strftime('%Y-%m-%dT%H:%M:%fZ', {raw}), {raw})"
+    if dialect == "postgresql":
+        # Writers store isoformat() text; naive values are UTC
+        return (
+            f"CASE WHEN {raw} ~ '^\\d{{4}}-\\d{{2}}-\\d{{2}}[T ]\\d{{2}}:\\d{{2}}' "
+            f"THEN to_char(CAST({raw} AS timestamptz) AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.MS\"Z\"') ELSE {raw} END"
+        )
+    return raw
+
+
+def upgrade() -> None:
+    op.create_table(
+        "kg_changes",
+        sa.Column("seq", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("op", sa.String(), nullable=False),
+        sa.Column("row_id", sa.BigInteger(), nullable=False),
+        sa.Column("tenant_id", sa.BigInteger(), nullable=True),
+        sa.Column("changed_at", sa.String(), nullable=False),
+        sa.Column("txid", sa.BigInteger(), nullable=False, server_default="0"),
+        sqlite_autoincrement=True,
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("SET LOCAL TIME ZONE 'UTC'")
+        # Hold off writers until the triggers exist and the backfill is done (CREATE TRIGGER takes this lock
+        # anyway); otherwise a row committed between the backfill snapshot and CREATE TRIGGER is never logged.
+        op.execute("LOCK TABLE kg_nodes, kg_edges IN SHARE ROW EXCLUSIVE MODE")
+        op.execute(PG_FUNCTION)
+    # Triggers first so rows written during the backfill are covered; the backfill skips rows they already logged
+    for table, (kind, cols) in TABLES.items():
+        if dialect == "postgresql":
+            op.execute(
+                f"CREATE TRIGGER trg_{table}_changes AFTER INSERT OR DELETE OR UPDATE OF {cols} ON {table} "
+                f"FOR EACH ROW EXECUTE PROCEDURE kg_changes_trg()"
+            )
+        elif dialect == "sqlite":
+            upd_op = "CASE WHEN OLD.valid_to IS NULL AND NEW.valid_to IS NOT NULL THEN 'close' ELSE 'update' END"
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_ins AFTER INSERT ON {table} BEGIN {_sqlite_append(kind, repr('insert'), 'NEW')} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_del AFTER DELETE ON {table} BEGIN {_sqlite_append(kind, repr('delete'), 'OLD')} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_upd AFTER UPDATE OF {cols} ON {table} BEGIN {_sqlite_append(kind, upd_op, 'NEW')} END")
+    # Backfill the existing history as inserts, oldest first, so a mirror starting at cursor 0 sees everything.
+    # changed_at is the row's created_at (or valid_from), rewritten to the triggers' UTC `...Z` millisecond
+    # format so `since` lookups compare like with like; unparseable values are kept as written.
+    op.execute(
+        "INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at) "
+        "SELECT kind, 'insert', id, tenant_id, at FROM ("
+        f"SELECT 'node' AS kind, id, tenant_id, {_normalized_at(dialect)} AS at FROM kg_nodes "
+        f"UNION ALL SELECT 'edge' AS kind, id, tenant_id, {_normalized_at(dialect)} AS at FROM kg_edges"
+        ") h WHERE NOT EXISTS (SELECT 1 FROM kg_changes c WHERE c.kind = h.kind AND c.row_id = h.id) "
+        "ORDER BY at, kind DESC, id"
+    )
+    op.create_index("ix_kg_changes_changed_at", "kg_changes", ["changed_at"])
+    op.create_index("ix_kg_changes_tenant_seq", "kg_changes", ["tenant_id", "seq"])
+    op.create_index("ix_kg_changes_txid_seq", "kg_changes", ["txid", "seq"])
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table in TABLES:
+        if dialect == "postgresql":
+            op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_changes ON {table}")
+        elif dialect == "sqlite":
+            for suffix in ("ins", "del", "upd"):
+                op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_changes_{suffix}")
+    if dialect == "postgresql":
+        op.execute("DROP FUNCTION IF EXISTS kg_changes_trg()")
+    op.drop_index("ix_kg_changes_txid_seq", table_name="kg_changes")
+    op.drop_index("ix_kg_changes_tenant_seq", table_name="kg_changes")
+    op.drop_index("ix_kg_changes_changed_at", table_name="kg_changes")
+    op.drop_table("kg_changes")
@@ -0,0 +1,26 @@
+"""api_keys.revoked_at: shared revocation watermark for the per-process auth caches
+
+Revision ID: 0025_api_keys_revoked_at
+Revises: 0024_kg_change_log
+Create Date: 2025-10-03
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0025_api_keys_revoked_at"
+down_revision = "0024_kg_change_log"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("api_keys") as batch:
+        batch.add_column(sa.Column("revoked_at", sa.String(), nullable=True))
+    op.create_index("ix_api_keys_revoked_at", "api_keys", ["revoked_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_api_keys_revoked_at", table_name="api_keys")
+    with op.batch_alter_table("api_keys") as batch:
+        batch.drop_column("revoked_at")
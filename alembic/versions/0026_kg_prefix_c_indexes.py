@@ -0,0 +1,36 @@
+"""COLLATE "C" indexes for /kg/find prefix ranges on Postgres
+
+Revision ID: 0026_kg_prefix_c_indexes
+Revises: 0025_api_keys_revoked_at
+Create Date: 2025-10-03
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0026_kg_prefix_c_indexes"
+down_revision = "0025_api_keys_revoked_at"
+branch_labels = None
+depends_on = None
+
+# Prefix filters compare `col COLLATE "C"` (see kg_props.prefix_condition); SQLite's default BINARY
+# collation already orders by code point, so its existing indexes serve the same ranges.
+INDEXES = (
+    ("ix_kg_node_props_key_val_c", "kg_node_props", 'key, val COLLATE "C"'),
+    ("ix_kg_nodes_uid_c", "kg_nodes", 'uid COLLATE "C"'),
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for name, table, cols in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols})")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY {name}")
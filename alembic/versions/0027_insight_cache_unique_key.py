@@ -0,0 +1,35 @@
+"""unique insight_cache.key_hash so response cache writes can upsert
+
+Revision ID: 0027_insight_cache_unique_key
+Revises: 0026_kg_prefix_c_indexes
+Create Date: 2025-10-04
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0027_insight_cache_unique_key"
+down_revision = "0026_kg_prefix_c_indexes"
+branch_labels = None
+depends_on = None
+
+
+def _needs_index() -> bool:
+    """False when key_hash is already unique: 0002 made it the primary key, fresh model tables index it uniquely."""
+    insp = sa.inspect(op.get_bind())
+    if "id" not in {c["name"] for c in insp.get_columns("insight_cache")}:
+        return False
+    return not any(ix.get("unique") and ix["column_names"] == ["key_hash"] for ix in insp.get_indexes("insight_cache"))
+
+
+def upgrade() -> None:
+    if not _needs_index():
+        return
+    # Keep the newest row per key (what the cache read returned), then enforce one row per key
+    op.execute("DELETE FROM insight_cache WHERE id NOT IN (SELECT MAX(id) FROM insight_cache GROUP BY key_hash)")
+    op.create_index("ux_insight_cache_key_hash", "insight_cache", ["key_hash"], unique=True)
+
+
+def downgrade() -> None:
+    if "ux_insight_cache_key_hash" in {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("insight_cache")}:
+        op.drop_index("ux_insight_cache_key_hash", table_name="insight_cache")
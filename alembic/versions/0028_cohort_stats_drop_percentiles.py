@@ -0,0 +1,26 @@
+"""drop cohort_metric_stats.p50/p90: never read, and they forced a per-value scan on refresh
+
+Revision ID: 0028_cohort_stats_drop_percentiles
+Revises: 0027_insight_cache_unique_key
+Create Date: 2025-10-05
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0028_cohort_stats_drop_percentiles"
+down_revision = "0027_insight_cache_unique_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("cohort_metric_stats") as batch:
+        batch.drop_column("p50")
+        batch.drop_column("p90")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("cohort_metric_stats") as batch:
+        batch.add_column(sa.Column("p50", sa.Float(), nullable=True))
+        batch.add_column(sa.Column("p90", sa.Float(), nullable=True))
@@ -0,0 +1,221 @@
+"""Non-blocking structured access log.
+
+`add_request_id` used to build and write a JSON line through `logging` on the
+request path for every call. Now the middleware only calls `ACCESS_LOG.record()`,
+which applies the sampling rules and appends a tuple to a bounded in-memory
+buffer. A daemon writer drains the buffer in batches, serializes the records
+and makes one write per batch to the sink:
+
+* `ACCESS_LOG_SINK` – `logger` (default: the `aurora.access` logger, one
+  record per line as before), `stdout`, `off`, or a file path (rotated at
+  `ACCESS_LOG_MAX_BYTES`, keeping `ACCESS_LOG_BACKUPS` files);
+* `ACCESS_LOG_BUFFER` – buffer capacity. When it is full, new records are
+  dropped and counted (`stats["dropped"]`) instead of blocking the request;
+* `ACCESS_LOG_SAMPLING` – comma-separated `<route prefix|*>[@<status class|*>]=<rate>`
+  rules, first match wins, default rate 1. For example
+  `/healthz=0,/metrics=0,*@2xx=0.1` drops probes and keeps 10% of successes
+  (errors and 4xx are still logged in full).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import sys
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+FIELDS = ("ts", "request_id", "method", "path", "route", "status", "dur_ms", "client", "error")
+
+Rule = Tuple[str, str, float]  # (route prefix or "*", status class or "*", rate)
+
+
+def parse_rules(raw: Optional[str]) -> List[Rule]:
+    rules: List[Rule] = []
+    for part in str(raw or "").split(","):
+        target, sep, rate = part.strip().rpartition("=")
+        if not sep or not target:
+            continue
+        prefix, _, status = target.partition("@")
+        try:
+            rules.append((prefix.strip() or "*", (status.strip() or "*").lower(), max(0.0, min(1.0, float(rate)))))
+        except ValueError:
+            continue
+    return rules
+
+
+class LoggerSink:
+    def __init__(self, name: str = "aurora.access") -> None:
+        self._logger = logging.getLogger(name)
+
+    def write(self, lines: Sequence[str], errors: Sequence[bool]) -> None:
+        for line, is_error in zip(lines, errors):
+            if is_error:
+                self._logger.error(line)
+            else:
+                self._logger.info(line)
+
+
+class StreamSink:
+    def __init__(self, stream: Any) -> None:
+        self._stream = stream
+
+    def write(self, lines: Sequence[str], errors: Sequence[bool]) -> None:
+        self._stream.write("\n".join(lines) + "\n")
+        self._stream.flush()
+
+
+class RotatingFileSink:
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backups: int = 5) -> None:
+        self._handler = RotatingFileHandler(path, maxBytes=max(0, int(max_bytes)), backupCount=max(0, int(backups)), encoding="utf-8")
+
+    def write(self, lines: Sequence[str], errors: Sequence[bool]) -> None:
+        h = self._handler
+        if h.stream is None:
+            h.stream = h._open()
+        h.stream.write("\n".join(lines) + "\n")
+        h.stream.flush()
+        if h.maxBytes and h.stream.tell() >= h.maxBytes:
+            h.doRollover()
+
+
+def _sink_from_env() -> Any:
+    kind = (os.getenv("ACCESS_LOG_SINK") or "logger").strip()
+    if kind.lower() in ("off", "none", "0", "false"):
+        return None
+    if kind.lower() == "logger":
+        return LoggerSink()
+    if kind.lower() == "stdout":
+        return StreamSink(sys.stdout)
+    return RotatingFileSink(kind, max_bytes=int(os.getenv("ACCESS_LOG_MAX_BYTES", str(50 * 1024 * 1024))), backups=int(os.getenv("ACCESS_LOG_BACKUPS", "5")))
+
+
+class AccessLog:
+    def __init__(
+        self,
+        sink: Any = None,
+        capacity: int = 8192,
+        batch: int = 512,
+        flush_interval_s: float = 0.5,
+        rules: Optional[List[Rule]] = None,
+    ) -> None:
+        self.sink = sink
+        self.capacity = max(1, int(capacity))
+        self.batch = max(1, int(batch))
+        self.flush_interval_s = float(flush_interval_s)
+        self.rules = list(rules or [])
+        self._buf: Deque[Tuple[Any, ...]] = deque()
+        self._wake = threading.Event()
+        self._write_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats: Dict[str, int] = {"recorded": 0, "sampled_out": 0, "dropped": 0, "written": 0, "write_errors": 0}
+
+    def sample_rate(self, route: str, status: int) -> float:
+        cls = f"{int(status) // 100}xx"
+        for prefix, st, rate in self.rules:
+            if (prefix == "*" or route.startswith(prefix)) and (st == "*" or st == cls):
+                return rate
+        return 1.0
+
+    def record(
+        self,
+        ts: float,
+        request_id: str,
+        method: str,
+        path: str,
+        route: str,
+        status: int,
+        dur_ms: float,
+        client: Optional[str],
+        error: Optional[str] = None,
+    ) -> bool:
+        """Queue one request; never blocks or formats. False when sampled out, dropped or logging is off."""
+        if self.sink is None:
+            return False
+        if self.rules:
+            rate = self.sample_rate(route, status)
+            if rate < 1.0 and (rate <= 0.0 or random.random() >= rate):
+                self.stats["sampled_out"] += 1
+                return False
+        if len(self._buf) >= self.capacity:
+            self.stats["dropped"] += 1
+            return False
+        self._buf.append((ts, request_id, method, path, route, status, dur_ms, client, error))
+        self.stats["recorded"] += 1
+        if len(self._buf) >= self.batch:
+            self._wake.set()
+        self._ensure_writer()
+        return True
+
+    def _ensure_writer(self) -> None:
+        if self.flush_interval_s <= 0 or (self._writer is not None and self._writer.is_alive()):
+            return
+        with self._start_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="access-log-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    @staticmethod
+    def format(rec: Tuple[Any, ...]) -> str:
+        d = dict(zip(FIELDS, rec))
+        d["ts"] = datetime.fromtimestamp(d["ts"], timezone.utc).isoformat()
+        d["dur_ms"] = round(float(d["dur_ms"]), 2)
+        if d["error"] is None:
+            del d["error"]
+        return json.dumps(d, separators=(",", ":"))
+
+    def flush(self) -> int:
+        """Drain the buffer to the sink in batches; returns the number of records written."""
+        written = 0
+        with self._write_lock:
+            while self._buf:
+                recs: List[Tuple[Any, ...]] = []
+                try:
+                    while len(recs) < self.batch:
+                        recs.append(self._buf.popleft())
+                except IndexError:
+                    pass
+                if not recs or self.sink is None:
+                    break
+                try:
+                    self.sink.write([self.format(r) for r in recs], [bool(r[8]) or int(r[5]) >= 500 for r in recs])
+                    written += len(recs)
+                except Exception:
+                    self.stats["write_errors"] += 1
+            self.stats["written"] += written
+        return written
+
+    def info(self) -> Dict[str, Any]:
+        return {"buffered": len(self._buf), "capacity": self.capacity, "sink": type(self.sink).__name__ if self.sink is not None else None, **self.stats}
+
+
+def _from_env() -> AccessLog:
+    try:
+        sink = _sink_from_env()
+    except Exception:
+        sink = LoggerSink()
+    return AccessLog(
+        sink,
+        capacity=int(os.getenv("ACCESS_LOG_BUFFER", "8192")),
+        batch=int(os.getenv("ACCESS_LOG_BATCH", "512")),
+        flush_interval_s=float(os.getenv("ACCESS_LOG_FLUSH_SEC", "0.5")),
+        rules=parse_rules(os.getenv("ACCESS_LOG_SAMPLING")),
+    )
+
+
+ACCESS_LOG = _from_env()
@@ -0,0 +1,151 @@
+"""Resolution cache for `apikey_middleware`.
+
+Resolving an API key costs a DB query (or a parse of `API_KEYS`) on every
+request. This cache sits in front of that lookup:
+
+* entries are keyed by the salted key hash (`_hash_api_key`), never the raw key;
+* resolved keys live for `AUTH_CACHE_TTL_SEC` (default 30s). Unknown or
+  inactive keys are cached negatively for `AUTH_CACHE_NEGATIVE_TTL_SEC`
+  (default 10s), so repeated guessing does not reach the DB;
+* the cache is bounded (`AUTH_CACHE_MAX_ENTRIES`, LRU) and is dropped wholesale
+  when the env key material (`API_KEYS`, `API_HASH_SALT`) changes;
+* admin key creation/revocation invalidates the affected hash immediately in
+  the serving process. Other workers learn about revocations from
+  `MAX(api_keys.revoked_at)`, which `check_revocations` polls at most every
+  `AUTH_CACHE_REVOCATION_CHECK_SEC` (default 1s). When the watermark moves,
+  every positive entry is dropped, so a revoked key stops working everywhere
+  within about a second rather than after the TTL.
+
+It also keeps a window of per-request middleware overhead samples for `/dev/metrics`.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+MISS = object()
+
+
+class AuthCache:
+    def __init__(
+        self,
+        ttl_s: float = 30.0,
+        negative_ttl_s: float = 10.0,
+        max_entries: int = 10000,
+        samples: int = 512,
+        revocation_check_s: float = 1.0,
+    ) -> None:
+        self.ttl_s = float(ttl_s)
+        self.negative_ttl_s = float(negative_ttl_s)
+        self.revocation_check_s = float(revocation_check_s)
+        self._revoked_mark: Any = MISS
+        self._revocation_checked = 0.0
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[Tuple[Any, ...]] = None
+        self._overhead_ms: Deque[float] = deque(maxlen=max(1, int(samples)))
+        self.stats: Dict[str, int] = {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0, "revocation_checks": 0, "revocation_errors": 0}
+
+    def check_fingerprint(self, fingerprint: Tuple[Any, ...]) -> None:
+        """Drop every entry when the key material the resolver depends on changed."""
+        if fingerprint == self._fingerprint:
+            return
+        with self._lock:
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def check_revocations(self, probe: Callable[[], Any]) -> bool:
+        """Poll the shared revocation watermark (throttled); drop positive entries when it moved. True if dropped."""
+        now = time.monotonic()
+        if now - self._revocation_checked < self.revocation_check_s:
+            return False
+        self._revocation_checked = now
+        self.stats["revocation_checks"] += 1
+        try:
+            mark = probe()
+        except Exception:
+            self.stats["revocation_errors"] += 1
+            return False
+        prev, self._revoked_mark = self._revoked_mark, mark
+        if prev is MISS or prev == mark:
+            return False
+        with self._lock:
+            doomed = [k for k, (info, _) in self._entries.items() if info is not None]
+            for k in doomed:
+                del self._entries[k]
+            self.stats["invalidations"] += len(doomed)
+        return True
+
+    def get(self, key_hash: str) -> Any:
+        """Cached info dict, None for a cached negative, or `MISS`."""
+        with self._lock:
+            ent = self._entries.get(key_hash)
+            if ent is None or ent[1] <= time.monotonic():
+                if ent is not None:
+                    del self._entries[key_hash]
+                self.stats["misses"] += 1
+                return MISS
+            self._entries.move_to_end(key_hash)
+            self.stats["hits" if ent[0] is not None else "negative_hits"] += 1
+            return ent[0]
+
+    def put(self, key_hash: str, info: Optional[Dict[str, Any]]) -> None:
+        ttl = self.ttl_s if info is not None else self.negative_ttl_s
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key_hash] = (info, time.monotonic() + ttl)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key_hash: Optional[str] = None, tenant_id: Optional[str] = None) -> int:
+        with self._lock:
+            if key_hash is None and tenant_id is None:
+                doomed = list(self._entries)
+            else:
+                doomed = [
+                    k for k, (info, _) in self._entries.items()
+                    if k == key_hash or (tenant_id is not None and info is not None and str(info.get("tenant_id")) == str(tenant_id))
+                ]
+            for k in doomed:
+                del self._entries[k]
+            self.stats["invalidations"] += len(doomed)
+        return len(doomed)
+
+    def record_overhead(self, ms: float) -> None:
+        self._overhead_ms.append(float(ms))
+
+    def info(self) -> Dict[str, Any]:
+        samples = sorted(self._overhead_ms)
+
+        def _pct(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(round(p * (len(samples) - 1))))], 4) if samples else 0.0
+
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "size": size,
+            **self.stats,
+            "overhead_ms": {"samples": len(samples), "p50": _pct(0.5), "p95": _pct(0.95), "max": round(samples[-1], 4) if samples else 0.0},
+        }
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+AUTH_CACHE = AuthCache(
+    ttl_s=_env_float("AUTH_CACHE_TTL_SEC", 30.0),
+    negative_ttl_s=_env_float("AUTH_CACHE_NEGATIVE_TTL_SEC", 10.0),
+    max_entries=int(_env_float("AUTH_CACHE_MAX_ENTRIES", 10000)),
+    revocation_check_s=_env_float("AUTH_CACHE_REVOCATION_CHECK_SEC", 1.0),
+)
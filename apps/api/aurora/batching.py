@@ -0,0 +1,158 @@
+"""Shared building blocks for the model-fronting services (embeddings, rerank).
+
+`EmbeddingService` and `RerankService` each carried their own copy of an LRU,
+a worker thread that drains a queue into one model call, the in-flight future
+map that lets identical requests share a slot, and a per-model-id registry.
+They now compose these instead:
+
+* `LruCache` – thread-safe bounded OrderedDict;
+* `MicroBatcher` – callers `submit(key, item)` and get a Future. A single
+  daemon worker takes the first queued item, keeps collecting for
+  `batch_window_ms` or until `max_batch` items, then calls
+  `fn(keys, items)` once. Results go to every waiter of each key; an exception
+  goes to every waiter of the batch;
+* `ServiceRegistry` – one service per model id, built by a factory on first use.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class LruCache:
+    def __init__(self, max_items: int) -> None:
+        self.max_items = max(1, int(max_items))
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            val = self._data.get(key)
+            if val is not None:
+                self._data.move_to_end(key)
+            return val
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        with self._lock:
+            for key, val in items:
+                self._data[key] = val
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        fn: Callable[[List[str], List[Any]], List[Any]],
+        name: str,
+        batch_window_ms: float = 2.0,
+        max_batch: int = 32,
+        timeout_s: float = 30.0,
+    ) -> None:
+        self._fn = fn
+        self.name = name
+        self.batch_window_s = max(0.0, float(batch_window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.timeout_s = float(timeout_s)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        """False when the window is 0: callers should run `fn` inline instead."""
+        return self.batch_window_s > 0
+
+    def submit(self, key: str, item: Any) -> Future:
+        """Future for `key`; an identical key already queued or running shares its Future."""
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = Future()
+                self._inflight[key] = fut
+                self._queue.put((key, item))
+        self._ensure_worker()
+        return fut
+
+    def wait(self, futs: Dict[str, Future]) -> Dict[str, Any]:
+        """Results by key under one shared deadline; raises on error or timeout."""
+        deadline = time.monotonic() + self.timeout_s
+        return {k: f.result(timeout=max(0.0, deadline - time.monotonic())) for k, f in futs.items()}
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            keys = [k for k, _ in batch]
+            try:
+                results: List[Any] = list(self._fn(keys, [item for _, item in batch]))
+            except Exception as e:  # propagate to every waiter of this batch
+                results = [e] * len(batch)
+            with self._lock:
+                futs = [self._inflight.pop(k, None) for k in keys]
+            for fut, res in zip(futs, results):
+                if fut is None:
+                    continue
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+
+
+class ServiceRegistry(Generic[T]):
+    """Process-wide service per model id; `factory(model_id, loader)` runs once per id."""
+
+    def __init__(self, factory: Callable[[str, Callable[[], Any]], T]) -> None:
+        self._factory = factory
+        self._services: Dict[str, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_id: str, loader: Callable[[], Any]) -> T:
+        svc = self._services.get(model_id)
+        if svc is not None:
+            return svc
+        with self._lock:
+            svc = self._services.get(model_id)
+            if svc is None:
+                svc = self._factory(model_id, loader)
+                self._services[model_id] = svc
+        return svc
+
+    def all_info(self) -> List[Dict[str, Any]]:
+        return [s.info() for s in list(self._services.values())]  # type: ignore[attr-defined]
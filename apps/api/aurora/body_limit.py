@@ -0,0 +1,127 @@
+"""ASGI request-body limiter.
+
+The previous `body_size_limit_middleware` awaited `request.body()` before
+checking its size, so every oversized upload was fully buffered in memory just
+to be rejected. `BodyLimitMiddleware` never holds the body:
+
+* a `Content-Length` above the route's limit is answered with 413 before any
+  body bytes are read;
+* otherwise `receive` is wrapped and counts bytes as chunks stream through, so
+  a chunked or lying client is cut off with 413 as soon as the limit is crossed.
+  Downstream sees `RequestBodyTooLarge` from `receive`; whatever response it
+  produces for that is replaced by the 413 (if nothing was sent yet).
+
+Limits are per path prefix (longest match wins), with a default for the rest:
+
+    request_max_body_bytes=2097152
+    request_max_body_routes="/kg/commit=16777216,/ingest=33554432"
+
+A limit of 0 disables the check for that prefix.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+
+class RequestBodyTooLarge(Exception):
+    pass
+
+
+def parse_route_limits(raw: Optional[str]) -> List[Tuple[str, int]]:
+    """'/a=10,/b/c=20' -> [('/b/c', 20), ('/a', 10)] ordered longest prefix first; bad entries are skipped."""
+    out: List[Tuple[str, int]] = []
+    for part in str(raw or "").split(","):
+        prefix, sep, val = part.strip().partition("=")
+        if not sep or not prefix.strip().startswith("/"):
+            continue
+        try:
+            out.append((prefix.strip(), int(val.strip())))
+        except ValueError:
+            continue
+    out.sort(key=lambda pv: len(pv[0]), reverse=True)
+    return out
+
+
+class BodyLimitMiddleware:
+    def __init__(self, app: Any, max_bytes: int = 2 * 1024 * 1024, route_limits: Optional[List[Tuple[str, int]]] = None) -> None:
+        self.app = app
+        self.max_bytes = int(max_bytes)
+        self.route_limits = sorted(route_limits or [], key=lambda pv: len(pv[0]), reverse=True)
+        self.stats: Dict[str, int] = {"rejected_header": 0, "rejected_stream": 0}
+
+    def limit_for(self, path: str) -> int:
+        for prefix, limit in self.route_limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limit_for(scope.get("path") or "")
+        if limit <= 0:
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope.get("headers") or ():
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > limit:
+                    self.stats["rejected_header"] += 1
+                    await _send_413(send)
+                    return
+                break
+
+        seen = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive() -> Message:
+            nonlocal seen, exceeded
+            if exceeded:
+                raise RequestBodyTooLarge()
+            message = await receive()
+            if message.get("type") == "http.request":
+                seen += len(message.get("body") or b"")
+                if seen > limit:
+                    exceeded = True
+                    self.stats["rejected_stream"] += 1
+                    raise RequestBodyTooLarge()
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal started
+            if exceeded:
+                return  # the 413 below replaces whatever downstream made of the error
+            if message.get("type") == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await _send_413(send)
+
+
+async def _send_413(send: Send) -> None:
+    body = b'{"detail":"request body too large"}'
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
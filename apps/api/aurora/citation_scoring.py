@@ -0,0 +1,123 @@
+"""Batched citation scoring and a cached company lookup for `rag_service.answer_with_citations`.
+
+After the LlamaIndex query, `answer_with_citations` ranked merged sources by
+`0.6 * vector + 0.4 * fuzz/100`. For each source it made three rapidfuzz calls
+(title, url, first 256 chars of text). These ran inside the sort key and then
+twice more for every emitted citation. Each question also ran a fresh Meili
+`companies` search. Here:
+
+* `score_sources` scores every candidate in one batched rapidfuzz call per field
+  (`process.cdist` when numpy is available, `process.extract(limit=None)`
+  otherwise) and returns (vector, fuzz, hybrid) per source, computed once;
+* the vector part is the retrieval score already attached to each source
+  (0 for keyword-only Meili hits);
+* `CompanyLookup` caches the Meili company hits per (tenant, normalized
+  question) for `RAG_COMPANY_CACHE_TTL_SEC` (default 300) in a bounded LRU.
+  Company upserts (`POST /companies`, the ETL) clear it.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from rapidfuzz import fuzz, process
+
+VECTOR_WEIGHT = 0.6
+FUZZ_WEIGHT = 0.4
+TEXT_PREFIX = 256
+# Below this many sources the per-call overhead of cdist outweighs its parallelism
+_CDIST_MIN = 32
+
+try:
+    import numpy  # type: ignore  # noqa: F401
+
+    _HAVE_NUMPY = True
+except Exception:
+    _HAVE_NUMPY = False
+
+
+def _batch(query: str, choices: Sequence[str], scorer: Any) -> List[float]:
+    if not choices:
+        return []
+    if _HAVE_NUMPY and len(choices) >= _CDIST_MIN:
+        return [float(x) for x in process.cdist([query], list(choices), scorer=scorer, workers=-1)[0]]
+    out = [0.0] * len(choices)
+    for _, score, i in process.extract(query, list(choices), scorer=scorer, limit=None):
+        out[i] = float(score)
+    return out
+
+
+def _vector(src: Dict[str, Any]) -> float:
+    v = src.get("vector_score")
+    try:
+        v = float(v) if v is not None else 0.0
+    except Exception:
+        v = 0.0
+    return max(0.0, min(1.0, v))
+
+
+def score_sources(question: str, sources: Sequence[Dict[str, Any]]) -> List[Tuple[float, float, float]]:
+    """(vector 0..1, keyword fuzz 0..100, hybrid) per source, in input order."""
+    titles = [str(s.get("title") or "") for s in sources]
+    urls = [str(s.get("url") or "") for s in sources]
+    texts = [str(s.get("text") or "")[:TEXT_PREFIX] for s in sources]
+    by_title = _batch(question, titles, fuzz.token_set_ratio)
+    by_url = _batch(question, urls, fuzz.partial_ratio)
+    by_text = _batch(question, texts, fuzz.token_set_ratio)
+    out: List[Tuple[float, float, float]] = []
+    for src, t, u, x in zip(sources, by_title, by_url, by_text):
+        v = _vector(src)
+        fz = max(t, u, x)
+        out.append((v, fz, VECTOR_WEIGHT * v + FUZZ_WEIGHT * (fz / 100.0)))
+    return out
+
+
+class CompanyLookup:
+    def __init__(self, ttl_s: float = 300.0, max_items: int = 2048) -> None:
+        self.ttl_s = max(0.0, float(ttl_s))
+        self.max_items = max(1, int(max_items))
+        self._lru: "OrderedDict[Tuple[str, str, int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "errors": 0}
+
+    def search(self, client: Any, question: str, tenant: Optional[str], limit: int = 5) -> List[Dict[str, Any]]:
+        """Meili `companies` hits for `question` (tagged source=meilisearch), cached per tenant."""
+        if client is None:
+            return []
+        key = (str(tenant or ""), " ".join(str(question).lower().split()), int(limit))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._lru.get(key)
+            if cached is not None and now - cached[0] < self.ttl_s:
+                self._lru.move_to_end(key)
+                self.stats["hits"] += 1
+                return [dict(h) for h in cached[1]]
+        self.stats["misses"] += 1
+        try:
+            res = client.index("companies").search(question, {"limit": limit})
+            hits = [{"source": "meilisearch", **h} for h in res.get("hits", [])]
+        except Exception:
+            self.stats["errors"] += 1
+            return []
+        with self._lock:
+            self._lru[key] = (now, hits)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+        return [dict(h) for h in hits]
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._lru)
+        return {"size": size, "ttl_s": self.ttl_s, **self.stats}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+
+COMPANIES = CompanyLookup(ttl_s=float(os.getenv("RAG_COMPANY_CACHE_TTL_SEC", "300")))
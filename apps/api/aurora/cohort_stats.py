@@ -0,0 +1,250 @@
+"""Materialized per-segment-set, per-week cohort statistics.
+
+`metrics._segment_stats` used to load every company, then query
+`company_metrics` once per cohort member for each of five metrics on every
+dashboard call. This module keeps a summary table instead:
+
+* `cohort_metric_stats` – one row per (segment set, week_start, metric) holding
+  the count, sum and sum of squares, so weeks and sets merge exactly into a
+  mean/std. The `segment` column holds the company's
+  whole segment set, sorted and comma-joined ("AI,Fintech"). Each company
+  therefore lands in exactly one row per week and metric. Summing the sets
+  that intersect a cohort counts every company once, even one listed under
+  several of the requested segments.
+
+A refresh is one joined `GROUP BY` over `company_metrics`/`companies`
+(optionally restricted to the weeks just written) returning COUNT/SUM/SUM(x²)
+per raw `segments` string and week; Python only folds the raw strings that
+normalize to the same set key ("B, A" and "A,B"). `etl.upsert_company_metrics` refreshes
+the weeks it touched. A full rebuild runs when the table is older than
+`COHORT_STATS_MAX_AGE_SEC` or after `invalidate()` (segment edits on
+`companies`). It runs on a background thread, and lookups keep serving the
+existing rows until it commits. A cohort lookup is then one grouped query over
+the set keys intersecting the company's segments.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .sql_utils import chunked, expanding_text
+
+METRICS: Tuple[str, ...] = ("mentions", "filings", "stars", "commits", "sentiment", "hiring", "patents", "signal_score")
+
+_READY: Set[str] = set()
+_built_at: Optional[float] = None
+# segment-set key -> its segments; None until first read after a (re)build
+_keys: Optional[Dict[str, FrozenSet[str]]] = None
+_rebuild_lock = threading.Lock()
+_rebuilding = False
+_retry_at = 0.0
+RETRY_SEC = 60.0
+
+
+def _raw_session(s: Any) -> Any:
+    return getattr(s, "_s", s)
+
+
+def split_segments(raw: Any) -> Tuple[str, ...]:
+    return tuple(sorted({p.strip() for p in str(raw or "").split(",") if p.strip()}))
+
+
+def segment_key(segs: Iterable[str]) -> str:
+    """Row key for a company's segment set (sorted, comma-joined)."""
+    return ",".join(split_segments(",".join(segs)))
+
+
+def ensure_schema(s: Any) -> None:
+    """Create the summary table on the session's bind (once per bind) when migrations have not run."""
+    bind = _raw_session(s).get_bind()
+    key = str(getattr(bind, "url", id(bind)))
+    if key in _READY:
+        return
+    from sqlmodel import SQLModel  # type: ignore
+    from .db import CohortMetricStat  # type: ignore
+
+    SQLModel.metadata.create_all(bind, tables=[CohortMetricStat.__table__])  # type: ignore[attr-defined]
+    _READY.add(key)
+
+
+def aggregate(rows: Iterable[Sequence[Any]]) -> Dict[Tuple[str, str, str], Dict[str, float]]:
+    """Fold grouped (segments, week_start, then n/total/total_sq per metric) rows into per (segment set, week, metric) stats."""
+    out: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+    for r in rows:
+        key = segment_key(split_segments(r[0]))
+        week = str(r[1] or "")
+        if not key or not week:
+            continue
+        for i, metric in enumerate(METRICS):
+            n = int(r[2 + 3 * i] or 0)
+            if n <= 0:
+                continue
+            acc = out.setdefault((key, week, metric), {"n": 0, "total": 0.0, "total_sq": 0.0})
+            acc["n"] += n
+            acc["total"] += float(r[3 + 3 * i] or 0.0)
+            acc["total_sq"] += float(r[4 + 3 * i] or 0.0)
+    for acc in out.values():
+        acc["mean"] = acc["total"] / acc["n"]
+    return out
+
+
+_SELECT = (
+    "SELECT c.segments, m.week_start, "
+    + ", ".join(f"COUNT(m.{k}), SUM(m.{k}), SUM(m.{k} * m.{k})" for k in METRICS)
+    + " FROM company_metrics m JOIN companies c ON c.id = m.company_id"
+)
+_GROUP = " GROUP BY c.segments, m.week_start"
+_INSERT = (
+    "INSERT INTO cohort_metric_stats (segment, week_start, metric, n, total, total_sq, mean, updated_at) "
+    "VALUES (:segment, :week_start, :metric, :n, :total, :total_sq, :mean, :updated_at)"
+)
+
+
+def _write(raw: Any, stats: Dict[Tuple[str, str, str], Dict[str, float]]) -> int:
+    from sqlmodel import text as _text  # type: ignore
+
+    now = datetime.now(timezone.utc).isoformat()
+    params = [{"segment": k[0], "week_start": k[1], "metric": k[2], **v, "updated_at": now} for k, v in sorted(stats.items())]
+    if params:
+        raw.execute(_text(_INSERT), params)
+    return len(params)
+
+
+def rebuild(s: Any) -> int:
+    """Recompute every (segment set, week, metric) row from one grouped scan."""
+    global _built_at, _keys
+    from sqlmodel import text as _text  # type: ignore
+
+    ensure_schema(s)
+    raw = _raw_session(s)
+    stats = aggregate(raw.execute(_text(_SELECT + _GROUP)))
+    raw.execute(_text("DELETE FROM cohort_metric_stats"))
+    n = _write(raw, stats)
+    raw.commit()
+    _built_at = time.time()
+    _keys = None
+    return n
+
+
+def refresh_weeks(s: Any, weeks: Iterable[str]) -> int:
+    """Recompute the rows of the given weeks only (all segments of those weeks)."""
+    wanted = sorted({str(w) for w in weeks if w})
+    if not wanted:
+        return 0
+    ensure_schema(s)
+    raw = _raw_session(s)
+    n = 0
+    written: Set[str] = set()
+    for chunk in chunked(wanted):
+        stats = aggregate(raw.execute(expanding_text(_SELECT + " WHERE m.week_start IN :w" + _GROUP, "w"), {"w": chunk}))
+        raw.execute(expanding_text("DELETE FROM cohort_metric_stats WHERE week_start IN :w", "w"), {"w": chunk})
+        n += _write(raw, stats)
+        written.update(k[0] for k in stats)
+    raw.commit()
+    keys = _keys
+    if keys is not None:
+        for key in written - set(keys):
+            keys[key] = frozenset(key.split(","))
+    return n
+
+
+def invalidate() -> None:
+    """Rebuild (in the background) on the next lookup, e.g. after company segments changed."""
+    global _built_at, _retry_at
+    _built_at = None
+    _retry_at = 0.0
+
+
+def _rebuild_worker() -> None:
+    global _rebuilding, _retry_at
+    try:
+        from .db import get_session  # type: ignore
+
+        with get_session() as s:
+            rebuild(s)
+    except Exception:
+        _retry_at = time.time() + RETRY_SEC
+    finally:
+        with _rebuild_lock:
+            _rebuilding = False
+
+
+def rebuild_in_background() -> bool:
+    """Start a rebuild on a daemon thread unless one is already running; True when started."""
+    global _rebuilding
+    with _rebuild_lock:
+        if _rebuilding:
+            return False
+        _rebuilding = True
+    threading.Thread(target=_rebuild_worker, name="cohort-stats-rebuild", daemon=True).start()
+    return True
+
+
+def _ensure_fresh() -> None:
+    """Kick off a background rebuild when stale; callers keep reading the current rows."""
+    try:
+        max_age = float(os.getenv("COHORT_STATS_MAX_AGE_SEC", "3600"))
+    except Exception:
+        max_age = 3600.0
+    if _built_at is not None and (max_age <= 0 or time.time() - _built_at < max_age):
+        return
+    if time.time() >= _retry_at:
+        rebuild_in_background()
+
+
+def _keys_for(raw: Any, segs: Sequence[str]) -> List[str]:
+    """Stored segment-set keys sharing at least one of `segs`."""
+    global _keys
+    from sqlmodel import text as _text  # type: ignore
+
+    keys = _keys
+    if keys is None:
+        keys = {str(r[0]): frozenset(str(r[0]).split(",")) for r in raw.execute(_text("SELECT DISTINCT segment FROM cohort_metric_stats"))}
+        _keys = keys
+    want = set(segs)
+    return sorted(k for k, members in list(keys.items()) if members & want)
+
+
+def lookup(s: Any, segments: Iterable[str], metrics: Sequence[str] = METRICS) -> Dict[str, Dict[str, float]]:
+    """All-time {metric: {n, mean, std}} over companies in any of the given segments (std is the sample std).
+
+    Moments are summed over the segment-set rows that intersect `segments`, so
+    every company is counted once however many of the segments it is listed under.
+    """
+    segs = sorted({str(x).strip() for x in segments if str(x).strip()})
+    if not segs:
+        return {}
+    _ensure_fresh()
+    raw = _raw_session(s)
+    keys = _keys_for(raw, segs)
+    if not keys:
+        return {}
+    rows = raw.execute(
+        expanding_text(
+            "SELECT metric, SUM(n), SUM(total), SUM(total_sq) FROM cohort_metric_stats "
+            "WHERE segment IN :keys AND metric IN :metrics GROUP BY metric",
+            "keys",
+            "metrics",
+        ),
+        {"keys": keys, "metrics": list(metrics)},
+    )
+    out: Dict[str, Dict[str, float]] = {}
+    for metric, n, total, total_sq in rows:
+        n = int(n or 0)
+        if n <= 0:
+            continue
+        mean = float(total or 0.0) / n
+        var = max(0.0, (float(total_sq or 0.0) - n * mean * mean) / max(1, n - 1))
+        out[str(metric)] = {"n": n, "mean": mean, "std": var ** 0.5}
+    return out
+
+
+def company_cohort(s: Any, company_id: int, metrics: Sequence[str] = METRICS) -> Dict[str, Dict[str, float]]:
+    from sqlmodel import text as _text  # type: ignore
+
+    row = _raw_session(s).execute(_text("SELECT segments FROM companies WHERE id = :id"), {"id": int(company_id)}).first()
+    return lookup(s, split_segments(row[0]) if row else (), metrics)
@@ -32,6 +32,8 @@ class Settings(BaseSettings):
     hsts_max_age: int = 31536000  # 1 year
     trusted_hosts: str | None = None  # CSV list; if None/empty, middleware disabled
     request_max_body_bytes: int = 2 * 1024 * 1024  # 2MB default
+    # Per path-prefix overrides for bulk endpoints: "/prefix=bytes,..." (longest prefix wins, 0 = unlimited)
+    request_max_body_routes: Optional[str] = "/kg/commit=16777216,/ingest=33554432,/admin/kg=16777216"
     gzip_enabled: bool = True
     gzip_min_size: int = 500  # bytes
 
@@ -53,6 +55,9 @@ class Settings(BaseSettings):
     rerank_enabled: bool = True
     rate_limit_enabled: bool = False
     rate_limit_per_minute: int = 120
+    rate_limit_backend: str = "memory"  # memory|db (db shares limits across workers)
+    rate_limit_max_keys: int = 100000
+    rate_limit_fail_open: bool = True  # db backend: allow requests when the limiter store errors
     citations_enforce: bool = True
     # Phase 4: API key & plans (default off to preserve current behavior)
     apikey_required: bool = False
@@ -1,29 +1,15 @@
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional, Tuple
-import time
 from pydantic import BaseModel
 from .db import get_session, Company, CopilotSession
 from .rag_models import ComparativeAnswer, ComparisonRow
+from . import doc_cache, entity_detect
 from sqlalchemy import text
 def answer_with_citations(question: str) -> Dict[str, Any]:
     # Minimal stub so tests can monkeypatch this symbol without importing heavy deps.
     return {"answer": "Insufficient evidence", "sources": []}
 
-try:
-    from rapidfuzz import fuzz  # type: ignore
-
-    def _sim(a: str, b: str) -> float:
-        try:
-            return float(fuzz.token_set_ratio(a, b))
-        except Exception:
-            return 0.0
-except Exception:
-    from difflib import SequenceMatcher
-
-    def _sim(a: str, b: str) -> float:
-        return 100.0 * SequenceMatcher(None, a, b).ratio()
-
 
 class CopilotMemory(BaseModel):
     last_intent: Optional[str] = None
@@ -32,12 +18,6 @@ class CopilotMemory(BaseModel):
     citation_cache: List[str] = []
 
 
-# Initialize in-memory cache globals to avoid 'possibly unbound' warnings
-_DOC_CACHE: Dict[str, Tuple[float, List[str]]] = {}
-_DOC_HITS: int = 0
-_DOC_MISSES: int = 0
-
-
 def _get_or_create_session(session_id: Optional[str]) -> Tuple[Optional[int], CopilotMemory]:
     if not session_id:
         return None, CopilotMemory()
@@ -83,46 +63,23 @@ def _persist_memory(session_id: Optional[int], mem: CopilotMemory) -> None:
         pass
 
 
-def _candidate_company_ids() -> List[Tuple[int, str]]:
+def _candidate_company_ids() -> List[Tuple[Any, ...]]:
+    """Every company as (id, canonical_name, alias, ticker); feeds the detection gazetteer."""
     try:
         with get_session() as s:
-            res = s.exec(text("SELECT id, canonical_name FROM companies LIMIT 200"))  # type: ignore[arg-type]
-            rows = list(res) if res is not None else []
-            out: List[Tuple[int, str]] = []
-            for r in rows:
-                try:
-                    cid = int(r[0])
-                    name = str(r[1])
-                    out.append((cid, name))
-                except Exception:
-                    continue
-            return out
+            try:
+                res = s.exec(text("SELECT id, canonical_name, name, ticker FROM companies"))  # type: ignore[arg-type]
+            except Exception:
+                s.rollback()
+                res = s.exec(text("SELECT id, canonical_name FROM companies"))  # type: ignore[arg-type]
+            return [tuple(r) for r in (res or [])]
     except Exception:
         return []
 
 
 def detect_company_ids(question: str, top_k: int = 2) -> List[int]:
-    # Optional spaCy NER
-    ents: List[str] = []
-    try:
-        import spacy  # type: ignore
-        try:
-            nlp = spacy.load("en_core_web_sm")  # may fail if model missing
-            doc = nlp(question)
-            ents = [e.text for e in doc.ents if e.label_ in {"ORG", "PRODUCT", "PERSON"}]
-        except Exception:
-            pass
-    except Exception:
-        pass
-    tokens = ents or question.split()
-    cands = _candidate_company_ids()
-    scored: List[Tuple[int, float]] = []
-    for cid, name in cands:
-        best = max((_sim(name, t) for t in tokens), default=0.0)
-        if best >= 70:
-            scored.append((cid, float(best)))
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return [cid for cid, _ in scored[:top_k]]
+    entity_detect.GAZETTEER.ensure_loaded(_candidate_company_ids)
+    return entity_detect.detect(question, top_k=top_k)
 
 
 def rrf_fuse(dense: List[str], sparse: List[str], k: int = 60, top_n: int = 10) -> List[str]:
@@ -174,19 +131,22 @@ def tool_compare_companies(ids: List[int], metrics: List[str]) -> List[Compariso
     return rows
 
 
-def tool_retrieve_docs(query: str, limit: int = 10) -> List[str]:
-    # In-memory TTL cache to avoid repeated retrievals
-    # key: query string -> (timestamp, urls)
-    global _DOC_CACHE, _DOC_HITS, _DOC_MISSES  # type: ignore
-    now = time.time()
-    TTL = 600.0  # 10 minutes
-    MAX_ENTRIES = 256
-    cached = _DOC_CACHE.get(query)
-    if cached:
-        ts, urls_cached = cached
-        if now - ts < TTL:
-            _DOC_HITS += 1
-            return list(urls_cached)[:limit]
+def _default_tenant_id() -> Optional[str]:
+    try:
+        from .retrieval import _current_tenant_id
+
+        return _current_tenant_id()
+    except Exception:
+        return None
+
+
+def tool_retrieve_docs(query: str, limit: int = 10, tenant_id: Optional[Any] = None) -> List[str]:
+    # Per-tenant LRU/TTL cache (doc_cache.DOC_CACHE) to avoid repeated retrievals
+    if tenant_id is None:
+        tenant_id = _default_tenant_id()
+    cached = doc_cache.DOC_CACHE.get(tenant_id, query, limit)
+    if cached is not None:
+        return cached
     # Use existing hybrid retrieval + citations as fallback
     # Lazy import to avoid heavy deps at module import time; fall back to local stub
     try:
@@ -257,15 +217,7 @@ def tool_retrieve_docs(query: str, limit: int = 10) -> List[str]:
             pass
     # Store in cache
     try:
-        _DOC_CACHE[query] = (now, list(urls))
-        _DOC_MISSES += 1
-        # simple size cap eviction: drop oldest entries beyond MAX_ENTRIES
-        if len(_DOC_CACHE) > MAX_ENTRIES:
-            try:
-                oldest_key = min(_DOC_CACHE.items(), key=lambda kv: kv[1][0])[0]
-                _DOC_CACHE.pop(oldest_key, None)
-            except Exception:
-                pass
+        doc_cache.DOC_CACHE.set(tenant_id, query, urls, limit)
     except Exception:
         pass
     return urls
@@ -273,32 +225,17 @@ def tool_retrieve_docs(query: str, limit: int = 10) -> List[str]:
 
 def _clear_doc_cache() -> int:
     """Clear the in-memory document cache. Returns number of entries removed."""
-    global _DOC_CACHE, _DOC_HITS, _DOC_MISSES  # type: ignore
     try:
-        n = len(_DOC_CACHE)
-        _DOC_CACHE.clear()
-        _DOC_HITS = 0
-        _DOC_MISSES = 0
-        return n
+        return doc_cache.DOC_CACHE.clear()
     except Exception:
         return 0
 
 
-def _get_doc_cache_stats() -> Dict[str, int]:
-    global _DOC_CACHE, _DOC_HITS, _DOC_MISSES  # type: ignore
-    try:
-        size = len(_DOC_CACHE)
-    except Exception:
-        size = 0
-    try:
-        hits = int(_DOC_HITS)
-    except Exception:
-        hits = 0
+def _get_doc_cache_stats() -> Dict[str, Any]:
     try:
-        misses = int(_DOC_MISSES)
+        return doc_cache.DOC_CACHE.info()
     except Exception:
-        misses = 0
-    return {"hits": hits, "misses": misses, "size": size}
+        return {"hits": 0, "misses": 0, "size": 0}
 
 
 def tool_trend_snapshot(segment: str | None, keyword: str | None, window: str = "90d") -> Dict[str, Any]:
@@ -314,7 +251,7 @@ def ask_copilot(session_id: Optional[str], question: str, context_filters: Optio
     metrics = ["signal_score", "stars_30d", "commits_30d"]
 
     rows = tool_compare_companies(ids[:2], metrics)
-    sources = tool_retrieve_docs(question, limit=12)
+    sources = tool_retrieve_docs(question, limit=12, tenant_id=(context_filters or {}).get("tenant_id"))
 
     # Guardrail: citations must be non-empty
     if not sources:
@@ -4,10 +4,12 @@ from contextlib import contextmanager
 from typing import Any, Generator, Iterable, Optional, Protocol
 from pydantic import ConfigDict
 
+from . import kg_changes, kg_stats, kg_temporal
 from .config import settings
 
 try:
     from sqlmodel import SQLModel, Field, Session, create_engine  # type: ignore
+    from sqlalchemy import BigInteger, Column, Index, event  # type: ignore
     _HAVE_SQLMODEL = True
 except Exception:
     SQLModel = object  # type: ignore
@@ -193,7 +195,7 @@ if _HAVE_SQLMODEL:
         __table_args__ = {"extend_existing": True}
 
         id: Optional[int] = Field(default=None, primary_key=True)  # type: ignore
-        key_hash: str = Field(index=True)  # type: ignore
+        key_hash: str = Field(index=True, unique=True)  # type: ignore  # one row per key (response_cache upserts)
         input_json: Optional[str] = None
         output_json: Optional[str] = None
         created_at: Optional[str] = Field(default=None, index=True)  # type: ignore
@@ -282,6 +284,8 @@ if _HAVE_SQLMODEL:
         rate_limit_per_min: Optional[int] = None
         expires_at: Optional[str] = Field(default=None, index=True)  # type: ignore
         status: str = Field(default="active", index=True)  # type: ignore
+        # Set on revocation; MAX(revoked_at) is the watermark every worker's auth cache polls
+        revoked_at: Optional[str] = Field(default=None, index=True)  # type: ignore
 
     class Plan(SQLModel, table=True):  # type: ignore
         __tablename__ = "plans"
@@ -318,6 +322,25 @@ if _HAVE_SQLMODEL:
         meta_json: Optional[str] = None
         ts: Optional[str] = Field(default=None, index=True)  # type: ignore
 
+    class UsageCounter(SQLModel, table=True):  # type: ignore
+        __tablename__ = "usage_counters"
+        __table_args__ = {"extend_existing": True}
+
+        period_key: str = Field(primary_key=True)  # type: ignore  # YYYY-MM or YYYY-MM-DD
+        tenant_id: str = Field(primary_key=True)  # type: ignore
+        product: str = Field(primary_key=True)  # type: ignore
+        units: int = 0
+        updated_at: Optional[str] = None
+
+    class RateLimitBucket(SQLModel, table=True):  # type: ignore
+        __tablename__ = "rate_limit_buckets"
+        __table_args__ = {"extend_existing": True}
+
+        k: str = Field(primary_key=True)  # type: ignore  # route|client key
+        win: int = 0  # window index (epoch seconds // window)
+        cur: int = 0
+        prev: int = 0
+
     class EntitlementOverride(SQLModel, table=True):  # type: ignore
         __tablename__ = "entitlement_overrides"
         __table_args__ = {"extend_existing": True}
@@ -363,8 +386,11 @@ if _HAVE_SQLMODEL:
         secret: Optional[str] = None
         attempt: int = Field(default=0, index=True)  # type: ignore
         next_at: Optional[str] = Field(default=None, index=True)  # type: ignore
-        status: Optional[str] = Field(default="pending", index=True)  # type: ignore
+        status: Optional[str] = Field(default="pending", index=True)  # type: ignore  # pending|inflight|delivered|dead
         created_at: Optional[str] = Field(default=None, index=True)  # type: ignore
+        lease_owner: Optional[str] = Field(default=None, index=True)  # type: ignore  # dispatcher claim token
+        lease_until: Optional[str] = None
+        last_error: Optional[str] = None
 
     class OrgSeat(SQLModel, table=True):  # type: ignore
         __tablename__ = "org_seats"
@@ -427,6 +453,16 @@ if _HAVE_SQLMODEL:
         provenance_id: Optional[int] = Field(default=None, index=True)  # type: ignore
         created_at: Optional[str] = Field(default=None, index=True)  # type: ignore
 
+    def _install_kg_triggers(target: Any, connection: Any, tables: Any = None, **_: Any) -> None:
+        # Metadata-level so the side tables (kg_stats, kg_changes) exist before their DDL runs
+        created = [t.name for t in (tables or []) if t.name in kg_temporal.TABLES]
+        if created:
+            kg_temporal.install(connection, tables=created)
+            kg_stats.install(connection, tables=created)
+            kg_changes.install(connection, tables=created)
+
+    event.listen(SQLModel.metadata, "after_create", _install_kg_triggers)
+
     class ProvenanceRecord(SQLModel, table=True):  # type: ignore
         __tablename__ = "provenance_records"
         __table_args__ = {"extend_existing": True}
@@ -461,6 +497,87 @@ if _HAVE_SQLMODEL:
         notes: Optional[str] = None
         created_at: Optional[str] = Field(default=None, index=True)  # type: ignore
 
+    # --- Phase 6: persistent Merkle index over open KG rows (see kg_merkle) ---
+    class KGMerkleLeaf(SQLModel, table=True):  # type: ignore
+        __tablename__ = "kg_merkle_leaves"
+        __table_args__ = {"extend_existing": True}
+
+        id: Optional[int] = Field(default=None, primary_key=True)  # type: ignore
+        uid: str = Field(index=True)  # type: ignore  # node uid, or src_uid for edges
+        bucket: int = Field(index=True)  # type: ignore
+        leaf_key: str = Field(index=True)  # type: ignore  # sort key within bucket
+        kind: str = Field(index=True)  # type: ignore  # n|e
+        leaf_hash: str
+
+    class KGMerkleNode(SQLModel, table=True):  # type: ignore
+        __tablename__ = "kg_merkle_nodes"
+        __table_args__ = {"extend_existing": True}
+
+        level: int = Field(primary_key=True)  # type: ignore  # 0 = bucket roots
+        idx: int = Field(primary_key=True)  # type: ignore
+        hash: str
+
+    class KGMerkleDirty(SQLModel, table=True):  # type: ignore
+        __tablename__ = "kg_merkle_dirty"
+        __table_args__ = {"extend_existing": True}
+
+        uid: str = Field(primary_key=True)  # type: ignore
+        marked_at: Optional[str] = None
+
+    class KGStat(SQLModel, table=True):  # type: ignore
+        __tablename__ = "kg_stats"
+        __table_args__ = {"extend_existing": True}
+
+        kind: str = Field(primary_key=True)  # type: ignore  # node|edge
+        tenant_key: int = Field(primary_key=True)  # type: ignore  # tenant_id, -1 for NULL
+        type: str = Field(primary_key=True)  # type: ignore
+        total_count: int = 0  # all versions
+        open_count: int = 0  # valid_to IS NULL
+        latest_created_at: Optional[str] = None
+
+    class KGChange(SQLModel, table=True):  # type: ignore
+        __tablename__ = "kg_changes"
+        __table_args__ = (
+            Index("ix_kg_changes_tenant_seq", "tenant_id", "seq"),
+            Index("ix_kg_changes_txid_seq", "txid", "seq"),
+            {"extend_existing": True, "sqlite_autoincrement": True},
+        )
+
+        seq: Optional[int] = Field(default=None, primary_key=True)  # type: ignore  # monotonic, appended by DB triggers
+        kind: str  # node|edge
+        op: str  # insert|close|update|delete
+        row_id: int  # kg_nodes.id / kg_edges.id
+        tenant_id: Optional[int] = None
+        changed_at: str = Field(index=True)  # type: ignore
+        txid: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))  # type: ignore  # writer's txid_current() on Postgres
+
+    class KGNodeProp(SQLModel, table=True):  # type: ignore
+        __tablename__ = "kg_node_props"
+        __table_args__ = (
+            Index("ix_kg_node_props_key_val", "key", "val"),
+            Index("ix_kg_node_props_key_num", "key", "num"),
+            {"extend_existing": True},
+        )
+
+        node_id: int = Field(primary_key=True)  # type: ignore  # kg_nodes.id (one version)
+        key: str = Field(primary_key=True)  # type: ignore
+        val: str = Field(primary_key=True)  # type: ignore  # trimmed, lowercased text
+        uid: str
+        num: Optional[float] = None  # numeric value for range filters
+
+    class CohortMetricStat(SQLModel, table=True):  # type: ignore
+        __tablename__ = "cohort_metric_stats"
+        __table_args__ = {"extend_existing": True}
+
+        segment: str = Field(primary_key=True)  # type: ignore
+        week_start: str = Field(primary_key=True, index=True)  # type: ignore
+        metric: str = Field(primary_key=True)  # type: ignore
+        n: int = 0
+        total: float = 0.0
+        total_sq: float = 0.0
+        mean: Optional[float] = None
+        updated_at: Optional[str] = None
+
     class IngestLedger(SQLModel, table=True):  # type: ignore
         __tablename__ = "ingest_ledger"
         __table_args__ = {"extend_existing": True}
@@ -705,7 +822,7 @@ else:
             self.created_at = created_at
 
     class ApiKey:
-        def __init__(self, id: Optional[int] = None, tenant_id: int = 0, prefix: str = "", key_hash: str = "", scopes: Optional[str] = None, rate_limit_per_min: Optional[int] = None, expires_at: Optional[str] = None, status: str = "active"):
+        def __init__(self, id: Optional[int] = None, tenant_id: int = 0, prefix: str = "", key_hash: str = "", scopes: Optional[str] = None, rate_limit_per_min: Optional[int] = None, expires_at: Optional[str] = None, status: str = "active", revoked_at: Optional[str] = None):
             self.id = id
             self.tenant_id = tenant_id
             self.prefix = prefix
@@ -714,6 +831,7 @@ else:
             self.rate_limit_per_min = rate_limit_per_min
             self.expires_at = expires_at
             self.status = status
+            self.revoked_at = revoked_at
 
     class Plan:
         def __init__(self, id: Optional[int] = None, code: str = "", name: str = "", price_usd: Optional[float] = None, period: Optional[str] = "monthly", entitlements_json: Optional[str] = None):
@@ -744,6 +862,48 @@ else:
             self.meta_json = meta_json
             self.ts = ts
 
+    class UsageCounter:
+        def __init__(self, period_key: str = "", tenant_id: str = "", product: str = "", units: int = 0, updated_at: Optional[str] = None):
+            self.period_key = period_key
+            self.tenant_id = tenant_id
+            self.product = product
+            self.units = units
+            self.updated_at = updated_at
+
+    class KGStat:
+        def __init__(self, kind: str = "", tenant_key: int = -1, type: str = "", total_count: int = 0, open_count: int = 0, latest_created_at: Optional[str] = None):
+            self.kind = kind
+            self.tenant_key = tenant_key
+            self.type = type
+            self.total_count = total_count
+            self.open_count = open_count
+            self.latest_created_at = latest_created_at
+
+    class KGChange:
+        def __init__(self, seq: Optional[int] = None, kind: str = "", op: str = "", row_id: int = 0, tenant_id: Optional[int] = None, changed_at: str = "", txid: int = 0):
+            self.seq = seq
+            self.kind = kind
+            self.op = op
+            self.row_id = row_id
+            self.tenant_id = tenant_id
+            self.changed_at = changed_at
+            self.txid = txid
+
+    class KGNodeProp:
+        def __init__(self, node_id: int = 0, key: str = "", val: str = "", uid: str = "", num: Optional[float] = None):
+            self.node_id = node_id
+            self.key = key
+            self.val = val
+            self.uid = uid
+            self.num = num
+
+    class RateLimitBucket:
+        def __init__(self, k: str = "", win: int = 0, cur: int = 0, prev: int = 0):
+            self.k = k
+            self.win = win
+            self.cur = cur
+            self.prev = prev
+
     class EntitlementOverride:
         def __init__(self, id: Optional[int] = None, tenant_id: int = 0, key: str = "", value: str = "", expires_at: Optional[str] = None):
             self.id = id
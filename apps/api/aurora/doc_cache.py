@@ -0,0 +1,162 @@
+"""Per-tenant LRU/TTL cache for the copilot's retrieved document URLs.
+
+`copilot.tool_retrieve_docs` kept `_DOC_CACHE`, a plain dict capped at 256
+entries with a 10-minute TTL. Once full, every insert scanned the whole dict
+for the oldest timestamp (O(n)), and all tenants shared the 256 slots. Only
+hit/miss counters were kept. `DocCache` replaces it:
+
+* one `OrderedDict` LRU per tenant. Hits move to the end, and eviction pops the
+  front, so both are O(1). Each partition has its own byte budget
+  (`COPILOT_DOC_CACHE_TENANT_BYTES`, default 1 MiB) and entry cap
+  (`COPILOT_DOC_CACHE_TENANT_ENTRIES`, default 256), so a busy tenant only
+  evicts its own entries;
+* partitions themselves sit in an LRU of at most `COPILOT_DOC_CACHE_TENANTS`
+  (default 256). The least recently used tenant is dropped whole when a new one
+  arrives;
+* entries expire after `COPILOT_DOC_CACHE_TTL_SEC` (default 600). Expired
+  entries are dropped on read, and opportunistically from the LRU front on
+  write;
+* an entry remembers the `limit` it was fetched with. A later call asking for
+  more URLs than a truncated entry holds counts as a miss instead of getting the
+  short list.
+
+`info()` feeds `/dev/cache-stats`, `/dev/metrics` and the `aurora_docs_cache_*`
+series on `/metrics`.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Rough per-entry overhead (tuple, floats, dict slot) added to the key/URL bytes
+_ENTRY_OVERHEAD = 96
+
+_Entry = Tuple[float, int, Tuple[str, ...], int]  # expires_at, limit, urls, bytes
+
+
+class _Partition:
+    __slots__ = ("lru", "bytes")
+
+    def __init__(self) -> None:
+        self.lru: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.bytes = 0
+
+    def drop(self, key: str) -> None:
+        ent = self.lru.pop(key, None)
+        if ent is not None:
+            self.bytes -= ent[3]
+
+
+class DocCache:
+    def __init__(
+        self,
+        ttl_s: float = 600.0,
+        tenant_max_bytes: int = 1024 * 1024,
+        tenant_max_entries: int = 256,
+        max_tenants: int = 256,
+    ) -> None:
+        self.ttl_s = max(0.0, float(ttl_s))
+        self.tenant_max_bytes = max(1, int(tenant_max_bytes))
+        self.tenant_max_entries = max(1, int(tenant_max_entries))
+        self.max_tenants = max(1, int(max_tenants))
+        self._tenants: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0, "tenant_evictions": 0}
+
+    @staticmethod
+    def _tenant_key(tenant: Optional[Any]) -> str:
+        return "" if tenant is None else str(tenant)
+
+    def get(self, tenant: Optional[Any], query: str, limit: int) -> Optional[List[str]]:
+        """Cached URLs for `query` (at most `limit`), or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            part = self._tenants.get(self._tenant_key(tenant))
+            ent = part.lru.get(query) if part is not None else None
+            if ent is None or part is None:
+                self.stats["misses"] += 1
+                return None
+            if ent[0] <= now:
+                part.drop(query)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            # A truncated entry (len == fetched limit) cannot answer a larger limit
+            if limit > ent[1] and len(ent[2]) >= ent[1]:
+                self.stats["misses"] += 1
+                return None
+            part.lru.move_to_end(query)
+            self._tenants.move_to_end(self._tenant_key(tenant))
+            self.stats["hits"] += 1
+            return list(ent[2][:limit])
+
+    def set(self, tenant: Optional[Any], query: str, urls: Sequence[str], limit: int) -> None:
+        urls_t = tuple(str(u) for u in urls)
+        size = _ENTRY_OVERHEAD + len(query.encode("utf-8", "ignore")) + sum(len(u) for u in urls_t)
+        if size > self.tenant_max_bytes:
+            return
+        now = time.monotonic()
+        tkey = self._tenant_key(tenant)
+        with self._lock:
+            part = self._tenants.get(tkey)
+            if part is None:
+                part = self._tenants[tkey] = _Partition()
+                while len(self._tenants) > self.max_tenants:
+                    _, old = self._tenants.popitem(last=False)
+                    self.stats["tenant_evictions"] += 1
+                    self.stats["evictions"] += len(old.lru)
+            self._tenants.move_to_end(tkey)
+            part.drop(query)
+            part.lru[query] = (now + self.ttl_s, int(limit), urls_t, size)
+            part.bytes += size
+            self.stats["sets"] += 1
+            # Expired entries at the LRU front go first, then the LRU while over budget
+            while part.lru:
+                key, ent = next(iter(part.lru.items()))
+                if ent[0] <= now:
+                    self.stats["expirations"] += 1
+                elif part.bytes > self.tenant_max_bytes or len(part.lru) > self.tenant_max_entries:
+                    self.stats["evictions"] += 1
+                else:
+                    break
+                part.drop(key)
+
+    def clear(self) -> int:
+        """Drop every entry and reset the counters; returns the number of entries removed."""
+        with self._lock:
+            n = sum(len(p.lru) for p in self._tenants.values())
+            self._tenants.clear()
+            for k in self.stats:
+                self.stats[k] = 0
+        return n
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            size = sum(len(p.lru) for p in self._tenants.values())
+            used = sum(p.bytes for p in self._tenants.values())
+            tenants = len(self._tenants)
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "size": size,
+            "bytes": used,
+            "tenants": tenants,
+            "hit_ratio": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            "ttl_s": self.ttl_s,
+            "tenant_max_bytes": self.tenant_max_bytes,
+            "tenant_max_entries": self.tenant_max_entries,
+            "max_tenants": self.max_tenants,
+            **stats,
+        }
+
+
+DOC_CACHE = DocCache(
+    ttl_s=float(os.getenv("COPILOT_DOC_CACHE_TTL_SEC", "600")),
+    tenant_max_bytes=int(os.getenv("COPILOT_DOC_CACHE_TENANT_BYTES", str(1024 * 1024))),
+    tenant_max_entries=int(os.getenv("COPILOT_DOC_CACHE_TENANT_ENTRIES", "256")),
+    max_tenants=int(os.getenv("COPILOT_DOC_CACHE_TENANTS", "256")),
+)
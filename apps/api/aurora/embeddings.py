@@ -0,0 +1,201 @@
+"""Query-embedding service: LRU cache, optional on-disk store, micro-batched encoding.
+
+`retrieval._qdrant_search` used to call `SentenceTransformer.encode` once per
+query. Copilot, memo generation and evals repeat the same or nearly the same
+query strings many times. This service sits in front of the model:
+
+1. an in-process LRU keyed by (model id, normalized text);
+2. an optional SQLite store (`EMBED_CACHE_PATH`) holding float32 vectors, so
+   hot queries survive restarts;
+3. a micro-batcher (`batching.MicroBatcher`). Concurrent misses are queued,
+   and its worker thread drains up to `EMBED_MAX_BATCH` of them after `EMBED_BATCH_WINDOW_MS` and
+   issues one `model.encode(list)` call. Identical in-flight texts share one
+   slot.
+
+Normalization is NFKC, trimmed, with whitespace collapsed and text lowercased.
+The bge models use an uncased tokenizer, so lowercasing does not change the vector.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .batching import LruCache, MicroBatcher, ServiceRegistry
+
+
+def normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", str(text or "")).split()).lower()
+
+
+def _to_list(vec: Any) -> List[float]:
+    # Round-trip through float32 so LRU and on-disk hits return identical vectors
+    return list(array("f", [float(x) for x in (vec.tolist() if hasattr(vec, "tolist") else vec)]))
+
+
+class _DiskStore:
+    """Tiny SQLite key/value store for float32 vectors (one connection per thread)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        with self._conn() as c:
+            c.execute("CREATE TABLE IF NOT EXISTS query_embeddings (model TEXT NOT NULL, key TEXT NOT NULL, vec BLOB NOT NULL, PRIMARY KEY (model, key))")
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            c.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = c
+        return c
+
+    def get(self, model: str, key: str) -> Optional[List[float]]:
+        row = self._conn().execute("SELECT vec FROM query_embeddings WHERE model = ? AND key = ?", (model, key)).fetchone()
+        if not row:
+            return None
+        arr = array("f")
+        arr.frombytes(row[0])
+        return list(arr)
+
+    def put_many(self, model: str, items: Sequence[Tuple[str, List[float]]]) -> None:
+        with self._conn() as c:
+            c.executemany(
+                "INSERT OR REPLACE INTO query_embeddings (model, key, vec) VALUES (?, ?, ?)",
+                [(model, k, array("f", v).tobytes()) for k, v in items],
+            )
+
+
+class EmbeddingService:
+    def __init__(
+        self,
+        loader: Callable[[], Any],
+        model_id: str,
+        max_items: int = 4096,
+        store_path: Optional[str] = None,
+        batch_window_ms: float = 2.0,
+        max_batch: int = 32,
+        timeout_s: float = 30.0,
+    ) -> None:
+        self._loader = loader
+        self.model_id = model_id
+        self._cache = LruCache(max_items)
+        self._batcher = MicroBatcher(self._encode_batch, "embedding-batcher", batch_window_ms, max_batch, timeout_s)
+        self._store: Optional[_DiskStore] = None
+        if store_path:
+            try:
+                self._store = _DiskStore(store_path)
+            except Exception:
+                self._store = None
+        self.stats: Dict[str, int] = {"hits": 0, "disk_hits": 0, "misses": 0, "batches": 0, "encoded": 0, "errors": 0}
+
+    # --- cache tiers ---
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        vec = self._cache.get(key)
+        if vec is not None:
+            self.stats["hits"] += 1
+            return vec
+        if self._store is not None:
+            try:
+                vec = self._store.get(self.model_id, key)
+            except Exception:
+                vec = None
+            if vec is not None:
+                self.stats["disk_hits"] += 1
+                self._cache.put_many([(key, vec)])
+                return vec
+        return None
+
+    def _remember(self, pairs: Sequence[Tuple[str, List[float]]]) -> None:
+        self._cache.put_many(pairs)
+        if self._store is not None and pairs:
+            try:
+                self._store.put_many(self.model_id, pairs)
+            except Exception:
+                pass
+
+    # --- encoding ---
+    def _encode_now(self, texts: List[str]) -> List[List[float]]:
+        model = self._loader()
+        if model is None:
+            raise RuntimeError("embedder unavailable")
+        vecs = model.encode(texts)
+        self.stats["batches"] += 1
+        self.stats["encoded"] += len(texts)
+        return [_to_list(v) for v in vecs]
+
+    def _encode_batch(self, keys: List[str], texts: List[str]) -> List[List[float]]:
+        try:
+            vecs = self._encode_now(texts)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self._remember(list(zip(keys, vecs)))
+        return vecs
+
+    def embed(self, text: str) -> Optional[List[float]]:
+        """Embedding for one query string; None when the model is unavailable."""
+        key = normalize(text)
+        vec = self._lookup(key)
+        if vec is not None:
+            return vec
+        self.stats["misses"] += 1
+        try:
+            if self._batcher.enabled:
+                return self._batcher.wait({key: self._batcher.submit(key, key)})[key]
+            return self._encode_batch([key], [key])[0]
+        except Exception:
+            return None
+
+    def cached(self, text: str) -> Optional[List[float]]:
+        """Embedding from the LRU or disk store only; never encodes."""
+        return self._lookup(normalize(text))
+
+    def embed_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Batch path for offline callers (evals): cache lookups, then one encode for the misses."""
+        keys = [normalize(t) for t in texts]
+        out: List[Optional[List[float]]] = [self._lookup(k) for k in keys]
+        missing = sorted({k for k, v in zip(keys, out) if v is None})
+        if missing:
+            self.stats["misses"] += len(missing)
+            try:
+                fresh = dict(zip(missing, self._encode_batch(missing, missing)))
+            except Exception:
+                fresh = {}
+            out = [v if v is not None else fresh.get(k) for k, v in zip(keys, out)]
+        return out
+
+    def info(self) -> Dict[str, Any]:
+        return {"model": self.model_id, "size": len(self._cache), "max_items": self._cache.max_items, "disk": self._store.path if self._store else None, **self.stats}
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def _from_env(model_id: str, loader: Callable[[], Any]) -> EmbeddingService:
+    return EmbeddingService(
+        loader,
+        model_id,
+        max_items=int(os.getenv("EMBED_CACHE_SIZE", "4096")),
+        store_path=os.getenv("EMBED_CACHE_PATH") or None,
+        batch_window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "2")),
+        max_batch=int(os.getenv("EMBED_MAX_BATCH", "32")),
+    )
+
+
+_SERVICES: ServiceRegistry[EmbeddingService] = ServiceRegistry(_from_env)
+
+
+def get_service(model_id: str, loader: Callable[[], Any]) -> EmbeddingService:
+    """Process-wide service per model id, configured from env on first use."""
+    return _SERVICES.get(model_id, loader)
+
+
+def all_info() -> List[Dict[str, Any]]:
+    return _SERVICES.all_info()
@@ -0,0 +1,377 @@
+"""Company detection for the copilot: shared NLP pipeline and an in-memory gazetteer.
+
+`copilot.detect_company_ids` used to call `spacy.load` on every question,
+which costs hundreds of milliseconds to seconds. It then read
+`SELECT id, canonical_name FROM companies LIMIT 200` and fuzzy-matched each
+name against every question token, so companies past the first 200 rows could
+never be detected. Here:
+
+* `nlp()` loads the spaCy pipeline (`COPILOT_SPACY_MODEL`, default
+  en_core_web_sm) once per process. A failed load is remembered, and the regex
+  tokenizer below is used instead;
+* `Gazetteer` indexes every company's canonical name, alias (`name`) and
+  ticker. Names are normalized with NFKC, lowercased and tokenized, and
+  corporate suffixes (Inc, Ltd, ...) are added as an optional variant. The
+  resulting token tuples are stored under their first token, so matching a
+  question is one dict probe per token plus a comparison of the few phrases
+  starting there. A fuzzy pass (rapidfuzz ratio >= `COPILOT_FUZZY_MIN`,
+  default 85) covers typos. It only considers phrases whose first token shares
+  a 2-character prefix with the question token. Tickers only match when written
+  in upper case in the question, so "AI" the ticker is not "ai" the word.
+* Multi-token names are also indexed under their leading token when it is
+  distinctive (>= 3 characters, not a stopword or suffix), so "Portek" finds
+  "Portek Systems". Such partial hits score `LEAD_SCORE`, below any exact
+  phrase, and are ignored when more than `LEAD_MAX` companies share the token.
+
+The gazetteer is loaded lazily (and at startup) and refreshed by canonical
+name from the company upsert path. It is loaded synchronously when empty or
+when its row source changes. After `COPILOT_GAZETTEER_RELOAD_SEC` (default
+300) it is rebuilt on a background thread, one at a time, while lookups keep
+using the current index; upserts applied meanwhile are replayed onto the new one.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .sql_utils import chunked, expanding_text
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[&'.\-][a-z0-9]+)*")
+_TICKER = re.compile(r"\$?\b([A-Z][A-Z0-9.]{1,5})\b")
+SUFFIXES = frozenset({"inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "llc", "plc", "gmbh", "ag", "sa"})
+NER_LABELS = frozenset({"ORG", "PRODUCT", "PERSON"})
+STOPWORDS = frozenset({"the", "a", "an", "and", "of", "for", "in", "on", "at", "to", "by", "with", "new", "my", "our", "your"})
+PREFIX = 2
+LEAD_MIN = 3
+LEAD_MAX = 3
+LEAD_SCORE = 90.0
+RETRY_SEC = 60.0
+
+_Phrase = Tuple[str, ...]
+
+_nlp: Any = None
+_nlp_failed = False
+_nlp_lock = threading.Lock()
+
+
+def nlp() -> Any:
+    """Process-wide spaCy pipeline, or None when spaCy or the model is unavailable."""
+    global _nlp, _nlp_failed
+    if _nlp is not None or _nlp_failed:
+        return _nlp
+    with _nlp_lock:
+        if _nlp is None and not _nlp_failed:
+            try:
+                import spacy  # type: ignore
+
+                _nlp = spacy.load(os.getenv("COPILOT_SPACY_MODEL", "en_core_web_sm"))
+            except Exception:
+                _nlp_failed = True
+    return _nlp
+
+
+def tokens(text: str) -> List[str]:
+    return _TOKEN.findall(unicodedata.normalize("NFKC", str(text or "")).lower())
+
+
+def name_variants(name: str) -> Set[_Phrase]:
+    """Token phrases a name is matched by: as written, and without trailing corporate suffixes."""
+    toks = tokens(name)
+    out: Set[_Phrase] = set()
+    if toks:
+        out.add(tuple(toks))
+        while len(toks) > 1 and toks[-1] in SUFFIXES:
+            toks = toks[:-1]
+            out.add(tuple(toks))
+    return out
+
+
+def lead_token(name: str) -> Optional[str]:
+    """Distinctive first token of a multi-token name, or None."""
+    toks = tokens(name)
+    if len(toks) < 2:
+        return None
+    lead = toks[0]
+    if len(lead) < LEAD_MIN or lead in STOPWORDS or lead in SUFFIXES or lead.isdigit():
+        return None
+    return lead
+
+
+def _fuzzy_min() -> float:
+    try:
+        return float(os.getenv("COPILOT_FUZZY_MIN", "85"))
+    except ValueError:
+        return 85.0
+
+
+class Gazetteer:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._phrases: Dict[str, Dict[_Phrase, Set[int]]] = {}
+        self._prefix: Dict[str, Set[str]] = {}
+        self._fuzzy_memo: Dict[Tuple[str, float], List[Tuple[str, float]]] = {}
+        self._tickers: Dict[str, Set[int]] = {}
+        self._leads: Dict[str, Set[int]] = {}
+        self._aliases: Dict[int, Tuple[Set[_Phrase], Set[str], Set[str]]] = {}
+        self._source: Any = None
+        self.loaded_at: Optional[float] = None
+        # Background reload state: rows upserted while a reload runs are replayed onto the new index
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self._replay: Optional[List[Any]] = None
+        self._retry_at = 0.0
+
+    # --- maintenance ---
+    def _drop(self, cid: int) -> None:
+        prev = self._aliases.pop(cid, None)
+        if prev is None:
+            return
+        phrases, tickers, leads = prev
+        self._fuzzy_memo.clear()
+        for ph in phrases:
+            bucket = self._phrases.get(ph[0], {})
+            ids = bucket.get(ph)
+            if ids is not None:
+                ids.discard(cid)
+                if not ids:
+                    del bucket[ph]
+                    if not bucket:
+                        del self._phrases[ph[0]]
+                        self._prefix.get(ph[0][:PREFIX], set()).discard(ph[0])
+        for t in tickers:
+            self._tickers.get(t, set()).discard(cid)
+        for lead in leads:
+            ids = self._leads.get(lead)
+            if ids is not None:
+                ids.discard(cid)
+                if not ids:
+                    del self._leads[lead]
+
+    def _put(self, cid: int, names: Sequence[Any], ticker: Any) -> None:
+        self._drop(cid)
+        phrases: Set[_Phrase] = set()
+        leads: Set[str] = set()
+        for n in names:
+            if n:
+                phrases |= name_variants(str(n))
+                lead = lead_token(str(n))
+                if lead:
+                    leads.add(lead)
+        tickers = {str(ticker).strip().upper().lstrip("$")} if ticker and str(ticker).strip() else set()
+        for ph in phrases:
+            self._phrases.setdefault(ph[0], {}).setdefault(ph, set()).add(cid)
+            self._prefix.setdefault(ph[0][:PREFIX], set()).add(ph[0])
+        self._fuzzy_memo.clear()
+        for t in tickers:
+            self._tickers.setdefault(t, set()).add(cid)
+        for lead in leads:
+            self._leads.setdefault(lead, set()).add(cid)
+        self._aliases[cid] = (phrases, tickers, leads)
+
+    def apply_rows(self, rows: Iterable[Any]) -> int:
+        """Upsert (id, canonical_name[, alias[, ticker]]) rows; rows without a canonical name are dropped."""
+        n = 0
+        with self._lock:
+            if self._replay is not None:
+                rows = list(rows)
+                self._replay.extend(rows)
+            for r in rows:
+                try:
+                    cid = int(r[0])
+                except Exception:
+                    continue
+                if not r[1]:
+                    self._drop(cid)
+                    continue
+                alias = r[2] if len(r) > 2 else None
+                ticker = r[3] if len(r) > 3 else None
+                self._put(cid, [r[1], alias], ticker)
+                n += 1
+        return n
+
+    def load_rows(self, rows: Iterable[Any], source: Any = None) -> int:
+        """Replace the index with `rows`; it is built aside, so lookups are only blocked for the swap."""
+        fresh = Gazetteer()
+        n = fresh.apply_rows(rows)
+        with self._lock:
+            if self._replay:
+                fresh.apply_rows(self._replay)
+            self._replay = None
+            self._phrases, self._prefix, self._tickers = fresh._phrases, fresh._prefix, fresh._tickers
+            self._leads, self._aliases = fresh._leads, fresh._aliases
+            self._fuzzy_memo = {}
+            self._source = source
+            self.loaded_at = time.time()
+        return n
+
+    def refresh(self, s: Any, names: Iterable[str]) -> int:
+        """Re-read the given canonical names after an upsert (no-op until the gazetteer is loaded)."""
+        if self.loaded_at is None:
+            return 0
+        wanted = sorted({str(n) for n in names if n})
+        n = 0
+        cols = "id, canonical_name, name, ticker"
+        for chunk in chunked(wanted):
+            try:
+                rows = list(s.execute(expanding_text(f"SELECT {cols} FROM companies WHERE canonical_name IN :n", "n"), {"n": chunk}))  # type: ignore[attr-defined]
+            except Exception:
+                # Older schemas without the alias/ticker columns; PG aborts the transaction on the failed statement
+                s.rollback()
+                cols = "id, canonical_name"
+                rows = list(s.execute(expanding_text(f"SELECT {cols} FROM companies WHERE canonical_name IN :n", "n"), {"n": chunk}))  # type: ignore[attr-defined]
+            n += self.apply_rows(rows)
+        return n
+
+    def _reload_worker(self, loader: Callable[[], Iterable[Any]]) -> None:
+        try:
+            rows = list(loader())
+            if self._source is loader:
+                self.load_rows(rows, source=loader)
+        except Exception:
+            self._retry_at = time.time() + RETRY_SEC
+        finally:
+            with self._lock:
+                self._replay = None
+            with self._reload_lock:
+                self._reloading = False
+
+    def reload_in_background(self, loader: Callable[[], Iterable[Any]]) -> bool:
+        """Start a reload on a daemon thread unless one is already running; True when started."""
+        with self._reload_lock:
+            if self._reloading:
+                return False
+            self._reloading = True
+        with self._lock:
+            self._replay = []
+        threading.Thread(target=self._reload_worker, args=(loader,), name="gazetteer-reload", daemon=True).start()
+        return True
+
+    def ensure_loaded(self, loader: Callable[[], Iterable[Any]]) -> bool:
+        """Load from `loader` when empty or when the loader itself changed; reload in the background when stale."""
+        if self.loaded_at is None or self._source is not loader:
+            try:
+                self.load_rows(loader(), source=loader)
+                return True
+            except Exception:
+                return self.loaded_at is not None
+        try:
+            max_age = float(os.getenv("COPILOT_GAZETTEER_RELOAD_SEC", "300"))
+        except Exception:
+            max_age = 300.0
+        if max_age > 0 and time.time() - self.loaded_at >= max_age and time.time() >= self._retry_at:
+            self.reload_in_background(loader)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+    # --- matching ---
+    def _fuzzy_heads(self, tok: str, cutoff: float) -> List[Tuple[str, float]]:
+        """Indexed first tokens within `cutoff` of `tok` (same 2-char prefix), memoized per token."""
+        key = (tok, cutoff)
+        hit = self._fuzzy_memo.get(key)
+        if hit is not None:
+            return hit
+        heads = self._prefix.get(tok[:PREFIX])
+        out: List[Tuple[str, float]] = []
+        if heads:
+            from rapidfuzz import fuzz, process
+
+            out = [(h, float(sc)) for h, sc, _ in process.extract(tok, list(heads), scorer=fuzz.ratio, score_cutoff=cutoff, limit=None)]
+        if len(self._fuzzy_memo) >= 8192:
+            self._fuzzy_memo.clear()
+        self._fuzzy_memo[key] = out
+        return out
+
+    def match(self, text: str) -> List[Tuple[int, float, int]]:
+        """(company id, score 0..100, token position) for every mention in `text`, best first."""
+        toks = tokens(text)
+        fuzzy_min = _fuzzy_min()
+        best: Dict[int, Tuple[float, int]] = {}
+
+        def _hit(cid: int, score: float, pos: int) -> None:
+            prev = best.get(cid)
+            if prev is None or (score, -pos) > (prev[0], -prev[1]):
+                best[cid] = (score, pos)
+
+        with self._lock:
+            for m in _TICKER.finditer(str(text or "")):
+                for cid in self._tickers.get(m.group(1), ()):
+                    _hit(cid, 100.0, -1)
+            i = 0
+            while i < len(toks):
+                tok = toks[i]
+                # Longest exact phrase wins, so "Portek Systems" does not also hit "Portek Inc" (indexed as "portek")
+                longest: Optional[_Phrase] = None
+                for ph in self._phrases.get(tok, {}):
+                    if (longest is None or len(ph) > len(longest)) and tuple(toks[i:i + len(ph)]) == ph:
+                        longest = ph
+                if longest is not None:
+                    for cid in self._phrases[tok][longest]:
+                        _hit(cid, 100.0, i)
+                    i += len(longest)
+                    continue
+                lead_ids = self._leads.get(tok)
+                if lead_ids and len(lead_ids) <= LEAD_MAX:
+                    # Partial mention ("Portek" for "Portek Systems"); the fuzzy pass below may still score a near-full match higher
+                    for cid in lead_ids:
+                        _hit(cid, LEAD_SCORE, i)
+                if len(tok) >= 4:
+                    # Typo fallback: fuzzy on the first token, then the whole phrase for multi-token names
+                    for head, head_score in self._fuzzy_heads(tok, fuzzy_min):
+                        for ph, ids in self._phrases.get(head, {}).items():
+                            score = head_score
+                            if len(ph) > 1:
+                                from rapidfuzz import fuzz
+
+                                score = float(fuzz.ratio(" ".join(toks[i:i + len(ph)]), " ".join(ph)))
+                            if score >= fuzzy_min:
+                                for cid in ids:
+                                    _hit(cid, score, i)
+                i += 1
+        return sorted(((cid, sc, pos) for cid, (sc, pos) in best.items()), key=lambda x: (-x[1], x[2], x[0]))
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            phrases = sum(len(b) for b in self._phrases.values())
+        return {
+            "companies": len(self._aliases),
+            "phrases": phrases,
+            "tickers": len(self._tickers),
+            "leads": len(self._leads),
+            "loaded_at": self.loaded_at,
+            "reloading": self._reloading,
+        }
+
+
+GAZETTEER = Gazetteer()
+
+
+def detect(question: str, top_k: int = 2, gazetteer: Optional[Gazetteer] = None) -> List[int]:
+    """Company ids mentioned in `question`, strongest first.
+
+    With a spaCy pipeline, only ORG/PRODUCT/PERSON entity spans are matched;
+    without one (or when it finds no entities) the whole question is.
+    """
+    gz = gazetteer or GAZETTEER
+    pipeline = nlp()
+    spans: List[str] = []
+    if pipeline is not None:
+        try:
+            spans = [e.text for e in pipeline(question).ents if e.label_ in NER_LABELS]
+        except Exception:
+            spans = []
+    hits: Dict[int, Tuple[float, int]] = {}
+    for offset, span in enumerate(spans or [question]):
+        for cid, score, pos in gz.match(span):
+            key = (score, -(offset * 10000 + pos))
+            prev = hits.get(cid)
+            if prev is None or key > prev:
+                hits[cid] = key
+    ranked = sorted(hits.items(), key=lambda kv: (-kv[1][0], -kv[1][1], kv[0]))
+    return [cid for cid, _ in ranked[: max(0, int(top_k))]]
@@ -2,6 +2,7 @@ from typing import List, Dict, Optional
 from sqlmodel import select
 from sqlalchemy import text
 from .db import Company, CompanyMetric, get_session
+from . import citation_scoring, cohort_stats, entity_detect, market_index, response_cache
 
 
 def upsert_companies_from_items(items: List[Dict]) -> int:
@@ -37,6 +38,19 @@ def upsert_companies_from_items(items: List[Dict]) -> int:
                 s.add(comp)
             count += 1
         s.commit()
+        try:
+            market_index.COMPANY_INDEX.refresh(s, [it.get("canonical_name") for it in items])
+        except Exception:
+            pass
+        try:
+            entity_detect.GAZETTEER.refresh(s, [it.get("canonical_name") for it in items])
+        except Exception:
+            pass
+        if any(it.get("segments") is not None for it in items):
+            cohort_stats.invalidate()
+    if count:
+        response_cache.invalidate_company_views()
+        citation_scoring.COMPANIES.clear()
     return count
 
 
@@ -46,6 +60,7 @@ def upsert_company_metrics(items: List[Dict]) -> int:
     mentions, filings, stars, commits, sentiment, hiring, patents, signal_score (all optional numerics).
     """
     count = 0
+    weeks = set()
     with get_session() as s:
         for it in items:
             # Resolve company_id if only canonical_id provided
@@ -76,9 +91,16 @@ def upsert_company_metrics(items: List[Dict]) -> int:
                     except Exception:
                         setattr(row, key, it[key])
             s.add(row)
+            weeks.add(week_start)
             count += 1
         try:
             s.commit()
         except Exception:
             pass
+        try:
+            cohort_stats.refresh_weeks(s, weeks)
+        except Exception:
+            pass
+    if count:
+        response_cache.invalidate_company_views()
     return count
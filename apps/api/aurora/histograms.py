@@ -0,0 +1,199 @@
+"""Log-bucketed request latency histograms for `/metrics`.
+
+Replaces the 256-sample `_REQ_LAT_LIST` (sorted on every read, percentiles
+over the last 50 requests, no per-route view):
+
+* `LogHistogram` – fixed log-spaced buckets, `SUB` per doubling from
+  `MIN_MS` (relative error ~4%), so merging two histograms is an element-wise
+  add over a constant number of buckets. Every `SUB`-th boundary is a power of
+  two, which is what `/metrics` exposes as the Prometheus `le` ladder, so the
+  exported cumulative counts are exact.
+* `RequestHistograms` – one cumulative histogram per (method, route template,
+  status class) plus a rolling "recent" histogram for percentile gauges.
+  Recording only touches the calling thread's shard (no lock on the hot path);
+  readers merge the shards. The recent view covers the current and previous
+  `window_s` interval.
+
+Gauges that used to need a DB query per scrape are now read from in-process
+state (`_SCHEDULES`) or the maintained `kg_stats` counters instead.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+MIN_MS = 1.0 / 16
+SUB = 8  # buckets per doubling
+DOUBLINGS = 20  # up to MIN_MS * 2**20 ms (~65s); slower requests land in the overflow bucket
+N_BUCKETS = SUB * DOUBLINGS + 2  # [0] <= MIN_MS ... [N-1] overflow
+
+SeriesKey = Tuple[str, str, str]  # (method, route, status class)
+
+
+def bucket_index(ms: float) -> int:
+    if ms <= MIN_MS:
+        return 0
+    i = int(math.ceil(math.log2(ms / MIN_MS) * SUB - 1e-9))
+    return min(max(i, 0), N_BUCKETS - 1)
+
+
+def bucket_upper(i: int) -> float:
+    """Upper bound (ms) of bucket i; inf for the overflow bucket."""
+    if i >= N_BUCKETS - 1:
+        return math.inf
+    return MIN_MS * 2.0 ** (i / SUB)
+
+
+class LogHistogram:
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bucket_index(ms)] += 1
+        self.count += 1
+        self.total += ms
+
+    def merge(self, other: "LogHistogram") -> "LogHistogram":
+        counts = self.counts
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile (geometric midpoint of the bucket holding it); 0 when empty."""
+        if self.count <= 0:
+            return 0.0
+        rank = max(1, int(math.ceil(q * self.count)))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                if i == 0:
+                    return MIN_MS
+                if i == N_BUCKETS - 1:
+                    return bucket_upper(i - 1)
+                return math.sqrt(bucket_upper(i - 1) * bucket_upper(i))
+        return bucket_upper(N_BUCKETS - 2)
+
+    def cumulative(self, every: int = SUB) -> List[Tuple[float, int]]:
+        """[(le, cumulative count)] at every `every`-th boundary, ending with +Inf."""
+        out: List[Tuple[float, int]] = []
+        seen = 0
+        for i, c in enumerate(self.counts[:-1]):
+            seen += c
+            if i % every == 0:
+                out.append((bucket_upper(i), seen))
+        out.append((math.inf, self.count))
+        return out
+
+
+class _Shard:
+    __slots__ = ("series", "recent", "recent_epoch", "previous")
+
+    def __init__(self) -> None:
+        self.series: Dict[SeriesKey, LogHistogram] = {}
+        self.recent = LogHistogram()
+        self.recent_epoch = -1
+        self.previous = LogHistogram()
+
+
+def status_class(status: int) -> str:
+    return f"{int(status) // 100}xx" if status else "unknown"
+
+
+class RequestHistograms:
+    def __init__(self, window_s: float = 60.0) -> None:
+        self.window_s = max(1.0, float(window_s))
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._lock = threading.Lock()  # only taken when a thread records for the first time
+
+    def _shard(self) -> _Shard:
+        sh = getattr(self._local, "shard", None)
+        if sh is None:
+            sh = _Shard()
+            self._local.shard = sh
+            with self._lock:
+                self._shards.append(sh)
+        return sh
+
+    def _epoch(self, now: Optional[float] = None) -> int:
+        return int((time.time() if now is None else now) // self.window_s)
+
+    def observe(self, method: str, route: str, status: int, ms: float, now: Optional[float] = None) -> None:
+        sh = self._shard()
+        key = (method, route, status_class(status))
+        h = sh.series.get(key)
+        if h is None:
+            h = sh.series[key] = LogHistogram()
+        h.observe(ms)
+        epoch = self._epoch(now)
+        if epoch != sh.recent_epoch:
+            sh.previous = sh.recent if epoch == sh.recent_epoch + 1 else LogHistogram()
+            sh.recent = LogHistogram()
+            sh.recent_epoch = epoch
+        sh.recent.observe(ms)
+
+    def series(self) -> Dict[SeriesKey, LogHistogram]:
+        """Cumulative histograms merged across threads, keyed by (method, route, status class)."""
+        with self._lock:
+            shards = list(self._shards)
+        out: Dict[SeriesKey, LogHistogram] = {}
+        for sh in shards:
+            for key, h in list(sh.series.items()):
+                acc = out.get(key)
+                if acc is None:
+                    acc = out[key] = LogHistogram()
+                acc.merge(h)
+        return out
+
+    def recent(self, now: Optional[float] = None) -> LogHistogram:
+        """All requests in the current and previous window, across routes and threads."""
+        epoch = self._epoch(now)
+        with self._lock:
+            shards = list(self._shards)
+        out = LogHistogram()
+        for sh in shards:
+            if sh.recent_epoch == epoch:
+                out.merge(sh.recent).merge(sh.previous)
+            elif sh.recent_epoch == epoch - 1:
+                out.merge(sh.recent)
+        return out
+
+    def percentiles(self, now: Optional[float] = None) -> Dict[str, float]:
+        h = self.recent(now)
+        return {"p50_ms": h.quantile(0.50), "p95_ms": h.quantile(0.95), "p99_ms": h.quantile(0.99), "samples": float(h.count)}
+
+
+def _fmt_le(le: float) -> str:
+    return "+Inf" if math.isinf(le) else repr(le)
+
+
+def _label(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def exposition(name: str, help_text: str, series: Dict[SeriesKey, LogHistogram]) -> List[str]:
+    """Prometheus text lines for a labelled histogram family."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route, status), h in sorted(series.items()):
+        labels = f'method="{_label(method)}",route="{_label(route)}",status="{_label(status)}"'
+        for le, c in h.cumulative():
+            lines.append(f'{name}_bucket{{{labels},le="{_fmt_le(le)}"}} {c}')
+        lines.append(f"{name}_sum{{{labels}}} {h.total:.3f}")
+        lines.append(f"{name}_count{{{labels}}} {h.count}")
+    return lines
+
+
+REQUESTS = RequestHistograms(window_s=float(os.getenv("METRICS_WINDOW_SEC", "60")))
@@ -0,0 +1,248 @@
+"""Transactional bulk path for `/kg/commit`.
+
+The per-event path issues an idempotency SELECT, a closing UPDATE, an INSERT and
+a provenance commit for every event. Here the whole batch is resolved up front:
+
+1. Open (and recently closed) versions for every uid/triple touched by the batch
+   are loaded with set-based IN queries.
+2. Events are replayed in order against that in-memory state, so idempotency,
+   in-batch dependencies (an edge whose src node is created earlier in the same
+   batch) and `valid_from`/`valid_to` transitions match the sequential path.
+3. Closes are written with one executemany UPDATE per table, new versions with a
+   multi-row INSERT ... RETURNING, and a single provenance record is written for
+   the batch. Touched uids are marked dirty in the Merkle index (kg_merkle).
+   Everything happens in one transaction.
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import kg_merkle
+from .sql_utils import chunked, expanding_text
+
+NODE_OPS = ("create_node", "node_create", "upsert_node")
+EDGE_OPS = ("create_edge", "edge_create", "upsert_edge")
+
+
+def _raw_session(s: Any) -> Any:
+    # Test harnesses wrap the SQLModel session; reach the underlying one for Core inserts
+    return getattr(s, "_s", s)
+
+
+def _exists_at(versions: List[Dict[str, Any]], at: str, tenant_id: Optional[int]) -> bool:
+    for v in versions:
+        if tenant_id is not None and v["tenant_id"] != tenant_id:
+            continue
+        if (v["valid_from"] is None or v["valid_from"] <= at) and (v["valid_to"] is None or v["valid_to"] > at):
+            return True
+    return False
+
+
+def _open_with(versions: List[Dict[str, Any]], pred) -> Optional[Dict[str, Any]]:
+    # Newest open version first (mirrors ORDER BY id DESC LIMIT 1)
+    for v in reversed(versions):
+        if v["valid_to"] is None and pred(v):
+            return v
+    return None
+
+
+def _close_open(versions: List[Dict[str, Any]], at: str, tenant_id: Optional[int]) -> None:
+    for v in versions:
+        if v["valid_to"] is None and (tenant_id is None or v["tenant_id"] == tenant_id):
+            v["valid_to"] = at
+
+
+def _load_node_versions(s: Any, uids: List[str], min_at: str) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = {u: [] for u in uids}
+    for chunk in chunked(sorted(uids)):
+        rows = s.execute(
+            expanding_text(
+                "SELECT id, uid, type, properties_json, valid_from, valid_to, tenant_id FROM kg_nodes "
+                "WHERE uid IN :u AND (valid_to IS NULL OR valid_to > :min_at) ORDER BY id ASC",
+                "u",
+            ),
+            {"u": chunk, "min_at": min_at},
+        )  # type: ignore[attr-defined]
+        for r in rows:
+            out[r[1]].append(
+                {"id": r[0], "type": r[2], "props": r[3], "valid_from": r[4], "valid_to": r[5], "orig_valid_to": r[5], "tenant_id": r[6]}
+            )
+    return out
+
+
+def _load_open_edges(s: Any, triples: List[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], List[Dict[str, Any]]]:
+    out: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {t: [] for t in triples}
+    srcs = sorted({t[0] for t in triples})
+    for chunk in chunked(srcs):
+        rows = s.execute(
+            expanding_text(
+                "SELECT id, src_uid, dst_uid, type, properties_json, valid_from, tenant_id FROM kg_edges "
+                "WHERE src_uid IN :s AND valid_to IS NULL ORDER BY id ASC",
+                "s",
+            ),
+            {"s": chunk},
+        )  # type: ignore[attr-defined]
+        for r in rows:
+            key = (r[1], r[2], r[3])
+            if key in out:
+                out[key].append(
+                    {"id": r[0], "props": r[4], "valid_from": r[5], "valid_to": None, "orig_valid_to": None, "tenant_id": r[6]}
+                )
+    return out
+
+
+def _uniform(values: List[Optional[str]]) -> Optional[str]:
+    uniq = {v for v in values}
+    return values[0] if len(uniq) == 1 else None
+
+
+def _insert_returning_ids(s: Any, table: Any, rows: List[Dict[str, Any]]) -> List[Optional[int]]:
+    """Multi-row INSERT ... RETURNING id (executemany via insertmanyvalues), ids in input order."""
+    if not rows:
+        return []
+    from sqlalchemy import insert  # type: ignore
+
+    stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+    res = _raw_session(s).execute(stmt, rows)
+    return [int(r[0]) for r in res]
+
+
+def commit_batch(s: Any, events: List[Dict[str, Any]], tenant_id: Optional[int], now: str) -> List[Dict[str, Any]]:
+    """Apply parsed commit events in one transaction and return per-event results.
+
+    `events` are normalized dicts produced by the API layer: {"kind": "node"|"edge"|"error", ...}.
+    Error entries pass their `result` through unchanged so validation output matches
+    the per-event path.
+    """
+    from .db import KGEdge, KGNode  # type: ignore
+    from sqlmodel import text as _text  # type: ignore
+
+    tid = int(tenant_id) if tenant_id is not None else None
+    node_events = [e for e in events if e["kind"] == "node"]
+    edge_events = [e for e in events if e["kind"] == "edge"]
+    ats = [e["at"] for e in node_events + edge_events]
+    min_at = min(ats) if ats else now
+
+    node_uids = sorted({e["uid"] for e in node_events} | {e["src"] for e in edge_events})
+    nodes = _load_node_versions(s, node_uids, min_at) if node_uids else {}
+    triples = sorted({(e["src"], e["dst"], e["type"]) for e in edge_events})
+    edges = _load_open_edges(s, triples) if triples else {}
+
+    # One provenance record for the whole batch
+    provs = [e.get("provenance") or {} for e in node_events + edge_events]
+    prov_row = s.execute(
+        _text(
+            "INSERT INTO provenance_records (ingest_event_id, snapshot_hash, signer, pipeline_version, model_version, evidence_json, created_at) "
+            "VALUES (:ie, :sh, :sg, :pv, :mv, :ev, :ca) RETURNING id"
+        ),
+        {
+            "ie": f"batch:{uuid.uuid4().hex}",
+            "sh": _uniform([p.get("snapshot_hash") or "" for p in provs]) or "",
+            "sg": _uniform([p.get("signer") for p in provs]),
+            "pv": _uniform([p.get("pipeline_version") for p in provs]),
+            "mv": _uniform([p.get("model_version") for p in provs]),
+            "ev": json.dumps({"events": len(events)}),
+            "ca": now,
+        },
+    ).first()  # type: ignore[attr-defined]
+    prov_id = int(prov_row[0]) if prov_row else None
+
+    results: List[Dict[str, Any]] = []
+    new_nodes: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []  # (version, result)
+    new_edges: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    for e in events:
+        if e["kind"] == "error":
+            results.append(e["result"])
+            continue
+        at = e["at"]
+        if e["kind"] == "node":
+            versions = nodes[e["uid"]]
+            cur = _open_with(versions, lambda v: v["type"] == e["type"])
+            if cur is not None and (cur["props"] or "{}") == e["props"]:
+                results.append({"ok": True, "uid": e["uid"], "type": e["type"], "valid_from": cur["valid_from"] or at, "noop": True})
+                continue
+            _close_open(versions, at, tid)
+            ver = {"id": None, "type": e["type"], "props": e["props"], "valid_from": at, "valid_to": None, "orig_valid_to": None, "tenant_id": tid}
+            versions.append(ver)
+            res = {"ok": True, "uid": e["uid"], "type": e["type"], "valid_from": at, "id": None}
+            new_nodes.append((ver, res))
+            results.append(res)
+        else:
+            src, dst, etype = e["src"], e["dst"], e["type"]
+            if not _exists_at(nodes.get(src, []), at, tid):
+                results.append({"ok": False, "reason": "src_not_found", "src": src, "dst": dst})
+                continue
+            versions = edges[(src, dst, etype)]
+            cur = _open_with(versions, lambda v: True)
+            if cur is not None and (cur["props"] or "{}") == e["props"]:
+                results.append({"ok": True, "src": src, "dst": dst, "type": etype, "valid_from": cur["valid_from"] or at, "noop": True})
+                continue
+            _close_open(versions, at, tid)
+            ver = {"id": None, "props": e["props"], "valid_from": at, "valid_to": None, "orig_valid_to": None, "tenant_id": tid, "src": src, "dst": dst, "type": etype}
+            versions.append(ver)
+            res = {"ok": True, "src": src, "dst": dst, "type": etype, "valid_from": at, "id": None}
+            new_edges.append((ver, res))
+            results.append(res)
+
+    # Close previously-open DB rows (executemany)
+    node_closes = [
+        {"vt": v["valid_to"], "id": v["id"]}
+        for vs in nodes.values() for v in vs
+        if v["id"] is not None and v["orig_valid_to"] is None and v["valid_to"] is not None
+    ]
+    edge_closes = [
+        {"vt": v["valid_to"], "id": v["id"]}
+        for vs in edges.values() for v in vs
+        if v["id"] is not None and v["valid_to"] is not None
+    ]
+    if node_closes:
+        s.execute(_text("UPDATE kg_nodes SET valid_to = :vt WHERE id = :id AND valid_to IS NULL"), node_closes)  # type: ignore[attr-defined]
+    if edge_closes:
+        s.execute(_text("UPDATE kg_edges SET valid_to = :vt WHERE id = :id AND valid_to IS NULL"), edge_closes)  # type: ignore[attr-defined]
+
+    # Insert new versions; versions superseded later in the batch are written already closed
+    node_ids = _insert_returning_ids(
+        s,
+        KGNode.__table__,
+        [
+            {
+                "tenant_id": tid,
+                "uid": res["uid"],
+                "type": v["type"],
+                "properties_json": v["props"],
+                "valid_from": v["valid_from"],
+                "valid_to": v["valid_to"],
+                "provenance_id": prov_id,
+                "created_at": v["valid_from"],
+            }
+            for v, res in new_nodes
+        ],
+    )
+    edge_ids = _insert_returning_ids(
+        s,
+        KGEdge.__table__,
+        [
+            {
+                "tenant_id": tid,
+                "src_uid": v["src"],
+                "dst_uid": v["dst"],
+                "type": v["type"],
+                "properties_json": v["props"],
+                "valid_from": v["valid_from"],
+                "valid_to": v["valid_to"],
+                "provenance_id": prov_id,
+                "created_at": v["valid_from"],
+            }
+            for v, res in new_edges
+        ],
+    )
+    for (_v, res), nid in zip(new_nodes, node_ids):
+        res["id"] = nid
+    for (_v, res), eid in zip(new_edges, edge_ids):
+        res["id"] = eid
+    kg_merkle.mark_dirty(s, [res.get("uid") or res.get("src") for _v, res in new_nodes + new_edges], now)
+    s.commit()  # type: ignore[attr-defined]
+    return results
@@ -0,0 +1,233 @@
+"""Sequenced change log behind `/daas/kg/changed`.
+
+The DaaS change feed used to filter `kg_nodes` / `kg_edges` on
+`created_at >= :t OR valid_from >= :t`. That OR cannot use a single index, so
+every call scanned both tables. The result was also capped by a LIMIT with no
+cursor, so a mirror that fell behind could not catch up without gaps.
+
+`kg_changes` is an append-only log with one row per write to either table:
+
+* `seq` is a monotonic sequence (SQLite AUTOINCREMENT, Postgres BIGSERIAL);
+* `kind` is node|edge and `row_id` is the version id in that table;
+* `op` is insert, close (`valid_to` set on an open version), update or delete;
+* `changed_at` is the database's UTC clock (ISO, millisecond precision);
+* `txid` (Postgres only) is the writing transaction's `txid_current()`.
+
+Row triggers append to it in the same transaction as the write, whichever path
+made it. They fire on insert, on delete, and on updates of the columns a mirror
+copies, but not on the derived `*_ts` columns.
+
+Readers page with `seq > :cursor ORDER BY seq LIMIT n` (a primary-key range
+scan; Postgres uses `(txid, seq)`, see below) and then load the payload rows
+by id. A `since` timestamp is
+mapped to its first sequence number through the `changed_at` index.
+
+Postgres hands out sequence values at insert time, not at commit time, so a
+long transaction can commit a lower `seq` after a reader has passed it. On
+Postgres the feed is therefore ordered by `(txid, seq)` and only publishes
+changes of transactions older than the oldest one still in flight
+(`txid < txid_snapshot_xmin(txid_current_snapshot())`). Every change that
+becomes visible later belongs to a transaction at or above that bound, so it
+sorts after everything already delivered. The cursor is still the last
+delivered `seq`; its position is found by looking up that row's `txid`, so
+`seq` values arrive in commit-safe rather than strictly ascending order.
+Backfilled history has txid 0. SQLite serializes writers, so `seq` order is
+commit order there.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+TABLES = {"kg_nodes": "node", "kg_edges": "edge"}
+MIRRORED = {
+    "kg_nodes": ("tenant_id", "uid", "type", "properties_json", "valid_from", "valid_to"),
+    "kg_edges": ("tenant_id", "src_uid", "dst_uid", "type", "properties_json", "valid_from", "valid_to"),
+}
+PAGE_MAX = 2000
+STREAM_MAX = 100000
+STREAM_BATCH = 1000
+
+_SQLITE_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+_PG_NOW = "to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.MS\"Z\"')"
+
+_DDL = {
+    "postgresql": (
+        "CREATE TABLE IF NOT EXISTS kg_changes (seq BIGSERIAL PRIMARY KEY, kind VARCHAR NOT NULL, op VARCHAR NOT NULL, "
+        "row_id BIGINT NOT NULL, tenant_id BIGINT, changed_at VARCHAR NOT NULL, txid BIGINT NOT NULL DEFAULT 0)"
+    ),
+    "sqlite": (
+        "CREATE TABLE IF NOT EXISTS kg_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, kind VARCHAR NOT NULL, op VARCHAR NOT NULL, "
+        "row_id BIGINT NOT NULL, tenant_id BIGINT, changed_at VARCHAR NOT NULL, txid BIGINT NOT NULL DEFAULT 0)"
+    ),
+}
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_kg_changes_changed_at ON kg_changes (changed_at)",
+    "CREATE INDEX IF NOT EXISTS ix_kg_changes_tenant_seq ON kg_changes (tenant_id, seq)",
+)
+_PG_TXID = (
+    "ALTER TABLE kg_changes ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_kg_changes_txid_seq ON kg_changes (txid, seq)",
+)
+# Changes of transactions that finished before every in-flight one
+_PG_SETTLED = "txid < txid_snapshot_xmin(txid_current_snapshot())"
+
+_PG_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION kg_changes_trg() RETURNS trigger AS $$ "
+    "DECLARE k text := CASE WHEN TG_TABLE_NAME = 'kg_nodes' THEN 'node' ELSE 'edge' END; BEGIN "
+    "IF TG_OP = 'DELETE' THEN "
+    f"INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at, txid) VALUES (k, 'delete', OLD.id, OLD.tenant_id, {_PG_NOW}, txid_current()); "
+    "ELSIF TG_OP = 'INSERT' THEN "
+    f"INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at, txid) VALUES (k, 'insert', NEW.id, NEW.tenant_id, {_PG_NOW}, txid_current()); "
+    "ELSE "
+    "INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at, txid) VALUES (k, "
+    "CASE WHEN OLD.valid_to IS NULL AND NEW.valid_to IS NOT NULL THEN 'close' ELSE 'update' END, "
+    f"NEW.id, NEW.tenant_id, {_PG_NOW}, txid_current()); "
+    "END IF; RETURN NULL; END $$ LANGUAGE plpgsql"
+)
+
+
+def _sqlite_append(kind: str, op: str, ref: str) -> str:
+    return (
+        f"INSERT INTO kg_changes (kind, op, row_id, tenant_id, changed_at) "
+        f"VALUES ('{kind}', {op}, {ref}.id, {ref}.tenant_id, {_SQLITE_NOW});"
+    )
+
+
+def trigger_ddl(dialect: str, table: str) -> List[str]:
+    """Idempotent statements appending every write to `table` to `kg_changes`."""
+    kind = TABLES[table]
+    cols = ", ".join(MIRRORED[table])
+    if dialect == "postgresql":
+        return [
+            _PG_FUNCTION,
+            f"DROP TRIGGER IF EXISTS trg_{table}_changes ON {table}",
+            f"CREATE TRIGGER trg_{table}_changes AFTER INSERT OR DELETE OR UPDATE OF {cols} ON {table} "
+            f"FOR EACH ROW EXECUTE PROCEDURE kg_changes_trg()",
+        ]
+    if dialect == "sqlite":
+        upd_op = "CASE WHEN OLD.valid_to IS NULL AND NEW.valid_to IS NOT NULL THEN 'close' ELSE 'update' END"
+        return [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_ins AFTER INSERT ON {table} BEGIN {_sqlite_append(kind, repr('insert'), 'NEW')} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_del AFTER DELETE ON {table} BEGIN {_sqlite_append(kind, repr('delete'), 'OLD')} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_upd AFTER UPDATE OF {cols} ON {table} BEGIN {_sqlite_append(kind, upd_op, 'NEW')} END",
+        ]
+    return []
+
+
+def install(conn: Any, tables: Sequence[str] = tuple(TABLES)) -> None:
+    """Create the log table, its indexes and the triggers for `tables` (each must exist already)."""
+    dialect = conn.dialect.name
+    if dialect in _DDL:
+        conn.exec_driver_sql(_DDL[dialect])
+    for stmt in INDEXES + (_PG_TXID if dialect == "postgresql" else ()):
+        conn.exec_driver_sql(stmt)
+    for table in tables:
+        for stmt in trigger_ddl(dialect, table):
+            conn.exec_driver_sql(stmt)
+
+
+def _dialect(s: Any) -> str:
+    try:
+        return getattr(s, "_s", s).get_bind().dialect.name
+    except Exception:
+        return ""
+
+
+def to_changed_at(ts: datetime) -> str:
+    """`changed_at` text for a datetime (UTC, millisecond precision, `Z` suffix)."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def seq_before(s: Any, since: str) -> int:
+    """Cursor that starts the feed at the first change at or after `since` (ISO-8601)."""
+    from sqlmodel import text as _text  # type: ignore
+
+    try:
+        at = to_changed_at(datetime.fromisoformat(since.strip().replace("Z", "+00:00")))
+    except ValueError:
+        at = since
+    first = s.execute(_text("SELECT MIN(seq) FROM kg_changes WHERE changed_at >= :t"), {"t": at}).scalar()  # type: ignore[attr-defined]
+    if first is not None:
+        return int(first) - 1
+    return int(s.execute(_text("SELECT COALESCE(MAX(seq), 0) FROM kg_changes")).scalar() or 0)  # type: ignore[attr-defined]
+
+
+def _payloads(s: Any, table: str, ids: List[int]) -> Dict[int, Tuple[Any, ...]]:
+    from sqlalchemy import bindparam  # type: ignore
+    from sqlmodel import text as _text  # type: ignore
+
+    if not ids:
+        return {}
+    keys = "uid" if table == "kg_nodes" else "src_uid, dst_uid"
+    stmt = _text(
+        f"SELECT id, {keys}, type, properties_json, valid_from, valid_to, created_at FROM {table} WHERE id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    return {int(r[0]): tuple(r) for r in s.execute(stmt, {"ids": ids})}  # type: ignore[attr-defined]
+
+
+def read_page(s: Any, after: int, limit: int, tenant_id: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """Up to `limit` changes after cursor `after`, in publication order, joined with their rows.
+
+    Deleted versions (and changes whose row is gone) carry only their ids.
+    """
+    from sqlmodel import text as _text  # type: ignore
+
+    params: Dict[str, Any] = {"after": int(after), "lim": max(1, int(limit))}
+    tenant = ""
+    if tenant_id is not None:
+        tenant = " AND tenant_id = :tid"
+        params["tid"] = tenant_id
+    if _dialect(s) == "postgresql":
+        # Resume after the (txid, seq) position of the cursor row (or the nearest one below it); cursor 0 starts at the top
+        pos = s.execute(_text("SELECT txid FROM kg_changes WHERE seq <= :after ORDER BY seq DESC LIMIT 1"), params).first()  # type: ignore[attr-defined]
+        params["atx"] = int(pos[0]) if pos is not None else -1
+        sql = (
+            "SELECT seq, kind, op, row_id, changed_at FROM kg_changes "
+            f"WHERE (txid, seq) > (:atx, :after) AND {_PG_SETTLED}{tenant} "
+            "ORDER BY txid, seq LIMIT :lim"
+        )
+    else:
+        sql = f"SELECT seq, kind, op, row_id, changed_at FROM kg_changes WHERE seq > :after{tenant} ORDER BY seq LIMIT :lim"
+    changes = list(s.execute(_text(sql), params))  # type: ignore[attr-defined]
+    rows = {
+        kind: _payloads(s, table, [int(c[3]) for c in changes if c[1] == kind])
+        for table, kind in TABLES.items()
+    }
+    out: List[Dict[str, Any]] = []
+    for seq, kind, op, row_id, changed_at in changes:
+        item: Dict[str, Any] = {"seq": int(seq), "kind": kind, "op": op, "id": int(row_id), "changed_at": changed_at}
+        row = rows.get(kind, {}).get(int(row_id))
+        if row is not None:
+            if kind == "node":
+                item["uid"] = row[1]
+                rest = row[2:]
+            else:
+                item["src"], item["dst"] = row[1], row[2]
+                rest = row[3:]
+            item.update(zip(("type", "props", "valid_from", "valid_to", "created_at"), rest))
+        out.append(item)
+    return out
+
+
+def stream(session_factory: Any, after: int, limit: int, tenant_id: Optional[Any] = None, batch: int = STREAM_BATCH) -> Iterator[str]:
+    """NDJSON lines for up to `limit` changes after `after`, read in `batch`-sized pages.
+
+    Each page uses its own short session, so a slow consumer does not hold a
+    transaction open. Clients resume from the `seq` of the last line.
+    """
+    remaining = max(0, int(limit))
+    while remaining > 0:
+        n = min(remaining, max(1, int(batch)))
+        with session_factory() as s:
+            page = read_page(s, after, n, tenant_id=tenant_id)
+        for item in page:
+            yield json.dumps(item, default=str) + "\n"
+        if len(page) < n:
+            return
+        after = page[-1]["seq"]
+        remaining -= len(page)
@@ -0,0 +1,348 @@
+"""Persistent, incrementally maintained Merkle index over open KG rows.
+
+`/admin/kg/snapshot` used to load every open node and edge, hash them into an
+in-memory tree and then hash a second full JSON dump of the same rows. This
+module keeps the tree in three small tables instead:
+
+* `kg_merkle_leaves` – one row per open node/edge version. The leaf hash is the
+  same canonical JSON hash the in-memory tree used. Edges are filed under
+  their `src_uid`.
+* `kg_merkle_nodes` – hashes of a fixed-shape tree, stored as (level, idx).
+  Level 0 holds 2**BUCKET_BITS bucket roots. A uid is assigned to a bucket by
+  sha256(uid), and each bucket root is a pairwise Merkle root over the bucket's
+  leaves sorted by leaf_key. Levels above are plain binary reductions, up to
+  the single root at level BUCKET_BITS. A missing row means that subtree is empty.
+* `kg_merkle_dirty` – uids touched by write paths since the last refresh.
+
+Write paths only mark uids dirty. `refresh` re-derives leaves for those uids,
+rehashes the affected buckets and walks up BUCKET_BITS parents per bucket.
+Inclusion proofs are therefore a path inside one bucket plus BUCKET_BITS
+siblings, i.e. O(log n).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .sql_utils import chunked, expanding_text
+
+BUCKET_BITS = 12
+N_BUCKETS = 1 << BUCKET_BITS
+REBUILD_PAGE = 2000
+
+_READY: Set[str] = set()
+
+
+def _h(data: str) -> str:
+    return hashlib.sha256(data.encode()).hexdigest()  # nosec
+
+
+def _empty_hashes() -> List[str]:
+    out = [hashlib.sha256(b"").hexdigest()]  # nosec
+    for _ in range(BUCKET_BITS):
+        out.append(_h(out[-1] + out[-1]))
+    return out
+
+
+EMPTY = _empty_hashes()
+
+
+def _raw_session(s: Any) -> Any:
+    return getattr(s, "_s", s)
+
+
+def bucket_of(uid: str) -> int:
+    return int(_h(str(uid))[:8], 16) >> (32 - BUCKET_BITS)
+
+
+def node_leaf(uid: str, typ: Optional[str], props: Optional[str]) -> Tuple[str, str]:
+    """Return (leaf_key, leaf_hash) for an open node row."""
+    leaf = _h(json.dumps({"n": [uid, typ, props]}, sort_keys=True, separators=(",", ":")))
+    return f"n|{uid}|{typ or ''}|{leaf}", leaf
+
+
+def edge_leaf(src: str, dst: Optional[str], typ: Optional[str], props: Optional[str]) -> Tuple[str, str]:
+    """Return (leaf_key, leaf_hash) for an open edge row."""
+    leaf = _h(json.dumps({"e": [src, dst, typ, props]}, sort_keys=True, separators=(",", ":")))
+    return f"e|{src}|{dst or ''}|{typ or ''}|{leaf}", leaf
+
+
+def subtree_root(hashes: List[str]) -> str:
+    """Pairwise reduction (odd tail is paired with itself); empty bucket -> EMPTY[0]."""
+    if not hashes:
+        return EMPTY[0]
+    level = list(hashes)
+    while len(level) > 1:
+        level = [_h(level[i] + (level[i + 1] if i + 1 < len(level) else level[i])) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def subtree_path(hashes: List[str], pos: int) -> List[Dict[str, str]]:
+    """Sibling path for `hashes[pos]` under `subtree_root`."""
+    path: List[Dict[str, str]] = []
+    level = list(hashes)
+    while len(level) > 1:
+        sib = pos ^ 1
+        if sib >= len(level):
+            sib = pos
+        path.append({"hash": level[sib], "side": "left" if sib < pos else "right"})
+        level = [_h(level[i] + (level[i + 1] if i + 1 < len(level) else level[i])) for i in range(0, len(level), 2)]
+        pos //= 2
+    return path
+
+
+def verify_proof(leaf_hash: str, path: Iterable[Dict[str, str]], root: str) -> bool:
+    acc = leaf_hash
+    for step in path:
+        sib = str(step.get("hash") or "")
+        acc = _h(sib + acc) if step.get("side") == "left" else _h(acc + sib)
+    return acc == root
+
+
+def root_of(leaves: Iterable[Tuple[str, str, str]]) -> str:
+    """Index root for (uid, leaf_key, leaf_hash) triples, computed in memory.
+
+    Same shape as the persisted tree (bucketed, EMPTY for missing subtrees), so
+    it equals `summary()["merkle_root"]` over the same open rows.
+    """
+    buckets: Dict[int, List[Tuple[str, str]]] = {}
+    for uid, key, leaf in leaves:
+        buckets.setdefault(bucket_of(uid), []).append((key, leaf))
+    level = {b: subtree_root([leaf for _k, leaf in sorted(rows)]) for b, rows in buckets.items()}
+    for lvl in range(1, BUCKET_BITS + 1):
+        level = {
+            i: _h(level.get(2 * i, EMPTY[lvl - 1]) + level.get(2 * i + 1, EMPTY[lvl - 1]))
+            for i in {b // 2 for b in level}
+        }
+    return level.get(0, EMPTY[BUCKET_BITS])
+
+
+def ensure_schema(s: Any) -> None:
+    """Create the index tables on the session's bind (once per bind) when migrations have not run."""
+    bind = _raw_session(s).get_bind()
+    key = str(getattr(bind, "url", id(bind)))
+    if key in _READY:
+        return
+    from sqlmodel import SQLModel  # type: ignore
+    from .db import KGMerkleDirty, KGMerkleLeaf, KGMerkleNode  # type: ignore
+
+    SQLModel.metadata.create_all(
+        bind, tables=[KGMerkleLeaf.__table__, KGMerkleNode.__table__, KGMerkleDirty.__table__]  # type: ignore[attr-defined]
+    )
+    _READY.add(key)
+
+
+def mark_dirty(s: Any, uids: Iterable[str], now: str) -> None:
+    """Queue uids for re-hashing on the next refresh. Caller commits."""
+    from sqlmodel import text as _text  # type: ignore
+
+    rows = [{"u": u, "m": now} for u in sorted({str(u) for u in uids if u})]
+    if not rows:
+        return
+    s.execute(
+        _text(
+            "INSERT INTO kg_merkle_dirty (uid, marked_at) VALUES (:u, :m) "
+            "ON CONFLICT (uid) DO UPDATE SET marked_at = excluded.marked_at"
+        ),
+        rows,
+    )  # type: ignore[attr-defined]
+
+
+def _leaf_rows(s: Any, uids: List[str]) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for r in s.execute(
+        expanding_text("SELECT uid, type, properties_json FROM kg_nodes WHERE valid_to IS NULL AND uid IN :u", "u"), {"u": uids}
+    ):  # type: ignore[attr-defined]
+        key, leaf = node_leaf(r[0], r[1], r[2])
+        out.append({"uid": r[0], "bucket": bucket_of(r[0]), "leaf_key": key, "kind": "n", "leaf_hash": leaf})
+    for r in s.execute(
+        expanding_text(
+            "SELECT src_uid, dst_uid, type, properties_json FROM kg_edges WHERE valid_to IS NULL AND src_uid IN :u", "u"
+        ),
+        {"u": uids},
+    ):  # type: ignore[attr-defined]
+        key, leaf = edge_leaf(r[0], r[1], r[2], r[3])
+        out.append({"uid": r[0], "bucket": bucket_of(r[0]), "leaf_key": key, "kind": "e", "leaf_hash": leaf})
+    return out
+
+
+def _insert_leaves(s: Any, rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    from sqlmodel import text as _text  # type: ignore
+
+    s.execute(
+        _text(
+            "INSERT INTO kg_merkle_leaves (uid, bucket, leaf_key, kind, leaf_hash) "
+            "VALUES (:uid, :bucket, :leaf_key, :kind, :leaf_hash)"
+        ),
+        rows,
+    )  # type: ignore[attr-defined]
+
+
+def _bucket_roots(s: Any, buckets: Optional[List[int]] = None) -> Dict[int, str]:
+    """Bucket root per bucket; `None` streams every populated bucket in one ordered scan."""
+    from sqlmodel import text as _text  # type: ignore
+
+    out: Dict[int, str] = {b: EMPTY[0] for b in (buckets or [])}
+
+    def _consume(rows: Iterable[Any]) -> None:
+        cur: Optional[int] = None
+        acc: List[str] = []
+        for r in rows:
+            if r[0] != cur:
+                if cur is not None:
+                    out[cur] = subtree_root(acc)
+                cur, acc = int(r[0]), []
+            acc.append(r[1])
+        if cur is not None:
+            out[cur] = subtree_root(acc)
+
+    if buckets is None:
+        _consume(s.execute(_text("SELECT bucket, leaf_hash FROM kg_merkle_leaves ORDER BY bucket, leaf_key, leaf_hash")))  # type: ignore[attr-defined]
+        return out
+    for chunk in chunked(sorted(buckets)):
+        _consume(
+            s.execute(
+                expanding_text(
+                    "SELECT bucket, leaf_hash FROM kg_merkle_leaves WHERE bucket IN :b ORDER BY bucket, leaf_key, leaf_hash", "b"
+                ),
+                {"b": chunk},
+            )
+        )  # type: ignore[attr-defined]
+    return out
+
+
+def _load_tree(s: Any) -> Dict[Tuple[int, int], str]:
+    from sqlmodel import text as _text  # type: ignore
+
+    return {(int(r[0]), int(r[1])): r[2] for r in s.execute(_text("SELECT level, idx, hash FROM kg_merkle_nodes"))}  # type: ignore[attr-defined]
+
+
+def _rehash(s: Any, roots: Dict[int, str]) -> None:
+    """Write new bucket roots and recompute their ancestors up to the root."""
+    from sqlmodel import text as _text  # type: ignore
+
+    tree = _load_tree(s)
+    changed: Dict[Tuple[int, int], str] = {(0, b): h for b, h in roots.items()}
+    tree.update(changed)
+    idxs = set(roots)
+    for lvl in range(1, BUCKET_BITS + 1):
+        idxs = {i // 2 for i in idxs}
+        for i in idxs:
+            left = tree.get((lvl - 1, 2 * i), EMPTY[lvl - 1])
+            right = tree.get((lvl - 1, 2 * i + 1), EMPTY[lvl - 1])
+            tree[(lvl, i)] = changed[(lvl, i)] = _h(left + right)
+    changed.setdefault((BUCKET_BITS, 0), tree.get((BUCKET_BITS, 0), EMPTY[BUCKET_BITS]))
+    s.execute(
+        _text(
+            "INSERT INTO kg_merkle_nodes (level, idx, hash) VALUES (:l, :i, :h) "
+            "ON CONFLICT (level, idx) DO UPDATE SET hash = excluded.hash"
+        ),
+        [{"l": k[0], "i": k[1], "h": v} for k, v in sorted(changed.items())],
+    )  # type: ignore[attr-defined]
+
+
+def refresh(s: Any) -> int:
+    """Apply pending dirty uids; returns the number of buckets rehashed."""
+    from sqlmodel import text as _text  # type: ignore
+
+    dirty = [(r[0], r[1]) for r in s.execute(_text("SELECT uid, marked_at FROM kg_merkle_dirty"))]  # type: ignore[attr-defined]
+    if not dirty:
+        return 0
+    uids = sorted({d[0] for d in dirty})
+    for chunk in chunked(uids):
+        s.execute(expanding_text("DELETE FROM kg_merkle_leaves WHERE uid IN :u", "u"), {"u": chunk})  # type: ignore[attr-defined]
+        _insert_leaves(s, _leaf_rows(s, chunk))
+    buckets = sorted({bucket_of(u) for u in uids})
+    _rehash(s, _bucket_roots(s, buckets))
+    # Only clear marks we consumed; a concurrent writer re-marking a uid bumps marked_at
+    s.execute(_text("DELETE FROM kg_merkle_dirty WHERE uid = :u AND marked_at = :m"), [{"u": u, "m": m} for u, m in dirty])  # type: ignore[attr-defined]
+    s.commit()  # type: ignore[attr-defined]
+    return len(buckets)
+
+
+def rebuild(s: Any) -> None:
+    """Re-derive the whole index by streaming open rows in keyset pages."""
+    from sqlmodel import text as _text  # type: ignore
+
+    for tbl in ("kg_merkle_leaves", "kg_merkle_nodes", "kg_merkle_dirty"):
+        s.execute(_text(f"DELETE FROM {tbl}"))  # type: ignore[attr-defined]  # nosec - fixed table names
+    for sql, leaf_fn, kind in (
+        ("SELECT id, uid, type, properties_json FROM kg_nodes WHERE valid_to IS NULL AND id > :last ORDER BY id LIMIT :lim", node_leaf, "n"),
+        ("SELECT id, src_uid, dst_uid, type, properties_json FROM kg_edges WHERE valid_to IS NULL AND id > :last ORDER BY id LIMIT :lim", edge_leaf, "e"),
+    ):
+        last = 0
+        while True:
+            page = list(s.execute(_text(sql), {"last": last, "lim": REBUILD_PAGE}))  # type: ignore[attr-defined]
+            if not page:
+                break
+            rows = []
+            for r in page:
+                key, leaf = leaf_fn(*r[1:])
+                rows.append({"uid": r[1], "bucket": bucket_of(r[1]), "leaf_key": key, "kind": kind, "leaf_hash": leaf})
+            _insert_leaves(s, rows)
+            last = int(page[-1][0])
+    _rehash(s, _bucket_roots(s))
+    s.commit()  # type: ignore[attr-defined]
+
+
+def summary(s: Any) -> Dict[str, Any]:
+    from sqlmodel import text as _text  # type: ignore
+
+    counts = {r[0]: int(r[1]) for r in s.execute(_text("SELECT kind, COUNT(1) FROM kg_merkle_leaves GROUP BY kind"))}  # type: ignore[attr-defined]
+    root_rows = list(s.execute(_text("SELECT hash FROM kg_merkle_nodes WHERE level = :l AND idx = 0"), {"l": BUCKET_BITS}))  # type: ignore[attr-defined]
+    root = root_rows[0][0] if root_rows else None
+    n, e = counts.get("n", 0), counts.get("e", 0)
+    return {"merkle_root": root if (n or e) else None, "node_count": n, "edge_count": e}
+
+
+def snapshot(s: Any, force_rebuild: bool = False) -> Dict[str, Any]:
+    """Bring the index up to date and return {merkle_root, node_count, edge_count, buckets_rehashed}."""
+    from sqlmodel import text as _text  # type: ignore
+
+    ensure_schema(s)
+    initialized = bool(list(s.execute(_text("SELECT 1 FROM kg_merkle_nodes WHERE level = :l LIMIT 1"), {"l": BUCKET_BITS})))  # type: ignore[attr-defined]
+    if force_rebuild or not initialized:
+        rebuild(s)
+        rehashed = N_BUCKETS
+    else:
+        rehashed = refresh(s)
+    out = summary(s)
+    out["buckets_rehashed"] = rehashed
+    return out
+
+
+def prove(s: Any, uid: str) -> Dict[str, Any]:
+    """Inclusion proofs for every leaf filed under `uid` (its node versions and outgoing edges)."""
+    from sqlmodel import text as _text  # type: ignore
+
+    b = bucket_of(uid)
+    rows = list(
+        s.execute(
+            _text("SELECT uid, leaf_key, kind, leaf_hash FROM kg_merkle_leaves WHERE bucket = :b ORDER BY leaf_key, leaf_hash"),
+            {"b": b},
+        )
+    )  # type: ignore[attr-defined]
+    hashes = [r[3] for r in rows]
+    # Top-of-tree siblings: one per level, plus the root
+    want = [(lvl, (b >> lvl) ^ 1) for lvl in range(BUCKET_BITS)] + [(BUCKET_BITS, 0)]
+    params: Dict[str, Any] = {}
+    conds = []
+    for k, (lvl, idx) in enumerate(want):
+        conds.append(f"(level = :l{k} AND idx = :i{k})")
+        params[f"l{k}"], params[f"i{k}"] = lvl, idx
+    got = {(int(r[0]), int(r[1])): r[2] for r in s.execute(_text("SELECT level, idx, hash FROM kg_merkle_nodes WHERE " + " OR ".join(conds)), params)}  # type: ignore[attr-defined]
+    top = [
+        {"hash": got.get((lvl, idx), EMPTY[lvl]), "side": "left" if idx < (b >> lvl) else "right"}
+        for lvl, idx in want[:-1]
+    ]
+    proofs = [
+        {"leaf_key": r[1], "kind": r[2], "leaf_hash": r[3], "path": subtree_path(hashes, pos) + top}
+        for pos, r in enumerate(rows)
+        if r[0] == uid
+    ]
+    return {"uid": uid, "bucket": b, "merkle_root": got.get((BUCKET_BITS, 0)), "proofs": proofs}
+
@@ -0,0 +1,345 @@
+"""Structured property index for `/kg/find`.
+
+`/kg/find` used to match properties with `LIKE` over `properties_json`
+(`REPLACE(REPLACE(...))` to tolerate whitespace around `"key":"value"`), so every
+property search scanned and rewrote each row, and pagination probed with a second
+query. Node versions are append-only, so their properties are now mirrored into
+`kg_node_props`, one row per (version id, key, normalized value):
+
+* `val` – the value as trimmed, lowercased text (truncated to `MAX_VAL`);
+* `num` – the value as a float when it is numeric, else NULL.
+
+Scalar top-level properties are indexed, and so is each scalar element of a list
+property. Nested objects are not. With indexes on (key, val) and (key, num),
+`eq`, `prefix` and `gt`/`gte`/`lt`/`lte` filters become index range lookups. The
+matching version ids then feed the temporal/tenant filter on `kg_nodes`.
+
+`prefix` compares in code point order (SQLite's BINARY collation, `COLLATE "C"`
+on Postgres) against `[prefix, successor(prefix))`, where the successor bumps the
+last code point. A fixed `prefix + U+FFFF` upper bound would miss values
+continuing with astral characters, and under a locale collation it is not a
+prefix bound at all. Migration 0026 adds the matching `COLLATE "C"` indexes on
+Postgres.
+
+`sync` indexes `kg_nodes` rows above an in-process watermark (per bind) and is
+cheap when nothing is new: one `MAX(id)` probe. Write paths call it after
+committing node versions. `SYNCER` (started from the app lifespan) calls it
+every `KG_PROPS_SYNC_SEC` (default 5) so rows written by raw SQL or other
+workers are picked up too; `/kg/find` itself only reads. Ids are handed out at
+insert time but become visible at commit, so a hole in the ids below the
+watermark may be a transaction that has not committed yet. Holes are kept as
+id ranges and re-probed on every sync until they fill, or until
+`GAP_TTL_SEC` passes (rolled-back inserts and deleted rows never fill).
+Inserts are `ON CONFLICT DO NOTHING`, so re-indexing is harmless. Migration
+0020 backfills the versions that already exist, so the first sync after an
+upgrade does not index the whole table on the request path.
+
+Postgres expression indexes on `properties_json` were not used because the
+keys are open-ended, and one side table serves SQLite and Postgres alike.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+MAX_KEY = 128
+MAX_VAL = 256
+SYNC_BATCH = 1000
+START_RESCAN = 1024  # ids re-read below the indexed maximum on a process's first sync
+GAP_TTL_SEC = 3600.0
+MAX_GAPS = 1024
+GAP_PROBE = 64  # hole ranges per probe query
+OPS = ("eq", "prefix", "contains", "gt", "gte", "lt", "lte")
+
+_Gap = Tuple[int, int, float]  # exclusive id range (lo, hi) not seen yet, and when it was first seen
+
+_READY: Set[str] = set()
+_WATERMARK: Dict[str, int] = {}
+_GAPS: Dict[str, List[_Gap]] = {}
+_SYNC_LOCK = threading.Lock()
+
+_INSERT_SQL = (
+    "INSERT INTO kg_node_props (node_id, uid, key, val, num) VALUES (:nid, :uid, :k, :v, :n) "
+    "ON CONFLICT (node_id, key, val) DO NOTHING"
+)
+
+
+def _raw_session(s: Any) -> Any:
+    return getattr(s, "_s", s)
+
+
+def _bind_key(s: Any) -> str:
+    bind = _raw_session(s).get_bind()
+    return str(getattr(bind, "url", id(bind)))
+
+
+def normalize(value: Any) -> Optional[Tuple[str, Optional[float]]]:
+    """(val, num) for a scalar property value; None for values that are not indexed."""
+    if value is None or isinstance(value, (dict, list, tuple)):
+        return None
+    if isinstance(value, bool):
+        return ("true" if value else "false"), None
+    if isinstance(value, (int, float)):
+        num = float(value)
+        return str(value).lower()[:MAX_VAL], (num if math.isfinite(num) else None)
+    val = str(value).strip().lower()[:MAX_VAL]
+    return val, parse_number(val)
+
+
+def parse_number(raw: Any) -> Optional[float]:
+    try:
+        num = float(str(raw).strip())
+    except (TypeError, ValueError):
+        return None
+    return num if math.isfinite(num) else None
+
+
+def prop_rows(node_id: int, uid: str, properties_json: Any) -> List[Dict[str, Any]]:
+    """Index rows for one node version."""
+    try:
+        props = json.loads(properties_json) if isinstance(properties_json, str) else properties_json
+    except Exception:
+        return []
+    if not isinstance(props, dict):
+        return []
+    out: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for key, value in props.items():
+        k = str(key)[:MAX_KEY]
+        for item in value if isinstance(value, list) else [value]:
+            norm = normalize(item)
+            if norm is not None:
+                out[(k, norm[0])] = {"nid": int(node_id), "uid": uid, "k": k, "v": norm[0], "n": norm[1]}
+    return list(out.values())
+
+
+def ensure_schema(s: Any) -> None:
+    """Create `kg_node_props` on the session's bind (once per bind) when migrations have not run."""
+    key = _bind_key(s)
+    if key in _READY:
+        return
+    from sqlmodel import SQLModel  # type: ignore
+    from .db import KGNodeProp  # type: ignore
+
+    SQLModel.metadata.create_all(_raw_session(s).get_bind(), tables=[KGNodeProp.__table__])  # type: ignore[attr-defined]
+    _READY.add(key)
+
+
+def index_rows(s: Any, rows: Iterable[Tuple[Any, Any, Any]]) -> int:
+    """Index (id, uid, properties_json) node rows. Caller commits."""
+    from sqlmodel import text as _text  # type: ignore
+
+    params: List[Dict[str, Any]] = []
+    for nid, uid, props in rows:
+        params.extend(prop_rows(nid, uid, props))
+    if params:
+        s.execute(_text(_INSERT_SQL), params)  # type: ignore[attr-defined]
+    return len(params)
+
+
+def holes(lo: int, hi: int, ids: Iterable[int], seen_at: float) -> List[_Gap]:
+    """Exclusive ranges inside (lo, hi) not covered by the ascending `ids`."""
+    out: List[_Gap] = []
+    prev = lo
+    for i in ids:
+        if i > prev + 1:
+            out.append((prev, i, seen_at))
+        prev = max(prev, i)
+    if hi > prev + 1:
+        out.append((prev, hi, seen_at))
+    return out
+
+
+def _probe_gaps(s: Any, gaps: List[_Gap], batch: int) -> Tuple[int, List[_Gap]]:
+    """Index rows that appeared inside known holes; returns (index rows written, holes still open)."""
+    from sqlmodel import text as _text  # type: ignore
+
+    written = 0
+    still: List[_Gap] = []
+    for i in range(0, len(gaps), GAP_PROBE):
+        chunk = gaps[i:i + GAP_PROBE]
+        cond = " OR ".join(f"(id > :l{j} AND id < :h{j})" for j in range(len(chunk)))
+        params: Dict[str, Any] = {f"l{j}": g[0] for j, g in enumerate(chunk)}
+        params.update({f"h{j}": g[1] for j, g in enumerate(chunk)})
+        found: List[int] = []
+        after = 0
+        while True:
+            rows = list(
+                s.execute(  # type: ignore[attr-defined]
+                    _text(f"SELECT id, uid, properties_json FROM kg_nodes WHERE ({cond}) AND id > :after ORDER BY id LIMIT :lim"),
+                    {**params, "after": after, "lim": batch},
+                )
+            )
+            if not rows:
+                break
+            written += index_rows(s, [(r[0], r[1], r[2]) for r in rows])
+            s.commit()  # type: ignore[attr-defined]
+            found.extend(int(r[0]) for r in rows)
+            after = found[-1]
+            if len(rows) < batch:
+                break
+        for lo, hi, seen_at in chunk:
+            still.extend(holes(lo, hi, [x for x in found if lo < x < hi], seen_at))
+    return written, still
+
+
+def sync(s: Any, batch: int = SYNC_BATCH) -> int:
+    """Index node versions added since the last sync on this bind and commit; returns index rows written."""
+    from sqlmodel import text as _text  # type: ignore
+
+    ensure_schema(s)
+    key = _bind_key(s)
+    batch = max(1, int(batch))
+    with _SYNC_LOCK:
+        top = int(s.execute(_text("SELECT MAX(id) FROM kg_nodes")).scalar() or 0)  # type: ignore[attr-defined]
+        mark = _WATERMARK.get(key)
+        if mark is None:
+            # Holes just below the indexed maximum may belong to transactions still in flight
+            indexed = int(s.execute(_text("SELECT COALESCE(MAX(node_id), 0) FROM kg_node_props")).scalar() or 0)  # type: ignore[attr-defined]
+            if top < indexed:
+                mark = indexed
+            else:
+                mark = max(0, indexed - START_RESCAN)
+        if top < mark:
+            # kg_nodes lost rows above the watermark (truncated or recreated): drop their entries
+            s.execute(_text("DELETE FROM kg_node_props WHERE node_id > :top"), {"top": top})  # type: ignore[attr-defined]
+            s.commit()  # type: ignore[attr-defined]
+            _WATERMARK[key] = top
+            _GAPS.pop(key, None)
+            return 0
+        now = time.time()
+        gaps = [g for g in _GAPS.get(key, []) if now - g[2] < GAP_TTL_SEC]
+        written = 0
+        if gaps:
+            written, gaps = _probe_gaps(s, gaps, batch)
+        lo = mark
+        while lo < top:
+            rows = list(
+                s.execute(  # type: ignore[attr-defined]
+                    _text("SELECT id, uid, properties_json FROM kg_nodes WHERE id > :lo AND id <= :top ORDER BY id LIMIT :lim"),
+                    {"lo": lo, "top": top, "lim": batch},
+                )
+            )
+            if not rows:
+                gaps.extend(holes(lo, top + 1, [], now))
+                break
+            written += index_rows(s, [(r[0], r[1], r[2]) for r in rows])
+            s.commit()  # type: ignore[attr-defined]
+            ids = [int(r[0]) for r in rows]
+            gaps.extend(holes(lo, ids[-1] + 1, ids, now))
+            lo = ids[-1]
+        if len(gaps) > MAX_GAPS:
+            gaps = sorted(gaps, key=lambda g: g[2])[-MAX_GAPS:]
+        _GAPS[key] = gaps
+        _WATERMARK[key] = top
+        return written
+
+
+def prefix_bounds(prefix: str) -> Tuple[str, Optional[str]]:
+    """`[lo, hi)` holding exactly the strings starting with `prefix` in code point order (hi None: unbounded)."""
+    head = prefix
+    while head and ord(head[-1]) == 0x10FFFF:
+        head = head[:-1]
+    if not head:
+        return prefix, None
+    nxt = ord(head[-1]) + 1
+    if 0xD800 <= nxt <= 0xDFFF:
+        nxt = 0xE000
+    return prefix, head[:-1] + chr(nxt)
+
+
+def prefix_condition(col: str, prefix: str, name: str, dialect: str = "") -> Tuple[str, Dict[str, Any]]:
+    """Index-friendly `col starts with prefix` (binary order; `COLLATE "C"` on Postgres)."""
+    lo, hi = prefix_bounds(prefix)
+    ref = f'{col} COLLATE "C"' if dialect == "postgresql" else col
+    cond = f"{ref} >= :{name}"
+    params: Dict[str, Any] = {name: lo}
+    if hi is not None:
+        cond += f" AND {ref} < :{name}_hi"
+        params[f"{name}_hi"] = hi
+    return cond, params
+
+
+def predicate(key: str, value: str, op: Optional[str] = "eq", dialect: str = "") -> Tuple[str, Dict[str, Any]]:
+    """SQL (`id IN (...)` over `kg_node_props`) and params for one property filter.
+
+    Range operators compare numerically when `value` parses as a number and
+    lexically on the normalized text otherwise. `contains` is a substring match
+    restricted to one key's entries.
+    """
+    op = (op or "eq").strip().lower()
+    if op not in OPS:
+        raise ValueError(f"unsupported prop_op: {op}")
+    params: Dict[str, Any] = {"pk": str(key)[:MAX_KEY]}
+    val = str(value).strip().lower()[:MAX_VAL]
+    num = parse_number(val)
+    if op == "eq":
+        if num is not None:
+            cond = "num = :pn"
+            params["pn"] = num
+        else:
+            cond = "val = :pv"
+            params["pv"] = val
+    elif op == "prefix":
+        cond, extra = prefix_condition("val", val, "pv", dialect)
+        params.update(extra)
+    elif op == "contains":
+        cond = "val LIKE :pv"
+        params["pv"] = f"%{val}%"
+    else:
+        cmp = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}[op]
+        if num is not None:
+            cond = f"num {cmp} :pn"
+            params["pn"] = num
+        else:
+            cond = f"val {cmp} :pv"
+            params["pv"] = val
+    return f"id IN (SELECT node_id FROM kg_node_props WHERE key = :pk AND {cond})", params
+
+
+class Syncer:
+    """Background catch-up for rows the write paths did not index (raw SQL, other workers, holes)."""
+
+    def __init__(self, session_factory: Callable[[], Any], interval_s: float = 5.0) -> None:
+        self._session_factory = session_factory
+        self.interval_s = float(interval_s)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"runs": 0, "errors": 0, "rows": 0, "last_run_at": None}
+
+    def run_once(self) -> int:
+        t0 = time.time()
+        try:
+            with self._session_factory() as s:
+                n = sync(s)
+        except Exception:
+            self.stats["errors"] += 1
+            return 0
+        self.stats.update(runs=self.stats["runs"] + 1, rows=self.stats["rows"] + n, last_run_at=t0)
+        return n
+
+    def ensure_started(self) -> None:
+        if self.interval_s <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="kg-props-sync", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.interval_s)
+            self.run_once()
+
+
+def _session() -> Any:
+    from . import db  # type: ignore
+
+    return db.get_session()
+
+
+SYNCER = Syncer(_session, interval_s=float(os.getenv("KG_PROPS_SYNC_SEC", "5")))
@@ -0,0 +1,271 @@
+"""Maintained aggregate counters for `/kg/stats`.
+
+`/kg/stats` used to run COUNT(1) and MAX(created_at) over `kg_nodes` and
+`kg_edges` (four full scans) per call. `kg_stats` holds one row per
+(kind, tenant, type) with `total_count` (all versions), `open_count`
+(`valid_to IS NULL`) and `latest_created_at`:
+
+* Row triggers on both tables apply +1/-1 deltas. They fire on insert, on
+  delete, and on updates of `valid_to`/`type`/`tenant_id`, which covers
+  closing a version. The counters therefore change in the same transaction
+  as the write, whichever path made it (ORM upsert, `/kg/commit`, bulk
+  commit or raw SQL).
+* `recount` reconciles without blocking writers. One statement reads the
+  grouped pass over both tables together with `kg_stats`, so both sides come
+  from the same snapshot. The per-key difference is the drift. It is then
+  applied as additive deltas in a short transaction, so deltas committed by
+  writers after that snapshot are kept. A daemon thread, started from the app
+  lifespan, runs it every `KG_STATS_RECOUNT_SEC` (default 3600, 0 disables) to
+  undo any drift, e.g. from writes made while the triggers were missing or
+  `latest_created_at` after deletes.
+* `counters` reads at most (#tenants x #types) rows, independent of graph size.
+  Without the table (migration not applied) `/kg/stats` falls back to `scan`.
+
+NULL tenant ids are stored as `tenant_key = -1` and NULL types as ''.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+TABLES = {"kg_nodes": "node", "kg_edges": "edge"}
+NULL_TENANT = -1
+
+_DDL = (
+    "CREATE TABLE IF NOT EXISTS kg_stats ("
+    "kind VARCHAR NOT NULL, tenant_key BIGINT NOT NULL, type VARCHAR NOT NULL, "
+    "total_count BIGINT NOT NULL DEFAULT 0, open_count BIGINT NOT NULL DEFAULT 0, latest_created_at VARCHAR, "
+    "PRIMARY KEY (kind, tenant_key, type))"
+)
+
+_PG_FUNCTIONS = (
+    "CREATE OR REPLACE FUNCTION kg_stats_apply(k text, tk bigint, t text, dt int, dopen int, created text) RETURNS void AS $$ "
+    "BEGIN INSERT INTO kg_stats (kind, tenant_key, type, total_count, open_count, latest_created_at) "
+    "VALUES (k, tk, t, dt, dopen, created) ON CONFLICT (kind, tenant_key, type) DO UPDATE SET "
+    "total_count = kg_stats.total_count + EXCLUDED.total_count, open_count = kg_stats.open_count + EXCLUDED.open_count, "
+    "latest_created_at = CASE WHEN kg_stats.latest_created_at IS NULL OR EXCLUDED.latest_created_at > kg_stats.latest_created_at "
+    "THEN COALESCE(EXCLUDED.latest_created_at, kg_stats.latest_created_at) ELSE kg_stats.latest_created_at END; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE FUNCTION kg_stats_trg() RETURNS trigger AS $$ "
+    "DECLARE k text := CASE WHEN TG_TABLE_NAME = 'kg_nodes' THEN 'node' ELSE 'edge' END; BEGIN "
+    "IF TG_OP IN ('UPDATE', 'DELETE') THEN PERFORM kg_stats_apply(k, COALESCE(OLD.tenant_id, -1), COALESCE(OLD.type, ''), -1, "
+    "CASE WHEN OLD.valid_to IS NULL THEN -1 ELSE 0 END, NULL); END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN PERFORM kg_stats_apply(k, COALESCE(NEW.tenant_id, -1), COALESCE(NEW.type, ''), 1, "
+    "CASE WHEN NEW.valid_to IS NULL THEN 1 ELSE 0 END, NEW.created_at); END IF; "
+    "RETURN NULL; END $$ LANGUAGE plpgsql",
+)
+
+
+def _sqlite_apply(kind: str, ref: str, sign: int) -> str:
+    key = f"kind = '{kind}' AND tenant_key = COALESCE({ref}.tenant_id, {NULL_TENANT}) AND type = COALESCE({ref}.type, '')"
+    latest = (
+        f", latest_created_at = CASE WHEN latest_created_at IS NULL OR {ref}.created_at > latest_created_at "
+        f"THEN COALESCE({ref}.created_at, latest_created_at) ELSE latest_created_at END"
+        if sign > 0
+        else ""
+    )
+    return (
+        f"INSERT OR IGNORE INTO kg_stats (kind, tenant_key, type, total_count, open_count) "
+        f"VALUES ('{kind}', COALESCE({ref}.tenant_id, {NULL_TENANT}), COALESCE({ref}.type, ''), 0, 0); "
+        f"UPDATE kg_stats SET total_count = total_count + ({sign}), open_count = open_count + ({sign}) * ({ref}.valid_to IS NULL)"
+        f"{latest} WHERE {key};"
+    )
+
+
+def trigger_ddl(dialect: str, table: str) -> List[str]:
+    """Idempotent statements keeping `kg_stats` in step with writes to `table`."""
+    kind = TABLES[table]
+    if dialect == "postgresql":
+        return list(_PG_FUNCTIONS) + [
+            f"DROP TRIGGER IF EXISTS trg_{table}_stats ON {table}",
+            f"CREATE TRIGGER trg_{table}_stats AFTER INSERT OR DELETE OR UPDATE OF valid_to, type, tenant_id ON {table} "
+            f"FOR EACH ROW EXECUTE PROCEDURE kg_stats_trg()",
+        ]
+    if dialect == "sqlite":
+        return [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_ins AFTER INSERT ON {table} BEGIN {_sqlite_apply(kind, 'NEW', 1)} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_del AFTER DELETE ON {table} BEGIN {_sqlite_apply(kind, 'OLD', -1)} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_upd AFTER UPDATE OF valid_to, type, tenant_id ON {table} "
+            f"BEGIN {_sqlite_apply(kind, 'OLD', -1)} {_sqlite_apply(kind, 'NEW', 1)} END",
+        ]
+    return []
+
+
+def install(conn: Any, tables: Sequence[str] = tuple(TABLES)) -> None:
+    """Create the counter table and triggers for `tables` (each must exist already)."""
+    conn.exec_driver_sql(_DDL)
+    for table in tables:
+        for stmt in trigger_ddl(conn.dialect.name, table):
+            conn.exec_driver_sql(stmt)
+
+
+def _grouped_sql(table: str) -> str:
+    return (
+        f"SELECT COALESCE(tenant_id, {NULL_TENANT}), COALESCE(type, ''), COUNT(1), "
+        f"SUM(CASE WHEN valid_to IS NULL THEN 1 ELSE 0 END), MAX(created_at) FROM {table} GROUP BY 1, 2"
+    )
+
+
+def scan(s: Any) -> List[Dict[str, Any]]:
+    """Counter rows computed directly from the KG tables (one grouped pass per table)."""
+    from sqlmodel import text as _text  # type: ignore
+
+    out: List[Dict[str, Any]] = []
+    for table, kind in TABLES.items():
+        for tk, typ, total, opened, latest in s.execute(_text(_grouped_sql(table))):  # type: ignore[attr-defined]
+            out.append({"kind": kind, "tk": int(tk), "t": typ, "total": int(total or 0), "open": int(opened or 0), "latest": latest})
+    return out
+
+
+def drift(s: Any) -> List[Dict[str, Any]]:
+    """Per-key corrections (scanned minus maintained), read in one statement so both sides share a snapshot.
+
+    Each row holds additive `total`/`open` deltas plus `latest` (scanned) and
+    `seen_latest` (maintained), so `apply` only replaces a `latest_created_at`
+    that nobody changed since.
+    """
+    from sqlmodel import text as _text  # type: ignore
+
+    parts = [f"SELECT 's', '{kind}', g.* FROM ({_grouped_sql(table)}) g" for table, kind in TABLES.items()]
+    parts.append("SELECT 'c', kind, tenant_key, type, total_count, open_count, latest_created_at FROM kg_stats")
+    scanned: Dict[tuple, tuple] = {}
+    kept: Dict[tuple, tuple] = {}
+    for src, kind, tk, typ, total, opened, latest in s.execute(_text(" UNION ALL ".join(parts))):  # type: ignore[attr-defined]
+        (scanned if src == "s" else kept)[(kind, int(tk), typ)] = (int(total or 0), int(opened or 0), latest)
+    out: List[Dict[str, Any]] = []
+    for key in set(scanned) | set(kept):
+        total, opened, latest = scanned.get(key, (0, 0, None))
+        k_total, k_open, k_latest = kept.get(key, (0, 0, None))
+        if (total, opened, latest) == (k_total, k_open, k_latest):
+            continue
+        out.append({"kind": key[0], "tk": key[1], "t": key[2], "dt": total - k_total, "dopen": opened - k_open, "latest": latest, "seen_latest": k_latest})
+    return out
+
+
+def apply(s: Any, rows: Sequence[Dict[str, Any]]) -> int:
+    """Add `drift` corrections to the counters (row-level upserts only; concurrent deltas are preserved)."""
+    from sqlmodel import text as _text  # type: ignore
+
+    if rows:
+        try:
+            dialect = getattr(s, "_s", s).get_bind().dialect.name
+        except Exception:
+            dialect = ""
+        same = "IS NOT DISTINCT FROM" if dialect == "postgresql" else "IS"
+        s.execute(  # type: ignore[attr-defined]
+            _text(
+                "INSERT INTO kg_stats (kind, tenant_key, type, total_count, open_count, latest_created_at) "
+                "VALUES (:kind, :tk, :t, :dt, :dopen, :latest) ON CONFLICT (kind, tenant_key, type) DO UPDATE SET "
+                "total_count = kg_stats.total_count + :dt, open_count = kg_stats.open_count + :dopen, "
+                f"latest_created_at = CASE WHEN kg_stats.latest_created_at {same} :seen_latest THEN :latest "
+                "ELSE kg_stats.latest_created_at END"
+            ),
+            list(rows),
+        )
+        s.execute(_text("DELETE FROM kg_stats WHERE total_count = 0 AND open_count = 0"))  # type: ignore[attr-defined]
+    s.commit()  # type: ignore[attr-defined]
+    return len(rows)
+
+
+def recount(s: Any) -> int:
+    """Reconcile the counters with a fresh scan; returns the number of corrected keys.
+
+    The scan holds no lock that trigger deltas wait on: writers keep running,
+    and whatever they commit after the read snapshot lands on top of the
+    corrections instead of being overwritten.
+    """
+    rows = drift(s)
+    try:
+        s.commit()  # type: ignore[attr-defined]  # end the read snapshot before writing
+    except Exception:
+        pass
+    return apply(s, rows)
+
+
+def summarize(rows: Sequence[Dict[str, Any]], tenant_id: Optional[Any] = None) -> Dict[str, Any]:
+    """`/kg/stats` payload from counter rows, optionally restricted to one tenant."""
+    out: Dict[str, Any] = {
+        "nodes_total": 0,
+        "edges_total": 0,
+        "latest_node_created_at": None,
+        "latest_edge_created_at": None,
+        "open_nodes_total": 0,
+        "open_edges_total": 0,
+        "nodes_by_type": {},
+        "edges_by_type": {},
+    }
+    tk = int(tenant_id) if tenant_id is not None else None
+    for r in rows:
+        if tk is not None and r["tk"] != tk:
+            continue
+        kind = r["kind"]
+        out[f"{kind}s_total"] += r["total"]
+        out[f"open_{kind}s_total"] += r["open"]
+        if r["open"]:
+            by_type = out[f"{kind}s_by_type"]
+            by_type[r["t"]] = by_type.get(r["t"], 0) + r["open"]
+        latest = r["latest"]
+        if latest and (out[f"latest_{kind}_created_at"] is None or str(latest) > out[f"latest_{kind}_created_at"]):
+            out[f"latest_{kind}_created_at"] = str(latest)
+    return out
+
+
+def counters(s: Any, tenant_id: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """Maintained counter rows (all tenants, or one)."""
+    from sqlmodel import text as _text  # type: ignore
+
+    sql = "SELECT kind, tenant_key, type, total_count, open_count, latest_created_at FROM kg_stats"
+    params: Dict[str, Any] = {}
+    if tenant_id is not None:
+        sql += " WHERE tenant_key = :tk"
+        params["tk"] = int(tenant_id)
+    return [
+        {"kind": r[0], "tk": int(r[1]), "t": r[2], "total": int(r[3] or 0), "open": int(r[4] or 0), "latest": r[5]}
+        for r in s.execute(_text(sql), params)  # type: ignore[attr-defined]
+    ]
+
+
+class Reconciler:
+    def __init__(self, session_factory: Callable[[], Any], interval_s: float = 3600.0) -> None:
+        self._session_factory = session_factory
+        self.interval_s = float(interval_s)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"runs": 0, "errors": 0, "last_run_at": None, "last_duration_ms": None}
+
+    def run_once(self) -> int:
+        t0 = time.time()
+        try:
+            with self._session_factory() as s:
+                n = recount(s)
+        except Exception:
+            self.stats["errors"] += 1
+            return 0
+        self.stats.update(runs=self.stats["runs"] + 1, last_run_at=t0, last_duration_ms=round((time.time() - t0) * 1000, 1))
+        return n
+
+    def ensure_started(self) -> None:
+        if self.interval_s <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="kg-stats-recount", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.interval_s)
+            self.run_once()
+
+
+def _session() -> Any:
+    from . import db  # type: ignore
+
+    return db.get_session()
+
+
+RECONCILER = Reconciler(_session, interval_s=float(os.getenv("KG_STATS_RECOUNT_SEC", "3600")))
+
@@ -0,0 +1,49 @@
+"""Temporal indexes for `kg_nodes` / `kg_edges`.
+
+The tables had only single-column indexes plus (uid|src_uid|dst_uid,
+valid_from), so the as-of lookups behind /kg/node, /kg/edges and the commit
+paths filtered `valid_to` row by row. `INDEXES` adds:
+
+* composite indexes shaped like the as-of lookups: (key, valid_to, valid_from);
+* partial indexes over open rows only (`valid_to IS NULL`) for the
+  "current version" probes used by upsert/commit and the snapshot.
+
+Migration 0022 installs them on existing databases; `install(conn)` covers
+tables created by `SQLModel.metadata.create_all`. Typed `*_ts` shadows of the
+ISO strings are deferred until the as-of reads move to them: until then their
+sync triggers would only add a second row write on every insert.
+"""
+
+from __future__ import annotations
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+TABLES = ("kg_nodes", "kg_edges")
+
+# (name, table, columns, partial WHERE or None)
+INDEXES: Sequence[Tuple[str, str, Tuple[str, ...], Optional[str]]] = (
+    ("ix_kg_nodes_uid_asof", "kg_nodes", ("uid", "valid_to", "valid_from"), None),
+    ("ix_kg_nodes_open_uid_type", "kg_nodes", ("uid", "type"), "valid_to IS NULL"),
+    ("ix_kg_edges_src_asof", "kg_edges", ("src_uid", "valid_to", "valid_from", "type"), None),
+    ("ix_kg_edges_dst_asof", "kg_edges", ("dst_uid", "valid_to", "valid_from", "type"), None),
+    ("ix_kg_edges_open_src_dst_type", "kg_edges", ("src_uid", "dst_uid", "type"), "valid_to IS NULL"),
+    ("ix_kg_edges_open_dst", "kg_edges", ("dst_uid",), "valid_to IS NULL"),
+)
+
+
+def index_ddl(dialect: str, tables: Sequence[str] = TABLES) -> List[str]:
+    out = []
+    for name, table, cols, where in INDEXES:
+        if table not in tables:
+            continue
+        stmt = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)})"
+        if where and dialect in ("postgresql", "sqlite"):
+            stmt += f" WHERE {where}"
+        out.append(stmt)
+    return out
+
+
+def install(conn: Any, tables: Sequence[str] = TABLES) -> None:
+    """Create the temporal indexes on kg tables (idempotent)."""
+    for stmt in index_ddl(conn.dialect.name, tables):
+        conn.exec_driver_sql(stmt)
@@ -0,0 +1,209 @@
+"""Set-based time-travel traversal helpers for the KG tables.
+
+Each BFS level is expanded with a single `IN (...)` query against `kg_edges`
+(chunked to stay under driver bind-parameter limits), neighbor nodes are
+hydrated in one batch per level, and the final edge page pushes limit/offset
+or a keyset cursor into SQL instead of slicing in Python. The number of
+statements therefore grows with depth, not with neighborhood size.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .sql_utils import chunked, expanding_text
+
+# Cap on frontier breadth per hop to keep fan-out bounded
+MAX_FRONTIER = 100
+
+_TEMPORAL = "(valid_from IS NULL OR valid_from <= :at) AND (valid_to IS NULL OR valid_to > :at)"
+
+
+def _col(r: Any, idx: int, name: str) -> Any:
+    return r[idx] if isinstance(r, (tuple, list)) else getattr(r, name, None)
+
+
+def _parse_props(raw: Any) -> Any:
+    if isinstance(raw, (bytes, bytearray)):
+        try:
+            raw = raw.decode("utf-8")
+        except Exception:
+            pass
+    try:
+        return json.loads(raw) if isinstance(raw, str) else raw
+    except Exception:
+        return raw
+
+
+def encode_cursor(lt_id: int) -> str:
+    try:
+        b = json.dumps({"lt_id": int(lt_id)}, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(b).decode()
+    except Exception:
+        return str(lt_id)
+
+
+def decode_cursor(cur: Optional[str]) -> Optional[int]:
+    if not cur:
+        return None
+    try:
+        s = cur.strip()
+        pad = (-len(s)) % 4
+        if pad:
+            s += "=" * pad
+        obj = json.loads(base64.urlsafe_b64decode(s.encode()).decode())
+        v = obj.get("lt_id")
+        return int(v) if v is not None else None
+    except Exception:
+        return None
+
+
+def _dialect(s: Any) -> str:
+    try:
+        return str(getattr(s, "_s", s).get_bind().dialect.name)
+    except Exception:
+        return ""
+
+
+def node_versions_as_of(s: Any, uids: Sequence[str], at: str, tenant_id: Optional[Any] = None) -> Dict[str, Tuple[Any, ...]]:
+    """Return {uid: (id, uid, type, properties_json, created_at)} for the version valid at `at`.
+
+    One query per IN chunk. The newest row (highest id) per uid is picked in SQL
+    (`DISTINCT ON` on Postgres, `ROW_NUMBER()` elsewhere), matching the
+    `ORDER BY id DESC LIMIT 1` semantics of the single-node lookups.
+    """
+    out: Dict[str, Tuple[Any, ...]] = {}
+    uniq = sorted({u for u in uids if u})
+    where = "uid IN :uids AND " + _TEMPORAL + (" AND tenant_id = :tid" if tenant_id else "")
+    if _dialect(s) == "postgresql":
+        sql = f"SELECT DISTINCT ON (uid) id, uid, type, properties_json, created_at FROM kg_nodes WHERE {where} ORDER BY uid, id DESC"
+    else:
+        sql = (
+            "SELECT id, uid, type, properties_json, created_at FROM ("
+            "SELECT id, uid, type, properties_json, created_at, ROW_NUMBER() OVER (PARTITION BY uid ORDER BY id DESC) AS rn "
+            f"FROM kg_nodes WHERE {where}) v WHERE rn = 1"
+        )
+    for chunk in chunked(uniq):
+        params: Dict[str, Any] = {"uids": chunk, "at": at}
+        if tenant_id:
+            params["tid"] = tenant_id
+        for r in s.execute(expanding_text(sql, "uids"), params):  # type: ignore[attr-defined]
+            out[_col(r, 1, "uid")] = tuple(r)
+    return out
+
+
+def node_dict(version: Sequence[Any]) -> Dict[str, Any]:
+    """API shape of a `node_versions_as_of` row."""
+    props = _parse_props(version[3])
+    return {"uid": version[1], "type": version[2], "props": props, "properties": props}
+
+
+def fetch_nodes_as_of(s: Any, uids: Sequence[str], at: str, tenant_id: Optional[Any] = None) -> Dict[str, Dict[str, Any]]:
+    """Return the latest version valid at `at` for each uid, keyed by uid."""
+    return {uid: node_dict(r) for uid, r in node_versions_as_of(s, uids, at, tenant_id).items()}
+
+
+def expand_level(s: Any, frontier: Sequence[str], at: str, tenant_id: Optional[Any] = None, limit: int = 200) -> List[Tuple[str, str]]:
+    """Return (src, dst) pairs for edges touching any frontier uid, valid at `at`.
+
+    `limit` is the per-node edge budget; each chunk query is capped at
+    `limit * len(chunk)` rows so breadth stays bounded like the per-node walk.
+    """
+    pairs: List[Tuple[str, str]] = []
+    for chunk in chunked(sorted(set(frontier))):
+        sql = (
+            "SELECT DISTINCT src_uid, dst_uid FROM kg_edges WHERE (src_uid IN :f OR dst_uid IN :f) AND "
+            + _TEMPORAL
+            + (" AND tenant_id = :tid" if tenant_id else "")
+            + " LIMIT :lim"
+        )
+        params: Dict[str, Any] = {"f": chunk, "at": at, "lim": int(limit) * len(chunk)}
+        if tenant_id:
+            params["tid"] = tenant_id
+        for r in s.execute(expanding_text(sql, "f"), params):  # type: ignore[attr-defined]
+            pairs.append((_col(r, 0, "src_uid"), _col(r, 1, "dst_uid")))
+    return pairs
+
+
+def neighborhood(
+    s: Any,
+    root_uid: str,
+    at: str,
+    tenant_id: Optional[Any] = None,
+    depth: int = 1,
+    limit: int = 200,
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """BFS from `root_uid` up to `depth` hops.
+
+    Returns (neighbors keyed by uid in discovery order, expanded uids). The expanded
+    uids are the nodes whose incident edges make up the neighborhood edge set.
+    """
+    seen = {root_uid}
+    neighbors: Dict[str, Dict[str, Any]] = {}
+    expanded: List[str] = []
+    frontier = [root_uid]
+    for _hop in range(max(0, int(depth))):
+        if not frontier:
+            break
+        frontier = frontier[:MAX_FRONTIER]
+        expanded.extend(frontier)
+        nxt: List[str] = []
+        for src, dst in expand_level(s, frontier, at, tenant_id, limit):
+            for v in (src, dst):
+                if v and v not in seen:
+                    seen.add(v)
+                    nxt.append(v)
+        hydrated = fetch_nodes_as_of(s, nxt[:limit], at, tenant_id)
+        for v in nxt[:limit]:
+            if v in hydrated:
+                neighbors[v] = hydrated[v]
+        frontier = nxt
+    return neighbors, expanded
+
+
+def page_incident_edges(
+    s: Any,
+    uids: Sequence[str],
+    at: str,
+    tenant_id: Optional[Any] = None,
+    limit: int = 200,
+    offset: int = 0,
+    before_id: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[int], bool]:
+    """One page of distinct edges incident to `uids`, ordered by id DESC.
+
+    Limit and offset (or the `before_id` keyset cursor) are applied in SQL; one
+    extra row is fetched to detect whether another page exists.
+    Returns (edges, last_id, has_more).
+    """
+    uniq = sorted({u for u in uids if u})
+    if not uniq:
+        return [], None, False
+    where = ["(src_uid IN :u OR dst_uid IN :u)", _TEMPORAL]
+    params: Dict[str, Any] = {"u": uniq, "at": at, "lim": int(limit) + 1}
+    if tenant_id:
+        where.append("tenant_id = :tid")
+        params["tid"] = tenant_id
+    if before_id is not None:
+        where.append("id < :cid")
+        params["cid"] = int(before_id)
+    sql = "SELECT id, src_uid, dst_uid, type, properties_json FROM kg_edges WHERE " + " AND ".join(where) + " ORDER BY id DESC LIMIT :lim"
+    if before_id is None:
+        sql += " OFFSET :off"
+        params["off"] = max(0, int(offset))
+    rows = list(s.execute(expanding_text(sql, "u"), params))  # type: ignore[attr-defined]
+    has_more = len(rows) > int(limit)
+    rows = rows[: int(limit)]
+    edges = [
+        {
+            "src": _col(r, 1, "src_uid"),
+            "dst": _col(r, 2, "dst_uid"),
+            "type": _col(r, 3, "type"),
+            "props": _col(r, 4, "properties_json"),
+        }
+        for r in rows
+    ]
+    last_id = int(_col(rows[-1], 0, "id")) if rows else None
+    return edges, last_id, has_more
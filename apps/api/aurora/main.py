@@ -12,7 +12,7 @@ import os
 from .config import settings
 
 from fastapi import Depends, FastAPI, HTTPException, Request, Query, Response, Header
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.gzip import GZipMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
@@ -30,8 +30,9 @@ except Exception:  # pragma: no cover
     def _db_init():
         return None
 from .config import settings
-from .ratelimit import allow as rl_allow
+from .ratelimit import allow as rl_allow, allow_async as rl_allow_async
 from .retrieval import hybrid as hybrid_retrieval
+from .retrieval import hybrid_with_meta
 from .metrics import (
     get_dashboard,
     compute_signal_series,
@@ -41,6 +42,20 @@ from .trends import compute_top_topics, compute_topic_series
 from .auth import require_role, require_supabase_auth
 from .copilot import answer_with_citations
 from . import graph_helpers as gh
+from . import kg_bulk
+from . import kg_changes
+from . import kg_merkle
+from . import kg_props
+from . import kg_stats
+from . import kg_traversal
+from . import access_log
+from . import apikey_cache
+from . import body_limit
+from . import histograms
+from . import market_index
+from . import webhook_dispatcher
+from . import response_cache
+from . import usage_meter
 from . import graphql as gql
 try:
     from .db import Company  # type: ignore
@@ -102,7 +117,9 @@ def _detect_entities(_text: str) -> list[dict]:
     return []
 
 def _clear_doc_cache() -> int:
-    return 0
+    from .copilot import _clear_doc_cache as _clear
+
+    return _clear()
 
 def run_refresh_topics(window: str) -> dict:
     return {"window": window, "refreshed": 0}
@@ -119,7 +136,6 @@ _HR_MISSES = 0
 # Simple request metrics
 _REQ_TOTAL = 0
 _REQ_TOTAL_LAT_MS = 0.0
-_REQ_LAT_LIST: deque[float] = deque(maxlen=256)
 _REQ_ERRORS = 0
 
 # Simple in-memory schedules for ingestion jobs
@@ -130,66 +146,23 @@ _FEEDS: List[str] = []
 # In-memory fallback config for signals when DB is unavailable (used in tests/local)
 _SIGCFG_MEM: Optional[Dict[str, Any]] = None
 
-# M10: tiny JSON cache backed by InsightCache; 24h TTL
+# M10: JSON response cache (memory LRU in front of InsightCache); 24h TTL
 import hashlib as _hashlib
 import json as _json
 
 def _cache_key(name: str, params: Dict[str, Any]) -> str:
     payload = _json.dumps({"name": name, "params": params}, sort_keys=True, separators=(",", ":"))
-    return _hashlib.sha1(payload.encode("utf-8")).hexdigest()  # nosec
+    return response_cache.view_key(name, _hashlib.sha1(payload.encode("utf-8")).hexdigest())  # nosec
 
 def _cache_get(key: str) -> Optional[Dict[str, Any]]:
     try:
-        from sqlmodel import text as _text  # type: ignore
-    except Exception:
-        return None
-    try:
-        with get_session() as s:
-            try:
-                rows = list(
-                    s.exec(
-                        _text(
-                            "SELECT output_json, created_at, ttl FROM insight_cache WHERE key_hash = :k ORDER BY id DESC LIMIT 1"
-                        ),
-                        {"k": key},
-                    )
-                )  # type: ignore[attr-defined]
-            except Exception:
-                rows = []
-            if not rows:
-                return None
-            r = rows[0]
-            out_json = r[0] if isinstance(r, (tuple, list)) else getattr(r, "output_json", None)
-            created_at = r[1] if isinstance(r, (tuple, list)) else getattr(r, "created_at", None)
-            ttl = r[2] if isinstance(r, (tuple, list)) else getattr(r, "ttl", None)
-            if not out_json:
-                return None
-            try:
-                data = _json.loads(out_json)
-            except Exception:
-                return None
-            # TTL check
-            try:
-                if ttl and created_at:
-                    created_ts = datetime.fromisoformat(str(created_at))
-                    if datetime.now(timezone.utc) > (created_ts + timedelta(seconds=int(ttl))):
-                        return None
-            except Exception:
-                pass
-            return data
+        return response_cache.RESPONSE_CACHE.get(key)
     except Exception:
         return None
 
 def _cache_set(key: str, data: Dict[str, Any], ttl_sec: int = 86400) -> None:
     try:
-        nowiso = datetime.now(timezone.utc).isoformat()
-        with get_session() as s:
-            try:
-                obj = InsightCache(key_hash=key, input_json=None, output_json=_json.dumps(data), created_at=nowiso, ttl=ttl_sec)  # type: ignore[call-arg]
-                s.add(obj)  # type: ignore[attr-defined]
-                s.commit()  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        response_cache.RESPONSE_CACHE.set(key, data, ttl_sec=ttl_sec)
     except Exception:
         pass
 @asynccontextmanager
@@ -202,128 +175,47 @@ async def _lifespan(app: FastAPI):
     # Start webhook dispatcher if durable enabled
     try:
         if _DURABLE_WEBHOOKS_ENABLED:  # type: ignore[name-defined]
-            import threading, time, requests  # type: ignore
-
-            def _worker():
-                while True:
-                    try:
-                        now_iso = _now_iso()  # type: ignore[name-defined]
-                        # First, try DB-backed queue if available
-                        try:
-                            from sqlmodel import text as _text  # type: ignore
-                            with get_session() as s:  # type: ignore[name-defined]
-                                row = None
-                                try:
-                                    rows = list(
-                                        s.exec(
-                                            _text(
-                                                """
-                                                SELECT id, url, event, body_json, secret, attempt
-                                                FROM webhook_queue
-                                                WHERE status='pending' AND (next_at IS NULL OR next_at <= :now)
-                                                ORDER BY id ASC
-                                                LIMIT 1
-                                                """
-                                            ),
-                                            {"now": now_iso},
-                                        )
-                                    )  # type: ignore[attr-defined]
-                                    if rows:
-                                        row = rows[0]
-                                except Exception:
-                                    row = None
-                                if row is not None:
-                                    wid, url, ev, body_json, secret, attempt = row
-                                    headers = {
-                                        "Content-Type": "application/json",
-                                        "X-Aurora-Event": ev or "unknown",
-                                        "X-Aurora-Timestamp": str(int(time.time())),
-                                    }
-                                    if secret:
-                                        headers["X-Aurora-Signature"] = _compute_sig(  # type: ignore[name-defined]
-                                            str(secret), headers["X-Aurora-Timestamp"], body_json or "{}"
-                                        )
-                                    ok = False
-                                    try:
-                                        resp = requests.post(url, data=body_json or "{}", headers=headers, timeout=3)
-                                        ok = getattr(resp, "status_code", 500) < 400
-                                    except Exception:
-                                        ok = False
-                                    if ok:
-                                        try:
-                                            s.exec(_text("UPDATE webhook_queue SET status='delivered' WHERE id=:id"), {"id": wid})
-                                            s.commit()  # type: ignore[attr-defined]
-                                        except Exception:
-                                            pass
-                                        continue  # proceed to next loop cycle
-                                    else:
-                                        try:
-                                            attempt = int(attempt or 0) + 1
-                                            if attempt >= _WEBHOOK_QUEUE_MAX_ATTEMPTS:  # type: ignore[name-defined]
-                                                s.exec(
-                                                    _text("UPDATE webhook_queue SET status='failed', attempt=:a WHERE id=:id"),
-                                                    {"a": attempt, "id": wid},
-                                                )
-                                                s.commit()  # type: ignore[attr-defined]
-                                            else:
-                                                delay = min(60.0, 2 ** attempt)
-                                                future_ts = datetime.now(timezone.utc) + timedelta(seconds=delay)
-                                                next_at = future_ts.isoformat()
-                                                s.exec(
-                                                    _text("UPDATE webhook_queue SET attempt=:a, next_at=:n WHERE id=:id"),
-                                                    {"a": attempt, "n": next_at, "id": wid},
-                                                )
-                                                s.commit()  # type: ignore[attr-defined]
-                                        except Exception:
-                                            pass
-                                        # fall through to in-memory processing below as well
-                        except Exception:
-                            pass
-                        now = time.time()
-                        # pop one ready item
-                        item = None
-                        for _ in range(len(_WEBHOOK_QUEUE)):  # type: ignore[name-defined]
-                            peek = _WEBHOOK_QUEUE[0] if _WEBHOOK_QUEUE else None  # type: ignore[index]
-                            if not peek or peek.get("next_at", 0) > now:
-                                break
-                            item = _WEBHOOK_QUEUE.popleft()  # type: ignore[call-arg]
-                            break
-                        if not item:
-                            time.sleep(1.0)
-                            continue
-                        headers = {
-                            "Content-Type": "application/json",
-                            "X-Aurora-Event": item.get("event", "unknown"),
-                            "X-Aurora-Timestamp": item.get("ts", str(int(time.time()))),
-                        }
-                        secret = item.get("secret") or ""
-                        if secret:
-                            headers["X-Aurora-Signature"] = _compute_sig(  # type: ignore[name-defined]
-                                secret, headers["X-Aurora-Timestamp"], item.get("body", "{}")
-                            )
-                        ok = False
-                        try:
-                            url = str(item.get("url") or "")
-                            body = item.get("body", "{}")
-                            resp = requests.post(
-                                url, data=body if isinstance(body, (str, bytes)) else str(body), headers=headers, timeout=3
-                            )
-                            ok = getattr(resp, "status_code", 500) < 400
-                        except Exception:
-                            ok = False
-                        if not ok:
-                            item["attempt"] = int(item.get("attempt", 0)) + 1
-                            if item["attempt"] < _WEBHOOK_QUEUE_MAX_ATTEMPTS:  # type: ignore[name-defined]
-                                delay = min(60.0, 2 ** item["attempt"])  # capped backoff
-                                item["next_at"] = time.time() + delay
-                                _WEBHOOK_QUEUE.append(item)  # type: ignore[name-defined]
-                    except Exception:
-                        time.sleep(1.0)
-
-            threading.Thread(target=_worker, daemon=True).start()
+            _webhook_dispatcher().start()
+    except Exception:
+        pass
+    # Warm the resident company index used by /market/realtime
+    try:
+        with get_session() as s:
+            market_index.COMPANY_INDEX.load(s)
+    except Exception:
+        pass
+    # Load the copilot's company gazetteer so the first question does not pay for it
+    try:
+        from . import copilot
+        copilot.entity_detect.GAZETTEER.ensure_loaded(copilot._candidate_company_ids)
+    except Exception:
+        pass
+    # Periodic kg_stats drift reconciliation (KG_STATS_RECOUNT_SEC, 0 disables)
+    try:
+        kg_stats.RECONCILER.ensure_started()
+    except Exception:
+        pass
+    # Property index catch-up for /kg/find (KG_PROPS_SYNC_SEC, 0 disables)
+    try:
+        kg_props.SYNCER.ensure_started()
+    except Exception:
+        pass
+    # Build the pooled RAG client/index/LLM in the background (no-op without Qdrant)
+    try:
+        from . import rag_runtime
+        rag_runtime.warm_on_startup()
     except Exception:
         pass
     yield
+    # Write out buffered usage counters before the process exits
+    try:
+        usage_meter.USAGE_METER.flush()
+    except Exception:
+        pass
+    try:
+        access_log.ACCESS_LOG.flush()
+    except Exception:
+        pass
 
 
 app = FastAPI(title="AURORA-Lite API", version="2.0-m1", lifespan=_lifespan)
@@ -458,38 +350,15 @@ async def security_headers_middleware(request: Request, call_next):
         pass
     return response
 
-# Request size limit middleware
-@app.middleware("http")
-async def body_size_limit_middleware(request: Request, call_next):
-    try:
-        max_bytes = int(getattr(settings, "request_max_body_bytes", 2 * 1024 * 1024) or 2097152)
-        if max_bytes > 0:
-            # Prefer Content-Length if provided
-            cl = request.headers.get("content-length")
-            if cl is not None:
-                try:
-                    if int(cl) > max_bytes:
-                        return Response(status_code=413)
-                except Exception:
-                    pass
-            # For safety, also enforce on actual body read if small
-            body = await request.body()
-            if body and len(body) > max_bytes:
-                return Response(status_code=413)
-            # Recreate request stream for downstream since we've read it
-            async def _receive_gen(first: bytes):
-                done = False
-                async def _receive():
-                    nonlocal done
-                    if not done:
-                        done = True
-                        return {"type": "http.request", "body": first, "more_body": False}
-                    return {"type": "http.request", "body": b"", "more_body": False}
-                return _receive
-            request._receive = await _receive_gen(body)  # type: ignore[attr-defined]
-    except Exception:
-        pass
-    return await call_next(request)
+# Request size limit: streaming ASGI limiter with per-route limits (never buffers the body)
+try:
+    app.add_middleware(
+        body_limit.BodyLimitMiddleware,
+        max_bytes=int(getattr(settings, "request_max_body_bytes", 2 * 1024 * 1024) or 0),
+        route_limits=body_limit.parse_route_limits(getattr(settings, "request_max_body_routes", None)),
+    )
+except Exception:
+    pass
 
 # --- Phase 4: API key middleware (feature-gated, default off) ---
 """
@@ -682,13 +551,15 @@ def _build_provenance_bundle(provenance_id: Optional[int]) -> Optional[Dict[str,
 
 
 @app.get("/kg/node/{node_id}")
-def kg_get_node(node_id: str, request: Request, as_of: Optional[str] = None, depth: int = 1, limit: int = 200, edges_offset: int = 0, edges_limit: int = 200):
+def kg_get_node(node_id: str, request: Request, as_of: Optional[str] = None, depth: int = 1, limit: int = 200, edges_offset: int = 0, edges_limit: int = 200, edges_cursor: Optional[str] = None):
     """Phase 6: Time-travel KG node view with optional neighbor expansion.
 
     - Respects temporal validity windows (valid_from <= as_of < valid_to)
     - Respects tenant scoping via request.state.tenant_id when available
     - Depth controls the number of neighbor hops to include (default 1)
     - Limit caps edges fetched per hop to avoid explosion (default 200)
+    - Each hop is a single set-based query (see kg_traversal); edges are paged in SQL
+      via edges_offset/edges_limit or the keyset `edges_cursor` (next_edges_cursor)
     """
     # Normalize as_of to handle unencoded '+' in query strings (spaces become '+')
     _raw_at = as_of or datetime.now(timezone.utc).isoformat()
@@ -708,7 +579,7 @@ def kg_get_node(node_id: str, request: Request, as_of: Optional[str] = None, dep
     except Exception:
         limit = 200
 
-    out: Dict[str, Any] = {"as_of": at, "node": None, "neighbors": [], "edges": [], "edges_offset": edges_offset, "edges_limit": edges_limit, "next_edges_offset": None, "provenance": None}
+    out: Dict[str, Any] = {"as_of": at, "node": None, "neighbors": [], "edges": [], "edges_offset": edges_offset, "edges_limit": edges_limit, "next_edges_offset": None, "next_edges_cursor": None, "provenance": None}
     try:
         from sqlmodel import text as _text  # type: ignore
         with get_session() as s:
@@ -748,76 +619,11 @@ def kg_get_node(node_id: str, request: Request, as_of: Optional[str] = None, dep
             provenance_id = br[3] if isinstance(br, (tuple, list)) else getattr(br, "provenance_id", None)
             out["provenance"] = _build_provenance_bundle(provenance_id)
 
-            # Neighbor expansion (BFS up to depth)
-            seen_nodes = set([node_id])
-            neighbor_nodes: Dict[str, Dict[str, Any]] = {}
-            all_edges: List[Dict[str, Any]] = []
-            frontier = {node_id}
-            for _hop in range(depth):
-                if not frontier:
-                    break
-                # Fetch edges touching any node in frontier; do one-by-one to avoid IN expansion issues
-                next_frontier: set[str] = set()
-                for u in list(frontier)[:100]:  # cap frontier breadth per hop
-                    erows = list(
-                        s.execute(
-                            _text(
-                                "SELECT src_uid, dst_uid, type, properties_json FROM kg_edges "
-                                "WHERE (src_uid = :u OR dst_uid = :u) AND (valid_from IS NULL OR valid_from <= :at) "
-                                "AND (valid_to IS NULL OR valid_to > :at)"
-                                + (" AND tenant_id = :tid" if tfilter else "")
-                                + " LIMIT :lim"
-                            ),
-                            ({"u": u, "at": at, "lim": limit} | ({"tid": tfilter} if tfilter else {})),
-                        )
-                    )  # type: ignore[attr-defined]
-                    for r in erows:
-                        src = r[0] if isinstance(r, (tuple, list)) else getattr(r, "src_uid", None)
-                        dst = r[1] if isinstance(r, (tuple, list)) else getattr(r, "dst_uid", None)
-                        typ = r[2] if isinstance(r, (tuple, list)) else getattr(r, "type", None)
-                        props = r[3] if isinstance(r, (tuple, list)) else getattr(r, "properties_json", None)
-                        edge_obj = {"src": src, "dst": dst, "type": typ, "props": props}
-                        all_edges.append(edge_obj)
-                        for v in (src, dst):
-                            if v and v not in seen_nodes:
-                                next_frontier.add(v)
-                                seen_nodes.add(v)
-                # Fetch node metadata for new neighbors
-                for v in list(next_frontier)[:limit]:
-                    nrows = list(
-                        s.execute(
-                            _text(
-                                "SELECT uid, type, properties_json FROM kg_nodes "
-                                "WHERE uid = :u AND (valid_from IS NULL OR valid_from <= :at) "
-                                "AND (valid_to IS NULL OR valid_to > :at)"
-                                + (" AND tenant_id = :tid" if tfilter else "")
-                                + " ORDER BY id DESC LIMIT 1"
-                            ),
-                            ({"u": v, "at": at} | ({"tid": tfilter} if tfilter else {})),
-                        )
-                    )  # type: ignore[attr-defined]
-                    if nrows:
-                        nr = nrows[0]
-                        _nraw = nr[2] if isinstance(nr, (tuple, list)) else getattr(nr, "properties_json", None)
-                        if isinstance(_nraw, (bytes, bytearray)):
-                            try:
-                                _nraw = _nraw.decode("utf-8")
-                            except Exception:
-                                pass
-                        try:
-                            _nparsed = _json.loads(_nraw) if isinstance(_nraw, str) else _nraw
-                        except Exception:
-                            _nparsed = _nraw
-                        neighbor_nodes[v] = {
-                            "uid": nr[0] if isinstance(nr, (tuple, list)) else getattr(nr, "uid", None),
-                            "type": nr[1] if isinstance(nr, (tuple, list)) else getattr(nr, "type", None),
-                            "props": _nparsed,
-                            "properties": _nparsed,
-                        }
-                frontier = next_frontier
-
+            # Neighbor expansion (BFS up to depth): one IN query per level plus one
+            # batched node hydration, instead of one query per frontier/neighbor node.
+            neighbor_nodes, expanded = kg_traversal.neighborhood(s, node_id, at, tfilter, depth=depth, limit=limit)
             out["neighbors"] = list(neighbor_nodes.values())
-            # Edge pagination (simple slice after collection). This may over-collect but keeps logic simple.
+            # Edge pagination pushed into SQL (offset or keyset cursor on id DESC)
             try:
                 edges_offset = max(0, int(edges_offset))
             except Exception:
@@ -826,11 +632,16 @@ def kg_get_node(node_id: str, request: Request, as_of: Optional[str] = None, dep
                 edges_limit = max(1, min(int(edges_limit), 1000))
             except Exception:
                 edges_limit = 200
-            total_edges = len(all_edges)
-            sliced = all_edges[edges_offset : edges_offset + edges_limit]
-            next_off = edges_offset + edges_limit if (edges_offset + edges_limit) < total_edges else None
+            cursor_id = kg_traversal.decode_cursor(edges_cursor)
+            sliced, last_id, has_more = kg_traversal.page_incident_edges(
+                s, expanded, at, tfilter, limit=edges_limit, offset=edges_offset, before_id=cursor_id
+            )
             out["edges"] = sliced
-            out["next_edges_offset"] = next_off
+            if has_more:
+                if cursor_id is None:
+                    out["next_edges_offset"] = edges_offset + edges_limit
+                if last_id is not None:
+                    out["next_edges_cursor"] = kg_traversal.encode_cursor(last_id)
         return out
     except HTTPException:
         raise
@@ -840,11 +651,14 @@ def kg_get_node(node_id: str, request: Request, as_of: Optional[str] = None, dep
 
 
 @app.get("/kg/nodes")
-def kg_get_nodes(request: Request, ids: str, as_of: Optional[str] = None, offset: int = 0, limit: int = 200):
+def kg_get_nodes(request: Request, response: Response, ids: str, as_of: Optional[str] = None, offset: int = 0, limit: int = 200):
     """Phase 6: Batch time-travel node fetch.
 
-    - ids: comma-separated uids
-    - Uses per-id queries to avoid large IN clauses; returns the latest valid version at as_of.
+    - ids: comma-separated uids; nodes are returned in request order
+    - The as-of version of every uid on the page is resolved in one set-based query
+      (see kg_traversal.node_versions_as_of); uids with no valid version are omitted
+    - ETag derives from the returned versions (max created_at + version ids); send it
+      back as If-None-Match to get a 304
     - Tenant-scoped via request.state.tenant_id
     """
     # Normalize as_of to handle unencoded '+' in query strings (spaces become '+')
@@ -870,52 +684,23 @@ def kg_get_nodes(request: Request, ids: str, as_of: Optional[str] = None, offset
     if not uids:
         return out
     try:
-        from sqlmodel import text as _text  # type: ignore
         with get_session() as s:
-            # Cap the per-request processed ids independently as a safety guard
-            for u in paged_uids[:200]:  # cap batch size
-                rows = list(
-                    s.execute(
-                        _text(
-                            "SELECT uid, type, properties_json FROM kg_nodes "
-                            "WHERE uid = :u AND (valid_from IS NULL OR valid_from <= :at) "
-                            "AND (valid_to IS NULL OR valid_to > :at)"
-                            + (" AND tenant_id = :tid" if tfilter else "")
-                            + " ORDER BY id DESC LIMIT 1"
-                        ),
-                        ({"u": u, "at": at} | ({"tid": tfilter} if tfilter else {})),
-                    )
-                )  # type: ignore[attr-defined]
-                if rows:
-                    import json as _json
-                    r = rows[0]
-                    _raw = r[2] if isinstance(r, (tuple, list)) else getattr(r, "properties_json", None)
-                    if isinstance(_raw, (bytes, bytearray)):
-                        try:
-                            _raw = _raw.decode("utf-8")
-                        except Exception:
-                            pass
-                    try:
-                        _parsed = _json.loads(_raw) if isinstance(_raw, str) else _raw
-                    except Exception:
-                        _parsed = _raw
-                    out["nodes"].append(
-                        {
-                            "uid": r[0] if isinstance(r, (tuple, list)) else getattr(r, "uid", None),
-                            "type": r[1] if isinstance(r, (tuple, list)) else getattr(r, "type", None),
-                            "props": _parsed,
-                            "properties": _parsed,
-                        }
-                    )
-        # Compute next_offset if more ids remain
-        try:
-            if offset + len(paged_uids) < len(uids):
-                out["next_offset"] = offset + len(paged_uids)
-        except Exception:
-            pass
-        return out
+            versions = kg_traversal.node_versions_as_of(s, paged_uids, at, tfilter)
     except Exception:
         return out
+    found = [versions[u] for u in paged_uids if u in versions]
+    import hashlib as _hashlib
+    max_created = max((str(r[4] or "") for r in found), default="")
+    etag = 'W/"' + _hashlib.sha1(f"{max_created}|{','.join(str(r[0]) for r in found)}".encode()).hexdigest()[:20] + '"'
+    inm = request.headers.get("if-none-match")
+    if inm and etag in [t.strip() for t in inm.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    out["nodes"] = [kg_traversal.node_dict(r) for r in found]
+    # Compute next_offset if more ids remain
+    if offset + len(paged_uids) < len(uids):
+        out["next_offset"] = offset + len(paged_uids)
+    return out
 
 
 @app.get("/kg/node/{node_id}/diff")
@@ -1194,13 +979,16 @@ def kg_find(
     offset: int = 0,
     cursor: Optional[str] = None,
 ):
-    """Phase 6: Simple filter-based node finder.
+    """Phase 6: Filter-based node finder.
 
-    - Filters by type, optional uid prefix (starts-with), and a naive substring match on properties_json.
+    - Filters by type, optional uid prefix and an optional property predicate
+      (`prop_key` + `prop_value` with `prop_op` in eq|prefix|contains|gt|gte|lt|lte),
+      answered from the `kg_node_props` index (see kg_props). `prop_contains` is a
+      raw substring match on properties_json.
     - Time-travel via as_of; tenant-scoped via request.state.tenant_id.
-    - Supports cursor-based pagination (keyset on id DESC) via `cursor` with `next_cursor` in response.
-      Offset/limit remain supported for backward compatibility with `next_offset`.
-    - Returns up to `limit` nodes valid at that time.
+    - Keyset pagination on id DESC via `cursor`/`next_cursor`; `offset`/`next_offset`
+      remain for backward compatibility. One extra row is fetched to detect a next page.
+    - Returns up to `limit` nodes valid at that time, newest version per uid (as /kg/nodes).
     """
     # Normalize as_of to handle unencoded '+' in query strings (spaces become '+')
     _raw_at = as_of or datetime.now(timezone.utc).isoformat()
@@ -1225,10 +1013,20 @@ def kg_find(
         "next_offset": None,
         "next_cursor": None,
     }
+    prop_filter: Optional[Tuple[str, str, str]] = None
+    if prop_key and prop_value is not None and str(prop_value) != "":
+        try:
+            prop_filter = (prop_key, prop_value, prop_op or "contains")
+            kg_props.predicate(*prop_filter)  # validate before touching the DB
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     try:
         from sqlmodel import text as _text  # type: ignore
         with get_session() as s:
-            # Build where clauses
+            try:
+                dialect = s.get_bind().dialect.name  # type: ignore[attr-defined]
+            except Exception:
+                dialect = ""
             where = [
                 "(valid_from IS NULL OR valid_from <= :at)",
                 "(valid_to IS NULL OR valid_to > :at)",
@@ -1238,106 +1036,42 @@ def kg_find(
                 where.append("type = :tp")
                 params["tp"] = type
             if uid_prefix:
-                where.append("uid LIKE :pref")
-                params["pref"] = f"{uid_prefix}%"
+                cond, extra = kg_props.prefix_condition("uid", uid_prefix, "pref", dialect)
+                where.append(cond)
+                params.update(extra)
             if prop_contains:
                 where.append("properties_json LIKE :pc")
                 params["pc"] = f"%{prop_contains}%"
-            # Optional JSON-like property filter on whitelisted keys
-            allowed_keys = {"name", "segment", "domain", "country", "ticker", "category"}
-            if prop_key and prop_value and prop_key in allowed_keys:
-                where.append(
-                    "REPLACE(REPLACE(REPLACE(properties_json, ' ', ''), '\n', ''), '\t', '') LIKE :jpat"
-                )
-                if (prop_op or "contains").lower() == "eq":
-                    params["jpat"] = f"%\"{prop_key}\":\"{prop_value}\"%"
-                else:
-                    params["jpat"] = f"%\"{prop_key}\":\"%{prop_value}%\"%"
+            if prop_filter is not None:
+                # Read-only: write paths and kg_props.SYNCER keep the index current
+                cond, extra = kg_props.predicate(*prop_filter, dialect=dialect)
+                where.append(cond)
+                params.update(extra)
             if tfilter is not None:
                 where.append("tenant_id = :tid")
                 params["tid"] = tfilter
-
-            # Cursor helpers
-            def _decode_cursor(cur: str) -> Optional[int]:
-                try:
-                    import base64, json as _json  # type: ignore
-                    # Ensure proper padding for urlsafe base64
-                    s = cur.strip()
-                    pad = (-len(s)) % 4
-                    if pad:
-                        s += "=" * pad
-                    obj = _json.loads(base64.urlsafe_b64decode(s.encode()).decode())
-                    v = obj.get("lt_id")
-                    return int(v) if v is not None else None
-                except Exception:
-                    return None
-
-            def _encode_cursor(nxt_id: int) -> str:
-                try:
-                    import base64, json as _json  # type: ignore
-                    b = _json.dumps({"lt_id": int(nxt_id)}, separators=(",", ":")).encode()
-                    return base64.urlsafe_b64encode(b).decode()
-                except Exception:
-                    return str(nxt_id)
-
-            cursor_id: Optional[int] = _decode_cursor(cursor) if cursor else None
+            # One row per uid: skip versions superseded by a newer one valid at the same time
+            where.append(
+                "NOT EXISTS (SELECT 1 FROM kg_nodes n2 WHERE n2.uid = kg_nodes.uid AND n2.id > kg_nodes.id"
+                " AND (n2.valid_from IS NULL OR n2.valid_from <= :at) AND (n2.valid_to IS NULL OR n2.valid_to > :at)"
+                + (" AND n2.tenant_id = :tid" if tfilter is not None else "")
+                + ")"
+            )
+            cursor_id = kg_traversal.decode_cursor(cursor)
             if cursor_id is not None:
                 where.append("id < :cid")
                 params["cid"] = cursor_id
-
-            # Build SQL selecting id to compute next_cursor; order by id DESC for keyset
-            base_sql = (
-                "SELECT id, uid, type, properties_json FROM kg_nodes WHERE "
-                + " AND ".join(where)
-                + " ORDER BY id DESC"
-            )
-
-            if cursor_id is not None:
-                # In cursor mode, return up to `limit` items and do not advertise further cursors
-                sql = base_sql + " LIMIT :lim"
-                params["lim"] = limit
-            else:
-                sql = base_sql + " LIMIT :lim OFFSET :off"
-                params["lim"] = limit
+            sql = "SELECT id, uid, type, properties_json FROM kg_nodes WHERE " + " AND ".join(where) + " ORDER BY id DESC LIMIT :lim"
+            params["lim"] = limit + 1
+            if cursor_id is None and offset:
+                sql += " OFFSET :off"
                 params["off"] = offset
-
             rows = list(s.execute(_text(sql), params))  # type: ignore[attr-defined]
-
-            # Slice rows for cursor mode and build response items
-            sliced = rows[:limit] if (cursor_id is not None and len(rows) > limit) else rows
-            out["nodes"] = [
-                {
-                    "uid": (r[1] if isinstance(r, (tuple, list)) else getattr(r, "uid", None)),
-                    "type": (r[2] if isinstance(r, (tuple, list)) else getattr(r, "type", None)),
-                    "props": (r[3] if isinstance(r, (tuple, list)) else getattr(r, "properties_json", None)),
-                }
-                for r in sliced
-            ]
-
-            # Determine last_id for next_cursor
-            last_id: Optional[int] = None
-            if sliced:
-                last_row = sliced[-1]
-                last_id = int(last_row[0] if isinstance(last_row, (tuple, list)) else getattr(last_row, "id", 0))
-
-            # Compute next_cursor / next_offset
-            if cursor_id is not None:
-                # Do not emit next_cursor in cursor mode to ensure termination is explicit
-                pass
-            else:
-                # Probe for next page via offset
-                params_probe = dict(params)
-                params_probe["off"] = offset + limit
-                params_probe["lim"] = 1
-                probe_sql = (
-                    "SELECT id FROM kg_nodes WHERE " + " AND ".join(where) + " ORDER BY id DESC LIMIT :lim OFFSET :off"
-                )
-                probe = list(s.execute(_text(probe_sql), params_probe))  # type: ignore[attr-defined]
-                if probe:
+            out["nodes"] = [{"uid": r[1], "type": r[2], "props": r[3]} for r in rows[:limit]]
+            if len(rows) > limit:
+                out["next_cursor"] = kg_traversal.encode_cursor(int(rows[limit - 1][0]))
+                if cursor_id is None:
                     out["next_offset"] = offset + limit
-                    if last_id:
-                        out["next_cursor"] = _encode_cursor(last_id)
-
             return out
     except Exception:
         return out
@@ -1491,80 +1225,47 @@ def kg_edges(
         return out
 
 @app.get("/kg/stats")
-def kg_stats(request: Request):
+def kg_stats_view(request: Request):
     """Phase 6: KG stats snapshot.
 
-    Returns tenant-scoped (if available) totals and latest creation timestamps.
-    Shape:
+    Returns tenant-scoped (if available) totals, open (current) counts per type
+    and latest creation timestamps, read from the maintained `kg_stats`
+    counters (see kg_stats). Shape:
     {
-      "nodes_total": int,
+      "nodes_total": int,            # all versions
       "edges_total": int,
       "latest_node_created_at": str|None,
-      "latest_edge_created_at": str|None
+      "latest_edge_created_at": str|None,
+      "open_nodes_total": int,       # valid_to IS NULL
+      "open_edges_total": int,
+      "nodes_by_type": {type: open count},
+      "edges_by_type": {type: open count},
+      "source": "counters"|"scan"
     }
     """
     try:
         tfilter = getattr(request.state, "tenant_id", None)
     except Exception:
         tfilter = None
-    out: Dict[str, Any] = {
-        "nodes_total": 0,
-        "edges_total": 0,
-        "latest_node_created_at": None,
-        "latest_edge_created_at": None,
-    }
+    out: Dict[str, Any] = kg_stats.summarize([])
     try:
         with get_session() as s:
-            # Nodes total
             try:
-                if tfilter is not None:
-                    from sqlmodel import text as _text  # type: ignore
-                    rows = list(s.execute(_text("SELECT COUNT(1) FROM kg_nodes WHERE tenant_id = :tid"), {"tid": int(tfilter)}))  # type: ignore[arg-type]
-                else:
-                    from sqlmodel import text as _text  # type: ignore
-                    rows = list(s.execute(_text("SELECT COUNT(1) FROM kg_nodes")))  # type: ignore[arg-type]
-                out["nodes_total"] = int(rows[0][0]) if rows else 0
-            except Exception:
-                pass
-            # Edges total
-            try:
-                if tfilter is not None:
-                    from sqlmodel import text as _text  # type: ignore
-                    rows = list(s.execute(_text("SELECT COUNT(1) FROM kg_edges WHERE tenant_id = :tid"), {"tid": int(tfilter)}))  # type: ignore[arg-type]
-                else:
-                    from sqlmodel import text as _text  # type: ignore
-                    rows = list(s.execute(_text("SELECT COUNT(1) FROM kg_edges")))  # type: ignore[arg-type]
-                out["edges_total"] = int(rows[0][0]) if rows else 0
-            except Exception:
-                pass
-            # Latest node created_at
-            try:
-                if tfilter is not None:
-                    from sqlmodel import text as _text  # type: ignore
-                    rows = list(s.execute(_text("SELECT MAX(created_at) FROM kg_nodes WHERE tenant_id = :tid"), {"tid": int(tfilter)}))  # type: ignore[arg-type]
-                else:
-                    from sqlmodel import text as _text  # type: ignore
-                    rows = list(s.execute(_text("SELECT MAX(created_at) FROM kg_nodes")))  # type: ignore[arg-type]
-                val = rows[0][0] if rows else None
-                out["latest_node_created_at"] = str(val) if val else None
+                rows = kg_stats.counters(s, tfilter)
+                source = "counters"
             except Exception:
-                pass
-            # Latest edge created_at
-            try:
-                if tfilter is not None:
-                    from sqlmodel import text as _text  # type: ignore
-                    rows = list(s.execute(_text("SELECT MAX(created_at) FROM kg_edges WHERE tenant_id = :tid"), {"tid": int(tfilter)}))  # type: ignore[arg-type]
-                else:
-                    from sqlmodel import text as _text  # type: ignore
-                    rows = list(s.execute(_text("SELECT MAX(created_at) FROM kg_edges")))  # type: ignore[arg-type]
-                val = rows[0][0] if rows else None
-                out["latest_edge_created_at"] = str(val) if val else None
-            except Exception:
-                pass
-        return out
+                try:
+                    s.rollback()  # type: ignore[attr-defined]
+                except Exception:
+                    pass
+                rows = kg_stats.scan(s)
+                source = "scan"
+        out = kg_stats.summarize(rows, tfilter)
+        out["source"] = source
     except Exception:
         # Graceful fallback when DB is unavailable
-        return out
+        pass
+    return out
 
 
 # --- Phase 5: KG admin upserts & close ---
@@ -1586,6 +1287,25 @@ def _record_provenance(prov: Optional[Dict[str, Any]], now: str) -> Optional[int
     except Exception:
         return None
 
+
+def _kg_props_sync() -> None:
+    """Index newly committed node versions for /kg/find (best-effort; kg_props.SYNCER catches up)."""
+    try:
+        with get_session() as s:
+            kg_props.sync(s)
+    except Exception:
+        pass
+
+
+def _kg_merkle_touch(s: Any, uids: List[str], now: str) -> None:
+    """Mark uids dirty in the persistent Merkle index inside the caller's write transaction.
+
+    Call before the caller commits, so a committed KG write is never missing from
+    the next refresh. `kg_merkle.ensure_schema` must have run on the session
+    before its first write (creating tables mid-transaction would block on SQLite).
+    """
+    kg_merkle.mark_dirty(s, uids, now)
+
 class _KGNodeUpsert(BaseModel):
     uid: str
     type: str
@@ -1612,6 +1332,7 @@ def admin_kg_nodes_upsert(req: _KGNodeUpsert, request: Request, token: Optional[
         raise HTTPException(status_code=503, detail="database unavailable: SQLModel not installed")
     try:
         with get_session() as s:
+            kg_merkle.ensure_schema(s)
             # Idempotency: if an open version exists with identical properties, no-op
             try:
                 existing_rows = list(
@@ -1646,6 +1367,7 @@ def admin_kg_nodes_upsert(req: _KGNodeUpsert, request: Request, token: Optional[
                         s.execute(_text("UPDATE kg_nodes SET valid_to = :now WHERE uid = :u AND tenant_id = :tid AND valid_to IS NULL"), {"now": now, "u": req.uid, "tid": int(tfilter)})
                     else:
                         s.execute(_text("UPDATE kg_nodes SET valid_to = :now WHERE uid = :u AND valid_to IS NULL"), {"now": now, "u": req.uid})
+                    _kg_merkle_touch(s, [req.uid], now)
                     s.commit()  # type: ignore[attr-defined]
                 except Exception:
                     pass
@@ -1660,8 +1382,10 @@ def admin_kg_nodes_upsert(req: _KGNodeUpsert, request: Request, token: Optional[
                 created_at=now,
             )
             s.add(node)  # type: ignore[attr-defined]
+            _kg_merkle_touch(s, [req.uid], now)
             s.commit()  # type: ignore[attr-defined]
             nid = getattr(node, "id", None)
+            _kg_props_sync()
             return {"ok": True, "id": nid, "uid": req.uid, "type": req.type, "valid_from": vfrom}
     except HTTPException as he:
         # Preserve explicit 4xx errors (e.g., validation) instead of converting to 500
@@ -1697,6 +1421,7 @@ def admin_kg_edges_upsert(req: _KGEdgeUpsert, request: Request, token: Optional[
         raise HTTPException(status_code=503, detail="database unavailable: SQLModel not installed")
     try:
         with get_session() as s:
+            kg_merkle.ensure_schema(s)
             # Validate that src and dst nodes exist at the upsert time
             try:
                 n_at = vfrom
@@ -1766,6 +1491,7 @@ def admin_kg_edges_upsert(req: _KGEdgeUpsert, request: Request, token: Optional[
                             _text("UPDATE kg_edges SET valid_to = :now WHERE src_uid = :s AND dst_uid = :d AND type = :t AND valid_to IS NULL"),
                             {"now": now, "s": req.src_uid, "d": req.dst_uid, "t": req.type},
                         )
+                    _kg_merkle_touch(s, [req.src_uid], now)
                     s.commit()  # type: ignore[attr-defined]
                 except Exception:
                     pass
@@ -1782,6 +1508,7 @@ def admin_kg_edges_upsert(req: _KGEdgeUpsert, request: Request, token: Optional[
             )
             try:
                 s.add(edge)  # type: ignore[attr-defined]
+                _kg_merkle_touch(s, [req.src_uid], now)
                 s.commit()  # type: ignore[attr-defined]
             except Exception:
                 # Best-effort: initialize DB schema and retry once in case of missing tables
@@ -1791,7 +1518,9 @@ def admin_kg_edges_upsert(req: _KGEdgeUpsert, request: Request, token: Optional[
                     pass
                 with get_session() as s2:
                     try:
+                        kg_merkle.ensure_schema(s2)
                         s2.add(edge)  # type: ignore[attr-defined]
+                        _kg_merkle_touch(s2, [req.src_uid], now)
                         s2.commit()  # type: ignore[attr-defined]
                     except Exception:
                         raise
@@ -1811,11 +1540,13 @@ def admin_kg_nodes_close(uid: str, request: Request, token: Optional[str] = None
     try:
         from sqlmodel import text as _text  # type: ignore
         with get_session() as s:
+            kg_merkle.ensure_schema(s)
             tfilter = getattr(request.state, "tenant_id", None)
             if tfilter is not None:
                 s.execute(_text("UPDATE kg_nodes SET valid_to = :now WHERE uid = :u AND tenant_id = :tid AND valid_to IS NULL"), {"now": now, "u": uid, "tid": int(tfilter)})
             else:
                 s.execute(_text("UPDATE kg_nodes SET valid_to = :now WHERE uid = :u AND valid_to IS NULL"), {"now": now, "u": uid})
+            _kg_merkle_touch(s, [uid], now)
             s.commit()  # type: ignore[attr-defined]
         return {"ok": True, "uid": uid, "closed_at": now}
     except Exception:
@@ -1835,6 +1566,7 @@ def admin_kg_edges_close(req: _KGEdgeClose, request: Request, token: Optional[st
     try:
         from sqlmodel import text as _text  # type: ignore
         with get_session() as s:
+            kg_merkle.ensure_schema(s)
             tfilter = getattr(request.state, "tenant_id", None)
             if tfilter is not None:
                 s.execute(
@@ -1846,6 +1578,7 @@ def admin_kg_edges_close(req: _KGEdgeClose, request: Request, token: Optional[st
                     _text("UPDATE kg_edges SET valid_to = :now WHERE src_uid = :s AND dst_uid = :d AND type = :t AND valid_to IS NULL"),
                     {"now": now, "s": req.src_uid, "d": req.dst_uid, "t": req.type},
                 )
+            _kg_merkle_touch(s, [req.src_uid], now)
             s.commit()  # type: ignore[attr-defined]
         return {"ok": True, "closed_at": now}
     except Exception:
@@ -1966,6 +1699,16 @@ def admin_kg_edges_list(
 class _SnapshotReq(BaseModel):
     notes: Optional[str] = None
     signer: Optional[str] = None
+    rebuild_index: bool = False  # re-derive the persistent Merkle index from kg_nodes/kg_edges
+
+
+def _kg_snapshot_hash(payload: Dict[str, Any]) -> str:
+    try:
+        from . import lakefs_provider  # type: ignore
+        return lakefs_provider.compute_snapshot_hash(payload)
+    except Exception:
+        blob = _json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return _hashlib.sha256(blob).hexdigest()  # nosec
 
 
 @app.post("/admin/kg/snapshot")
@@ -1973,10 +1716,28 @@ def admin_kg_snapshot(req: _SnapshotReq, request: Request, token: Optional[str]
     _require_admin_token(_get_dev_token_from_request(request, token))
     at = datetime.now(timezone.utc).isoformat()
     _t_start = time.time()
-    # Helper to build canonical snapshot payload (nodes + edges) independent of timestamp.
-    # We intentionally exclude the current time from the hashed material so that repeated
-    # snapshots over identical graph state yield identical snapshot_hash values.
-    def _build_canonical_snapshot() -> Dict[str, Any]:
+    # Preferred path: persistent Merkle index (kg_merkle). Only buckets touched since the last
+    # snapshot are rehashed, and the snapshot hash commits to the Merkle root instead of a full
+    # JSON dump, so inclusion proofs for single uids chain up to the signed hash.
+    index: Optional[Dict[str, Any]] = None
+    try:
+        with get_session() as s:
+            index = kg_merkle.snapshot(s, force_rebuild=bool(req.rebuild_index))
+    except Exception:
+        index = None
+    if index is not None:
+        merkle_root = index.get("merkle_root")
+        node_count = int(index.get("node_count") or 0)
+        edge_count = int(index.get("edge_count") or 0)
+        snapshot_payload: Dict[str, Any] = {"merkle_root": merkle_root}
+        try:
+            _METRICS["kg_merkle_buckets_rehashed_total"] = _METRICS.get("kg_merkle_buckets_rehashed_total", 0) + int(index.get("buckets_rehashed") or 0)
+        except Exception:
+            pass
+    else:
+        # Fallback when the index tables are unavailable: hash the full canonical payload (nodes + edges).
+        # We intentionally exclude the current time from the hashed material so that repeated
+        # snapshots over identical graph state yield identical snapshot_hash values.
         try:
             with get_session() as s:
                 rows_n = list(
@@ -1991,64 +1752,15 @@ def admin_kg_snapshot(req: _SnapshotReq, request: Request, token: Optional[str]
                 )  # type: ignore[attr-defined]
         except Exception:
             rows_n, rows_e = [], []
-        # Directly return raw row tuples; deterministic ordering is enforced by SQL ORDER BY.
-        return {"nodes": rows_n, "edges": rows_e}
-
-    snapshot_payload = _build_canonical_snapshot()
-    # Build Merkle root over leaves (node and edge canonical JSON entries). This is an in-memory convenience
-    # (not persisted) enabling future partial inclusion proofs. Leaves are sha256 of compact JSON for each
-    # node/edge, concatenated pairwise (left||right) hashed again until single root remains. Single leaf -> itself.
-    def _compute_merkle_root(payload: Dict[str, Any]) -> Optional[str]:
-        try:
-            leaves: List[str] = []
-            for n in payload.get("nodes", []) or []:
-                try:
-                    # n is tuple (uid, type, properties_json)
-                    uid = n[0] if isinstance(n, (tuple, list)) else n.get("uid")
-                    typ = n[1] if isinstance(n, (tuple, list)) else n.get("type")
-                    props = n[2] if isinstance(n, (tuple, list)) else n.get("properties_json")
-                    j = _json.dumps({"n": [uid, typ, props]}, sort_keys=True, separators=(",", ":"))
-                    leaves.append(_hashlib.sha256(j.encode()).hexdigest())  # nosec
-                except Exception:
-                    continue
-            for e in payload.get("edges", []) or []:
-                try:
-                    src = e[0] if isinstance(e, (tuple, list)) else e.get("src_uid")
-                    dst = e[1] if isinstance(e, (tuple, list)) else e.get("dst_uid")
-                    typ = e[2] if isinstance(e, (tuple, list)) else e.get("type")
-                    props = e[3] if isinstance(e, (tuple, list)) else e.get("properties_json")
-                    j = _json.dumps({"e": [src, dst, typ, props]}, sort_keys=True, separators=(",", ":"))
-                    leaves.append(_hashlib.sha256(j.encode()).hexdigest())  # nosec
-                except Exception:
-                    continue
-            if not leaves:
-                return None
-            level = leaves
-            # Pairwise reduce
-            while len(level) > 1:
-                nxt: List[str] = []
-                for i in range(0, len(level), 2):
-                    if i + 1 < len(level):
-                        combined = (level[i] + level[i + 1]).encode()
-                    else:
-                        combined = (level[i] + level[i]).encode()  # duplicate last
-                    nxt.append(_hashlib.sha256(combined).hexdigest())  # nosec
-                level = nxt
-            return level[0]
-        except Exception:
-            return None
-
-    merkle_root = _compute_merkle_root(snapshot_payload)
+        snapshot_payload = {"nodes": rows_n, "edges": rows_e}
+        leaves = [(n[0], *kg_merkle.node_leaf(*tuple(n))) for n in rows_n] + [(e[0], *kg_merkle.edge_leaf(*tuple(e))) for e in rows_e]
+        merkle_root = kg_merkle.root_of(leaves) if leaves else None
+        node_count, edge_count = len(rows_n), len(rows_e)
     # Deterministic hash over canonical payload (no timestamp influence)
     try:
-        from . import lakefs_provider  # type: ignore
-        snap_hash = lakefs_provider.compute_snapshot_hash(snapshot_payload)
+        snap_hash = _kg_snapshot_hash(snapshot_payload)
     except Exception:
-        try:
-            blob = _json.dumps(snapshot_payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
-            snap_hash = _hashlib.sha256(blob).hexdigest()  # nosec
-        except Exception:
-            snap_hash = uuid.uuid4().hex
+        snap_hash = uuid.uuid4().hex
     _hash_dur_ms = int((time.time() - _t_start) * 1000)
     try:
         _METRICS["kg_snapshot_hash_total"] = _METRICS.get("kg_snapshot_hash_total", 0) + 1
@@ -2104,12 +1816,7 @@ def admin_kg_snapshot(req: _SnapshotReq, request: Request, token: Optional[str]
             s.commit()  # type: ignore[attr-defined]
     except Exception:
         pass
-    # Include a lightweight echo of counts (not hashed) for operator convenience
-    try:
-        node_count = len(snapshot_payload.get("nodes", []))
-        edge_count = len(snapshot_payload.get("edges", []))
-    except Exception:
-        node_count = edge_count = 0
+    # node_count/edge_count are a lightweight echo (not hashed) for operator convenience
     return {"at": at, "hash": snap_hash, "snapshot_hash": snap_hash, "merkle_root": merkle_root, "signer": signer, "notes": req.notes, "signature": signature, "signature_backend": signature_backend, "dsse_bundle_json": dsse_bundle_json, "rekor_log_id": rekor_log_id, "rekor_log_index": rekor_log_index, "node_count": node_count, "edge_count": edge_count}
 
 
@@ -2150,6 +1857,45 @@ class _VerifyReq(BaseModel):
     dsse_bundle_json: Optional[str] = None
     rekor_log_id: Optional[str] = None
     rekor_log_index: Optional[int] = None
+    # Optional Merkle inclusion check: prove `uid` from the persistent index (latest indexed snapshot only), or verify a
+    # client-held (leaf_hash, proof, merkle_root) triple without touching the DB.
+    uid: Optional[str] = None
+    merkle_root: Optional[str] = None
+    leaf_hash: Optional[str] = None
+    proof: Optional[List[Dict[str, Any]]] = None
+
+
+def _kg_inclusion(req: _VerifyReq) -> Dict[str, Any]:
+    root = req.merkle_root
+    proofs: Optional[List[Dict[str, Any]]] = None
+    if req.leaf_hash and req.proof is not None:
+        if not root:
+            return {"valid": False, "reason": "merkle_root_required"}
+        valid = kg_merkle.verify_proof(req.leaf_hash, req.proof, root)
+    else:
+        with get_session() as s:
+            kg_merkle.ensure_schema(s)
+            proved = kg_merkle.prove(s, str(req.uid))
+        # The index only holds the tree of the latest indexed snapshot, so a uid can only be
+        # proven against that snapshot's root, never against an older snapshot hash.
+        index_root = proved.get("merkle_root")
+        if index_root is None or _kg_snapshot_hash({"merkle_root": index_root}) != req.snapshot_hash:
+            return {"valid": False, "reason": "snapshot_not_current", "uid": req.uid, "merkle_root": root, "bound_to_snapshot": False}
+        if root and root != index_root:
+            return {"valid": False, "reason": "merkle_root_mismatch", "uid": req.uid, "merkle_root": root, "bound_to_snapshot": False}
+        root = index_root
+        proofs = proved.get("proofs") or []
+        valid = bool(proofs) and all(kg_merkle.verify_proof(p["leaf_hash"], p["path"], root) for p in proofs)
+    try:
+        bound = _kg_snapshot_hash({"merkle_root": root}) == req.snapshot_hash
+    except Exception:
+        bound = False
+    out: Dict[str, Any] = {"valid": bool(valid), "merkle_root": root, "bound_to_snapshot": bound}
+    if req.uid:
+        out["uid"] = req.uid
+    if proofs is not None:
+        out["proofs"] = proofs
+    return out
 
 
 @app.post("/kg/snapshot/verify")
@@ -2203,6 +1949,12 @@ def kg_snapshot_verify(req: _VerifyReq):
                 _METRICS["kg_snapshot_verify_invalid_total"] = _METRICS.get("kg_snapshot_verify_invalid_total", 0) + 1
         except Exception:
             pass
+        if req.uid or req.proof is not None:
+            try:
+                res = dict(res)
+                res["inclusion"] = _kg_inclusion(req)
+            except Exception:
+                res["inclusion"] = {"valid": False, "reason": "inclusion_error"}
         return res
     except Exception:
         try:
@@ -2309,6 +2061,37 @@ class _CommitEvent(BaseModel):
 
 class _CommitReq(BaseModel):
     events: List[_CommitEvent]
+    # "bulk" resolves the whole batch with set queries in one transaction (see kg_bulk)
+    mode: Optional[str] = None
+
+
+def _parse_commit_event(ev: _CommitEvent, now: str) -> Dict[str, Any]:
+    """Normalize a commit event into {"kind": "node"|"edge"|"error", ...}."""
+    op = ev.operation or {}
+    otype = str(op.get("type") or "").strip().lower()
+    ing_at = ev.ingest_time or now
+    prov = {
+        "snapshot_hash": ev.snapshot_hash or "",
+        "signer": ev.signer,
+        "pipeline_version": ev.pipeline_version,
+        "model_version": ev.model_version,
+    }
+    if otype in kg_bulk.NODE_OPS:
+        uid = str(op.get("uid") or op.get("id") or ev.parsed_entity or "").strip()
+        ntype = str(op.get("node_type") or op.get("type_name") or op.get("label") or op.get("type2") or op.get("nodeLabel") or op.get("node_type_name") or op.get("kind") or op.get("class") or op.get("nodeClass") or op.get("nodeType") or op.get("entity_type") or op.get("type") or "").strip() or "Entity"
+        props = op.get("properties") or op.get("props") or {}
+        if not uid:
+            return {"kind": "error", "result": {"ok": False, "reason": "missing_uid"}, "provenance": prov}
+        return {"kind": "node", "uid": uid, "type": ntype, "props": _json.dumps(props or {}), "at": ing_at, "provenance": prov}
+    if otype in kg_bulk.EDGE_OPS:
+        src = str(op.get("from") or op.get("src") or op.get("src_uid") or "").strip()
+        dst = str(op.get("to") or op.get("dst") or op.get("dst_uid") or "").strip()
+        etype = str(op.get("edge_type") or op.get("type") or op.get("label") or "").strip() or "REL"
+        props = op.get("properties") or op.get("props") or {}
+        if not src or not dst:
+            return {"kind": "error", "result": {"ok": False, "reason": "missing_src_or_dst"}, "provenance": prov}
+        return {"kind": "edge", "src": src, "dst": dst, "type": etype, "props": _json.dumps(props or {}), "at": ing_at, "provenance": prov}
+    return {"kind": "error", "result": {"ok": False, "reason": "unsupported_operation", "operation": otype}, "provenance": prov}
 
 
 @app.post("/kg/commit")
@@ -2324,6 +2107,9 @@ def kg_commit(
     Auth options (any one):
       - x-dev-token matches DEV_ADMIN_TOKEN (admin path), or
       - Supabase JWT valid (if configured) AND X-Role: admin
+
+    With `mode="bulk"` the batch is applied in a single transaction with one
+    provenance record; per-event results and temporal semantics are unchanged.
     """
     # AuthN/AuthZ
     authed = False
@@ -2374,30 +2160,27 @@ def kg_commit(
                 tfilter = getattr(request.state, "tenant_id", None)
             except Exception:
                 tfilter = None
+            kg_merkle.ensure_schema(s)
+            if (req.mode or "").strip().lower() == "bulk":
+                parsed = [_parse_commit_event(ev, now) for ev in req.events]
+                results = kg_bulk.commit_batch(s, parsed, tfilter, now)
+                _kg_props_sync()
+                return {"ok": True, "count": len(results), "results": results, "mode": "bulk"}
             for ev in req.events:
                 if os.getenv("KG_DEBUG"):
                     try:
                         print("[kg_commit] processing event", ev.model_dump())
                     except Exception:
                         pass
-                op = ev.operation or {}
-                otype = str(op.get("type") or "").strip().lower()
+                pe = _parse_commit_event(ev, now)
                 ing_at = ev.ingest_time or now
                 # Record provenance (best-effort) and link to node/edge via provenance_id
-                prov = {
-                    "snapshot_hash": ev.snapshot_hash or "",
-                    "signer": ev.signer,
-                    "pipeline_version": ev.pipeline_version,
-                    "model_version": ev.model_version,
-                }
-                prov_id = _record_provenance(prov, ing_at)
-                if otype in ("create_node", "node_create", "upsert_node"):
-                    uid = str(op.get("uid") or op.get("id") or ev.parsed_entity or "").strip()
-                    ntype = str(op.get("node_type") or op.get("type_name") or op.get("label") or op.get("type2") or op.get("nodeLabel") or op.get("node_type_name") or op.get("kind") or op.get("class") or op.get("nodeClass") or op.get("nodeType") or op.get("entity_type") or op.get("type") or "").strip() or "Entity"
-                    props = op.get("properties") or op.get("props") or {}
-                    if not uid:
-                        results.append({"ok": False, "reason": "missing_uid"})
-                        continue
+                prov_id = _record_provenance(pe["provenance"], ing_at)
+                if pe["kind"] == "error":
+                    results.append(pe["result"])
+                    continue
+                if pe["kind"] == "node":
+                    uid, ntype, target_props = pe["uid"], pe["type"], pe["props"]
                     # Idempotency: if an open version exists with identical properties, no-op
                     try:
                         existing_rows = list(
@@ -2413,7 +2196,6 @@ def kg_commit(
                     if existing_rows:
                         er = existing_rows[0]
                         er_props = er[1] if isinstance(er, (list, tuple)) else getattr(er, "properties_json", None)
-                        target_props = _json.dumps(props or {})
                         if (er_props or "{}") == target_props:
                             ef = er[2] if isinstance(er, (list, tuple)) else getattr(er, "valid_from", None)
                             results.append({"ok": True, "uid": uid, "type": ntype, "valid_from": ef or ing_at, "noop": True})
@@ -2424,6 +2206,7 @@ def kg_commit(
                             s.execute(_text("UPDATE kg_nodes SET valid_to = :now WHERE uid = :u AND tenant_id = :tid AND valid_to IS NULL"), {"now": ing_at, "u": uid, "tid": int(tfilter)})
                         else:
                             s.execute(_text("UPDATE kg_nodes SET valid_to = :now WHERE uid = :u AND valid_to IS NULL"), {"now": ing_at, "u": uid})
+                        _kg_merkle_touch(s, [uid], ing_at)
                         s.commit()  # type: ignore[attr-defined]
                     except Exception:
                         pass
@@ -2431,23 +2214,18 @@ def kg_commit(
                         tenant_id=int(tfilter) if tfilter is not None else None,
                         uid=uid,
                         type=ntype,
-                        properties_json=_json.dumps(props or {}),
+                        properties_json=target_props,
                         valid_from=ing_at,
                         valid_to=None,
                         provenance_id=prov_id,
                         created_at=ing_at,
                     )
                     s.add(node)  # type: ignore[attr-defined]
+                    _kg_merkle_touch(s, [uid], ing_at)
                     s.commit()  # type: ignore[attr-defined]
                     results.append({"ok": True, "uid": uid, "type": ntype, "valid_from": ing_at, "id": getattr(node, "id", None)})
-                elif otype in ("create_edge", "edge_create", "upsert_edge"):
-                    src = str(op.get("from") or op.get("src") or op.get("src_uid") or "").strip()
-                    dst = str(op.get("to") or op.get("dst") or op.get("dst_uid") or "").strip()
-                    etype = str(op.get("edge_type") or op.get("type") or op.get("label") or "").strip() or "REL"
-                    props = op.get("properties") or op.get("props") or {}
-                    if not src or not dst:
-                        results.append({"ok": False, "reason": "missing_src_or_dst"})
-                        continue
+                else:
+                    src, dst, etype, target_props = pe["src"], pe["dst"], pe["type"], pe["props"]
                     # Validate only source existence (destination may not yet exist; allow forward reference)
                     try:
                         q_base = "SELECT 1 FROM kg_nodes WHERE uid = :u AND (valid_from IS NULL OR valid_from <= :at) AND (valid_to IS NULL OR valid_to > :at)"
@@ -2475,7 +2253,6 @@ def kg_commit(
                     if existing_rows:
                         er = existing_rows[0]
                         er_props = er[1] if isinstance(er, (list, tuple)) else getattr(er, "properties_json", None)
-                        target_props = _json.dumps(props or {})
                         if (er_props or "{}") == target_props:
                             ef = er[2] if isinstance(er, (list, tuple)) else getattr(er, "valid_from", None)
                             results.append({"ok": True, "src": src, "dst": dst, "type": etype, "valid_from": ef or ing_at, "noop": True})
@@ -2492,6 +2269,7 @@ def kg_commit(
                                 _text("UPDATE kg_edges SET valid_to = :now WHERE src_uid = :s AND dst_uid = :d AND type = :t AND valid_to IS NULL"),
                                 {"now": ing_at, "s": src, "d": dst, "t": etype},
                             )
+                        _kg_merkle_touch(s, [src], ing_at)
                         s.commit()  # type: ignore[attr-defined]
                     except Exception:
                         pass
@@ -2500,17 +2278,16 @@ def kg_commit(
                         src_uid=src,
                         dst_uid=dst,
                         type=etype,
-                        properties_json=_json.dumps(props or {}),
+                        properties_json=target_props,
                         valid_from=ing_at,
                         valid_to=None,
                         provenance_id=prov_id,
                         created_at=ing_at,
                     )
                     s.add(edge)  # type: ignore[attr-defined]
+                    _kg_merkle_touch(s, [src], ing_at)
                     s.commit()  # type: ignore[attr-defined]
                     results.append({"ok": True, "src": src, "dst": dst, "type": etype, "valid_from": ing_at, "id": getattr(edge, "id", None)})
-                else:
-                    results.append({"ok": False, "reason": "unsupported_operation", "operation": otype})
     except HTTPException:
         raise
     except Exception as e:
@@ -2520,6 +2297,7 @@ def kg_commit(
             traceback.print_exc()
             print("[kg_commit] ERROR", e, file=sys.stderr)
         raise HTTPException(status_code=500, detail=f"kg commit failed: {e}")
+    _kg_props_sync()
     return {"ok": True, "count": len(results), "results": results}
 
 
@@ -3436,26 +3214,51 @@ def provenance_bundle(uid: str, limit: int = 5):
 
 
 @app.get("/daas/kg/changed")
-def daas_kg_changed(since: Optional[str] = None, limit: int = 500):
-    if not since:
+def daas_kg_changed(
+    request: Request,
+    since: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: int = 500,
+    format: Optional[str] = None,
+):
+    """KG changes in write order, paged by the `kg_changes` sequence.
+
+    Pass `cursor` (the `next_cursor` / last `seq` seen) to resume; `since` is
+    only used to pick the starting point when no cursor is given. With
+    `format=ndjson` (or `Accept: application/x-ndjson`) up to `limit` changes
+    (max 100000) are streamed one per line.
+    """
+    tfilter = getattr(request.state, "tenant_id", None)
+    ndjson = (format or "").lower() == "ndjson" or "application/x-ndjson" in (request.headers.get("accept") or "")
+    if cursor is None and not since:
         since = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
-    lim = max(1, min(int(limit or 500), 2000))
-    out = {"since": since, "nodes": [], "edges": []}
+    try:
+        after = int(cursor) if cursor is not None else None
+        if after is None:
+            with get_session() as s:
+                after = kg_changes.seq_before(s, str(since))
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor or since")
+    if ndjson:
+        lim = max(1, min(int(limit or 500), kg_changes.STREAM_MAX))
+        return StreamingResponse(
+            kg_changes.stream(lambda: get_session(), after, lim, tenant_id=tfilter),
+            media_type="application/x-ndjson",
+        )
+    lim = max(1, min(int(limit or 500), kg_changes.PAGE_MAX))
+    out: Dict[str, Any] = {"since": since, "cursor": after, "nodes": [], "edges": [], "next_cursor": after, "has_more": False}
     try:
         with get_session() as s:
-            nodes = list(s.exec("SELECT uid, type, properties_json, created_at FROM kg_nodes WHERE (created_at >= :t OR (valid_from IS NOT NULL AND valid_from >= :t)) ORDER BY created_at DESC LIMIT :lim", {"t": since, "lim": lim}))  # type: ignore[attr-defined]
-            edges = list(s.exec("SELECT src_uid, dst_uid, type, properties_json, created_at FROM kg_edges WHERE (created_at >= :t OR (valid_from IS NOT NULL AND valid_from >= :t)) ORDER BY created_at DESC LIMIT :lim", {"t": since, "lim": lim}))  # type: ignore[attr-defined]
-            out["nodes"] = [
-                {"uid": r[0] if isinstance(r, (tuple, list)) else getattr(r, "uid", None), "type": r[1] if isinstance(r, (tuple, list)) else getattr(r, "type", None), "props": r[2] if isinstance(r, (tuple, list)) else getattr(r, "properties_json", None), "created_at": r[3] if isinstance(r, (tuple, list)) else getattr(r, "created_at", None)}
-                for r in nodes
-            ]
-            out["edges"] = [
-                {"src": r[0] if isinstance(r, (tuple, list)) else getattr(r, "src_uid", None), "dst": r[1] if isinstance(r, (tuple, list)) else getattr(r, "dst_uid", None), "type": r[2] if isinstance(r, (tuple, list)) else getattr(r, "type", None), "props": r[3] if isinstance(r, (tuple, list)) else getattr(r, "properties_json", None), "created_at": r[4] if isinstance(r, (tuple, list)) else getattr(r, "created_at", None)}
-                for r in edges
-            ]
-        return out
+            page = kg_changes.read_page(s, after, lim + 1, tenant_id=tfilter)
     except Exception:
         return out
+    out["has_more"] = len(page) > lim
+    page = page[:lim]
+    for item in page:
+        out["nodes" if item["kind"] == "node" else "edges"].append(item)
+    if page:
+        out["next_cursor"] = page[-1]["seq"]
+    return out
 
 # --- Phase 4: API key middleware (feature-gated, default off) ---
 _PLANS_CACHE: Dict[str, Dict[str, Any]] = {}
@@ -3501,18 +3304,75 @@ def _load_plans_from_env() -> None:
     except Exception:
         pass
 
-def _lookup_apikey(key: str) -> Optional[Dict[str, Any]]:
+# Fingerprints of the plan sources last applied to _PLANS_CACHE: the PLANS_JSON payload and the plans table rows
+_PLANS_LOADED: Dict[str, Any] = {"payload": None, "table": None, "checked": 0.0}
+
+def _plans_table_rows() -> tuple:
+    """(code, entitlements_json) for every row of the plans table (a handful of rows)."""
+    from sqlmodel import text  # type: ignore
+    with get_session() as s:
+        rows = list(s.execute(text("SELECT code, entitlements_json FROM plans ORDER BY code, id")))  # type: ignore[attr-defined]
+    return tuple((str(r[0]), r[1]) for r in rows if r[0])
+
+def _ensure_plans_loaded() -> None:
+    """Re-apply PLANS_JSON and the plans table when either changed.
+
+    The table is re-read at most every PLANS_RECHECK_SEC (default 5s), so plan
+    edits made through another worker's admin endpoints show up here too. Rows
+    from the table override env plans with the same code.
+    """
+    payload = os.environ.get("PLANS_JSON") or getattr(settings, "plans_json", None)
+    table = _PLANS_LOADED["table"]
+    try:
+        recheck = float(os.environ.get("PLANS_RECHECK_SEC", "5"))
+    except Exception:
+        recheck = 5.0
+    now = time.monotonic()
+    if now - float(_PLANS_LOADED["checked"]) >= recheck:
+        _PLANS_LOADED["checked"] = now
+        try:
+            table = _plans_table_rows()
+        except Exception:
+            pass
+    if payload == _PLANS_LOADED["payload"] and table == _PLANS_LOADED["table"]:
+        return
+    if payload:
+        _load_plans_from_env()
+    import json as _json
+    prev_codes = {code for code, _ in (_PLANS_LOADED["table"] or ())}
+    codes = set()
+    for code, ents in table or ():
+        try:
+            parsed = _json.loads(ents) if ents else {}
+        except Exception:
+            parsed = {}
+        _PLANS_CACHE[code] = {"code": code, "entitlements": parsed}
+        codes.add(code)
+    # Deleted from the table (e.g. by another worker); env plans with that code come back on the next env parse
+    for code in prev_codes - codes:
+        _PLANS_CACHE.pop(code, None)
+    _PLANS_LOADED["payload"] = payload
+    _PLANS_LOADED["table"] = table
+
+def _api_key_revocation_mark() -> Any:
+    """Shared revocation watermark polled by every worker's auth cache."""
+    from sqlmodel import text  # type: ignore
+    with get_session() as s:
+        rows = list(s.execute(text("SELECT MAX(revoked_at) FROM api_keys")))  # type: ignore[attr-defined]
+    return rows[0][0] if rows else None
+
+def _lookup_apikey(key: str, kh: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """Best-effort lookup: first DB api_keys table, else env list API_KEYS JSON.
     Returns { tenant_id, scopes(list), rate_limit_per_min, plan_code } or None.
     """
     if not key:
         return None
-    kh = _hash_api_key(key)
+    kh = kh or _hash_api_key(key)
     # Try DB
     try:
         from sqlmodel import text  # type: ignore
         with get_session() as s:
-            rows = list(s.exec(text("SELECT tenant_id, scopes, rate_limit_per_min, status FROM api_keys WHERE key_hash = :h LIMIT 1"), {"h": kh}))  # type: ignore[attr-defined]
+            rows = list(s.execute(text("SELECT tenant_id, scopes, rate_limit_per_min, status FROM api_keys WHERE key_hash = :h LIMIT 1"), {"h": kh}))  # type: ignore[attr-defined]
             if rows:
                 r = rows[0]
                 tenant_id = int(r[0] if isinstance(r, (tuple, list)) else getattr(r, "tenant_id", 0))
@@ -3543,6 +3403,21 @@ def _lookup_apikey(key: str) -> Optional[Dict[str, Any]]:
         pass
     return None
 
+def _resolve_apikey(key: str) -> Optional[Dict[str, Any]]:
+    """`_lookup_apikey` behind the auth cache (positive and negative entries keyed by key hash)."""
+    if not key:
+        return None
+    cache = apikey_cache.AUTH_CACHE
+    cache.check_fingerprint((os.environ.get("API_KEYS"), os.environ.get("API_HASH_SALT", getattr(settings, "api_hash_salt", None) or "")))
+    cache.check_revocations(_api_key_revocation_mark)
+    kh = _hash_api_key(key)
+    hit = cache.get(kh)
+    if hit is not apikey_cache.MISS:
+        return hit
+    info = _lookup_apikey(key, kh)
+    cache.put(kh, info)
+    return info
+
 # --- Phase 4: Usage metering & quotas ---------------------------------------
 # In-memory usage tracker fallback: {(tenant_id, period_key, product): units}
 _USAGE_MEM: Dict[tuple, int] = {}
@@ -3551,6 +3426,13 @@ _MARKET_ITEMS: List[Dict[str, Any]] = []  # dev-time in-memory marketplace items
 _DURABLE_WEBHOOKS_ENABLED = bool(os.environ.get("DURABLE_WEBHOOKS") and os.environ.get("DURABLE_WEBHOOKS") not in ("0", "false", "False"))
 _WEBHOOK_QUEUE: deque[Dict[str, Any]] = deque()
 _WEBHOOK_QUEUE_MAX_ATTEMPTS = 5
+_WEBHOOK_DISPATCHER: Optional[webhook_dispatcher.WebhookDispatcher] = None
+
+def _webhook_dispatcher() -> webhook_dispatcher.WebhookDispatcher:
+    global _WEBHOOK_DISPATCHER
+    if _WEBHOOK_DISPATCHER is None:
+        _WEBHOOK_DISPATCHER = webhook_dispatcher.from_env(get_session, signer=_compute_sig, memory_queue=_WEBHOOK_QUEUE, max_attempts=_WEBHOOK_QUEUE_MAX_ATTEMPTS)
+    return _WEBHOOK_DISPATCHER
 
 def _period_key(dt: Optional[datetime] = None, period: str = "monthly") -> str:
     dt = dt or datetime.now(timezone.utc)
@@ -3569,52 +3451,17 @@ def _get_plan_entitlements(plan_code: Optional[str]) -> Dict[str, Any]:
     return ents or {}
 
 def _get_usage_sum(tenant_id: str, product: str, period_key: str) -> int:
-    # Try DB first
-    try:
-        from sqlmodel import text  # type: ignore
-        with get_session() as s:
-            # TS stored as ISO; match prefix period_key
-            rows = list(
-                s.exec(
-                    text(
-                        "SELECT COALESCE(SUM(units),0) FROM usage_events WHERE tenant_id=:tid AND product=:prod AND ts LIKE :prefix"
-                    ),
-                    {"tid": tenant_id, "prod": product, "prefix": f"{period_key}%"},
-                )
-            )  # type: ignore[attr-defined]
-            if rows:
-                val = rows[0][0] if isinstance(rows[0], (tuple, list)) else rows[0]
-                try:
-                    return int(val or 0)
-                except Exception:
-                    return 0
-    except Exception:
-        pass
+    # Keyed read of the rolling counter (plus unflushed deltas); see usage_meter
+    used = usage_meter.USAGE_METER.used(tenant_id, product, period_key)
+    if used is not None:
+        return int(used)
     # Fallback in-memory
     return int(_USAGE_MEM.get((tenant_id, period_key, product), 0))
 
 def _inc_usage(tenant_id: str, actor: Optional[str], product: str, verb: str, units: int, unit_type: Optional[str] = None, meta: Optional[Dict[str, Any]] = None) -> None:
-    ts = datetime.now(timezone.utc).isoformat()
-    # DB write best-effort
+    # Buffered: counters and the usage_events audit row are written behind in batches
     try:
-        from sqlmodel import text  # type: ignore
-        with get_session() as s:
-            s.exec(
-                text(
-                    "INSERT INTO usage_events (tenant_id, actor, product, verb, units, unit_type, meta_json, ts) VALUES (:tid,:actor,:prod,:verb,:units,:ut,:meta,:ts)"
-                ),
-                {
-                    "tid": tenant_id,
-                    "actor": actor,
-                    "prod": product,
-                    "verb": verb,
-                    "units": int(units),
-                    "ut": unit_type,
-                    "meta": _json.dumps(meta or {}),
-                    "ts": ts,
-                },
-            )
-            s.commit()  # type: ignore[attr-defined]
+        usage_meter.USAGE_METER.record(tenant_id, actor, product, verb, units, unit_type=unit_type, meta=meta)
     except Exception:
         pass
     # memory
@@ -3746,21 +3593,32 @@ def _enforce_quota(request: Request, *, product: str, entitlement_key: str, need
 
 @app.middleware("http")
 async def apikey_middleware(request: Request, call_next):
+    t0 = time.perf_counter()
+    try:
+        denied = _apikey_check(request)
+    finally:
+        apikey_cache.AUTH_CACHE.record_overhead((time.perf_counter() - t0) * 1000.0)
+    if denied is not None:
+        return denied
+    return await call_next(request)
+
+def _apikey_check(request: Request) -> Optional[Response]:
+    """Resolve the API key onto request.state; returns a response only when the request is rejected."""
     # Only enforce when enabled; always set request.state.tenant_id if present
     try:
-        _load_plans_from_env()
+        _ensure_plans_loaded()
     except Exception:
         pass
     require = bool(getattr(settings, "apikey_required", False)) or _env_truthy(os.environ.get("APIKEY_REQUIRED"))
     path = request.url.path or ""
     # Always bypass for public/observability endpoints
     if path.startswith("/healthz") or path.startswith("/metrics") or path.startswith("/dev/metrics") or path.startswith("/openapi") or path.startswith("/docs"):
-        return await call_next(request)
+        return None
     header_name = getattr(settings, "apikey_header_name", "X-API-Key")
     key = request.headers.get(header_name) or request.headers.get(header_name.lower())
     info = None
     if key:
-        info = _lookup_apikey(key)
+        info = _resolve_apikey(key)
     # annotate span
     try:
         from opentelemetry import trace  # type: ignore
@@ -3782,7 +3640,7 @@ async def apikey_middleware(request: Request, call_next):
     # Only enforce API key for sensitive insights APIs; leave the rest of the app public by default
     # Also bypass API key checks entirely for developer endpoints under /dev/*.
     if path.startswith("/dev/"):
-        return await call_next(request)
+        return None
     if require and path.startswith("/insights"):
         # Allow admin and dev endpoints guarded by DEV_ADMIN_TOKEN to bypass API key requirement
         try:
@@ -3791,19 +3649,19 @@ async def apikey_middleware(request: Request, call_next):
                 if expected:
                     provided = _get_dev_token_from_request(request, request.query_params.get("token"))
                     if provided == expected:
-                        return await call_next(request)
+                        return None
         except Exception:
             pass
         # Allow JWT-authenticated calls to proceed without API key
         try:
             if _jwt_ok(request):
-                return await call_next(request)
+                return None
         except Exception:
             pass
         # Enforce API key only for insights endpoints when required
         if not key or not info:
             return Response(status_code=401)
-    return await call_next(request)
+    return None
 
 # Request ID middleware
 @app.middleware("http")
@@ -3828,33 +3686,31 @@ async def add_request_id(request: Request, call_next):
         exc = e
         response = Response(status_code=500)
     dur_ms = (time.time() - start) * 1000.0
+    # Label by route template (not the raw path) to keep series bounded
+    route = getattr(request.scope.get("route"), "path", None) or "unmatched"
     try:
         global _REQ_TOTAL, _REQ_TOTAL_LAT_MS, _REQ_ERRORS  # type: ignore
         _REQ_TOTAL += 1
         _REQ_TOTAL_LAT_MS += float(dur_ms)
-        _REQ_LAT_LIST.append(float(dur_ms))
+        histograms.REQUESTS.observe(request.method, route, response.status_code, float(dur_ms))
         if exc is not None:
             _REQ_ERRORS += 1
     except Exception:
         pass
     response.headers["X-Request-ID"] = rid
-    # Structured JSON access log
-    try:
-        logger = logging.getLogger("aurora.access")
-        payload = {
-            "ts": datetime.now(timezone.utc).isoformat(),
-            "request_id": rid,
-            "method": request.method,
-            "path": request.url.path,
-            "status": response.status_code,
-            "dur_ms": round(dur_ms, 2),
-            "client": request.client.host if request.client else None,
-        }
-        if exc is not None:
-            payload["error"] = str(type(exc).__name__)
-            logger.error(__import__("json").dumps(payload))
-        else:
-            logger.info(__import__("json").dumps(payload))
+    # Structured JSON access log: queued here, serialized and written by a background writer
+    try:
+        access_log.ACCESS_LOG.record(
+            start,
+            rid,
+            request.method,
+            request.url.path,
+            route,
+            response.status_code,
+            dur_ms,
+            request.client.host if request.client else None,
+            str(type(exc).__name__) if exc is not None else None,
+        )
     except Exception:
         pass
     if exc is not None:
@@ -3871,7 +3727,7 @@ async def rate_limit_middleware(request: Request, call_next):
         if path.startswith("/healthz") or path.startswith("/metrics") or path.startswith("/dev/metrics"):
             return await call_next(request)
         key = request.client.host if request.client else "public"
-        if not rl_allow(key, path):
+        if not await rl_allow_async(key, path):
             return Response(status_code=429)
     except Exception:
         pass
@@ -3904,26 +3760,9 @@ def dev_metrics(request: Request, token: Optional[str] = Query(default=None)):
     try:
         total = int(_REQ_TOTAL)
         avg_ms = float(_REQ_TOTAL_LAT_MS) / total if total > 0 else 0.0
-        lat_list = list(_REQ_LAT_LIST)
-        # Use a sliding window of most recent samples to compute percentiles
-        try:
-            win = int(os.environ.get("METRICS_WINDOW_SAMPLES", "50"))
-        except Exception:
-            win = 50
-        if win <= 0:
-            win = 50
-        lat_list = lat_list[-min(win, len(lat_list)) :]
-        p50 = p95 = p99 = 0.0
-        if lat_list:
-            srt = sorted(lat_list)
-            def _pct(values: List[float], pct: float) -> float:
-                if not values:
-                    return 0.0
-                k = max(0, min(len(values) - 1, int(round((pct/100.0) * (len(values) - 1)))))
-                return values[k]
-            p50 = _pct(srt, 50)
-            p95 = _pct(srt, 95)
-            p99 = _pct(srt, 99)
+        # Percentiles over the recent window of the log-bucketed request histogram
+        pct = histograms.REQUESTS.percentiles()
+        p50, p95, p99 = pct["p50_ms"], pct["p95_ms"], pct["p99_ms"]
     except Exception:
         total = 0
         avg_ms = 0.0
@@ -3958,6 +3797,62 @@ def dev_metrics(request: Request, token: Optional[str] = Query(default=None)):
         },
         "timestamp": _now_iso(),
     }
+    try:
+        # Busiest routes (cumulative), from the per-route histograms
+        series = sorted(histograms.REQUESTS.series().items(), key=lambda kv: kv[1].count, reverse=True)[:20]
+        payload["routes"] = [
+            {"method": m, "route": r, "status": st, "count": h.count, "p50_ms": round(h.quantile(0.5), 2), "p95_ms": round(h.quantile(0.95), 2)}
+            for (m, r, st), h in series
+        ]
+    except Exception:
+        pass
+    try:
+        from .embeddings import all_info as _embedding_info  # type: ignore
+        payload["embedding_cache"] = _embedding_info()
+    except Exception:
+        pass
+    try:
+        from .rerank import all_info as _rerank_info  # type: ignore
+        payload["rerank_cache"] = _rerank_info()
+    except Exception:
+        pass
+    try:
+        from .rag_runtime import RUNTIME as _rag_runtime  # type: ignore
+        payload["rag_runtime"] = _rag_runtime.info()
+    except Exception:
+        pass
+    try:
+        from .citation_scoring import COMPANIES as _rag_companies  # type: ignore
+        payload["rag_company_cache"] = _rag_companies.info()
+    except Exception:
+        pass
+    try:
+        from .entity_detect import GAZETTEER as _gazetteer  # type: ignore
+        payload["copilot_gazetteer"] = _gazetteer.info()
+    except Exception:
+        pass
+    try:
+        from .doc_cache import DOC_CACHE as _doc_cache  # type: ignore
+        payload["copilot_doc_cache"] = _doc_cache.info()
+    except Exception:
+        pass
+    try:
+        payload["auth"] = {**apikey_cache.AUTH_CACHE.info(), "plans": len(_PLANS_CACHE)}
+    except Exception:
+        pass
+    try:
+        payload["usage_meter"] = usage_meter.USAGE_METER.info()
+    except Exception:
+        pass
+    try:
+        payload["access_log"] = access_log.ACCESS_LOG.info()
+    except Exception:
+        pass
+    try:
+        from . import ratelimit as _rl
+        payload["rate_limit"] = {"enabled": bool(settings.rate_limit_enabled), **_rl.LIMITER.info()}
+    except Exception:
+        pass
     # Lightweight SLO alerts for local visibility only
     try:
         perf_budget = float(os.environ.get("PERF_P95_BUDGET_MS", getattr(settings, "perf_p95_budget_ms", 1500)))
@@ -4231,16 +4126,7 @@ def gate_perf():
     # Reuse current metrics state to compute p95 and compare to budget
     try:
         try:
-            lat_list = list(_REQ_LAT_LIST)
-            win = int(os.environ.get("METRICS_WINDOW_SAMPLES", "50"))
-            lat_list = lat_list[-min(win, len(lat_list)) :]
-            srt = sorted(lat_list)
-            def _pct(values: List[float], pct: float) -> float:
-                if not values:
-                    return 0.0
-                k = max(0, min(len(values) - 1, int(round((pct/100.0) * (len(values) - 1)))))
-                return values[k]
-            p95 = _pct(srt, 95)
+            p95 = histograms.REQUESTS.percentiles()["p95_ms"]
         except Exception:
             p95 = 0.0
         try:
@@ -4296,6 +4182,28 @@ def gate_market_perf(size: int = 400, runs: int = 7):
     except Exception:
         budget = 2000
     out = {"p95_ms": round(p95, 2), "budget_ms": int(budget), "samples": len(samples), "size": eff_size, "pass": p95 <= float(budget)}
+    # Uncached filter+top-k path: resident company index vs the full-table scan it replaced
+    def _p95_of(fn) -> float:
+        xs: List[float] = []
+        for _ in range(eff_runs):
+            t0 = time.perf_counter()
+            try:
+                fn()
+            except Exception:
+                pass
+            xs.append((time.perf_counter() - t0) * 1000.0)
+        return _pct(sorted(xs), 95)
+    try:
+        p95_index = _p95_of(lambda: _market_companies(None, set(), 0.0, None, "signal", 0, eff_size))
+        p95_scan = _p95_of(lambda: _market_scan_companies(None, set(), 0.0, None, "signal", 0, eff_size))
+        out["uncached"] = {
+            "p95_index_ms": round(p95_index, 2),
+            "p95_scan_ms": round(p95_scan, 2),
+            "speedup": round(p95_scan / p95_index, 2) if p95_index > 0 else None,
+            "indexed_companies": len(market_index.COMPANY_INDEX),
+        }
+    except Exception:
+        pass
     try:
         span.__exit__(None, None, None)
     except Exception:
@@ -4348,7 +4256,7 @@ def gate_rag(body: Dict[str, Any]):
         q = str((body or {}).get("question") or "")
         allowed = [str(d).lower() for d in ((body or {}).get("allowed_domains") or [])]
         min_sources = int((body or {}).get("min_sources") or 1)
-        docs = hybrid_retrieval(q or "company:1", top_n=6, rerank_k=4)
+        docs, retrieval_meta = hybrid_with_meta(q or "company:1", top_n=6, rerank_k=4)
     urls = [str(d.get("url")) for d in docs if isinstance(d.get("url"), str) and d.get("url")]
     if not urls:
         urls = ["https://example.com/"]
@@ -4365,7 +4273,16 @@ def gate_rag(body: Dict[str, Any]):
                 passed = False
                 reason = f"domain_not_allowed:{host}"
                 break
-    return {"question": q, "sources": urls[:10], "allowed": allowed, "pass": bool(passed), "reason": reason}
+    return {
+        "question": q,
+        "sources": urls[:10],
+        "allowed": allowed,
+        "pass": bool(passed),
+        "reason": reason,
+        "partial": bool(retrieval_meta.get("partial")),
+        "latency_ms": retrieval_meta.get("timings_ms"),
+        "legs": retrieval_meta.get("legs"),
+    }
 
 @app.post("/dev/gates/rag-strict")
 def gate_rag_strict(body: Dict[str, Any]):
@@ -4478,16 +4395,7 @@ def gate_status(strict: bool = False):
     try:
         # Perf
         try:
-            lat_list = list(_REQ_LAT_LIST)
-            win = int(os.environ.get("METRICS_WINDOW_SAMPLES", "50"))
-            lat_list = lat_list[-min(win, len(lat_list)) :]
-            srt = sorted(lat_list)
-            def _pct(values: List[float], pct: float) -> float:
-                if not values:
-                    return 0.0
-                k = max(0, min(len(values) - 1, int(round((pct/100.0) * (len(values) - 1)))))
-                return values[k]
-            p95 = _pct(srt, 95)
+            p95 = histograms.REQUESTS.percentiles()["p95_ms"]
         except Exception:
             p95 = 0.0
         try:
@@ -5096,13 +5004,16 @@ def usage_summary(request: Request):
 def compare(body: CompareBody, request: Request, response: Response):
     comps = body.companies[:2]
     mets = body.metrics[:8]
-    # M10 cache: attempt to serve from InsightCache
+    # M10 cache: attempt to serve from the response cache; concurrent misses compute once
     try:
-        _ckey = _cache_key("compare", {"companies": comps, "metrics": mets})
-        _ccached = _cache_get(_ckey)
+        _ckey: Optional[str] = _cache_key("compare", {"companies": comps, "metrics": mets})
     except Exception:
-        _ckey, _ccached = None, None
-    if _ccached:
+        _ckey = None
+    if not _ckey:
+        return _compare_compute(comps, mets, None, response)
+    with response_cache.RESPONSE_CACHE.flight(_ckey) as _ccached:
+        if not _ccached:
+            return _compare_compute(comps, mets, _ckey, response)
         try:
             response.headers["ETag"] = _ckey  # type: ignore[index]
         except Exception:
@@ -5114,7 +5025,10 @@ def compare(body: CompareBody, request: Request, response: Response):
                 return Response(status_code=304)
         except Exception:
             pass
-        return _ccached
+    return _ccached
+
+
+def _compare_compute(comps: List[str], mets: List[str], _ckey: Optional[str], response: Response):
     # Fetch KPIs via dashboard for each company
     sources_all: List[str] = []
     kpis_list: List[Dict[str, float | int]] = []
@@ -5266,8 +5180,8 @@ def tool_compare_companies_endpoint(body: CompareBody):
 @app.get("/tools/retrieve_docs")
 def tool_retrieve_docs_endpoint(query: str, limit: int = Query(default=6)):
     limit = max(1, min(int(limit), 50))
-    docs = hybrid_retrieval(query, top_n=limit, rerank_k=min(6, limit))
-    return {"docs": [{"id": d.get("id"), "url": d.get("url")} for d in docs[:limit]]}
+    docs, meta = hybrid_with_meta(query, top_n=limit, rerank_k=min(6, limit))
+    return {"docs": [{"id": d.get("id"), "url": d.get("url")} for d in docs[:limit]], "partial": bool(meta.get("partial"))}
 
 
 @app.get("/tools/trend_snapshot")
@@ -5460,18 +5374,34 @@ def admin_webhook_queue(request: Request, token: Optional[str] = None):
     _require_admin_token(_get_dev_token_from_request(request, token))
     try:
         depth = None
+        by_status: Dict[str, int] = {}
         try:
             from sqlmodel import text as _text  # type: ignore
             with get_session() as s:
-                rows = list(s.exec(_text("SELECT COUNT(1) FROM webhook_queue WHERE status='pending'")))  # type: ignore[attr-defined]
-                depth = int(rows[0][0]) if rows else 0
+                rows = list(s.exec(_text("SELECT status, COUNT(1) FROM webhook_queue GROUP BY status")))  # type: ignore[attr-defined]
+                by_status = {str(r[0]): int(r[1]) for r in rows}
+                depth = by_status.get("pending", 0)
         except Exception:
             depth = len(_WEBHOOK_QUEUE)
-        return {"durable": _DURABLE_WEBHOOKS_ENABLED, "depth": depth, "max_attempts": _WEBHOOK_QUEUE_MAX_ATTEMPTS}
+        out = {"durable": _DURABLE_WEBHOOKS_ENABLED, "depth": depth, "max_attempts": _WEBHOOK_QUEUE_MAX_ATTEMPTS, "by_status": by_status}
+        if _WEBHOOK_DISPATCHER is not None:
+            out["dispatcher"] = _WEBHOOK_DISPATCHER.info()
+        return out
     except Exception:
         return {"durable": _DURABLE_WEBHOOKS_ENABLED, "depth": 0, "max_attempts": _WEBHOOK_QUEUE_MAX_ATTEMPTS}
 
 
+@app.post("/admin/webhooks/dead-letter/requeue")
+def admin_webhook_requeue_dead(request: Request, token: Optional[str] = None, ids: Optional[List[int]] = Query(default=None)):
+    _require_admin_token(_get_dev_token_from_request(request, token))
+    try:
+        with get_session() as s:
+            n = webhook_dispatcher.requeue_dead(s, ids)
+    except Exception:
+        raise HTTPException(status_code=501, detail="DB not available")
+    return {"ok": True, "requeued": n}
+
+
 # --- ROI calculator (sales aide) ---
 class RoiInputs(BaseModel):
     analysts: int
@@ -5811,8 +5741,9 @@ def admin_orders(request: Request, format: Optional[str] = None, token: Optional
 def company_dashboard(company_id: str, request: Request, response: Response, window: str = Query(default="90d")):
     # M10: ETag + JSON cache (24h)
     key = _cache_key("company_dashboard", {"company_id": company_id, "window": window})
-    cached = _cache_get(key)
-    if cached:
+    with response_cache.RESPONSE_CACHE.flight(key) as cached:
+        if not cached:
+            return _company_dashboard_compute(company_id, window, key, response)
         try:
             response.headers["ETag"] = key  # type: ignore[index]
         except Exception:
@@ -5824,7 +5755,10 @@ def company_dashboard(company_id: str, request: Request, response: Response, win
                 return Response(status_code=304)
         except Exception:
             pass
-        return cached
+    return cached
+
+
+def _company_dashboard_compute(company_id: str, window: str, key: str, response: Response):
     kpis, spark_raw, sources = get_dashboard(int(company_id) if str(company_id).isdigit() else 0, window)
     spark: List[Sparkline] = []
     for s in spark_raw:
@@ -5839,7 +5773,12 @@ def company_dashboard(company_id: str, request: Request, response: Response, win
     try:
         if response is not None:
             response.headers["ETag"] = key  # type: ignore[index]
-        _cache_set(key, _json.loads(out.model_dump_json()))  # type: ignore
+        # Short TTL: hiring/patent/news writers do not invalidate company views (see response_cache)
+        try:
+            ttl = int(os.environ.get("COMPANY_DASHBOARD_TTL_SEC", "300"))
+        except Exception:
+            ttl = 300
+        _cache_set(key, _json.loads(out.model_dump_json()), ttl_sec=ttl)  # type: ignore
     except Exception:
         pass
     return out
@@ -5852,36 +5791,15 @@ class MarketGraphParams(BaseModel):
     limit: Optional[int] = 1000
 
 
-@app.get("/market/realtime")
-def market_realtime(segment: Optional[str] = None, min_signal: float = 0.0, limit: int = 0, page: int = 1, size: int = 200, segments: Optional[str] = None, bucket: Optional[str] = None, sort: Optional[str] = None, source: Optional[str] = None):
-    """Interactive, filterable market graph with best-effort server-side filtering.
-    Returns nodes and edges; aims to support ~1000 nodes quickly.
-    """
-    # Cache hot queries
-    ck = _cache_key("market_realtime", {"segment": segment, "segments": segments, "min_signal": min_signal, "page": page, "size": size, "bucket": bucket, "sort": sort, "source": source})
-    cached = _cache_get(ck)
-    if cached:
-        return cached
+def _market_scan_companies(segment: Optional[str], seg_set: set, min_signal: float, bucket: Optional[str], sort: Optional[str], start: int, end: int) -> Tuple[List[Dict[str, object]], int]:
+    """Full-table scan path (used when the resident index cannot be loaded, and as the gate baseline)."""
     try:
         with _trace_start("db.load_companies"):
             with get_session() as s:
-                rows = list(s.exec("SELECT id, canonical_name, segments, signal_score FROM companies"))  # type: ignore[arg-type]
+                rows = list(s.exec("SELECT id, canonical_name, segments, signal_score FROM companies ORDER BY id"))  # type: ignore[arg-type]
     except Exception:
         rows = []
-    nodes: List[Dict[str, object]] = []
-    edges: List[Dict[str, object]] = []
-    seg_nodes: Dict[str, str] = {}
-    def _add_seg(seg_name: str):
-        sid = f"segment:{seg_name.lower().replace(' ', '_')}"
-        if sid not in seg_nodes:
-            seg_nodes[sid] = seg_name
-            nodes.append({"id": sid, "label": seg_name, "type": "Segment"})
-        return sid
-    # Collect matching companies first to apply paging deterministically
     matched: List[Dict[str, object]] = []
-    seg_set = set()
-    if segments:
-        seg_set = {s.strip() for s in str(segments).split(",") if s.strip()}
     # Signal buckets: low<0.3, mid<0.7, high>=0.7
     def in_bucket(x: float) -> bool:
         b = (bucket or "").lower()
@@ -5913,20 +5831,81 @@ def market_realtime(segment: Optional[str] = None, min_signal: float = 0.0, limi
                     continue
                 if not in_bucket(sig):
                     continue
-                matched.append({
-                    "cid": cid,
-                    "name": name,
-                    "segs": seg_list,
-                    "sig": sig,
-                })
+                matched.append({"cid": cid, "name": name, "segs": seg_list, "sig": sig})
             except Exception:
                 continue
+    with _trace_start("market.page_sort"):
+        def _sig_key(d: Dict[str, object]) -> float:
+            try:
+                v = d.get("sig", 0.0)
+                return float(v) if isinstance(v, (int, float)) else float(str(v))
+            except Exception:
+                return 0.0
+        if (sort or "").lower() in ("signal", "sig", "desc"):
+            matched.sort(key=_sig_key, reverse=True)
+        elif (sort or "").lower() in ("signal_asc", "asc"):
+            matched.sort(key=_sig_key)
+    return matched[start:end], len(matched)
+
+
+def _market_companies(segment: Optional[str], seg_set: set, min_signal: float, bucket: Optional[str], sort: Optional[str], start: int, end: int) -> Tuple[List[Dict[str, object]], int]:
+    """Filtered, sorted company page for the market map: resident index first, table scan as fallback."""
+    idx = market_index.COMPANY_INDEX
+    if idx.ensure_loaded(get_session):
+        try:
+            with _trace_start("market.index_query"):
+                return idx.query(segment, seg_set, min_signal, bucket, sort, start, end)
+        except Exception:
+            pass
+    return _market_scan_companies(segment, seg_set, min_signal, bucket, sort, start, end)
+
+
+@app.get("/market/realtime")
+def market_realtime(segment: Optional[str] = None, min_signal: float = 0.0, limit: int = 0, page: int = 1, size: int = 200, segments: Optional[str] = None, bucket: Optional[str] = None, sort: Optional[str] = None, source: Optional[str] = None):
+    """Interactive, filterable market graph with best-effort server-side filtering.
+    Returns nodes and edges; aims to support ~1000 nodes quickly.
+    """
+    # Cache hot queries
+    ck = _cache_key("market_realtime", {"segment": segment, "segments": segments, "min_signal": min_signal, "page": page, "size": size, "bucket": bucket, "sort": sort, "source": source})
+    with response_cache.RESPONSE_CACHE.flight(ck) as cached:
+        if cached:
+            return cached
+        return _market_realtime_compute(ck, segment, min_signal, limit, page, size, segments, bucket, sort, source)
+
+
+def _market_realtime_compute(ck: str, segment: Optional[str], min_signal: float, limit: int, page: int, size: int, segments: Optional[str], bucket: Optional[str], sort: Optional[str], source: Optional[str]) -> Dict[str, Any]:
+    try:
+        eff_size = int(size or 200)
+        if int(limit or 0) > 0:
+            eff_size = int(limit)
+        eff_size = max(1, min(2000, eff_size))
+    except Exception:
+        eff_size = 200
+    try:
+        eff_page = max(1, int(page or 1))
+    except Exception:
+        eff_page = 1
+    start = (eff_page - 1) * eff_size
+    end = start + eff_size
+    nodes: List[Dict[str, object]] = []
+    edges: List[Dict[str, object]] = []
+    seg_nodes: Dict[str, str] = {}
+    def _add_seg(seg_name: str):
+        sid = f"segment:{seg_name.lower().replace(' ', '_')}"
+        if sid not in seg_nodes:
+            seg_nodes[sid] = seg_name
+            nodes.append({"id": sid, "label": seg_name, "type": "Segment"})
+        return sid
+    seg_set = set()
+    if segments:
+        seg_set = {s.strip() for s in str(segments).split(",") if s.strip()}
+    page_items, total = _market_companies(segment, seg_set, min_signal, bucket, sort, start, end)
 
     # Fallback or explicit KG source: build from KG tables when requested or when no company matches were found
     try:
-        use_kg = (source or "").lower() == "kg" or len(matched) == 0
+        use_kg = (source or "").lower() == "kg" or total == 0
     except Exception:
-        use_kg = len(matched) == 0
+        use_kg = total == 0
     if use_kg:
         try:
             from sqlmodel import text as _text  # type: ignore
@@ -5990,34 +5969,7 @@ def market_realtime(segment: Optional[str] = None, min_signal: float = 0.0, limi
         except Exception:
             # fall through to existing (possibly empty) company graph
             pass
-    # Pagination and sorting
-    with _trace_start("market.page_sort"):
-        try:
-            eff_size = int(size or 200)
-            if int(limit or 0) > 0:
-                eff_size = int(limit)
-            eff_size = max(1, min(2000, eff_size))
-        except Exception:
-            eff_size = 200
-        try:
-            eff_page = max(1, int(page or 1))
-        except Exception:
-            eff_page = 1
-        start = (eff_page - 1) * eff_size
-        end = start + eff_size
-        # sorting
-        def _sig_key(d: Dict[str, object]) -> float:
-            try:
-                v = d.get("sig", 0.0)
-                return float(v) if isinstance(v, (int, float)) else float(str(v))
-            except Exception:
-                return 0.0
-        if (sort or "").lower() in ("signal", "sig", "desc"):
-            matched.sort(key=_sig_key, reverse=True)
-        elif (sort or "").lower() in ("signal_asc", "asc"):
-            matched.sort(key=_sig_key)
-        page_items = matched[start:end]
-    has_more = end < len(matched)
+    has_more = end < total
     for item in page_items:
         cid = item["cid"]
         name = item["name"]
@@ -6032,7 +5984,7 @@ def market_realtime(segment: Optional[str] = None, min_signal: float = 0.0, limi
         "nodes": nodes,
         "edges": edges,
         "filters": {"segment": segment, "segments": list(seg_set) if seg_set else None, "min_signal": min_signal, "bucket": bucket, "sort": sort},
-        "pagination": {"page": eff_page, "size": eff_size, "total": len(matched), "has_more": has_more},
+        "pagination": {"page": eff_page, "size": eff_size, "total": total, "has_more": has_more},
         "sources": []
     }
     try:
@@ -6239,14 +6191,8 @@ def slo_summary():
         total = int(_REQ_TOTAL)
         errors = int(_REQ_ERRORS)
         rate = (errors / max(1, total)) if total else 0.0
-        lat_list = list(_REQ_LAT_LIST)
-        srt = sorted(lat_list[-min(len(lat_list), int(os.environ.get("METRICS_WINDOW_SAMPLES", "50"))) :])
-        def _pct(values: List[float], pct: float) -> float:
-            if not values:
-                return 0.0
-            k = max(0, min(len(values) - 1, int(round((pct/100.0) * (len(values) - 1)))))
-            return values[k]
-        payload = {"requests": total, "errors": errors, "error_rate": round(rate, 4), "p50_ms": round(_pct(srt, 50), 2), "p95_ms": round(_pct(srt, 95), 2), "p99_ms": round(_pct(srt, 99), 2)}
+        pct = histograms.REQUESTS.percentiles()
+        payload = {"requests": total, "errors": errors, "error_rate": round(rate, 4), "p50_ms": round(pct["p50_ms"], 2), "p95_ms": round(pct["p95_ms"], 2), "p99_ms": round(pct["p99_ms"], 2)}
         # Best-effort burn alert when enabled
         try:
             burn_thr = float(os.environ.get("SLO_ERROR_RATE_BURN", "0.05"))
@@ -6278,7 +6224,8 @@ def dev_plans_reload(request: Request, token: Optional[str] = None):
     _require_admin_token(_get_dev_token_from_request(request, token))
     try:
         _PLANS_CACHE.clear()
-        _load_plans_from_env()
+        _PLANS_LOADED.update({"payload": None, "table": None, "checked": 0.0})
+        _ensure_plans_loaded()
         return {"ok": True, "plans": list(_PLANS_CACHE.keys())}
     except Exception:
         return {"ok": False}
@@ -6552,13 +6499,11 @@ def admin_billing_snapshot(request: Request, token: Optional[str] = None, tenant
         from sqlmodel import text  # type: ignore
         with get_session() as s:
             try:
-                pk = _period_key()
-                rows = list(s.exec(text("SELECT product, SUM(units) FROM usage_events WHERE ts >= :since AND (:tid IS NULL OR tenant_id = :tid) GROUP BY product"), {"since": pk, "tid": tenant_id}))  # type: ignore[attr-defined]
-                for r in rows:
-                    prod = r[0] if isinstance(r, (tuple, list)) else getattr(r, "product", None)
-                    total = r[1] if isinstance(r, (tuple, list)) else getattr(r, "sum", 0)
+                totals = usage_meter.USAGE_METER.totals(_period_key(), str(tenant_id) if tenant_id is not None else None) or {}
+                for (_tid, prod), units in totals.items():
                     if prod:
-                        out["current_period_usage"][str(prod)] = int(total or 0)
+                        cur = out["current_period_usage"]
+                        cur[str(prod)] = int(cur.get(str(prod), 0)) + int(units or 0)
             except Exception:
                 pass
             try:
@@ -6615,38 +6560,12 @@ def admin_usage_export(request: Request, token: Optional[str] = None, tenant_id:
     _require_admin_token(_get_dev_token_from_request(request, token))
     pk = _period_key(period=period or "monthly")
     items: List[Dict[str, Any]] = []
-    # Try DB aggregation when available
-    try:
-        from sqlmodel import text as _text  # type: ignore
-        with get_session() as s:
-            if tenant_id:
-                rows = list(
-                    s.exec(
-                        _text(
-                            "SELECT tenant_id, product, COALESCE(SUM(units),0) FROM usage_events WHERE ts LIKE :prefix AND tenant_id=:tid GROUP BY tenant_id, product"
-                        ),
-                        {"prefix": f"{pk}%", "tid": str(tenant_id)},
-                    )
-                )  # type: ignore[attr-defined]
-            else:
-                rows = list(
-                    s.exec(
-                        _text(
-                            "SELECT tenant_id, product, COALESCE(SUM(units),0) FROM usage_events WHERE ts LIKE :prefix GROUP BY tenant_id, product"
-                        ),
-                        {"prefix": f"{pk}%"},
-                    )
-                )  # type: ignore[attr-defined]
-            for r in rows:
-                tid = r[0] if isinstance(r, (tuple, list)) else getattr(r, "tenant_id", None)
-                prod = r[1] if isinstance(r, (tuple, list)) else getattr(r, "product", None)
-                units = r[2] if isinstance(r, (tuple, list)) else getattr(r, "sum", 0)
-                try:
-                    units = int(units or 0)
-                except Exception:
-                    units = 0
-                items.append({"tenant_id": str(tid), "product": str(prod), "units": int(units)})
-    except Exception:
+    # Read the per-period counters; no scan of usage_events
+    totals = usage_meter.USAGE_METER.totals(pk, str(tenant_id) if tenant_id else None)
+    if totals is not None:
+        for (tid, prod), units in totals.items():
+            items.append({"tenant_id": str(tid), "product": str(prod), "units": int(units or 0)})
+    else:
         # Fallback to in-memory aggregation
         agg: Dict[Tuple[str, str], int] = {}
         for (tid, pk_key, product), units in list(_USAGE_MEM.items()):
@@ -6836,7 +6755,7 @@ def admin_create_api_key(request: Request, payload: _ApiKeyCreate = _Body(...),
     try:
         from sqlmodel import text as _text  # type: ignore
         with get_session() as s:
-            s.exec(
+            s.execute(
                 _text(
                     """
                     INSERT INTO api_keys (tenant_id, prefix, key_hash, scopes, rate_limit_per_min, expires_at, status)
@@ -6854,11 +6773,38 @@ def admin_create_api_key(request: Request, payload: _ApiKeyCreate = _Body(...),
                 },
             )
             s.commit()  # type: ignore[attr-defined]
+        apikey_cache.AUTH_CACHE.invalidate(key_hash=kh)
         return {"ok": True, "prefix": prefix, "key": plain}
     except Exception:
         raise HTTPException(status_code=501, detail="DB not available")
 
 
+@app.delete("/admin/api-keys/{key_id}")
+def admin_revoke_api_key(key_id: int, request: Request, token: Optional[str] = None):
+    _require_admin_token(_get_dev_token_from_request(request, token))
+    try:
+        from sqlmodel import text as _text  # type: ignore
+        with get_session() as s:
+            rows = list(s.execute(_text("SELECT key_hash FROM api_keys WHERE id = :id"), {"id": int(key_id)}))  # type: ignore[attr-defined]
+            if not rows:
+                raise HTTPException(status_code=404, detail="api key not found")
+            # revoked_at moves the watermark the other workers' auth caches poll
+            try:
+                s.execute(_text("UPDATE api_keys SET status = 'revoked', revoked_at = :at WHERE id = :id"), {"id": int(key_id), "at": datetime.now(timezone.utc).isoformat()})  # type: ignore[attr-defined]
+            except Exception:
+                # Older schemas without revoked_at: other workers fall back to the cache TTL
+                s.rollback()  # type: ignore[attr-defined]
+                s.execute(_text("UPDATE api_keys SET status = 'revoked' WHERE id = :id"), {"id": int(key_id)})  # type: ignore[attr-defined]
+            s.commit()  # type: ignore[attr-defined]
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=501, detail="DB not available")
+    # Effective immediately here; other workers drop it on their next revocation check
+    apikey_cache.AUTH_CACHE.invalidate(key_hash=str(rows[0][0]))
+    return {"ok": True, "id": int(key_id), "status": "revoked"}
+
+
 @app.get("/graph/derive/{company_id}")
 def graph_derive(company_id: str, window: str = Query(default="90d")):
     try:
@@ -6984,7 +6930,11 @@ def dev_clear_caches(request: Request, token: Optional[str] = None):
         cleared_hr = n
     except Exception:
         cleared_hr = 0
-    return {"ok": True, "cleared": {"doc_cache": cleared_docs, "hybrid_cache": cleared_hr}}
+    try:
+        cleared_resp = response_cache.RESPONSE_CACHE.clear()
+    except Exception:
+        cleared_resp = 0
+    return {"ok": True, "cleared": {"doc_cache": cleared_docs, "hybrid_cache": cleared_hr, "response_cache": cleared_resp}}
 
 
 @app.post("/dev/graph/rebuild-comentions")
@@ -7026,6 +6976,7 @@ def dev_cache_stats(request: Request, token: Optional[str] = None):
     return {
         "hybrid": {"hits": _HR_HITS, "misses": _HR_MISSES, "size": len(_HR_CACHE)},
         "docs": doc_stats,
+        "response": response_cache.RESPONSE_CACHE.info(),
     }
 
 
@@ -7058,6 +7009,16 @@ def metrics_endpoint():
     lines.append(f"aurora_docs_cache_hits {doc_stats.get('hits', 0)}")
     lines.append(f"aurora_docs_cache_misses {doc_stats.get('misses', 0)}")
     lines.append(f"aurora_docs_cache_size {doc_stats.get('size', 0)}")
+    for _name, _kind, _help in (
+        ("evictions", "counter", "Doc cache entries evicted by the per-tenant LRU budget"),
+        ("expirations", "counter", "Doc cache entries dropped after their TTL"),
+        ("bytes", "gauge", "Approximate bytes held by the doc cache"),
+        ("tenants", "gauge", "Tenant partitions in the doc cache"),
+        ("hit_ratio", "gauge", "Doc cache hits / lookups since the last clear"),
+    ):
+        lines.append(f"# HELP aurora_docs_cache_{_name} {_help}")
+        lines.append(f"# TYPE aurora_docs_cache_{_name} {_kind}")
+        lines.append(f"aurora_docs_cache_{_name} {doc_stats.get(_name, 0)}")
 
     # Request metrics
     try:
@@ -7091,25 +7052,8 @@ def metrics_endpoint():
     lines.append("# TYPE aurora_hybrid_cache_hit_ratio gauge")
     lines.append(f"aurora_hybrid_cache_hit_ratio {hit_ratio:.4f}")
 
-    # Schedules (prefer DB if available)
-    try:
-        total_sched = 0
-        try:
-            from sqlmodel import select  # type: ignore
-            have_sql = True
-        except Exception:
-            have_sql = False
-        if have_sql:
-            with get_session() as s:
-                try:
-                    rows = list(s.exec(select(JobSchedule)))  # type: ignore[attr-defined]
-                    total_sched = len(rows)
-                except Exception:
-                    total_sched = len(_SCHEDULES)
-        else:
-            total_sched = len(_SCHEDULES)
-    except Exception:
-        total_sched = len(_SCHEDULES)
+    # Schedules: the schedule endpoints keep them in _SCHEDULES (JobSchedule is not importable here)
+    total_sched = len(_SCHEDULES)
     lines.append("# HELP aurora_schedules_total Total job schedules (DB or in-memory)")
     lines.append("# TYPE aurora_schedules_total gauge")
     lines.append(f"aurora_schedules_total {total_sched}")
@@ -7129,33 +7073,18 @@ def metrics_endpoint():
     except Exception:
         pass
 
-    # Percentile gauges for request latency (based on sliding window)
+    # Percentile gauges for request latency (recent window of the request histogram)
     try:
-        lat_list = list(_REQ_LAT_LIST)
-        try:
-            win = int(os.environ.get("METRICS_WINDOW_SAMPLES", "50"))
-        except Exception:
-            win = 50
-        lat_list = lat_list[-min(win, len(lat_list)) :]
-        if lat_list:
-            srt = sorted(lat_list)
-            def _pct(values: List[float], pct: float) -> float:
-                if not values:
-                    return 0.0
-                k = max(0, min(len(values) - 1, int(round((pct/100.0) * (len(values) - 1)))))
-                return values[k]
-            p50 = _pct(srt, 50)
-            p95 = _pct(srt, 95)
-            p99 = _pct(srt, 99)
-            lines.append("# HELP aurora_request_latency_p50_ms P50 latency (ms)")
-            lines.append("# TYPE aurora_request_latency_p50_ms gauge")
-            lines.append(f"aurora_request_latency_p50_ms {p50:.2f}")
-            lines.append("# HELP aurora_request_latency_p95_ms P95 latency (ms)")
-            lines.append("# TYPE aurora_request_latency_p95_ms gauge")
-            lines.append(f"aurora_request_latency_p95_ms {p95:.2f}")
-            lines.append("# HELP aurora_request_latency_p99_ms P99 latency (ms)")
-            lines.append("# TYPE aurora_request_latency_p99_ms gauge")
-            lines.append(f"aurora_request_latency_p99_ms {p99:.2f}")
+        pct = histograms.REQUESTS.percentiles()
+        if pct["samples"]:
+            for q in ("p50", "p95", "p99"):
+                lines.append(f"# HELP aurora_request_latency_{q}_ms {q.upper()} latency (ms)")
+                lines.append(f"# TYPE aurora_request_latency_{q}_ms gauge")
+                lines.append(f"aurora_request_latency_{q}_ms {pct[q + '_ms']:.2f}")
+    except Exception:
+        pass
+    try:
+        lines.extend(histograms.exposition("aurora_http_request_duration_ms", "HTTP request latency (ms) by method, route template and status class", histograms.REQUESTS.series()))
     except Exception:
         pass
 
@@ -7178,33 +7107,51 @@ def metrics_endpoint():
     except Exception:
         pass
 
-    # Optional sovereign platform gauges (defensive; safe if tables are absent)
+    # Rate limiter backend errors (this process); each one is a request decided by fail_open, not by the limit
     try:
-        kg_nodes = 0
-        try:
-            from sqlmodel import text as _text  # type: ignore
-            with get_session() as s:
-                rows = list(s.exec(_text("SELECT COUNT(1) FROM kg_nodes")))  # type: ignore[attr-defined]
-                kg_nodes = int(rows[0][0]) if rows else 0
-        except Exception:
-            kg_nodes = 0
-        lines.append("# HELP aurora_kg_nodes_total Total KG nodes")
-        lines.append("# TYPE aurora_kg_nodes_total gauge")
-        lines.append(f"aurora_kg_nodes_total {kg_nodes}")
+        from . import ratelimit as _rl
+
+        lines.append("# HELP aurora_rate_limit_backend_errors_total Rate limiter backend errors (request allowed or denied per fail_open)")
+        lines.append("# TYPE aurora_rate_limit_backend_errors_total counter")
+        lines.append(f"aurora_rate_limit_backend_errors_total {int(_rl.LIMITER.backend.errors)}")
+    except Exception:
+        pass
+
+    # Webhook dispatcher counters (this process)
+    try:
+        if _WEBHOOK_DISPATCHER is not None:
+            wi = _WEBHOOK_DISPATCHER.info()
+            lines.append("# HELP aurora_webhook_deliveries_total Webhook delivery outcomes by result")
+            lines.append("# TYPE aurora_webhook_deliveries_total counter")
+            for outcome in ("delivered", "retried", "dead", "released"):
+                lines.append(f"aurora_webhook_deliveries_total{{outcome=\"{outcome}\"}} {int(wi.get(outcome, 0))}")
+            lines.append("# HELP aurora_webhook_inflight Webhook deliveries in flight")
+            lines.append("# TYPE aurora_webhook_inflight gauge")
+            lines.append(f"aurora_webhook_inflight {int(wi.get('inflight', 0))}")
+            lines.append("# HELP aurora_webhook_open_circuits Endpoints with an open circuit breaker")
+            lines.append("# TYPE aurora_webhook_open_circuits gauge")
+            lines.append(f"aurora_webhook_open_circuits {len(wi.get('open_circuits') or [])}")
     except Exception:
         pass
+
+    # Optional sovereign platform gauges from the maintained kg_stats counters (no table scans; 0 when absent)
+    kg_totals: Dict[str, Any] = {}
     try:
-        kg_edges = 0
-        try:
-            from sqlmodel import text as _text  # type: ignore
-            with get_session() as s:
-                rows = list(s.exec(_text("SELECT COUNT(1) FROM kg_edges")))  # type: ignore[attr-defined]
-                kg_edges = int(rows[0][0]) if rows else 0
-        except Exception:
-            kg_edges = 0
-        lines.append("# HELP aurora_kg_edges_total Total KG edges")
-        lines.append("# TYPE aurora_kg_edges_total gauge")
-        lines.append(f"aurora_kg_edges_total {kg_edges}")
+        with get_session() as s:
+            kg_totals = kg_stats.summarize(kg_stats.counters(s))
+    except Exception:
+        pass
+    for table in ("kg_nodes", "kg_edges"):
+        lines.append(f"# HELP aurora_{table}_total Total KG {table[3:]}")
+        lines.append(f"# TYPE aurora_{table}_total gauge")
+        lines.append(f"aurora_{table}_total {int(kg_totals.get(table[3:] + '_total') or 0)}")
+
+    try:
+        al = access_log.ACCESS_LOG.stats
+        lines.append("# HELP aurora_access_log_records_total Access log records by outcome")
+        lines.append("# TYPE aurora_access_log_records_total counter")
+        for outcome in ("written", "sampled_out", "dropped"):
+            lines.append(f"aurora_access_log_records_total{{outcome=\"{outcome}\"}} {int(al.get(outcome, 0))}")
     except Exception:
         pass
 
@@ -0,0 +1,222 @@
+"""Resident company index backing `/market/realtime`.
+
+Uncached market requests used to scan the whole `companies` table, then split
+segments, filter and sort in Python. This index keeps the same columns in
+process and organizes them two ways:
+
+* per segment (plus an "all" list), keys `(-signal_score, id)` kept sorted with
+  `bisect`. A signal range (min_signal and/or bucket) is then a contiguous
+  slice, so a signal-sorted page costs O(log n + k) and the total is a
+  subtraction;
+* per segment, ids in ascending order, for the unsorted default order
+  (previously the table order).
+
+It is loaded once at startup. The company upsert paths refresh it by name. A
+full reload happens only after `MARKET_INDEX_RELOAD_SEC`, so writes from other
+processes are still picked up.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .sql_utils import chunked, expanding_text
+
+# Signal buckets: low<0.3, mid<0.7, high>=0.7
+BUCKETS: Dict[str, Tuple[float, Optional[float]]] = {"low": (-math.inf, 0.3), "mid": (0.3, 0.7), "high": (0.7, None)}
+
+_Key = Tuple[float, int]
+
+
+def _split_segments(raw: Any) -> Tuple[str, ...]:
+    return tuple(s.strip() for s in str(raw or "").split(",") if s.strip())
+
+
+def _asc_key(k: _Key) -> Tuple[float, int]:
+    # Ascending signal, ties by ascending id (same tie-break as the descending order and the scan)
+    return (-k[0], k[1])
+
+
+def _asc_page(keys: List[_Key], a: int, b: int, start: int, end: int) -> List[_Key]:
+    """Page [start, end) of keys[a:b] in ascending signal order.
+
+    Reversing the `(-sig, id)` slice would put tied signals in descending id
+    order. Instead the reversed window is widened to whole tie groups and only
+    that window is re-sorted, which keeps the cost O(log n + k + ties).
+    """
+    lo, hi = max(a, b - end), max(a, b - start)
+    if lo >= hi:
+        return []
+    lo = bisect_left(keys, (keys[lo][0], -math.inf), a, lo)
+    hi = bisect_right(keys, (keys[hi - 1][0], math.inf), hi, b)
+    skip = start - (b - hi)
+    return sorted(keys[lo:hi], key=_asc_key)[skip:skip + end - start]
+
+
+def _remove(lst: List[Any], item: Any) -> None:
+    i = bisect_right(lst, item) - 1
+    if i >= 0 and lst[i] == item:
+        del lst[i]
+
+
+class CompanyIndex:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._rows: Dict[int, Tuple[str, Tuple[str, ...], float]] = {}
+        self._by_sig: Dict[Optional[str], List[_Key]] = {None: []}
+        self._by_id: Dict[Optional[str], List[int]] = {None: []}
+        self.loaded_at: Optional[float] = None
+
+    # --- maintenance ---
+    def _put(self, cid: int, name: str, segs: Tuple[str, ...], sig: float) -> None:
+        self._drop(cid)
+        self._rows[cid] = (name, segs, sig)
+        key = (-sig, cid)
+        for seg in (None,) + segs:
+            insort(self._by_sig.setdefault(seg, []), key)
+            insort(self._by_id.setdefault(seg, []), cid)
+
+    def _drop(self, cid: int) -> None:
+        prev = self._rows.pop(cid, None)
+        if prev is None:
+            return
+        key = (-prev[2], cid)
+        for seg in (None,) + prev[1]:
+            _remove(self._by_sig.get(seg, []), key)
+            _remove(self._by_id.get(seg, []), cid)
+
+    def apply_rows(self, rows: Iterable[Any]) -> int:
+        """Upsert (id, canonical_name, segments, signal_score) rows; rows without id or name are dropped."""
+        n = 0
+        with self._lock:
+            for r in rows:
+                try:
+                    cid = int(r[0])
+                except Exception:
+                    continue
+                if not r[1]:
+                    self._drop(cid)
+                    continue
+                try:
+                    sig = float(r[3] or 0.0)
+                except Exception:
+                    sig = 0.0
+                self._put(cid, str(r[1]), _split_segments(r[2]), sig)
+                n += 1
+        return n
+
+    def load(self, s: Any) -> int:
+        from sqlmodel import text as _text  # type: ignore
+
+        rows = list(s.execute(_text("SELECT id, canonical_name, segments, signal_score FROM companies")))  # type: ignore[attr-defined]
+        with self._lock:
+            self._rows.clear()
+            self._by_sig = {None: []}
+            self._by_id = {None: []}
+            n = self.apply_rows(rows)
+            self.loaded_at = time.time()
+        return n
+
+    def refresh(self, s: Any, names: Iterable[str]) -> int:
+        """Re-read the given canonical names after an upsert (no-op until the index is loaded)."""
+        if self.loaded_at is None:
+            return 0
+        wanted = sorted({str(n) for n in names if n})
+        n = 0
+        for chunk in chunked(wanted):
+            rows = list(
+                s.execute(
+                    expanding_text("SELECT id, canonical_name, segments, signal_score FROM companies WHERE canonical_name IN :n", "n"),
+                    {"n": chunk},
+                )
+            )  # type: ignore[attr-defined]
+            n += self.apply_rows(rows)
+        return n
+
+    def ensure_loaded(self, session_factory: Callable[[], Any]) -> bool:
+        try:
+            max_age = float(os.getenv("MARKET_INDEX_RELOAD_SEC", "300"))
+        except Exception:
+            max_age = 300.0
+        if self.loaded_at is not None and (max_age <= 0 or time.time() - self.loaded_at < max_age):
+            return True
+        try:
+            with session_factory() as s:
+                self.load(s)
+            return True
+        except Exception:
+            return self.loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # --- queries ---
+    def _item(self, cid: int) -> Dict[str, object]:
+        name, segs, sig = self._rows[cid]
+        return {"cid": cid, "name": name, "segs": list(segs), "sig": sig}
+
+    def query(
+        self,
+        segment: Optional[str] = None,
+        segments: Optional[Set[str]] = None,
+        min_signal: float = 0.0,
+        bucket: Optional[str] = None,
+        sort: Optional[str] = None,
+        start: int = 0,
+        end: int = 200,
+    ) -> Tuple[List[Dict[str, object]], int]:
+        """Return (page_items, total) with the same filter and sort semantics as the table scan."""
+        lo, hi = BUCKETS.get((bucket or "").lower(), (-math.inf, None))
+        lo = max(lo, float(min_signal or 0.0))
+        order = (sort or "").lower()
+
+        def _bounds(keys: List[_Key]) -> Tuple[int, int]:
+            a = bisect_right(keys, (-hi, math.inf)) if hi is not None else 0
+            return a, max(a, bisect_right(keys, (-lo, math.inf)))
+
+        with self._lock:
+            if not segments or segment:
+                keys = self._by_sig.get(segment or None, [])
+                a, b = _bounds(keys)
+                if not segments:
+                    # Single sorted list: the signal range is one contiguous slice
+                    if order in ("signal", "sig", "desc"):
+                        return [self._item(k[1]) for k in keys[a + start:min(a + end, b)]], b - a
+                    if order in ("signal_asc", "asc"):
+                        return [self._item(k[1]) for k in _asc_page(keys, a, b, start, end)], b - a
+                    page: List[Dict[str, object]] = []
+                    seen = 0
+                    for cid in self._by_id.get(segment or None, []):
+                        sig = self._rows[cid][2]
+                        if sig < lo or (hi is not None and sig >= hi):
+                            continue
+                        if seen >= start:
+                            page.append(self._item(cid))
+                            if len(page) >= end - start:
+                                break
+                        seen += 1
+                    return page, b - a
+                # segment AND any-of segments
+                merged = [k for k in keys[a:b] if set(self._rows[k[1]][1]) & segments]
+            else:
+                # Any-of segments: union of per-segment slices (a company may sit in several)
+                merged_set: Set[_Key] = set()
+                for seg in segments:
+                    seg_keys = self._by_sig.get(seg, [])
+                    a, b = _bounds(seg_keys)
+                    merged_set.update(seg_keys[a:b])
+                merged = sorted(merged_set)
+            if order in ("signal", "sig", "desc"):
+                picked = merged[start:end]
+            elif order in ("signal_asc", "asc"):
+                picked = sorted(merged, key=_asc_key)[start:end]
+            else:
+                picked = sorted(merged, key=lambda k: k[1])[start:end]
+            return [self._item(k[1]) for k in picked], len(merged)
+
+COMPANY_INDEX = CompanyIndex()
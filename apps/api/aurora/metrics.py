@@ -41,42 +41,27 @@ def _week_series(n: int = 7) -> List[str]:
 
 
 def _segment_stats(metric: str, company_id: int) -> Optional[Tuple[float, float]]:
-    """Approximate segment-wise stats (mean,std) for a metric across companies in the same segment.
-    Falls back to None if not available. Uses all-time values; lightweight approximation.
+    """Segment-wise (mean, std) for a metric across companies sharing any of the company's segments.
+    Keyed lookup into the materialized `cohort_metric_stats` table (all-time values).
+    Falls back to None when fewer than 3 values are available.
     """
+    return _cohort_stats(company_id).get(metric)
+
+
+def _cohort_stats(company_id: int) -> Dict[str, Tuple[float, float]]:
+    """(mean, std) per metric for the company's cohort; empty when unavailable."""
     try:
-        from sqlmodel import select  # type: ignore
-        from .db import Company  # type: ignore
+        from . import cohort_stats  # type: ignore
         with get_session() as s:  # type: ignore
-            # Get target company's segments
-            c = s.get(Company, int(company_id))
-            segs = set((getattr(c, "segments", "") or "").split(",")) if c else set()
-            if not segs:
-                return None
-            # Find other companies sharing any segment
-            comp_rows = list(s.exec(select(Company)).all())  # type: ignore[attr-defined]
-            cohort_ids = [int(getattr(r, "id", 0) or 0) for r in comp_rows if r and segs.intersection(set((getattr(r, "segments", "") or "").split(",")))]
-            if not cohort_ids:
-                return None
-            # Gather metric values across cohort
-            vals: List[float] = []
-            for cid in cohort_ids:
-                rows = list(s.exec(select(CompanyMetric).where(CompanyMetric.company_id == cid)).all())  # type: ignore[attr-defined]
-                for row in rows:
-                    v = getattr(row, metric, None)
-                    if v is not None:
-                        try:
-                            vals.append(float(v))
-                        except Exception:
-                            continue
-            if len(vals) < 3:
-                return None
-            mean = sum(vals) / len(vals)
-            var = sum((x - mean) ** 2 for x in vals) / max(1, len(vals) - 1)
-            std = var ** 0.5 if var > 0 else 1.0
-            return (mean, std)
+            stats = cohort_stats.company_cohort(s, int(company_id))
     except Exception:
-        return None
+        return {}
+    out: Dict[str, Tuple[float, float]] = {}
+    for metric, st in stats.items():
+        if st["n"] < 3:
+            continue
+        out[metric] = (st["mean"], st["std"] if st["std"] > 0 else 1.0)
+    return out
 
 
 def _fetch_cached_metrics(company_id: int, window: str) -> List[CompanyMetric]:
@@ -635,11 +620,12 @@ def compute_signal_series(company_id: int, window: str = "90d") -> List[Dict[str
     stars_growth = _diff(stars)
 
     # Attempt segment-wise stats
-    m_stats = _segment_stats("mentions", company_id)
-    c_stats = _segment_stats("commits", company_id)
-    sg_stats = _segment_stats("stars", company_id)  # growth uses stars base for cohort
-    f_stats = _segment_stats("filings", company_id)
-    se_stats = _segment_stats("sentiment", company_id)
+    cohort = _cohort_stats(company_id)
+    m_stats = cohort.get("mentions")
+    c_stats = cohort.get("commits")
+    sg_stats = cohort.get("stars")  # growth uses stars base for cohort
+    f_stats = cohort.get("filings")
+    se_stats = cohort.get("sentiment")
 
     z_mentions = _z(mentions, m_stats)
     z_commits = _z(commits_vel, c_stats)
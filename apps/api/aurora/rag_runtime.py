@@ -0,0 +1,262 @@
+"""Process-wide RAG runtime: pooled Qdrant client, LlamaIndex indexes and LLM wrappers.
+
+`rag_service.answer_with_citations` used to call `get_rag_index()` and
+`get_llm()` for every question. Each call built a new `QdrantClient` (and its
+connection pool), a `QdrantVectorStore`, a `StorageContext`, a
+`VectorStoreIndex` with its query engine, and an Ollama wrapper. All of that
+cost was paid before retrieval started. `RagRuntime` builds these once and hands
+out the same objects:
+
+* one client per process. It is health-checked lazily, at most every
+  `RAG_HEALTH_INTERVAL_SEC` (`get_collections()` on Qdrant), and a failed check
+  drops the client and every index built on it;
+* a bounded LRU (`RAG_POOL_SIZE`) of index + query engine per collection. With
+  `VECTOR_TENANT_MODE=collection` that means one entry per tenant collection;
+* one LLM wrapper per model name.
+
+Builds are serialized per key, so concurrent first questions share one build.
+A failed build is remembered for `RAG_RETRY_BACKOFF_SEC`, so an unreachable
+Qdrant fails fast instead of reconnecting on every question. Callers that hit
+an error while querying call `invalidate(collection)`, and the entry is rebuilt
+lazily on next use. `warm_async()` (called from the API lifespan) builds the
+default collection and LLM in the background.
+
+The factories are injectable; tests and `scripts/bench_rag_runtime.py` use
+local stand-ins instead of Qdrant/Ollama.
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from .config import settings
+
+
+def default_client() -> Any:
+    try:
+        from qdrant_client import QdrantClient  # type: ignore
+    except Exception as e:
+        raise RuntimeError("Qdrant client not installed. Install qdrant-client to enable vector search.") from e
+    if not settings.qdrant_url:
+        raise RuntimeError("Qdrant URL not configured")
+    return QdrantClient(url=settings.qdrant_url)
+
+
+def default_index(client: Any, collection: str) -> Any:
+    try:
+        li = importlib.import_module("llama_index")
+        li_qdrant = importlib.import_module("llama_index.vector_stores.qdrant")
+    except Exception as e:
+        raise RuntimeError("LlamaIndex not installed or incompatible. Install dependencies to enable RAG.") from e
+    QdrantVectorStore: Any = getattr(li_qdrant, "QdrantVectorStore")
+    StorageContext: Any = getattr(li, "StorageContext")
+    VectorStoreIndex: Any = getattr(li, "VectorStoreIndex")
+    vs = QdrantVectorStore(client=client, collection_name=collection)
+    storage = StorageContext.from_defaults(vector_store=vs)
+    return VectorStoreIndex.from_vector_store(vs, storage_context=storage)
+
+
+def default_llm(model: str) -> Any:
+    try:
+        li_ollama = importlib.import_module("llama_index.llms.ollama")
+    except Exception as e:
+        raise RuntimeError("Ollama LLM wrapper missing. Install llama-index and restart.") from e
+    Ollama: Any = getattr(li_ollama, "Ollama")
+    return Ollama(model=model, base_url=settings.ollama_base_url)
+
+
+def default_health(client: Any) -> None:
+    probe = getattr(client, "get_collections", None)
+    if callable(probe):
+        probe()
+
+
+class RagRuntime:
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = default_client,
+        index_factory: Callable[[Any, str], Any] = default_index,
+        llm_factory: Callable[[str], Any] = default_llm,
+        health_check: Callable[[Any], None] = default_health,
+        max_indexes: int = 8,
+        health_interval_s: float = 30.0,
+        retry_backoff_s: float = 5.0,
+        similarity_top_k: int = 8,
+    ) -> None:
+        self._client_factory = client_factory
+        self._index_factory = index_factory
+        self._llm_factory = llm_factory
+        self._health_check = health_check
+        self.max_indexes = max(1, int(max_indexes))
+        self.health_interval_s = max(0.0, float(health_interval_s))
+        self.retry_backoff_s = max(0.0, float(retry_backoff_s))
+        self.similarity_top_k = int(similarity_top_k)
+        self._client: Any = None
+        self._client_checked = 0.0
+        self._indexes: "OrderedDict[str, Tuple[Any, Any]]" = OrderedDict()
+        self._llms: Dict[str, Any] = {}
+        self._failures: Dict[str, Tuple[float, BaseException]] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._warm_thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, int] = {"hits": 0, "builds": 0, "build_errors": 0, "evictions": 0, "health_failures": 0, "invalidations": 0}
+
+    def _build_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            lk = self._build_locks.get(key)
+            if lk is None:
+                lk = self._build_locks[key] = threading.Lock()
+            return lk
+
+    def _build(self, key: str, fn: Callable[[], Any]) -> Any:
+        failed = self._failures.get(key)
+        if failed is not None and time.monotonic() - failed[0] < self.retry_backoff_s:
+            raise RuntimeError(f"{key} unavailable (retrying in {self.retry_backoff_s:.0f}s): {failed[1]}")
+        try:
+            obj = fn()
+        except Exception as e:
+            self.stats["build_errors"] += 1
+            self._failures[key] = (time.monotonic(), e)
+            raise
+        self._failures.pop(key, None)
+        self.stats["builds"] += 1
+        return obj
+
+    def client(self) -> Any:
+        """Shared vector-store client, rebuilt when a periodic health check fails."""
+        client = self._client
+        if client is not None:
+            if self.health_interval_s <= 0 or time.monotonic() - self._client_checked < self.health_interval_s:
+                return client
+            try:
+                self._health_check(client)
+                self._client_checked = time.monotonic()
+                return client
+            except Exception:
+                self.stats["health_failures"] += 1
+                self.invalidate()
+        with self._build_lock("client"):
+            if self._client is None:
+                self._client = self._build("client", self._client_factory)
+                self._client_checked = time.monotonic()
+            return self._client
+
+    def index(self, collection: str) -> Any:
+        return self._entry(collection)[0]
+
+    def query_engine(self, collection: str) -> Any:
+        return self._entry(collection)[1]
+
+    def _entry(self, collection: str) -> Tuple[Any, Any]:
+        client = self.client()
+        with self._lock:
+            entry = self._indexes.get(collection)
+            if entry is not None:
+                self._indexes.move_to_end(collection)
+                self.stats["hits"] += 1
+                return entry
+        with self._build_lock(f"index:{collection}"):
+            entry = self._indexes.get(collection)
+            if entry is not None:
+                return entry
+
+            def _make() -> Tuple[Any, Any]:
+                idx = self._index_factory(client, collection)
+                return idx, idx.as_query_engine(similarity_top_k=self.similarity_top_k)
+
+            entry = self._build(f"index:{collection}", _make)
+            with self._lock:
+                self._indexes[collection] = entry
+                while len(self._indexes) > self.max_indexes:
+                    self._indexes.popitem(last=False)
+                    self.stats["evictions"] += 1
+            return entry
+
+    def llm(self, model: str) -> Any:
+        llm = self._llms.get(model)
+        if llm is not None:
+            return llm
+        with self._build_lock(f"llm:{model}"):
+            if model not in self._llms:
+                self._llms[model] = self._build(f"llm:{model}", lambda: self._llm_factory(model))
+            return self._llms[model]
+
+    def invalidate(self, collection: Optional[str] = None) -> None:
+        """Drop one collection's index, or (no argument) the client and everything built on it."""
+        self.stats["invalidations"] += 1
+        with self._lock:
+            if collection is not None:
+                self._indexes.pop(collection, None)
+                return
+            self._client = None
+            self._indexes.clear()
+
+    def warm(self, collections: Sequence[str], model: Optional[str] = None) -> Dict[str, str]:
+        """Build the given collections (and LLM); returns per-key status instead of raising."""
+        out: Dict[str, str] = {}
+        for c in collections:
+            try:
+                self._entry(c)
+                out[f"index:{c}"] = "ok"
+            except Exception as e:
+                out[f"index:{c}"] = f"error: {e.__class__.__name__}"
+        if model:
+            try:
+                self.llm(model)
+                out[f"llm:{model}"] = "ok"
+            except Exception as e:
+                out[f"llm:{model}"] = f"error: {e.__class__.__name__}"
+        return out
+
+    def warm_async(self, collections: Sequence[str], model: Optional[str] = None) -> None:
+        if self._warm_thread is not None and self._warm_thread.is_alive():
+            return
+        self._warm_thread = threading.Thread(target=self.warm, args=(list(collections), model), name="rag-warmup", daemon=True)
+        self._warm_thread.start()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            collections = list(self._indexes)
+        return {
+            "client": self._client is not None,
+            "collections": collections,
+            "max_indexes": self.max_indexes,
+            "llms": list(self._llms),
+            "failing": sorted(self._failures),
+            **self.stats,
+        }
+
+
+def collection_name(base: Optional[str] = None) -> str:
+    """Collection for the current tenant (per-tenant collections when VECTOR_TENANT_MODE=collection)."""
+    from .retrieval import _qdrant_collection_name
+
+    return _qdrant_collection_name(base or os.getenv("RAG_COLLECTION", "docs"))
+
+
+def tenant_id() -> Optional[str]:
+    from .retrieval import _current_tenant_id
+
+    return _current_tenant_id()
+
+
+LLM_MODEL = os.getenv("RAG_LLM_MODEL", "llama3.1:8b")
+
+RUNTIME = RagRuntime(
+    max_indexes=int(os.getenv("RAG_POOL_SIZE", "8")),
+    health_interval_s=float(os.getenv("RAG_HEALTH_INTERVAL_SEC", "30")),
+    retry_backoff_s=float(os.getenv("RAG_RETRY_BACKOFF_SEC", "5")),
+)
+
+
+def warm_on_startup() -> bool:
+    """Lifespan hook: warm the default collection and LLM in the background when Qdrant is configured."""
+    if not settings.qdrant_url or os.getenv("RAG_WARM_ON_START", "1").strip().lower() in ("0", "false", "no", "off"):
+        return False
+    RUNTIME.warm_async([collection_name()], LLM_MODEL)
+    return True
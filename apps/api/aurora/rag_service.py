@@ -1,48 +1,27 @@
 from .config import settings
 import importlib
-from typing import Any, List, Dict, Optional, Tuple
+import time
+from functools import lru_cache
+from typing import Any, List, Dict, Optional
 from pathlib import Path
 import json
 from .clients import meili
-from rapidfuzz import fuzz
+from . import citation_scoring, rag_runtime
 def _get_qdrant_client():
-    try:
-        from qdrant_client import QdrantClient  # type: ignore
-    except Exception as e:
-        raise RuntimeError("Qdrant client not installed. Install qdrant-client to enable vector search.") from e
-    if not settings.qdrant_url:
-        raise RuntimeError("Qdrant URL not configured")
-    return QdrantClient(url=settings.qdrant_url)
+    return rag_runtime.RUNTIME.client()
 
 
 
 def get_rag_index(collection: str = "docs"):
-    try:
-        li = importlib.import_module("llama_index")
-        li_qdrant = importlib.import_module("llama_index.vector_stores.qdrant")
-    except Exception as e:
-        raise RuntimeError("LlamaIndex not installed or incompatible. Install dependencies to enable RAG.") from e
-
-    client = _get_qdrant_client() if settings.qdrant_url else None
-    QdrantVectorStore: Any = getattr(li_qdrant, "QdrantVectorStore")
-    StorageContext: Any = getattr(li, "StorageContext")
-    VectorStoreIndex: Any = getattr(li, "VectorStoreIndex")
-    if client is None:
-        raise RuntimeError("Qdrant URL not configured")
-    vs = QdrantVectorStore(client=client, collection_name=collection)
-    storage = StorageContext.from_defaults(vector_store=vs)
-    return VectorStoreIndex.from_vector_store(vs, storage_context=storage)
+    """Pooled index for `collection` (built once per process, see rag_runtime)."""
+    return rag_runtime.RUNTIME.index(collection)
 
 
 def get_llm(model: str = "llama3.1:8b"):
-    try:
-        li_ollama = importlib.import_module("llama_index.llms.ollama")
-    except Exception as e:
-        raise RuntimeError("Ollama LLM wrapper missing. Install llama-index and restart.") from e
-    Ollama: Any = getattr(li_ollama, "Ollama")
-    return Ollama(model=model, base_url=settings.ollama_base_url)
+    return rag_runtime.RUNTIME.llm(model)
 
 
+@lru_cache(maxsize=1)
 def _load_prompt() -> str:
     p = Path(__file__).resolve().parents[3] / "models" / "prompts" / "company_brief_prompt.txt"
     try:
@@ -70,40 +49,50 @@ def _try_parse_json(text: str) -> Optional[dict]:
 
 
 def answer_with_citations(question: str) -> dict:
+    t0 = time.perf_counter()
     # Hybrid: keyword search via Meilisearch
-    hits: List[Dict] = []
-    if meili:
-        try:
-            res = meili.index("companies").search(question, {"limit": 5})
-            for h in res.get("hits", []):
-                hits.append({"source": "meilisearch", **h})
-        except Exception:
-            pass
+    hits: List[Dict] = citation_scoring.COMPANIES.search(meili, question, rag_runtime.tenant_id(), limit=5)
 
-    # Vector search via LlamaIndex/Qdrant
+    # Vector search via LlamaIndex/Qdrant; client, index, query engine and LLM come from the pooled runtime
     prompt = _load_prompt()
+    t_setup = time.perf_counter()
+    setup_ms = query_ms = 0.0
+    runtime = rag_runtime.RUNTIME
+    collection = rag_runtime.collection_name()
     try:
-        index = get_rag_index()
-        # Retrieve a bit more, we'll rerank down
-        query_engine = index.as_query_engine(similarity_top_k=8)
-        _ = get_llm()  # ensure LLM is available
+        # Retrieves a bit more (similarity_top_k=8); we rerank down
+        query_engine = runtime.query_engine(collection)
+        _ = runtime.llm(rag_runtime.LLM_MODEL)  # ensure LLM is available
+        setup_ms = (time.perf_counter() - t_setup) * 1000.0
         # Prepend system prompt guidance
         full_q = f"{prompt}\n\nQuestion: {question}\nReturn strict JSON only."
-        resp = query_engine.query(full_q)
+        t_query = time.perf_counter()
+        try:
+            resp = query_engine.query(full_q)
+        except Exception:
+            # Stale connection or dropped collection: rebuild on the next question
+            runtime.invalidate(collection)
+            raise
+        finally:
+            query_ms = (time.perf_counter() - t_query) * 1000.0
     except Exception:
         # If vector path fails, degrade gracefully
         resp = "Insufficient evidence"
+        if not setup_ms:
+            setup_ms = (time.perf_counter() - t_setup) * 1000.0
+    t_post = time.perf_counter()
     sources = []  # raw nodes capture
     for node in getattr(resp, "source_nodes", []) or []:
         meta = getattr(node.node, "metadata", {}) or {}
         text = getattr(node.node, "text", None)
         vscore = getattr(node, "score", None)
-        sources.append({
+        src = {
             "source_id": getattr(node.node, "node_id", None),
             "text": text,
             "vector_score": vscore,
             **meta,
-        })
+        }
+        sources.append(src)
 
     # Merge and dedupe sources
     merged_sources = []
@@ -113,55 +102,38 @@ def answer_with_citations(question: str) -> dict:
         if key and key not in seen:
             merged_sources.append(s)
             seen.add(key)
-    # Rerank sources by combined score: 0.6 * vector_sim + 0.4 * keyword_fuzz
-    # vector_score is expected in [0,1]; keyword fuzz in [0,100]
-    def _score_components(src: Dict) -> Tuple[float, float]:
-        title = str(src.get("title") or "")
-        url = str(src.get("url") or "")
-        text = str(src.get("text") or "")
-        # Keyword-based fuzzy score (0..100)
-        fuzz_score = float(max(
-            fuzz.token_set_ratio(question, title),
-            fuzz.partial_ratio(question, url),
-            fuzz.token_set_ratio(question, text[:256])
-        ))
-        # Vector similarity score (0..1)
-        v = src.get("vector_score")
-        try:
-            v = float(v) if v is not None else 0.0
-        except Exception:
-            v = 0.0
-        v = max(0.0, min(1.0, v))
-        return v, fuzz_score
-
-    def _hybrid_score(src: Dict) -> float:
-        v, fz = _score_components(src)
-        return 0.6 * v + 0.4 * (fz / 100.0)
-
-    merged_sources.sort(key=_hybrid_score, reverse=True)
+    # Rerank sources by combined score: 0.6 * vector_sim + 0.4 * keyword_fuzz, scored in one batch
+    scores = citation_scoring.score_sources(question, merged_sources)
+    ranked = sorted(zip(scores, merged_sources), key=lambda x: x[0][2], reverse=True)
     # Compress sources into citations with short snippets
     citations: List[Dict] = []
-    for s in merged_sources[:6]:
+    for (v, fz, hybrid), s in ranked[:6]:
         snippet = (str(s.get("text") or "").strip().replace("\n", " ")[:200]) if s.get("text") else None
-        entry = {k: v for k, v in s.items() if k != "text"}
-        # include audit scores if available
-        try:
-            v, fz = _score_components(s)
-            entry["vector_score"] = v
-            entry["keyword_fuzz"] = fz
-            entry["hybrid_score"] = _hybrid_score(s)
-        except Exception:
-            pass
+        entry = {k: val for k, val in s.items() if k != "text"}
+        # include audit scores
+        entry["vector_score"] = v
+        entry["keyword_fuzz"] = fz
+        entry["hybrid_score"] = hybrid
         if snippet:
             entry["snippet"] = snippet
         citations.append(entry)
+    post_ms = (time.perf_counter() - t_post) * 1000.0
 
     # Attempt JSON parse for strict schema path
     maybe = _try_parse_json(str(resp)) if not isinstance(resp, dict) else resp
     answer_payload = maybe if maybe is not None else (resp if isinstance(resp, dict) else str(resp))
     if not citations:
         answer_payload = "Insufficient evidence"
-    return {"answer": answer_payload, "sources": citations}
+    return {
+        "answer": answer_payload,
+        "sources": citations,
+        "timings_ms": {
+            "setup": round(setup_ms, 2),
+            "query": round(query_ms, 2),
+            "postprocess": round(post_ms, 2),
+            "total": round((time.perf_counter() - t0) * 1000.0, 2),
+        },
+    }
 
 
 def seed_sample_docs():
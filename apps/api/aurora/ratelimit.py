@@ -1,25 +1,192 @@
+"""Per-client rate limiting for `rate_limit_middleware` (and a few endpoints).
+
+Sliding-window counter: each (key, route) keeps the request count of the current
+and previous fixed window, and a request is allowed while
+
+    prev * (1 - elapsed_fraction_of_current_window) + cur < limit
+
+so a client cannot get 2x the limit by straddling a window boundary. State is
+three integers per active key.
+
+Backends:
+
+* `MemoryBackend` – in-process; keys live in an LRU ordered by last use, so
+  keys idle for two windows (whose estimate is zero) are evicted from the cold
+  end in O(1) amortized, and `max_keys` bounds the total;
+* `DbBackend` – one row per key in `rate_limit_buckets`, updated by a single
+  atomic upsert (`ON CONFLICT DO UPDATE .. WHERE <estimate> < limit RETURNING`)
+  so several uvicorn workers share limits through the app database (SQLite or
+  Postgres). Idle rows are deleted at most once per window. Each hit is a DB
+  round trip, so `Limiter.blocking` is set and the middleware runs it in the
+  threadpool instead of on the event loop. Backend errors (e.g. lock timeouts
+  under load) are counted in `errors` / `last_error` and exported as
+  `aurora_rate_limit_backend_errors_total`. They allow the request unless
+  `RATE_LIMIT_FAIL_OPEN=false`.
+
+`RATE_LIMIT_BACKEND` (`memory` | `db`) selects the backend.
+"""
+
 from __future__ import annotations
 
-from typing import Dict, Tuple
+import threading
 import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from .config import settings
 
-# Tiny in-memory rate limiter (best-effort; replace with Redis in prod)
-_BUCKETS: Dict[Tuple[str, str], Tuple[int, float]] = {}
+WINDOW_S = 60.0
+
+_READY: Set[str] = set()
+
+
+def _window(now: float, window_s: float) -> Tuple[int, float]:
+    """(window index, elapsed fraction of that window) for a timestamp."""
+    w = int(now // window_s)
+    return w, (now - w * window_s) / window_s
+
+
+class MemoryBackend:
+    blocking = False
+    errors = 0
+
+    def __init__(self, max_keys: int = 100000) -> None:
+        self.max_keys = max(1, int(max_keys))
+        # (key, route) -> [window index, cur count, prev count]; least recently used first
+        self._slots: "OrderedDict[Tuple[str, str], List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def hit(self, key: str, route: str, limit: int, window_s: float, now: float) -> bool:
+        w, frac = _window(now, window_s)
+        k = (key, route)
+        with self._lock:
+            slot = self._slots.get(k)
+            if slot is None:
+                slot = [w, 0, 0]
+                self._slots[k] = slot
+            else:
+                self._slots.move_to_end(k)
+                if slot[0] != w:
+                    slot[2] = slot[1] if slot[0] == w - 1 else 0
+                    slot[1] = 0
+                    slot[0] = w
+            allowed = slot[2] * (1.0 - frac) + slot[1] < limit
+            if allowed:
+                slot[1] += 1
+            self._evict(w)
+        return allowed
+
+    def _evict(self, w: int) -> None:
+        slots = self._slots
+        while slots:
+            oldest = next(iter(slots.values()))
+            if oldest[0] >= w - 1 and len(slots) <= self.max_keys:
+                break
+            slots.popitem(last=False)
+            self.evicted += 1
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+_UPSERT_SQL = (
+    "INSERT INTO rate_limit_buckets (k, win, cur, prev) VALUES (:k, :w, 1, 0) "
+    "ON CONFLICT (k) DO UPDATE SET "
+    "prev = CASE WHEN rate_limit_buckets.win = :w THEN rate_limit_buckets.prev WHEN rate_limit_buckets.win = :w - 1 THEN rate_limit_buckets.cur ELSE 0 END, "
+    "cur = CASE WHEN rate_limit_buckets.win = :w THEN rate_limit_buckets.cur ELSE 0 END + 1, "
+    "win = :w "
+    "WHERE (CASE WHEN rate_limit_buckets.win = :w THEN rate_limit_buckets.prev WHEN rate_limit_buckets.win = :w - 1 THEN rate_limit_buckets.cur ELSE 0 END) * :rest "
+    "+ (CASE WHEN rate_limit_buckets.win = :w THEN rate_limit_buckets.cur ELSE 0 END) < :lim "
+    "RETURNING cur"
+)
+
+
+class DbBackend:
+    blocking = True
+
+    def __init__(self, engine: Any, fail_open: bool = True) -> None:
+        self._engine = engine
+        self._swept_window: Optional[int] = None
+        self.fail_open = bool(fail_open)
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def ensure_schema(self) -> None:
+        key = str(getattr(self._engine, "url", id(self._engine)))
+        if key in _READY:
+            return
+        from sqlmodel import SQLModel  # type: ignore
+        from .db import RateLimitBucket  # type: ignore
+
+        SQLModel.metadata.create_all(self._engine, tables=[RateLimitBucket.__table__])  # type: ignore[attr-defined]
+        _READY.add(key)
+
+    def hit(self, key: str, route: str, limit: int, window_s: float, now: float) -> bool:
+        from sqlalchemy import text  # type: ignore
+
+        w, frac = _window(now, window_s)
+        try:
+            self.ensure_schema()
+            with self._engine.begin() as conn:
+                row = conn.execute(text(_UPSERT_SQL), {"k": f"{route}|{key}", "w": w, "rest": 1.0 - frac, "lim": limit}).first()
+                if self._swept_window != w:
+                    self._swept_window = w
+                    conn.execute(text("DELETE FROM rate_limit_buckets WHERE win < :w"), {"w": w - 1})
+        except Exception as exc:
+            self.errors += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"[:200]
+            return self.fail_open
+        return row is not None
+
+
+class Limiter:
+    def __init__(self, backend: Any, window_s: float = WINDOW_S) -> None:
+        self.backend = backend
+        self.window_s = float(window_s)
+
+    @property
+    def blocking(self) -> bool:
+        """True when `allow` does I/O and must not run on the event loop."""
+        return bool(getattr(self.backend, "blocking", False))
+
+    def allow(self, key: str, route: str, limit: Optional[int] = None, now: Optional[float] = None) -> bool:
+        lim = max(1, int(limit if limit is not None else settings.rate_limit_per_minute))
+        return self.backend.hit(key, route, lim, self.window_s, time.time() if now is None else now)
+
+    def info(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"backend": type(self.backend).__name__, "window_s": self.window_s, "errors": self.backend.errors}
+        if isinstance(self.backend, MemoryBackend):
+            out.update({"keys": len(self.backend), "evicted": self.backend.evicted})
+        if isinstance(self.backend, DbBackend):
+            out.update({"fail_open": self.backend.fail_open, "last_error": self.backend.last_error})
+        return out
+
+
+def _from_settings() -> Limiter:
+    if str(getattr(settings, "rate_limit_backend", "memory") or "memory").lower() == "db":
+        from .db import engine  # type: ignore
+
+        if engine is not None:
+            return Limiter(DbBackend(engine, fail_open=bool(getattr(settings, "rate_limit_fail_open", True))))
+    return Limiter(MemoryBackend(max_keys=int(getattr(settings, "rate_limit_max_keys", 100000) or 100000)))
+
+
+LIMITER = _from_settings()
 
 
 def allow(key: str, route: str) -> bool:
     if not settings.rate_limit_enabled:
         return True
-    limit = max(1, int(settings.rate_limit_per_minute))
-    now = time.time()
-    k = (key, route)
-    count, ts = _BUCKETS.get(k, (0, now))
-    if now - ts > 60:
-        _BUCKETS[k] = (1, now)
-        return True
-    if count < limit:
-        _BUCKETS[k] = (count + 1, ts)
+    return LIMITER.allow(key, route)
+
+
+async def allow_async(key: str, route: str) -> bool:
+    """`allow` for async callers; DB-backed hits run in the threadpool."""
+    if not settings.rate_limit_enabled:
         return True
-    return False
+    if LIMITER.blocking:
+        from starlette.concurrency import run_in_threadpool  # type: ignore
+
+        return await run_in_threadpool(LIMITER.allow, key, route)
+    return LIMITER.allow(key, route)
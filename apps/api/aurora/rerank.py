@@ -0,0 +1,119 @@
+"""Cross-encoder reranking service: pair-score cache and cross-request micro-batching.
+
+`retrieval._bge_rerank` used to call `CrossEncoder.predict` once per request on
+that request's (query, passage) pairs. Concurrent copilot requests each paid the
+fixed per-call overhead. Identical pairs (the same question over the same top
+documents) were scored again every time. This service sits in front of the model:
+
+1. an in-process LRU of float scores keyed by (query hash, passage hash), one
+   service (and cache) per model id;
+2. a micro-batcher (`batching.MicroBatcher`). Pairs that miss the cache are
+   queued, and its worker drains up to `RERANK_MAX_BATCH` of them after
+   `RERANK_BATCH_WINDOW_MS` and issues one `model.predict(pairs)` call across
+   all in-flight requests. Identical in-flight pairs share one slot.
+
+Queries and passages are NFKC-normalized with whitespace collapsed. Case is kept
+because the bge reranker tokenizer is cased. `score` returns None when the model
+is unavailable or a batch fails, so callers can fall back to token overlap.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .batching import LruCache, MicroBatcher, ServiceRegistry
+
+
+def normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", str(text or "")).split())
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class RerankService:
+    def __init__(
+        self,
+        loader: Callable[[], Any],
+        model_id: str,
+        max_items: int = 65536,
+        batch_window_ms: float = 2.0,
+        max_batch: int = 64,
+        timeout_s: float = 30.0,
+    ) -> None:
+        self._loader = loader
+        self.model_id = model_id
+        self._cache = LruCache(max_items)
+        self._batcher = MicroBatcher(self._score_batch, "rerank-batcher", batch_window_ms, max_batch, timeout_s)
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "batches": 0, "scored": 0, "errors": 0}
+
+    # --- scoring ---
+    def _predict_now(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        model = self._loader()
+        if model is None:
+            raise RuntimeError("reranker unavailable")
+        scores = model.predict(pairs)
+        self.stats["batches"] += 1
+        self.stats["scored"] += len(pairs)
+        return [float(s) for s in scores]
+
+    def _score_batch(self, keys: List[str], pairs: List[Tuple[str, str]]) -> List[float]:
+        try:
+            scores = self._predict_now(pairs)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self._cache.put_many(zip(keys, scores))
+        return scores
+
+    def score(self, query: str, texts: Sequence[str]) -> Optional[List[float]]:
+        """Cross-encoder scores for (query, text) pairs, in input order; None when unavailable."""
+        q = normalize(query)
+        qh = _digest(q)
+        items = [(f"{qh}:{_digest(t)}", t) for t in (normalize(x) for x in texts)]
+        out: List[Optional[float]] = [self._cache.get(k) for k, _ in items]
+        self.stats["hits"] += sum(1 for s in out if s is not None)
+        missing: Dict[str, str] = {k: t for (k, t), s in zip(items, out) if s is None}
+        if not missing:
+            return out  # type: ignore[return-value]
+        self.stats["misses"] += len(missing)
+        try:
+            if self._batcher.enabled:
+                fresh = self._batcher.wait({k: self._batcher.submit(k, (q, t)) for k, t in missing.items()})
+            else:
+                fresh = dict(zip(missing, self._score_batch(list(missing), [(q, t) for t in missing.values()])))
+        except Exception:
+            return None
+        return [s if s is not None else fresh[k] for (k, _), s in zip(items, out)]
+
+    def info(self) -> Dict[str, Any]:
+        return {"model": self.model_id, "size": len(self._cache), "max_items": self._cache.max_items, "queued": self._batcher.qsize(), **self.stats}
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def _from_env(model_id: str, loader: Callable[[], Any]) -> RerankService:
+    return RerankService(
+        loader,
+        model_id,
+        max_items=int(os.getenv("RERANK_CACHE_SIZE", "65536")),
+        batch_window_ms=float(os.getenv("RERANK_BATCH_WINDOW_MS", "2")),
+        max_batch=int(os.getenv("RERANK_MAX_BATCH", "64")),
+    )
+
+
+_SERVICES: ServiceRegistry[RerankService] = ServiceRegistry(_from_env)
+
+
+def get_service(model_id: str, loader: Callable[[], Any]) -> RerankService:
+    """Process-wide service per model id, configured from env on first use."""
+    return _SERVICES.get(model_id, loader)
+
+
+def all_info() -> List[Dict[str, Any]]:
+    return _SERVICES.all_info()
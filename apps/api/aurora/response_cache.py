@@ -0,0 +1,353 @@
+"""Two-tier JSON response cache used by `/compare`, `/market/realtime` and dashboards.
+
+The previous protocol read `insight_cache` on every call (newest row per key,
+TTL parsed from ISO text), inserted a new row on every write and never evicted
+anything. This module keeps the table as the shared tier and fronts it:
+
+1. an in-process LRU bounded by `RESPONSE_CACHE_MAX_BYTES` (serialized JSON
+   size), with each entry's absolute expiry kept as a float;
+2. the `insight_cache` table, one row per key: migration 0027 removes legacy
+   duplicates and adds a unique index on `key_hash`, and writes are
+   `INSERT ... ON CONFLICT (key_hash) DO UPDATE`, so concurrent misses cannot
+   both insert. A daemon sweeper deletes expired rows every
+   `RESPONSE_CACHE_SWEEP_SEC`;
+3. single-flight: `RESPONSE_CACHE.flight(key)` lets one caller compute a miss
+   while concurrent callers for the same key wait, then read its result.
+
+Responses derived from `companies`/`company_metrics` (the `COMPANY_VIEWS`) are
+keyed `"<view>:<digest>"`. The company and metric writers (etl upserts and
+`POST /companies`) call `invalidate_company_views()`, which drops those keys
+from both tiers. Memory entries also live at most `RESPONSE_CACHE_MEM_TTL_SEC`,
+so an invalidation made by another process is picked up from the shared table
+within that window. Dashboards also read tables with other writers (hiring,
+patents, news), which do not invalidate, so they are cached for
+`COMPANY_DASHBOARD_TTL_SEC` (default 300) rather than a day. That bounds how
+stale such data can be.
+
+Entries are stored as JSON text. Every hit returns a fresh copy, so callers can
+mutate what they get back.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+SWEEP_PAGE = 1000
+# Cached views computed from companies/company_metrics; invalidated on writes to either
+COMPANY_VIEWS: Tuple[str, ...] = ("compare", "company_dashboard", "market_realtime")
+
+_UPSERT_SQL = (
+    "INSERT INTO insight_cache (key_hash, output_json, created_at, ttl) VALUES (:k, :o, :c, :t) "
+    "ON CONFLICT (key_hash) DO UPDATE SET output_json = excluded.output_json, created_at = excluded.created_at, ttl = excluded.ttl"
+)
+
+
+def _like_prefix(prefix: str) -> str:
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _parse_expiry(created_at: Any, ttl: Any) -> Optional[float]:
+    """Epoch seconds when a DB row expires; None means no TTL."""
+    if not ttl or not created_at:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(created_at))
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return ts.timestamp() + int(ttl)
+    except Exception:
+        return None
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        max_bytes: int = 32 * 1024 * 1024,
+        sweep_interval_s: float = 300.0,
+        flight_wait_s: float = 30.0,
+        mem_ttl_s: float = 60.0,
+    ) -> None:
+        self._session_factory = session_factory
+        self.max_bytes = max(0, int(max_bytes))
+        self.sweep_interval_s = float(sweep_interval_s)
+        self.flight_wait_s = float(flight_wait_s)
+        self.mem_ttl_s = float(mem_ttl_s)
+        self._lru: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flights: Dict[str, List[Any]] = {}  # key -> [lock, waiters]
+        self._sweeper: Optional[threading.Thread] = None
+        self.stats: Dict[str, int] = {"hits": 0, "db_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "coalesced": 0, "swept": 0, "invalidated": 0}
+
+    # --- memory tier ---
+    def _mem_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            ent = self._lru.get(key)
+            if ent is None:
+                return None
+            if ent[1] is not None and ent[1] <= time.time():
+                self._mem_drop(key)
+                return None
+            self._lru.move_to_end(key)
+            return ent[0]
+
+    def _mem_drop(self, key: str) -> None:
+        ent = self._lru.pop(key, None)
+        if ent is not None:
+            self._bytes -= len(ent[0])
+
+    def _mem_put(self, key: str, payload: str, expires_at: Optional[float]) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        if self._session_factory is not None and self.mem_ttl_s > 0:
+            # Bounded so invalidations made by other processes reach this tier via the table
+            cap = time.time() + self.mem_ttl_s
+            expires_at = cap if expires_at is None else min(expires_at, cap)
+        with self._lock:
+            self._mem_drop(key)
+            self._lru[key] = (payload, expires_at)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes and self._lru:
+                _, (old, _exp) = self._lru.popitem(last=False)
+                self._bytes -= len(old)
+                self.stats["evictions"] += 1
+
+    # --- DB tier ---
+    def _db_get(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        if self._session_factory is None:
+            return None
+        from sqlmodel import text as _text  # type: ignore
+
+        with self._session_factory() as s:
+            row = s.execute(
+                _text("SELECT output_json, created_at, ttl FROM insight_cache WHERE key_hash = :k LIMIT 1"),
+                {"k": key},
+            ).first()  # type: ignore[attr-defined]
+        if not row or not row[0]:
+            return None
+        expires_at = _parse_expiry(row[1], row[2])
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return str(row[0]), expires_at
+
+    def _db_put(self, key: str, payload: str, ttl_sec: int) -> None:
+        if self._session_factory is None:
+            return
+        from sqlmodel import text as _text  # type: ignore
+
+        params = {"k": key, "o": payload, "c": datetime.now(timezone.utc).isoformat(), "t": int(ttl_sec)}
+        with self._session_factory() as s:
+            try:
+                s.execute(_text(_UPSERT_SQL), params)  # type: ignore[attr-defined]
+            except Exception:
+                # Schema without the unique key_hash index (migration 0027 not applied)
+                s.rollback()  # type: ignore[attr-defined]
+                res = s.execute(_text("UPDATE insight_cache SET output_json = :o, created_at = :c, ttl = :t WHERE key_hash = :k"), params)  # type: ignore[attr-defined]
+                if not getattr(res, "rowcount", 0):
+                    s.execute(_text("INSERT INTO insight_cache (key_hash, output_json, created_at, ttl) VALUES (:k, :o, :c, :t)"), params)  # type: ignore[attr-defined]
+            s.commit()
+
+    def _db_delete(self, prefixes: Tuple[str, ...] = (), key: Optional[str] = None) -> None:
+        if self._session_factory is None:
+            return
+        from sqlmodel import text as _text  # type: ignore
+
+        with self._session_factory() as s:
+            if key is not None:
+                s.execute(_text("DELETE FROM insight_cache WHERE key_hash = :k"), {"k": key})  # type: ignore[attr-defined]
+            for prefix in prefixes:
+                s.execute(_text("DELETE FROM insight_cache WHERE key_hash LIKE :p ESCAPE '\\'"), {"p": _like_prefix(prefix)})  # type: ignore[attr-defined]
+            s.commit()
+
+    # --- public API ---
+    def _read(self, key: str) -> Optional[str]:
+        """Payload from memory, else from the table (promoted to memory); None on a miss."""
+        payload = self._mem_get(key)
+        if payload is not None:
+            self.stats["hits"] += 1
+            return payload
+        try:
+            found = self._db_get(key)
+        except Exception:
+            found = None
+        if found is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["db_hits"] += 1
+        self._mem_put(key, found[0], found[1])
+        return found[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        payload = self._read(key)
+        if payload is None:
+            return None
+        try:
+            return json.loads(payload)
+        except Exception:
+            return None
+
+    def set(self, key: str, data: Any, ttl_sec: int = 86400) -> None:
+        payload = json.dumps(data)
+        self._mem_put(key, payload, time.time() + int(ttl_sec) if ttl_sec else None)
+        self.stats["sets"] += 1
+        try:
+            self._db_put(key, payload, ttl_sec)
+        except Exception:
+            pass
+        self._ensure_sweeper()
+
+    def invalidate(self, key: str) -> None:
+        """Drop `key` from both tiers."""
+        with self._lock:
+            self._mem_drop(key)
+        try:
+            self._db_delete(key=key)
+        except Exception:
+            pass
+
+    def invalidate_prefix(self, *prefixes: str) -> int:
+        """Drop every key starting with one of `prefixes` from both tiers; returns memory entries dropped."""
+        wanted = tuple(p for p in prefixes if p)
+        if not wanted:
+            return 0
+        with self._lock:
+            doomed = [k for k in self._lru if k.startswith(wanted)]
+            for k in doomed:
+                self._mem_drop(k)
+        self.stats["invalidated"] += len(doomed)
+        try:
+            self._db_delete(prefixes=wanted)
+        except Exception:
+            pass
+        return len(doomed)
+
+    def clear(self) -> int:
+        """Drop the memory tier (the DB tier expires on its own)."""
+        with self._lock:
+            n = len(self._lru)
+            self._lru.clear()
+            self._bytes = 0
+        return n
+
+    @contextmanager
+    def flight(self, key: str) -> Iterator[Optional[Any]]:
+        """Yield the cached value, or None to the single caller that should compute and `set` it.
+
+        Concurrent callers for the same key block until the computing caller
+        leaves the block (or `flight_wait_s` passes) and then re-read both tiers,
+        so a result stored by another process also ends the wait.
+        """
+        hit = self.get(key)
+        if hit is not None:
+            yield hit
+            return
+        with self._lock:
+            slot = self._flights.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        lock = slot[0]
+        if lock.locked():
+            self.stats["coalesced"] += 1
+        acquired = lock.acquire(timeout=self.flight_wait_s)
+        try:
+            # A previous holder (here or in another process) may have filled the key while we waited
+            payload = self._read(key) if acquired else None
+            yield json.loads(payload) if payload is not None else None
+        finally:
+            if acquired:
+                lock.release()
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] <= 0 and self._flights.get(key) is slot:
+                    del self._flights[key]
+
+    # --- expiry sweeper ---
+    def sweep(self) -> int:
+        """Delete expired rows from `insight_cache`; returns rows removed."""
+        if self._session_factory is None:
+            return 0
+        from sqlmodel import text as _text  # type: ignore
+
+        now = time.time()
+        removed = 0
+        last_key = ""
+        with self._session_factory() as s:
+            while True:
+                rows = list(
+                    s.execute(
+                        _text("SELECT key_hash, created_at, ttl FROM insight_cache WHERE key_hash > :last ORDER BY key_hash LIMIT :lim"),
+                        {"last": last_key, "lim": SWEEP_PAGE},
+                    )
+                )  # type: ignore[attr-defined]
+                if not rows:
+                    break
+                last_key = str(rows[-1][0])
+                doomed: List[Dict[str, Any]] = []
+                for key, created_at, ttl in rows:
+                    exp = _parse_expiry(created_at, ttl)
+                    if exp is not None and exp <= now:
+                        # Matching created_at too, so a row rewritten since it was read survives
+                        doomed.append({"k": key, "c": created_at})
+                if doomed:
+                    s.execute(_text("DELETE FROM insight_cache WHERE key_hash = :k AND created_at = :c"), doomed)  # type: ignore[attr-defined]
+                removed += len(doomed)
+            s.commit()
+        self.stats["swept"] += removed
+        return removed
+
+    def _ensure_sweeper(self) -> None:
+        if self.sweep_interval_s <= 0 or self._session_factory is None:
+            return
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        with self._lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(target=self._sweep_loop, name="response-cache-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval_s)
+            try:
+                self.sweep()
+            except Exception:
+                pass
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            size, used = len(self._lru), self._bytes
+        return {"size": size, "bytes": used, "max_bytes": self.max_bytes, **self.stats}
+
+
+def _default_session_factory() -> Any:
+    from .db import get_session
+
+    return get_session()
+
+
+RESPONSE_CACHE = ResponseCache(
+    _default_session_factory,
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    sweep_interval_s=float(os.getenv("RESPONSE_CACHE_SWEEP_SEC", "300")),
+    mem_ttl_s=float(os.getenv("RESPONSE_CACHE_MEM_TTL_SEC", "60")),
+)
+
+
+def view_key(view: str, digest: str) -> str:
+    """Cache key for a response; company views carry their name so they can be invalidated together."""
+    return f"{view}:{digest}" if view in COMPANY_VIEWS else digest
+
+
+def invalidate_company_views() -> int:
+    """Called after companies or company_metrics change (best-effort)."""
+    try:
+        return RESPONSE_CACHE.invalidate_prefix(*(f"{v}:" for v in COMPANY_VIEWS))
+    except Exception:
+        return 0
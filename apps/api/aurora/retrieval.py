@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple, Sequence, cast
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Any, Callable, Dict, List, Tuple, Sequence
 
 from .config import settings
 import os
@@ -33,6 +37,9 @@ def _current_tenant_id() -> str | None:
 
 _embedder = None
 _reranker = None
+_reranker_failed_at: float | None = None  # monotonic time of the last failed CrossEncoder load
+EMBED_MODEL_ID = "BAAI/bge-small-en-v1.5"
+RERANK_MODEL_ID = "BAAI/bge-reranker-base"
 
 
 def _load_embedder():
@@ -42,27 +49,55 @@ def _load_embedder():
     try:
         from sentence_transformers import SentenceTransformer  # type: ignore
 
-        _embedder = SentenceTransformer("BAAI/bge-small-en-v1.5")
+        _embedder = SentenceTransformer(EMBED_MODEL_ID)
         return _embedder
     except Exception:
         return None
 
 
+def _query_embedding(query: str) -> Sequence[float] | None:
+    """Cached, micro-batched query embedding (see embeddings.EmbeddingService)."""
+    from .embeddings import get_service
+
+    return get_service(EMBED_MODEL_ID, _load_embedder).embed(query)
+
+
+def _rerank_retry_backoff() -> float:
+    try:
+        return max(0.0, float(os.getenv("RERANK_RETRY_BACKOFF_SEC", "60")))
+    except ValueError:
+        return 60.0
+
+
 def _load_reranker():
-    global _reranker
+    global _reranker, _reranker_failed_at
     if _reranker is not None:
         return _reranker
     if not getattr(settings, "rerank_enabled", True):
         return None
+    # Don't retry the import/download on every request, but recover from transient failures
+    if _reranker_failed_at is not None and time.monotonic() - _reranker_failed_at < _rerank_retry_backoff():
+        return None
     try:
         from sentence_transformers import CrossEncoder  # type: ignore
 
-        _reranker = CrossEncoder("BAAI/bge-reranker-base")
+        _reranker = CrossEncoder(RERANK_MODEL_ID)
+        _reranker_failed_at = None
         return _reranker
     except Exception:
+        _reranker_failed_at = time.monotonic()
         return None
 
 
+def _rerank_candidates(top_k: int) -> int:
+    """How many fused candidates reach the cross-encoder (RERANK_CANDIDATES, never below top_k)."""
+    try:
+        n = int(os.getenv("RERANK_CANDIDATES", "20"))
+    except ValueError:
+        n = 20
+    return max(int(top_k), n)
+
+
 def _qdrant_search(query: str, limit: int = 12) -> List[Dict[str, Any]]:
     # Lazy import to avoid heavy dependency at module import time
     try:
@@ -71,14 +106,10 @@ def _qdrant_search(query: str, limit: int = 12) -> List[Dict[str, Any]]:
         qdrant = None  # type: ignore
     if not qdrant:
         return []
-    emb: Sequence[float] | None = None
-    emb_model = _load_embedder()
-    if emb_model:
-        try:
-            vec = emb_model.encode(query)
-            emb = cast(Sequence[float], vec.tolist() if hasattr(vec, "tolist") else list(vec))
-        except Exception:
-            emb = None
+    try:
+        emb = _query_embedding(query)
+    except Exception:
+        emb = None
     if not emb:
         return []
     try:
@@ -173,25 +204,27 @@ def _token_rerank(query: str, docs: List[Dict[str, Any]], top_k: int) -> List[Di
     q_tokens = set(query.lower().split())
     scored = []
     for d in docs:
-        text = (d.get("text") or "") + " " + " ".join(d.get("tags") or [])
-        s = sum(2 for t in q_tokens if t in text.lower())
+        text = ((d.get("text") or "") + " " + " ".join(d.get("tags") or [])).lower()
+        s = sum(2 for t in q_tokens if t in text)
         scored.append((s, d))
     scored.sort(key=lambda x: x[0], reverse=True)
     return [d for _, d in scored[:top_k]]
 
 
-def _bge_rerank(query: str, docs: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
-    rr = _load_reranker()
-    if not rr or not docs:
-        return _token_rerank(query, docs, top_k)
-    try:
-        pairs = [(query, d.get("text") or "") for d in docs]
-        scores = rr.predict(pairs)  # type: ignore
-        ranked = list(zip(scores, docs))
-        ranked.sort(key=lambda x: float(x[0]), reverse=True)
-        return [d for _, d in ranked[:top_k]]
-    except Exception:
-        return _token_rerank(query, docs, top_k)
+def _bge_rerank(query: str, docs: List[Dict[str, Any]], top_k: int, candidates: int | None = None) -> List[Dict[str, Any]]:
+    """Cross-encoder rerank of the first `candidates` docs (fused order) via the cached, batched service."""
+    if not docs:
+        return []
+    head = docs[: candidates if candidates is not None else _rerank_candidates(top_k)]
+    if _load_reranker() is None:
+        return _token_rerank(query, head, top_k)
+    from .rerank import get_service
+
+    scores = get_service(RERANK_MODEL_ID, _load_reranker).score(query, [d.get("text") or "" for d in head])
+    if scores is None:
+        return _token_rerank(query, head, top_k)
+    ranked = sorted(zip(scores, range(len(head))), key=lambda x: x[0], reverse=True)
+    return [head[i] for _, i in ranked[:top_k]]
 
 
 def rrf_fuse(rank_lists: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
@@ -214,14 +247,131 @@ def rrf_fuse(rank_lists: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[s
     return [id_to_doc[i] for i, _ in fused if i in id_to_doc]
 
 
+_leg_pool: ThreadPoolExecutor | None = None
+_leg_slots: threading.BoundedSemaphore | None = None
+_leg_pool_lock = threading.Lock()
+
+
+def _get_leg_pool() -> Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    """Shared leg executor plus one slot per worker.
+
+    A leg is only submitted when it can take a slot, so it never waits in the
+    executor queue. Slots are released when the leg finishes, so legs still
+    running past their deadline keep holding theirs.
+    """
+    global _leg_pool, _leg_slots
+    if _leg_pool is None or _leg_slots is None:
+        with _leg_pool_lock:
+            if _leg_pool is None or _leg_slots is None:
+                workers = max(1, int(os.getenv("HYBRID_LEG_WORKERS", "8")))
+                _leg_slots = threading.BoundedSemaphore(workers)
+                _leg_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hybrid-leg")
+    return _leg_pool, _leg_slots
+
+
+def _leg_timeout_s(name: str, default_ms: int) -> float:
+    try:
+        return max(0.0, float(os.getenv(f"HYBRID_{name.upper()}_TIMEOUT_MS", str(default_ms)))) / 1000.0
+    except Exception:
+        return default_ms / 1000.0
+
+
+def make_stub_leg(docs: List[Dict[str, Any]], delay_ms: float = 0.0, fail: bool = False) -> Callable[..., List[Dict[str, Any]]]:
+    """Offline stand-in for a retrieval leg (tests / local runs without Qdrant or Meilisearch)."""
+
+    def _leg(query: str, limit: int = 12) -> List[Dict[str, Any]]:
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+        if fail:
+            raise RuntimeError("stub leg failure")
+        return [dict(d) for d in docs[:limit]]
+
+    return _leg
+
+
+def hybrid_with_meta(
+    query: str,
+    top_n: int = 10,
+    rerank_k: int = 6,
+    dense_fn: Callable[..., List[Dict[str, Any]]] | None = None,
+    sparse_fn: Callable[..., List[Dict[str, Any]]] | None = None,
+    dense_timeout_ms: float | None = None,
+    sparse_timeout_ms: float | None = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Run dense and sparse legs concurrently, each under its own deadline, then fuse and rerank.
+
+    A leg that misses its deadline or raises contributes no results; the fusion is
+    then marked `partial`. When every worker is still busy (e.g. with legs that
+    overran earlier deadlines) a leg is skipped rather than queued behind them.
+    Returns (docs, meta) with per-leg status (ok/timeout/error/skipped),
+    `timed_out` flag and timings.
+    """
+    t0 = time.perf_counter()
+    legs = {
+        "dense": (dense_fn or _qdrant_search, dense_timeout_ms / 1000.0 if dense_timeout_ms is not None else _leg_timeout_s("dense", 1500)),
+        "sparse": (sparse_fn or _meili_search, sparse_timeout_ms / 1000.0 if sparse_timeout_ms is not None else _leg_timeout_s("sparse", 800)),
+    }
+    pool, slots = _get_leg_pool()
+    futures = {}
+    for name, (fn, _) in legs.items():
+        if not slots.acquire(blocking=False):
+            continue
+        ctx = contextvars.copy_context()
+        try:
+            fut = pool.submit(_timed_leg, ctx, fn, query)
+        except Exception:
+            slots.release()
+            continue
+        fut.add_done_callback(lambda _f: slots.release())
+        futures[name] = fut
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    meta_legs: Dict[str, Dict[str, Any]] = {}
+    for name, (_, timeout_s) in legs.items():
+        results[name] = []
+        if name not in futures:
+            meta_legs[name] = {"status": "skipped", "ms": 0.0, "count": 0, "timed_out": False}
+            continue
+        remaining = max(0.0, timeout_s - (time.perf_counter() - t0))
+        try:
+            docs, ms = futures[name].result(timeout=remaining)
+            results[name] = docs
+            meta_legs[name] = {"status": "ok", "ms": round(ms, 2), "count": len(docs), "timed_out": False}
+        except FuturesTimeout:
+            # The worker keeps running (and holding its slot) in the background; its result is discarded
+            futures[name].cancel()
+            meta_legs[name] = {"status": "timeout", "ms": round((time.perf_counter() - t0) * 1000.0, 2), "count": 0, "timed_out": True}
+        except Exception:
+            meta_legs[name] = {"status": "error", "ms": round((time.perf_counter() - t0) * 1000.0, 2), "count": 0, "timed_out": False}
+    partial = any(m["status"] != "ok" for m in meta_legs.values())
+    reranked: List[Dict[str, Any]] = []
+    rerank_ms = 0.0
+    if results["dense"] or results["sparse"]:
+        fused = rrf_fuse([results["dense"], results["sparse"]])[:top_n]
+        t_rr = time.perf_counter()
+        reranked = _bge_rerank(query, fused, top_k=rerank_k)
+        rerank_ms = (time.perf_counter() - t_rr) * 1000.0
+    meta = {
+        "partial": partial,
+        "legs": meta_legs,
+        "timings_ms": {
+            "dense": meta_legs["dense"]["ms"],
+            "sparse": meta_legs["sparse"]["ms"],
+            "rerank": round(rerank_ms, 2),
+            "total": round((time.perf_counter() - t0) * 1000.0, 2),
+        },
+    }
+    return reranked, meta
+
+
+def _timed_leg(ctx: contextvars.Context, fn: Callable[..., List[Dict[str, Any]]], query: str) -> Tuple[List[Dict[str, Any]], float]:
+    t = time.perf_counter()
+    docs = ctx.run(fn, query, limit=12)
+    return list(docs or []), (time.perf_counter() - t) * 1000.0
+
+
 def hybrid(query: str, top_n: int = 10, rerank_k: int = 6) -> List[Dict[str, Any]]:
-    dense = _qdrant_search(query, limit=12)
-    sparse = _meili_search(query, limit=12)
-    if not dense and not sparse:
-        return []
-    fused = rrf_fuse([dense, sparse])[:top_n]
-    reranked = _bge_rerank(query, fused, top_k=rerank_k)
-    return reranked
+    docs, _meta = hybrid_with_meta(query, top_n=top_n, rerank_k=rerank_k)
+    return docs
 
 
 def validate_citations(citations: List[Any], retrieved_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
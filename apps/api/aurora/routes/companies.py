@@ -4,6 +4,7 @@ from sqlmodel import select
 from pydantic import BaseModel
 from ..db import Company, get_session
 from ..clients import meili
+from .. import citation_scoring, cohort_stats, entity_detect, market_index, response_cache
 
 router = APIRouter()
 
@@ -31,6 +32,7 @@ def upsert_company(payload: CompanyCreate):
         if existing:
             existing.website = payload.website or existing.website
             existing.hq_country = payload.hq_country or existing.hq_country
+            segments_changed = payload.segments is not None and ",".join(payload.segments) != (existing.segments or "")
             if payload.segments is not None:
                 existing.segments = ",".join(payload.segments)
             if payload.funding_total is not None:
@@ -38,6 +40,18 @@ def upsert_company(payload: CompanyCreate):
             s.add(existing)
             s.commit()
             s.refresh(existing)
+            try:
+                market_index.COMPANY_INDEX.refresh(s, [existing.canonical_name])
+            except Exception:
+                pass
+            try:
+                entity_detect.GAZETTEER.refresh(s, [existing.canonical_name])
+            except Exception:
+                pass
+            if segments_changed:
+                cohort_stats.invalidate()
+            response_cache.invalidate_company_views()
+            citation_scoring.COMPANIES.clear()
             doc = {
                 "id": existing.id,
                 "canonical_name": existing.canonical_name,
@@ -61,6 +75,18 @@ def upsert_company(payload: CompanyCreate):
             s.add(comp)
             s.commit()
             s.refresh(comp)
+            try:
+                market_index.COMPANY_INDEX.refresh(s, [comp.canonical_name])
+            except Exception:
+                pass
+            try:
+                entity_detect.GAZETTEER.refresh(s, [comp.canonical_name])
+            except Exception:
+                pass
+            if payload.segments:
+                cohort_stats.invalidate()
+            response_cache.invalidate_company_views()
+            citation_scoring.COMPANIES.clear()
             doc = {
                 "id": comp.id,
                 "canonical_name": comp.canonical_name,
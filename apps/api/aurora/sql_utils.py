@@ -0,0 +1,27 @@
+"""Small SQL helpers shared by modules that bind large id/name lists.
+
+`chunked` splits a list into IN-list sized pieces and `expanding_text` builds
+a `text()` clause whose named parameters expand to `IN (...)` lists. Together
+they keep batch lookups portable across SQLite and Postgres without building
+SQL strings by hand.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable, List, Sequence
+
+# Max values bound into one IN list (SQLite's historical limit is 999 variables)
+IN_CHUNK = 500
+
+
+def chunked(items: Sequence[Any], size: int = IN_CHUNK) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield list(items[i : i + size])
+
+
+def expanding_text(sql: str, *names: str):
+    """Build a text() clause with expanding IN parameters (portable across SQLite/Postgres)."""
+    from sqlalchemy import bindparam  # type: ignore
+    from sqlmodel import text as _text  # type: ignore
+
+    return _text(sql).bindparams(*[bindparam(n, expanding=True) for n in names])
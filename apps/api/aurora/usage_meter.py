@@ -0,0 +1,306 @@
+"""Pre-aggregated usage counters behind quota checks and usage exports.
+
+`_enforce_quota` used to run `SUM(units) FROM usage_events WHERE ts LIKE ...`
+on every metered call, and `_inc_usage` inserted one raw row per call, so
+quota checks slowed down as the month filled up. This module keeps:
+
+* `usage_counters` – one row per (period_key, tenant_id, product) with the
+  running unit total. Every increment bumps both the monthly (`YYYY-MM`) and
+  the daily (`YYYY-MM-DD`) key, so either plan period is a primary-key read;
+* an in-process write-behind buffer. `record()` only touches memory. A daemon
+  flusher applies the buffered deltas as atomic
+  `INSERT .. ON CONFLICT DO UPDATE SET units = units + excluded.units` upserts,
+  and the raw events as one batched insert into `usage_events` (now an audit
+  log only), every `USAGE_FLUSH_SEC` or once `USAGE_FLUSH_BATCH` events are
+  pending. A failed flush puts the deltas back in the buffer.
+
+Reads (`used`, `totals`) add the deltas that have not been flushed yet,
+including those of a flush still in flight. Those stay in `_flushing` until
+its commit succeeds, or are merged back into the buffer when it fails. A read
+that overlaps a commit is retried (`_epoch`), so a quota check never lags
+behind the calls this process has already counted.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+CounterKey = Tuple[str, str, str]  # (period_key, tenant_id, product)
+
+_UPSERT_SQL = (
+    "INSERT INTO usage_counters (period_key, tenant_id, product, units, updated_at) VALUES (:pk, :tid, :prod, :units, :ts) "
+    "ON CONFLICT (period_key, tenant_id, product) DO UPDATE SET units = usage_counters.units + excluded.units, updated_at = excluded.updated_at"
+)
+_EVENT_SQL = (
+    "INSERT INTO usage_events (tenant_id, actor, product, verb, units, unit_type, meta_json, ts) "
+    "VALUES (:tid, :actor, :prod, :verb, :units, :ut, :meta, :ts)"
+)
+# Rebuilds counters from the audit log; used when the table is first created
+BACKFILL_SQL = (
+    "INSERT INTO usage_counters (period_key, tenant_id, product, units, updated_at) "
+    "SELECT substr(ts, 1, {n}), CAST(tenant_id AS TEXT), product, SUM(units), MAX(ts) FROM usage_events "
+    "WHERE ts IS NOT NULL AND tenant_id IS NOT NULL AND product IS NOT NULL GROUP BY substr(ts, 1, {n}), CAST(tenant_id AS TEXT), product"
+)
+
+_READY: Set[str] = set()
+
+
+def _raw_session(s: Any) -> Any:
+    return getattr(s, "_s", s)
+
+
+def period_keys(ts: datetime) -> Tuple[str, str]:
+    """(monthly, daily) keys for a timestamp, matching `main._period_key`."""
+    return ts.strftime("%Y-%m"), ts.strftime("%Y-%m-%d")
+
+
+def ensure_schema(s: Any) -> None:
+    """Create `usage_counters` on the session's bind when migrations have not run, backfilling from `usage_events`."""
+    bind = _raw_session(s).get_bind()
+    key = str(getattr(bind, "url", id(bind)))
+    if key in _READY:
+        return
+    from sqlalchemy import inspect  # type: ignore
+    from sqlmodel import SQLModel  # type: ignore
+    from .db import UsageCounter  # type: ignore
+
+    insp = inspect(bind)
+    if not insp.has_table("usage_counters"):
+        SQLModel.metadata.create_all(bind, tables=[UsageCounter.__table__])  # type: ignore[attr-defined]
+        if insp.has_table("usage_events"):
+            from sqlalchemy import text  # type: ignore
+
+            with bind.begin() as conn:
+                for n in (7, 10):
+                    conn.execute(text(BACKFILL_SQL.format(n=n)))
+    _READY.add(key)
+
+
+class UsageMeter:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        flush_interval_s: float = 2.0,
+        flush_batch: int = 200,
+        max_pending_events: int = 50000,
+    ) -> None:
+        self._session_factory = session_factory
+        self.flush_interval_s = float(flush_interval_s)
+        self.flush_batch = max(1, int(flush_batch))
+        self.max_pending_events = max(1, int(max_pending_events))
+        self._deltas: Dict[CounterKey, int] = {}
+        self._flushing: Dict[CounterKey, int] = {}  # swapped out by a flush, not yet committed
+        self._epoch = 0  # bumped when a flush commits
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self.stats: Dict[str, int] = {"recorded": 0, "flushes": 0, "flushed_events": 0, "flush_errors": 0, "dropped_events": 0}
+
+    @contextmanager
+    def _session(self) -> Iterator[Any]:
+        if self._session_factory is None:
+            raise RuntimeError("usage meter has no session factory")
+        with self._session_factory() as s:
+            ensure_schema(s)
+            yield s
+
+    # --- writes ---
+    def record(
+        self,
+        tenant_id: str,
+        actor: Optional[str],
+        product: str,
+        verb: str,
+        units: int,
+        unit_type: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        ts: Optional[datetime] = None,
+    ) -> None:
+        ts = ts or datetime.now(timezone.utc)
+        units = int(units)
+        event = {
+            "tid": str(tenant_id),
+            "actor": actor,
+            "prod": str(product),
+            "verb": verb,
+            "units": units,
+            "ut": unit_type,
+            "meta": json.dumps(meta or {}),
+            "ts": ts.isoformat(),
+        }
+        with self._lock:
+            for pk in period_keys(ts):
+                k = (pk, str(tenant_id), str(product))
+                self._deltas[k] = self._deltas.get(k, 0) + units
+            self._events.append(event)
+            self._trim_events()
+            self.stats["recorded"] += 1
+            pending = len(self._events)
+        if self.flush_interval_s <= 0:
+            self.flush()
+        elif pending >= self.flush_batch:
+            self._ensure_flusher()
+            self._wake.set()
+        else:
+            self._ensure_flusher()
+
+    def _trim_events(self) -> None:
+        over = len(self._events) - self.max_pending_events
+        if over > 0:
+            del self._events[:over]  # the counters keep the units; only the audit rows go
+            self.stats["dropped_events"] += over
+
+    def flush(self) -> int:
+        """Apply buffered deltas and audit rows in one transaction; returns the number of events written."""
+        with self._flush_lock:
+            with self._lock:
+                deltas, self._deltas = self._deltas, {}
+                self._flushing = deltas
+                events, self._events = self._events, []
+            if not deltas and not events:
+                return 0
+            now = datetime.now(timezone.utc).isoformat()
+            try:
+                from sqlalchemy import text  # type: ignore
+
+                with self._session() as s:
+                    if deltas:
+                        s.execute(
+                            text(_UPSERT_SQL),
+                            [{"pk": pk, "tid": tid, "prod": prod, "units": u, "ts": now} for (pk, tid, prod), u in deltas.items()],
+                        )  # type: ignore[attr-defined]
+                    if events:
+                        s.execute(text(_EVENT_SQL), events)  # type: ignore[attr-defined]
+                    s.commit()
+            except Exception:
+                with self._lock:
+                    for k, u in deltas.items():
+                        self._deltas[k] = self._deltas.get(k, 0) + u
+                    self._flushing = {}
+                    self._events[:0] = events
+                    self._trim_events()
+                    self.stats["flush_errors"] += 1
+                return 0
+            with self._lock:
+                self._flushing = {}
+                self._epoch += 1
+            self.stats["flushes"] += 1
+            self.stats["flushed_events"] += len(events)
+            return len(events)
+
+    def _ensure_flusher(self) -> None:
+        if self._session_factory is None:
+            return
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="usage-meter-flusher", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    # --- reads ---
+    def _pending_locked(self, key: CounterKey) -> int:
+        return int(self._deltas.get(key, 0)) + int(self._flushing.get(key, 0))
+
+    def pending(self, tenant_id: str, product: str, period_key: str) -> int:
+        """Buffered plus in-flight units not yet committed to `usage_counters`."""
+        with self._lock:
+            return self._pending_locked((period_key, str(tenant_id), str(product)))
+
+    def _consistent_read(self, read: Callable[[], Any], pending: Callable[[], Any]) -> Tuple[Any, Any]:
+        """(db result, pending snapshot) taken so that no committed flush is missed by both.
+
+        The snapshot is taken before the DB read. If a flush commits in between,
+        its units could be absent from the snapshot's DB read yet already
+        cleared from `_flushing`, so the pair is read again.
+        """
+        for _ in range(3):
+            with self._lock:
+                epoch, snap = self._epoch, pending()
+            got = read()
+            with self._lock:
+                if self._epoch == epoch:
+                    break
+        return got, snap
+
+    def used(self, tenant_id: str, product: str, period_key: str) -> Optional[int]:
+        """Units used in a period: one primary-key read plus unflushed deltas. None when the DB is unavailable."""
+        key = (period_key, str(tenant_id), str(product))
+
+        def _read() -> Any:
+            from sqlalchemy import text  # type: ignore
+
+            with self._session() as s:
+                return s.execute(
+                    text("SELECT units FROM usage_counters WHERE period_key = :pk AND tenant_id = :tid AND product = :prod"),
+                    {"pk": period_key, "tid": str(tenant_id), "prod": str(product)},
+                ).first()  # type: ignore[attr-defined]
+
+        try:
+            row, pend = self._consistent_read(_read, lambda: self._pending_locked(key))
+        except Exception:
+            return None
+        return int((row[0] if row else 0) or 0) + pend
+
+    def totals(self, period_key: str, tenant_id: Optional[str] = None) -> Optional[Dict[Tuple[str, str], int]]:
+        """{(tenant_id, product): units} for a period, including unflushed deltas. None when the DB is unavailable."""
+        sql = "SELECT tenant_id, product, units FROM usage_counters WHERE period_key = :pk"
+        params: Dict[str, Any] = {"pk": period_key}
+        if tenant_id is not None:
+            sql += " AND tenant_id = :tid"
+            params["tid"] = str(tenant_id)
+
+        def _read() -> Any:
+            from sqlalchemy import text  # type: ignore
+
+            with self._session() as s:
+                return list(s.execute(text(sql), params))  # type: ignore[attr-defined]
+
+        def _pending() -> List[Tuple[CounterKey, int]]:
+            return list(self._deltas.items()) + list(self._flushing.items())
+
+        try:
+            rows, pend = self._consistent_read(_read, _pending)
+        except Exception:
+            return None
+        out: Dict[Tuple[str, str], int] = {}
+        for r in rows:
+            k = (str(r[0]), str(r[1]))
+            out[k] = out.get(k, 0) + int(r[2] or 0)
+        for (pk, tid, prod), u in pend:
+            if pk == period_key and (tenant_id is None or tid == str(tenant_id)):
+                out[(tid, prod)] = out.get((tid, prod), 0) + u
+        return out
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"pending_events": len(self._events), "pending_counters": len(self._deltas), "flushing_counters": len(self._flushing), **self.stats}
+
+
+def _default_session_factory() -> Any:
+    from .db import get_session
+
+    return get_session()
+
+
+USAGE_METER = UsageMeter(
+    _default_session_factory,
+    flush_interval_s=float(os.getenv("USAGE_FLUSH_SEC", "2")),
+    flush_batch=int(os.getenv("USAGE_FLUSH_BATCH", "200")),
+)
@@ -0,0 +1,404 @@
+"""Batched, concurrent delivery engine for the durable webhook queue.
+
+The old `_lifespan` worker claimed one `webhook_queue` row per poll, slept a
+second when idle and posted synchronously. One slow subscriber stalled every
+tenant. This dispatcher:
+
+* claims batches. On Postgres the claim is `UPDATE ... WHERE id IN (SELECT ...
+  FOR UPDATE SKIP LOCKED) RETURNING`. On SQLite (single writer) the same UPDATE
+  runs without the locking clause, and rows are read back by a per-claim lease
+  token. A claimed row is `inflight` with `lease_owner`/`lease_until`, and rows
+  whose lease expired (crashed dispatcher) become claimable again;
+* never claims more than `per_endpoint` rows per URL, and skips URLs that are
+  saturated or whose circuit is open, so one endpoint cannot fill a batch. A
+  claimed row whose URL filled up in the meantime is released straight back to
+  pending (no attempt burned) rather than parked in memory past its lease;
+* delivers on a thread pool (`workers`), at most `per_endpoint` concurrent
+  requests per URL, over pooled keep-alive sessions;
+* retries with exponential backoff plus jitter. After `max_attempts` a row
+  moves to the `dead` state, with `last_error`, and can be requeued by an admin;
+* opens a per-URL circuit after `breaker_threshold` consecutive failures. While
+  it is open that URL's rows stay pending without burning attempts; after
+  `breaker_cooldown_s` one probe request is let through.
+
+Result writes are applied from the dispatcher thread in batches, so SQLite
+sees a single writer. The in-memory `_WEBHOOK_QUEUE` fallback (used when the DB
+insert failed) goes through the same delivery path.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from .sql_utils import chunked, expanding_text
+
+PENDING, INFLIGHT, DELIVERED, DEAD = "pending", "inflight", "delivered", "dead"
+LEASE_COLUMNS = (("lease_owner", "VARCHAR(64)"), ("lease_until", "VARCHAR(64)"), ("last_error", "TEXT"))
+
+_READY: Set[str] = set()
+
+_READY_SQL = "((status = 'pending' AND (next_at IS NULL OR next_at <= :now)) OR (status = 'inflight' AND (lease_until IS NULL OR lease_until < :now)))"
+_RANKED_SQL = (
+    "SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY url ORDER BY id) AS rn FROM webhook_queue "
+    f"WHERE {_READY_SQL} AND url NOT IN :busy) ranked WHERE rn <= :per_url ORDER BY id LIMIT :lim"
+)
+_COLS = "id, url, event, body_json, secret, attempt"
+
+
+def _iso(ts: Optional[float] = None) -> str:
+    return (datetime.now(timezone.utc) if ts is None else datetime.fromtimestamp(ts, timezone.utc)).isoformat()
+
+
+def ensure_schema(s: Any) -> None:
+    """Add the lease columns to `webhook_queue` when migrations have not run (once per bind)."""
+    bind = s.get_bind()
+    key = str(getattr(bind, "url", id(bind)))
+    if key in _READY:
+        return
+    from sqlalchemy import inspect  # type: ignore
+    from sqlmodel import text as _text  # type: ignore
+
+    have = {c["name"] for c in inspect(bind).get_columns("webhook_queue")}
+    for name, typ in LEASE_COLUMNS:
+        if name not in have:
+            s.execute(_text(f"ALTER TABLE webhook_queue ADD COLUMN {name} {typ}"))
+    s.commit()
+    _READY.add(key)
+
+
+class _Breaker:
+    __slots__ = ("failures", "open_until", "probing")
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]],
+        signer: Optional[Callable[[str, str, str], str]] = None,
+        sender: Optional[Callable[[str, str, Dict[str, str], float], int]] = None,
+        memory_queue: Optional[Deque[Dict[str, Any]]] = None,
+        *,
+        workers: int = 16,
+        per_endpoint: int = 4,
+        batch: int = 64,
+        lease_s: float = 30.0,
+        max_attempts: int = 5,
+        backoff_base_s: float = 2.0,
+        backoff_max_s: float = 300.0,
+        breaker_threshold: int = 5,
+        breaker_cooldown_s: float = 60.0,
+        timeout_s: float = 3.0,
+        poll_s: float = 0.5,
+    ) -> None:
+        self._session_factory = session_factory
+        self._signer = signer
+        self._sender = sender or self._http_send
+        self._memory = memory_queue
+        self.workers = max(1, int(workers))
+        self.per_endpoint = max(1, int(per_endpoint))
+        self.batch = max(1, int(batch))
+        self.lease_s = float(lease_s)
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base_s = float(backoff_base_s)
+        self.backoff_max_s = float(backoff_max_s)
+        self.breaker_threshold = max(1, int(breaker_threshold))
+        self.breaker_cooldown_s = float(breaker_cooldown_s)
+        self.timeout_s = float(timeout_s)
+        self.poll_s = float(poll_s)
+        self.owner = uuid.uuid4().hex[:12]
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="webhook-delivery")
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._inflight: Dict[str, int] = defaultdict(int)
+        self._breakers: Dict[str, _Breaker] = defaultdict(_Breaker)
+        self._results: Deque[Tuple[Dict[str, Any], bool, str]] = deque()
+        self._claims = 0
+        self._thread: Optional[threading.Thread] = None
+        self._local = threading.local()
+        self.dead_letters: Deque[Dict[str, Any]] = deque(maxlen=1000)  # memory-queue items only
+        self.stats: Dict[str, int] = {"claimed": 0, "delivered": 0, "retried": 0, "dead": 0, "released": 0, "breaker_opened": 0}
+
+    # --- transport ---
+    def _http_send(self, url: str, body: str, headers: Dict[str, str], timeout: float) -> int:
+        sess = getattr(self._local, "session", None)
+        if sess is None:
+            import requests  # type: ignore
+
+            sess = requests.Session()
+            self._local.session = sess
+        return int(getattr(sess.post(url, data=body, headers=headers, timeout=timeout), "status_code", 500))
+
+    def _deliver(self, job: Dict[str, Any]) -> None:
+        ok, err = False, ""
+        try:
+            ts = str(job.get("ts") or int(time.time()))
+            body = job.get("body") or "{}"
+            headers = {"Content-Type": "application/json", "X-Aurora-Event": job.get("event") or "unknown", "X-Aurora-Timestamp": ts}
+            if job.get("secret") and self._signer is not None:
+                headers["X-Aurora-Signature"] = self._signer(str(job["secret"]), ts, body)
+            code = self._sender(job["url"], body, headers, self.timeout_s)
+            ok = code < 400
+            err = "" if ok else f"http {code}"
+        except Exception as e:
+            err = f"{type(e).__name__}: {e}"[:500]
+        url = job["url"]
+        with self._lock:
+            self._inflight[url] -= 1
+            if self._inflight[url] <= 0:
+                del self._inflight[url]
+            br = self._breakers[url]
+            br.probing = False
+            if ok:
+                br.failures, br.open_until = 0, 0.0
+            else:
+                br.failures += 1
+                if br.failures >= self.breaker_threshold and br.open_until <= time.time():
+                    br.open_until = time.time() + self.breaker_cooldown_s
+                    self.stats["breaker_opened"] += 1
+            self._results.append((job, ok, err))
+        self._wake.set()
+
+    # --- scheduling ---
+    def _busy_urls(self) -> List[str]:
+        now = time.time()
+        with self._lock:
+            busy = {u for u, n in self._inflight.items() if n >= self.per_endpoint}
+            busy.update(u for u, b in self._breakers.items() if b.open_until > now or b.probing)
+        return sorted(busy)
+
+    def _try_start(self, job: Dict[str, Any]) -> str:
+        """'started', 'wait' (endpoint saturated) or 'blocked' (circuit open)."""
+        url = job["url"]
+        now = time.time()
+        with self._lock:
+            br = self._breakers.get(url)
+            if br is not None and br.failures >= self.breaker_threshold:
+                if br.open_until > now or br.probing:
+                    return "blocked"
+                br.probing = True  # half-open: a single probe
+            if self._inflight[url] >= self.per_endpoint:
+                return "wait"
+            self._inflight[url] += 1
+        self._pool.submit(self._deliver, job)
+        return "started"
+
+    def _capacity(self) -> int:
+        with self._lock:
+            return self.workers - sum(self._inflight.values())
+
+    def _claim_db(self, limit: int, busy: List[str]) -> List[Dict[str, Any]]:
+        if self._session_factory is None or limit <= 0:
+            return []
+        from sqlmodel import text as _text  # type: ignore
+
+        now = _iso()
+        self._claims += 1
+        token = f"{self.owner}:{self._claims}"
+        params = {"now": now, "busy": busy or [""], "per_url": self.per_endpoint, "lim": limit, "owner": token, "lu": _iso(time.time() + self.lease_s)}
+        with self._session_factory() as s:
+            ensure_schema(s)
+            claim = "UPDATE webhook_queue SET status = 'inflight', lease_owner = :owner, lease_until = :lu WHERE id IN "
+            if s.get_bind().dialect.name == "postgresql":
+                sql = claim + f"(SELECT id FROM webhook_queue WHERE id IN ({_RANKED_SQL}) AND {_READY_SQL} FOR UPDATE SKIP LOCKED) RETURNING {_COLS}"
+                rows = list(s.execute(expanding_text(sql, "busy"), params))
+            else:
+                s.execute(expanding_text(claim + f"({_RANKED_SQL})", "busy"), params)
+                rows = list(s.execute(_text(f"SELECT {_COLS} FROM webhook_queue WHERE lease_owner = :owner ORDER BY id"), {"owner": token}))
+            s.commit()
+        return [{"id": int(r[0]), "url": str(r[1] or ""), "event": r[2], "body": r[3], "secret": r[4], "attempt": int(r[5] or 0)} for r in rows]
+
+    def _claim_memory(self, limit: int, busy: List[str]) -> List[Dict[str, Any]]:
+        if self._memory is None or limit <= 0:
+            return []
+        now = time.time()
+        taken: List[Dict[str, Any]] = []
+        skip = set(busy)
+        for _ in range(len(self._memory)):
+            try:
+                item = self._memory.popleft()
+            except IndexError:
+                break
+            if len(taken) < limit and float(item.get("next_at", 0) or 0) <= now and item.get("url") and item["url"] not in skip:
+                taken.append({"id": None, "url": str(item["url"]), "event": item.get("event"), "body": item.get("body"), "secret": item.get("secret"), "attempt": int(item.get("attempt", 0) or 0), "ts": item.get("ts"), "item": item})
+            else:
+                self._memory.append(item)
+        self.stats["claimed"] += len(taken)
+        return taken
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max_s, self.backoff_base_s * (2 ** max(0, attempt - 1)))
+        return delay * (1.0 + 0.1 * random.random())  # nosec - jitter only
+
+    # --- result application (dispatcher thread) ---
+    def _apply_results(self, released: List[Tuple[Dict[str, Any], float, Optional[str]]]) -> int:
+        with self._lock:
+            results = list(self._results)
+            self._results.clear()
+        if not results and not released:
+            return 0
+        delivered: List[int] = []
+        updates: List[Dict[str, Any]] = []
+        now = time.time()
+        for job, ok, err in results:
+            if ok:
+                self.stats["delivered"] += 1
+                if job["id"] is not None:
+                    delivered.append(job["id"])
+                continue
+            attempt = int(job["attempt"]) + 1
+            dead = attempt >= self.max_attempts
+            self.stats["dead" if dead else "retried"] += 1
+            next_ts = now + self._backoff(attempt)
+            if job["id"] is None:
+                item = job["item"]
+                item["attempt"] = attempt
+                item["next_at"] = next_ts
+                (self.dead_letters if dead else self._memory).append(item)  # type: ignore[union-attr]
+                continue
+            updates.append({"id": job["id"], "st": DEAD if dead else PENDING, "a": attempt, "n": _iso(next_ts), "e": err})
+        for job, until, reason in released:
+            self.stats["released"] += 1
+            if job["id"] is None:
+                job["item"]["next_at"] = until
+                self._memory.append(job["item"])  # type: ignore[union-attr]
+            else:
+                updates.append({"id": job["id"], "st": PENDING, "a": int(job["attempt"]), "n": _iso(until), "e": reason})
+        if self._session_factory is not None and (delivered or updates):
+            from sqlmodel import text as _text  # type: ignore
+
+            with self._session_factory() as s:
+                for ids in chunked(delivered):
+                    s.execute(
+                        expanding_text("UPDATE webhook_queue SET status = 'delivered', lease_owner = NULL, lease_until = NULL, last_error = NULL WHERE id IN :ids", "ids"),
+                        {"ids": ids},
+                    )
+                if updates:
+                    s.execute(
+                        _text("UPDATE webhook_queue SET status = :st, attempt = :a, next_at = :n, last_error = COALESCE(:e, last_error), lease_owner = NULL, lease_until = NULL WHERE id = :id"),
+                        updates,
+                    )
+                s.commit()
+        return len(results)
+
+    def tick(self) -> int:
+        """Apply finished deliveries and claim new work; returns jobs started."""
+        released: List[Tuple[Dict[str, Any], float, Optional[str]]] = []
+        started = 0
+        free = min(self.batch, self._capacity())
+        if free > 0:
+            busy = self._busy_urls()
+            try:
+                jobs = self._claim_db(free, busy)
+            except Exception:
+                jobs = []
+            self.stats["claimed"] += len(jobs)
+            jobs += self._claim_memory(free - len(jobs), busy)
+            for job in jobs:
+                res = self._try_start(job)
+                if res == "started":
+                    started += 1
+                elif res == "wait":
+                    # Saturated since the claim: hand the row back instead of holding it past lease_until
+                    released.append((job, time.time(), None))
+                else:
+                    released.append((job, self._breakers[job["url"]].open_until, "circuit open"))
+        try:
+            self._apply_results(released)
+        except Exception:
+            pass
+        return started
+
+    def idle(self) -> bool:
+        with self._lock:
+            return not self._inflight and not self._results
+
+    def run_until_idle(self, timeout_s: float = 30.0) -> None:
+        """Drive the dispatcher from the caller's thread until nothing is ready or in flight."""
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            started = self.tick()
+            if not started and self.idle():
+                self.tick()  # flush results written by the last completions
+                if self.idle():
+                    return
+            self._wake.wait(0.05)
+            self._wake.clear()
+
+    # --- background loop ---
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                started = self.tick()
+            except Exception:
+                started = 0
+            if not started:
+                self._wake.wait(self.poll_s)
+                self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="webhook-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def info(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            open_circuits = sorted(u for u, b in self._breakers.items() if b.open_until > now)
+            inflight = sum(self._inflight.values())
+        return {"inflight": inflight, "open_circuits": open_circuits, "workers": self.workers, "per_endpoint": self.per_endpoint, **self.stats}
+
+
+def requeue_dead(s: Any, ids: Optional[List[int]] = None) -> int:
+    """Move dead-lettered rows back to pending with a fresh attempt budget."""
+    from sqlmodel import text as _text  # type: ignore
+
+    sql = "UPDATE webhook_queue SET status = 'pending', attempt = 0, next_at = :now, last_error = NULL WHERE status = 'dead'"
+    if ids:
+        res = s.execute(expanding_text(sql + " AND id IN :ids", "ids"), {"now": _iso(), "ids": [int(i) for i in ids]})
+    else:
+        res = s.execute(_text(sql), {"now": _iso()})
+    s.commit()
+    return int(getattr(res, "rowcount", 0) or 0)
+
+
+def from_env(session_factory: Optional[Callable[[], Any]], signer: Optional[Callable[[str, str, str], str]] = None, memory_queue: Optional[Deque[Dict[str, Any]]] = None, max_attempts: int = 5) -> WebhookDispatcher:
+    import os
+
+    def _num(name: str, default: float) -> float:
+        try:
+            return float(os.getenv(name, str(default)))
+        except Exception:
+            return default
+
+    return WebhookDispatcher(
+        session_factory,
+        signer=signer,
+        memory_queue=memory_queue,
+        workers=int(_num("WEBHOOK_WORKERS", 16)),
+        per_endpoint=int(_num("WEBHOOK_PER_ENDPOINT", 4)),
+        batch=int(_num("WEBHOOK_BATCH", 64)),
+        lease_s=_num("WEBHOOK_LEASE_SEC", 30.0),
+        max_attempts=max_attempts,
+        breaker_threshold=int(_num("WEBHOOK_BREAKER_THRESHOLD", 5)),
+        breaker_cooldown_s=_num("WEBHOOK_BREAKER_COOLDOWN_SEC", 60.0),
+        timeout_s=_num("WEBHOOK_TIMEOUT_SEC", 3.0),
+    )
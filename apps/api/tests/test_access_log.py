@@ -0,0 +1,36 @@
+import io
+import json
+
+from aurora.access_log import AccessLog, RotatingFileSink, StreamSink, parse_rules
+
+
+def _rec(log, route="/x", status=200, error=None):
+    return log.record(1700000000.0, "rid", "GET", route, route, status, 1.234, "1.2.3.4", error)
+
+
+def test_records_are_batched_sampled_and_dropped_when_full():
+    out = io.StringIO()
+    log = AccessLog(StreamSink(out), capacity=5, batch=2, flush_interval_s=0, rules=parse_rules("/healthz=0, *@2xx=0, junk"))
+    assert not _rec(log, "/healthz", 500)  # route rule wins before the status rule
+    assert not _rec(log, "/x", 204)
+    for _ in range(6):
+        _rec(log, "/x", 503)
+    assert log.stats == {"recorded": 5, "sampled_out": 2, "dropped": 1, "written": 0, "write_errors": 0}
+
+    assert log.flush() == 5
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 5
+    first = json.loads(lines[0])
+    assert first["status"] == 503 and first["dur_ms"] == 1.23 and first["ts"].startswith("2023-11-14T22:13:20")
+    assert "error" not in first
+    assert log.info()["buffered"] == 0
+
+
+def test_rotating_file_sink(tmp_path):
+    path = tmp_path / "access.log"
+    log = AccessLog(RotatingFileSink(str(path), max_bytes=300, backups=2), batch=3, flush_interval_s=0)
+    for _ in range(9):
+        _rec(log, error="ValueError")
+    log.flush()
+    assert (tmp_path / "access.log.1").exists()
+    assert json.loads((tmp_path / "access.log.1").read_text().splitlines()[0])["error"] == "ValueError"
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aurora import apikey_cache
+from aurora.main import _resolve_apikey, app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def _env(monkeypatch):
+    monkeypatch.setenv("DEV_ADMIN_TOKEN", "tok")
+    monkeypatch.delenv("API_KEYS", raising=False)
+    monkeypatch.setattr(apikey_cache, "AUTH_CACHE", apikey_cache.AuthCache(ttl_s=60, negative_ttl_s=60))
+
+
+def test_resolution_is_cached_and_revocation_is_immediate():
+    plain = f"sk_{uuid.uuid4().hex[:24]}"
+    assert _resolve_apikey(plain) is None  # unknown key: cached negatively
+    assert _resolve_apikey(plain) is None
+    cache = apikey_cache.AUTH_CACHE
+    assert cache.stats["negative_hits"] == 1
+
+    r = client.post("/admin/api-keys", params={"token": "tok"}, json={"tenant_id": "4242", "key": plain})
+    assert r.status_code in (200, 501)
+    if r.status_code == 501:
+        pytest.skip("api_keys table not available")
+    assert _resolve_apikey(plain)["tenant_id"] == "4242"  # creation dropped the negative entry
+    assert _resolve_apikey(plain)["tenant_id"] == "4242"
+    assert cache.stats["hits"] == 1
+
+    key_id = next(k["id"] for k in client.get("/admin/api-keys", params={"token": "tok"}).json()["api_keys"] if k["prefix"] == plain[:8])
+    r = client.delete(f"/admin/api-keys/{key_id}", params={"token": "tok"})
+    assert r.status_code == 200 and r.json()["status"] == "revoked"
+    assert _resolve_apikey(plain) is None
+
+    client.get("/healthz", headers={"X-API-Key": plain})
+    overhead = client.get("/dev/metrics").json()["auth"]["overhead_ms"]
+    assert overhead["samples"] >= 1 and overhead["p95"] >= overhead["p50"] >= 0
+
+
+def test_revocation_watermark_drops_positive_entries_in_other_workers():
+    other = apikey_cache.AuthCache(ttl_s=60, negative_ttl_s=60, revocation_check_s=0)  # e.g. a second uvicorn worker
+    mark = ["2025-10-01T00:00:00+00:00"]
+    other.put("live", {"tenant_id": "1"})
+    other.put("unknown", None)
+    assert not other.check_revocations(lambda: mark[0])  # first poll only records the watermark
+    assert other.get("live") == {"tenant_id": "1"}
+    mark[0] = "2025-10-02T00:00:00+00:00"  # some worker revoked a key
+    assert other.check_revocations(lambda: mark[0])
+    assert other.get("live") is apikey_cache.MISS
+    assert other.get("unknown") is None  # negatives cannot be revoked
+
+
+def test_plans_follow_the_plans_table(monkeypatch):
+    from sqlmodel import text
+
+    from aurora import main
+    from aurora.db import get_session
+
+    monkeypatch.setenv("PLANS_RECHECK_SEC", "0")
+    code = f"p_{uuid.uuid4().hex[:8]}"
+    try:
+        with get_session() as s:
+            s.execute(text("INSERT INTO plans (code, name, period, entitlements_json) VALUES (:c, :c, 'monthly', :e)"), {"c": code, "e": '{"api_calls": 7}'})
+            s.commit()
+    except Exception:
+        pytest.skip("plans table not available")
+    try:
+        main._ensure_plans_loaded()
+        assert main._get_plan_entitlements(code) == {"api_calls": 7}
+    finally:
+        with get_session() as s:
+            s.execute(text("DELETE FROM plans WHERE code = :c"), {"c": code})
+            s.commit()
+    main._ensure_plans_loaded()
+    assert main._get_plan_entitlements(code) == {}
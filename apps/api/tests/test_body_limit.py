@@ -0,0 +1,52 @@
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from aurora.body_limit import BodyLimitMiddleware, parse_route_limits
+
+
+def _app():
+    app = FastAPI()
+
+    @app.post("/small")
+    async def small(request: Request):
+        return {"n": len(await request.body())}
+
+    @app.post("/bulk/load")
+    async def bulk(request: Request):
+        n = 0
+        async for chunk in request.stream():
+            n += len(chunk)
+        return {"n": n}
+
+    app.add_middleware(BodyLimitMiddleware, max_bytes=100, route_limits=parse_route_limits("/bulk=1000, bad, /x=y"))
+    return app
+
+
+def test_content_length_and_per_route_limits():
+    c = TestClient(_app())
+    assert c.post("/small", content=b"a" * 100).json() == {"n": 100}
+    assert c.post("/small", content=b"a" * 101).status_code == 413
+    assert c.post("/bulk/load", content=b"a" * 900).json() == {"n": 900}
+    assert c.post("/bulk/load", content=b"a" * 1001).status_code == 413
+
+
+def test_streamed_body_is_cut_off_mid_stream():
+    mw = BodyLimitMiddleware(_app(), max_bytes=100)
+    chunks = [b"x" * 40] * 10
+    pulled = []
+    sent = []
+
+    async def receive():
+        pulled.append(1)
+        return {"type": "http.request", "body": chunks[len(pulled) - 1], "more_body": len(pulled) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/small", "raw_path": b"/small", "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http", "server": ("t", 80), "client": ("c", 1), "root_path": ""}
+    asyncio.run(mw(scope, receive, send))
+    assert sent[0]["status"] == 413
+    assert len(pulled) == 3  # stopped right after the chunk that crossed the limit
+    assert mw.stats["rejected_stream"] == 1
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from rapidfuzz import fuzz
+
+from aurora import citation_scoring, rag_runtime, rag_service
+from aurora.citation_scoring import CompanyLookup
+
+
+def _legacy(question, src):
+    fz = float(max(
+        fuzz.token_set_ratio(question, str(src.get("title") or "")),
+        fuzz.partial_ratio(question, str(src.get("url") or "")),
+        fuzz.token_set_ratio(question, str(src.get("text") or "")[:256]),
+    ))
+    try:
+        v = max(0.0, min(1.0, float(src.get("vector_score") or 0.0)))
+    except ValueError:
+        v = 0.0
+    return v, fz, 0.6 * v + 0.4 * (fz / 100.0)
+
+
+def test_batched_scores_match_per_source_scoring():
+    q = "vector database startups raising series A"
+    sources = [
+        {"title": f"Company {i} raises series A", "url": f"https://news.example/{i}", "text": "vector database " * (i % 5) + "funding round", "vector_score": (i % 10) / 10}
+        for i in range(60)
+    ] + [{"title": None, "url": None, "text": None}, {"vector_score": "bad"}]
+    got = citation_scoring.score_sources(q, sources)
+    assert got == [_legacy(q, s) for s in sources]
+
+
+def test_company_lookup_is_cached_per_tenant():
+    calls = []
+
+    class _Index:
+        def search(self, q, opts):
+            calls.append(q)
+            return {"hits": [{"id": 1, "url": "https://acme.example"}]}
+
+    client = SimpleNamespace(index=lambda name: _Index())
+    lookup = CompanyLookup(ttl_s=60)
+    a = lookup.search(client, "Who is ACME?", "t1")
+    a[0]["url"] = "mutated"
+    assert lookup.search(client, "who is  acme?", "t1")[0] == {"source": "meilisearch", "id": 1, "url": "https://acme.example"}
+    lookup.search(client, "who is acme?", "t2")
+    assert len(calls) == 2 and lookup.stats["hits"] == 1
+    assert lookup.search(None, "q", "t1") == []
+
+
+def test_company_upserts_clear_the_lookup(monkeypatch):
+    import uuid
+
+    from aurora.db import init_db
+    from aurora.etl import upsert_companies_from_items
+    from aurora.routes.companies import CompanyCreate, upsert_company
+
+    init_db()
+    cleared = []
+    monkeypatch.setattr(citation_scoring.COMPANIES, "clear", lambda: cleared.append(1))
+    name = f"cl-{uuid.uuid4().hex[:8]}"
+    upsert_company(CompanyCreate(canonical_name=name))
+    upsert_company(CompanyCreate(canonical_name=name, website="https://cl.example"))
+    upsert_companies_from_items([{"canonical_name": name, "segments": ["Z"]}])
+    assert len(cleared) == 3
+
+
+def test_answer_reports_postprocess_time_and_strips_embeddings(monkeypatch):
+    nodes = [
+        SimpleNamespace(node=SimpleNamespace(metadata={"url": f"https://docs.example/{i}"}, text=f"doc {i}", node_id=f"n{i}", embedding=[0.1, 0.2]), score=i / 10)
+        for i in range(10)
+    ]
+    engine = SimpleNamespace(query=lambda q: SimpleNamespace(source_nodes=nodes))
+    index = SimpleNamespace(as_query_engine=lambda similarity_top_k=8: engine)
+    monkeypatch.setattr(rag_runtime, "RUNTIME", rag_runtime.RagRuntime(lambda: object(), lambda c, n: index, lambda m: m))
+    monkeypatch.setattr(rag_service, "meili", None)
+    out = rag_service.answer_with_citations("doc")
+    assert [s["url"] for s in out["sources"]][:2] == ["https://docs.example/9", "https://docs.example/8"]
+    assert all("embedding" not in s and "hybrid_score" in s for s in out["sources"])
+    assert "postprocess" in out["timings_ms"]
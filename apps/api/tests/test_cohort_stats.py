@@ -0,0 +1,108 @@
+import statistics
+import threading
+import time
+import uuid
+
+from sqlmodel import text
+
+from aurora import cohort_stats, metrics
+from aurora.db import get_session, init_db
+from aurora.etl import upsert_company_metrics
+
+
+def _company(s, name, segments):
+    s.exec(text("INSERT INTO companies (canonical_name, segments) VALUES (:n, :g)").bindparams(n=name, g=segments))
+    return int(list(s.exec(text("SELECT id FROM companies WHERE canonical_name = :n").bindparams(n=name)))[0][0])
+
+
+def test_cohort_lookup_matches_naive_scan_and_refreshes_incrementally():
+    init_db()
+    tag = uuid.uuid4().hex[:8]
+    seg_a, seg_b = f"cs-a-{tag}", f"cs-b-{tag}"
+    with get_session() as s:
+        a1 = _company(s, f"cs-a1-{tag}", seg_a)
+        a2 = _company(s, f"cs-a2-{tag}", f"{seg_a}, {seg_b}")
+        b1 = _company(s, f"cs-b1-{tag}", seg_b)
+        s.commit()
+    upsert_company_metrics(
+        [
+            {"company_id": cid, "week_start": f"2031-0{w}-01", "mentions": m, "sentiment": 0.1 * m}
+            for w, (cid, m) in enumerate([(a1, 3), (a1, 5), (a2, 10), (b1, 7)], start=1)
+        ]
+    )
+    with get_session() as s:
+        cohort_stats.rebuild(s)
+        rows = list(s.exec(text("SELECT week_start, n, total FROM cohort_metric_stats WHERE segment = :g AND metric = 'mentions' ORDER BY week_start").bindparams(g=seg_a)))
+    assert [(r[0], r[1], r[2]) for r in rows] == [("2031-01-01", 1, 3.0), ("2031-02-01", 1, 5.0)]
+
+    vals = [3.0, 5.0, 10.0]
+    mean, std = metrics._segment_stats("mentions", a1)
+    assert abs(mean - statistics.mean(vals)) < 1e-9 and abs(std - statistics.stdev(vals)) < 1e-9
+    assert metrics._segment_stats("mentions", b1) is None  # only 2 values in seg_b
+    # a2 sits in both segments of its own cohort and is still counted once
+    both = [3.0, 5.0, 10.0, 7.0]
+    mean, std = metrics._segment_stats("mentions", a2)
+    assert abs(mean - statistics.mean(both)) < 1e-9 and abs(std - statistics.stdev(both)) < 1e-9
+
+    # A new write refreshes just its week; the next lookup sees it without a rebuild
+    upsert_company_metrics([{"company_id": b1, "week_start": "2031-03-01", "mentions": 1}])
+    mean, std = metrics._segment_stats("mentions", b1)
+    assert abs(mean - statistics.mean([10.0, 7.0, 1.0])) < 1e-9 and abs(std - statistics.stdev([10.0, 7.0, 1.0])) < 1e-9
+    with get_session() as s:
+        row = list(s.exec(text("SELECT n, total, total_sq FROM cohort_metric_stats WHERE segment = :g AND week_start = '2031-03-01' AND metric = 'mentions'").bindparams(g=f"{seg_a},{seg_b}")))
+    assert tuple(row[0]) == (1, 10.0, 100.0)
+
+
+def test_aggregate_folds_raw_segment_spellings_into_one_set():
+    zeros = (0, None, None) * (len(cohort_stats.METRICS) - 1)
+    out = cohort_stats.aggregate([("B, A", "w1", 1, 2.0, 4.0, *zeros), ("A,B", "w1", 2, 6.0, 20.0, *zeros), ("", "w1", 5, 1.0, 1.0, *zeros)])
+    assert out == {("A,B", "w1", "mentions"): {"n": 3, "total": 8.0, "total_sq": 24.0, "mean": 8.0 / 3}}
+
+
+def test_company_segment_edits_invalidate_cohort_stats():
+    from aurora.routes.companies import CompanyCreate, upsert_company
+
+    init_db()
+    name = f"cs-edit-{uuid.uuid4().hex[:8]}"
+    upsert_company(CompanyCreate(canonical_name=name, segments=["X"]))
+    cohort_stats._built_at = time.time()
+    upsert_company(CompanyCreate(canonical_name=name, website="https://x.example"))
+    assert cohort_stats._built_at is not None
+    upsert_company(CompanyCreate(canonical_name=name, segments=["X", "Y"]))
+    assert cohort_stats._built_at is None
+
+
+def test_stale_stats_are_served_while_rebuilding_in_background(monkeypatch):
+    init_db()
+    tag = uuid.uuid4().hex[:8]
+    seg = f"cs-bg-{tag}"
+    with get_session() as s:
+        ids = [_company(s, f"cs-bg{i}-{tag}", seg) for i in range(3)]
+        s.commit()
+    upsert_company_metrics([{"company_id": cid, "week_start": "2031-05-01", "mentions": i + 1} for i, cid in enumerate(ids)])
+    with get_session() as s:
+        cohort_stats.rebuild(s)
+
+    started, release = threading.Event(), threading.Event()
+    real_rebuild = cohort_stats.rebuild
+
+    def _slow_rebuild(s):
+        started.set()
+        release.wait(5)
+        return real_rebuild(s)
+
+    monkeypatch.setattr(cohort_stats, "rebuild", _slow_rebuild)
+    cohort_stats.invalidate()
+    try:
+        with get_session() as s:
+            stats = cohort_stats.company_cohort(s, ids[0])
+        assert stats["mentions"]["n"] == 3 and stats["mentions"]["mean"] == 2.0
+        assert started.wait(5)
+        assert not cohort_stats.rebuild_in_background()  # single flight
+    finally:
+        release.set()
+    for _ in range(100):
+        if cohort_stats._built_at is not None and not cohort_stats._rebuilding:
+            break
+        time.sleep(0.05)
+    assert cohort_stats._built_at is not None
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import aurora.copilot as cp
+from aurora import doc_cache
+from aurora.doc_cache import DocCache
+
+
+def test_lru_budget_is_per_tenant():
+    c = DocCache(ttl_s=60, tenant_max_entries=3)
+    for i in range(3):
+        c.set("a", f"q{i}", [f"https://a/{i}"], 5)
+    c.set("b", "q0", ["https://b/0"], 5)
+    assert c.get("a", "q0", 5) == ["https://a/0"]  # q0 now most recent in "a"
+    for i in range(3, 10):
+        c.set("a", f"q{i}", [f"https://a/{i}"], 5)
+    # tenant "a" churned through its own partition only
+    assert c.get("b", "q0", 5) == ["https://b/0"]
+    assert c.get("a", "q0", 5) is None
+    assert [q for q in (f"q{i}" for i in range(10)) if c.get("a", q, 5)] == ["q7", "q8", "q9"]
+    info = c.info()
+    assert info["tenants"] == 2 and info["size"] == 4
+    assert info["evictions"] == 7
+
+
+def test_byte_budget_ttl_and_tenant_lru(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(doc_cache.time, "monotonic", lambda: now[0])
+    c = DocCache(ttl_s=10, tenant_max_bytes=400, max_tenants=2)
+    c.set(1, "big", ["x" * 500], 5)  # larger than a partition: not cached
+    assert c.get(1, "big", 5) is None
+    c.set(1, "q", ["https://u/" + "y" * 150], 5)
+    c.set(1, "r", ["https://u/" + "z" * 150], 5)
+    assert c.get(1, "q", 5) is None and c.get(1, "r", 5) is not None
+    now[0] += 11
+    assert c.get(1, "r", 5) is None
+    assert c.stats["expirations"] == 1
+    c.set(2, "q", ["u2"], 5)
+    c.set(3, "q", ["u3"], 5)  # third tenant drops the least recently used one (1)
+    assert c.info()["tenants"] == 2 and c.stats["tenant_evictions"] == 1
+
+
+def test_truncated_entry_misses_for_larger_limit():
+    c = DocCache()
+    c.set(None, "q", ["u1", "u2"], 2)
+    assert c.get(None, "q", 1) == ["u1"]
+    assert c.get(None, "q", 12) is None
+    c.set(None, "short", ["u1"], 6)  # fewer results than asked for: complete
+    assert c.get(None, "short", 12) == ["u1"]
+
+
+def test_tool_retrieve_docs_uses_tenant_partitions(monkeypatch):
+    calls = []
+
+    def fake(q):
+        calls.append(q)
+        return {"sources": [{"url": f"https://docs/{len(calls)}"}]}
+
+    monkeypatch.setattr(doc_cache, "DOC_CACHE", DocCache())
+    monkeypatch.setattr("aurora.rag_service.answer_with_citations", fake, raising=False)
+    a1 = cp.tool_retrieve_docs("what is new", limit=3, tenant_id=1)
+    assert cp.tool_retrieve_docs("what is new", limit=3, tenant_id=1) == a1
+    assert cp.tool_retrieve_docs("what is new", limit=3, tenant_id=2) != a1
+    assert len(calls) == 2
+    stats = cp._get_doc_cache_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["tenants"] == 2
+    assert cp._clear_doc_cache() == 2
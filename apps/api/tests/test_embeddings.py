@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import threading
+
+from aurora.embeddings import EmbeddingService
+
+
+class _FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), float(sum(map(ord, t)) % 97)] for t in texts]
+
+
+def test_cache_normalizes_and_batches_concurrent_misses(tmp_path):
+    model = _FakeModel()
+    svc = EmbeddingService(lambda: model, "fake", store_path=str(tmp_path / "emb.sqlite"), batch_window_ms=50)
+
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def _worker(i):
+        barrier.wait()
+        results[i] = svc.embed(f"query {i % 4}")
+
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 8 callers, 4 distinct texts, one encode call
+    assert len(model.calls) == 1 and sorted(model.calls[0]) == [f"query {i}" for i in range(4)]
+    assert results[0] == results[4]
+
+    # Whitespace/case variants hit the LRU
+    assert svc.embed("  QUERY   0 ") == results[0]
+    assert svc.stats["hits"] >= 1 and len(model.calls) == 1
+
+    # A fresh service (restart) is served from the on-disk store
+    model2 = _FakeModel()
+    svc2 = EmbeddingService(lambda: model2, "fake", store_path=str(tmp_path / "emb.sqlite"), batch_window_ms=0)
+    assert svc2.embed("query 1") == results[1]
+    assert model2.calls == [] and svc2.stats["disk_hits"] == 1
+
+    # embed_many encodes only the misses, in one call
+    out = svc2.embed_many(["query 2", "new one", "New  One"])
+    assert model2.calls == [["new one"]]
+    assert out[1] == out[2] and out[0] == results[2]
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from aurora import entity_detect
+from aurora.entity_detect import Gazetteer, detect, name_variants
+
+
+@pytest.fixture(autouse=True)
+def _no_spacy(monkeypatch):
+    monkeypatch.setattr(entity_detect, "nlp", lambda: None)
+
+
+def _gazetteer(rows):
+    gz = Gazetteer()
+    gz.load_rows(rows)
+    return gz
+
+
+def test_name_variants_strip_corporate_suffixes():
+    assert name_variants("Acme Robotics, Inc.") == {("acme", "robotics", "inc"), ("acme", "robotics")}
+    assert name_variants("Inc") == {("inc",)}
+
+
+def test_matches_full_universe_aliases_and_tickers():
+    rows = [(i, f"Company {i:04d} Labs", None, None) for i in range(1, 2001)]
+    rows += [(5000, "Northwind Traders Ltd", "Northwind", "NWT"), (5001, "Open AI Research", None, "AI")]
+    gz = _gazetteer(rows)
+    assert len(gz) == 2002
+    assert detect("What did company 1999 labs ship?", gazetteer=gz) == [1999]
+    assert detect("Is Northwind Traders hiring?", gazetteer=gz) == [5000]
+    assert detect("price of $NWT today", gazetteer=gz) == [5000]
+    # lowercase "ai" is a word, not the ticker
+    assert detect("how is ai changing retail", gazetteer=gz) == []
+    assert detect("Compare NWT and AI", top_k=5, gazetteer=gz) == [5000, 5001]
+
+
+def test_fuzzy_fallback_and_threshold(monkeypatch):
+    gz = _gazetteer([(1, "Anthropos Analytics"), (2, "Zephyrine")])
+    assert detect("news on Zephyrinne", gazetteer=gz) == [2]
+    monkeypatch.setenv("COPILOT_FUZZY_MIN", "99")
+    assert detect("news on Zephyrinne", gazetteer=gz) == []
+
+
+def test_refresh_and_drop_by_canonical_name():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE companies (id INTEGER PRIMARY KEY, canonical_name TEXT, name TEXT, ticker TEXT)")
+    conn.execute("INSERT INTO companies VALUES (1, 'Foo Corp', NULL, NULL)")
+
+    class _S:
+        def execute(self, stmt, params):
+            names = list(params["n"])
+            sql = "SELECT id, canonical_name, name, ticker FROM companies WHERE canonical_name IN (%s)" % ",".join("?" * len(names))
+            return conn.execute(sql, names).fetchall()
+
+    gz = _gazetteer(conn.execute("SELECT * FROM companies").fetchall())
+    assert detect("Foo results", gazetteer=gz) == [1]
+    conn.execute("UPDATE companies SET name = 'Barco', ticker = 'BRC' WHERE id = 1")
+    assert gz.refresh(_S(), ["Foo Corp"]) == 1
+    assert detect("Barco and BRC", gazetteer=gz) == [1]
+    gz.apply_rows([(1, None)])
+    assert detect("Foo and Barco", gazetteer=gz) == []
+
+
+def test_refresh_rolls_back_before_legacy_column_fallback():
+    calls = []
+
+    class _S:
+        def execute(self, stmt, params):
+            if "ticker" in str(stmt):
+                calls.append("fail")
+                raise RuntimeError("no such column: ticker")
+            calls.append("legacy")
+            return [(7, "Legacy Co")]
+
+        def rollback(self):
+            calls.append("rollback")
+
+    gz = _gazetteer([(1, "Alpha")])
+    assert gz.refresh(_S(), ["Legacy Co"]) == 1
+    assert calls == ["fail", "rollback", "legacy"]
+    assert detect("Legacy Co news", gazetteer=gz) == [7]
+
+
+def test_ensure_loaded_reloads_on_source_change():
+    gz = Gazetteer()
+    calls = []
+
+    def a():
+        calls.append("a")
+        return [(1, "Alpha")]
+
+    def b():
+        calls.append("b")
+        return [(2, "Beta")]
+
+    assert gz.ensure_loaded(a) and gz.ensure_loaded(a)
+    assert calls == ["a"]
+    gz.ensure_loaded(b)
+    assert calls == ["a", "b"]
+    assert detect("Alpha vs Beta", gazetteer=gz) == [2]
+
+
+def test_partial_names_match_by_distinctive_leading_token():
+    gz = _gazetteer([(1, "Portek Systems"), (2, "Acme Robotics Inc"), (3, "The Trade Desk")])
+    assert detect("How is Portek doing?", gazetteer=gz) == [1]
+    assert detect("any news from acme?", gazetteer=gz) == [2]
+    # An exact name still wins over a partial hit on the same token
+    gz.apply_rows([(4, "Portek Inc")])
+    assert detect("How is Portek doing?", top_k=5, gazetteer=gz) == [4]
+    assert detect("Portek Systems roadmap", top_k=5, gazetteer=gz) == [1]
+    # Stopword leads are not indexed
+    assert detect("what is the outlook", gazetteer=gz) == []
+
+
+def test_stale_index_is_served_while_reloading_in_background(monkeypatch):
+    import threading
+
+    monkeypatch.setenv("COPILOT_GAZETTEER_RELOAD_SEC", "1")
+    gate = threading.Event()
+    rows = [[(1, "Alpha")], [(2, "Beta")]]
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            assert gate.wait(5)
+        return rows[min(len(calls), 2) - 1]
+
+    gz = Gazetteer()
+    assert gz.ensure_loaded(loader)
+    gz.loaded_at -= 10
+    assert gz.ensure_loaded(loader) and gz.ensure_loaded(loader)
+    # Old index keeps serving; only one reload is in flight
+    assert detect("Alpha vs Beta", gazetteer=gz) == [1]
+    assert len(calls) == 2
+    gz.apply_rows([(3, "Gamma")])
+    gate.set()
+    for _ in range(200):
+        if not gz.info()["reloading"]:
+            break
+        threading.Event().wait(0.01)
+    # New rows are in, and the upsert made during the reload survived the swap
+    assert detect("Alpha vs Beta vs Gamma", top_k=5, gazetteer=gz) == [2, 3]
@@ -0,0 +1,44 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from aurora import histograms
+from aurora.histograms import LogHistogram, RequestHistograms, bucket_upper
+
+
+def test_log_histogram_quantiles_and_merge():
+    a, b = LogHistogram(), LogHistogram()
+    for v in range(1, 1001):
+        (a if v % 2 else b).observe(float(v))
+    merged = LogHistogram().merge(a).merge(b)
+    assert merged.count == 1000 and merged.total == sum(range(1, 1001))
+    for q, exact in ((0.5, 500), (0.95, 950), (0.99, 990)):
+        assert abs(merged.quantile(q) - exact) / exact < 0.05
+    cum = merged.cumulative()
+    assert cum[-1] == (float("inf"), 1000)
+    assert dict(cum)[512.0] == 512  # power-of-two `le` boundaries are exact
+
+
+def test_request_histograms_shard_per_thread_and_window():
+    rh = RequestHistograms(window_s=10)
+    threads = [threading.Thread(target=lambda: [rh.observe("GET", "/x", 200, 5.0, now=100.0) for _ in range(50)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    rh.observe("GET", "/x", 503, 40.0, now=105.0)
+    series = rh.series()
+    assert series[("GET", "/x", "2xx")].count == 200 and series[("GET", "/x", "5xx")].count == 1
+    assert rh.percentiles(now=115.0)["samples"] == 201  # previous window still counts
+    assert rh.percentiles(now=125.0)["samples"] == 0
+    assert bucket_upper(histograms.N_BUCKETS - 1) == float("inf")
+
+
+def test_metrics_exposes_route_histograms():
+    from aurora.main import app
+
+    c = TestClient(app)
+    c.get("/healthz")
+    body = c.get("/metrics").text
+    assert "# TYPE aurora_http_request_duration_ms histogram" in body
+    assert 'aurora_http_request_duration_ms_count{method="GET",route="/healthz",status="2xx"}' in body
@@ -1,8 +1,17 @@
 from fastapi.testclient import TestClient
 import types
 
+import pytest
+
 import aurora.main as main
 import aurora.metrics as mx
+from aurora import response_cache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_dashboards():
+    # These tests swap the metric source underneath the endpoint; drop dashboards cached by earlier tests
+    response_cache.invalidate_company_views()
 
 
 def _mk_rows(weeks, vals):
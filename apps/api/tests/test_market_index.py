@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import random
+
+from aurora.market_index import CompanyIndex
+
+
+def _naive(rows, segment=None, seg_set=None, min_signal=0.0, bucket=None, sort=None):
+    out = []
+    for cid, name, segs, sig in sorted(rows, key=lambda r: r[0]):
+        seg_list = [x.strip() for x in (segs or "").split(",") if x.strip()]
+        sig = float(sig or 0.0)
+        if not name or sig < min_signal:
+            continue
+        if segment and segment not in seg_list:
+            continue
+        if seg_set and not (set(seg_list) & seg_set):
+            continue
+        if bucket == "low" and not sig < 0.3 or bucket == "mid" and not 0.3 <= sig < 0.7 or bucket == "high" and not sig >= 0.7:
+            continue
+        out.append(cid)
+    if sort == "signal":
+        out.sort(key=lambda c: -dict((r[0], float(r[3] or 0.0)) for r in rows)[c])
+    return out
+
+
+def test_index_matches_scan_semantics_and_refreshes():
+    rnd = random.Random(7)
+    segs = ["AI", "Fintech", "Bio", "Climate"]
+    rows = [
+        (i, f"Co{i}", ",".join(rnd.sample(segs, rnd.randint(0, 2))), round(rnd.random(), 2) if i % 9 else None)
+        for i in range(1, 301)
+    ]
+    idx = CompanyIndex()
+    idx.apply_rows(rows)
+    cases = [
+        {},
+        {"segment": "AI"},
+        {"seg_set": {"Bio", "Climate"}},
+        {"segment": "AI", "seg_set": {"Fintech"}},
+        {"min_signal": 0.5, "bucket": "mid"},
+        {"bucket": "high", "segment": "Bio"},
+    ]
+    for case in cases:
+        for sort in (None, "signal"):
+            expected = _naive(rows, sort=sort, **case)
+            page, total = idx.query(case.get("segment"), case.get("seg_set"), case.get("min_signal", 0.0), case.get("bucket"), sort, 5, 25)
+            assert total == len(expected)
+            got = [p["cid"] for p in page]
+            if sort is None:
+                assert got == expected[5:25]
+            else:
+                sig = {r[0]: float(r[3] or 0.0) for r in rows}
+                assert [sig[c] for c in got] == [sig[c] for c in expected[5:25]]
+
+    # Incremental upsert moves a company between segments and signal ranks
+    idx.apply_rows([(3, "Co3", "Quantum", 0.99)])
+    page, total = idx.query("Quantum", None, 0.0, None, "signal", 0, 10)
+    assert total == 1 and page[0]["cid"] == 3 and page[0]["segs"] == ["Quantum"]
+    top, _ = idx.query(None, None, 0.0, None, "signal", 0, 1)
+    assert top[0]["sig"] >= 0.99
+    asc, _ = idx.query(None, None, 0.0, "high", "signal_asc", 0, 3)
+    assert [p["sig"] for p in asc] == sorted(p["sig"] for p in asc) and asc[0]["sig"] >= 0.7
+
+
+def test_tied_signals_order_by_ascending_id_in_both_directions():
+    rows = [(i, f"Co{i}", "AI" if i % 2 else "Bio", [0.2, 0.5, 0.5, 0.5, 0.8][i % 5]) for i in range(1, 41)]
+    idx = CompanyIndex()
+    idx.apply_rows(rows)
+    by_id = sorted(rows)
+    # Scan path semantics: id-ordered rows, stable sort on signal
+    scan_asc = [r[0] for r in sorted(by_id, key=lambda r: r[3])]
+    scan_desc = [r[0] for r in sorted(by_id, key=lambda r: r[3], reverse=True)]
+    for start, end in ((0, 40), (0, 7), (3, 11), (9, 26), (30, 40), (38, 50)):
+        asc, _ = idx.query(None, None, 0.0, None, "signal_asc", start, end)
+        desc, _ = idx.query(None, None, 0.0, None, "signal", start, end)
+        assert [p["cid"] for p in asc] == scan_asc[start:end]
+        assert [p["cid"] for p in desc] == scan_desc[start:end]
+    multi, _ = idx.query(None, {"AI", "Bio"}, 0.0, None, "signal_asc", 4, 20)
+    assert [p["cid"] for p in multi] == scan_asc[4:20]
+    mid, total = idx.query(None, None, 0.0, "mid", "asc", 2, 9)
+    assert total == 24 and [p["cid"] for p in mid] == [c for c in scan_asc if rows[c - 1][3] == 0.5][2:9]
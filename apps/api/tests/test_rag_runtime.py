@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from aurora import rag_runtime, rag_service
+from aurora.rag_runtime import RagRuntime
+
+
+class _Engine:
+    def query(self, q):
+        node = SimpleNamespace(node=SimpleNamespace(metadata={"url": "https://example.ai"}, text="ExampleAI builds a vector DB", node_id="n1"), score=0.9)
+        return SimpleNamespace(source_nodes=[node], __str__=lambda self: "{}")
+
+
+class _Index:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def as_query_engine(self, similarity_top_k=8):
+        return _Engine()
+
+
+def _runtime(build_s=0.0, **kw):
+    calls = {"client": 0, "index": [], "llm": 0}
+
+    def client():
+        calls["client"] += 1
+        time.sleep(build_s)
+        return SimpleNamespace(get_collections=lambda: [])
+
+    def index(c, collection):
+        calls["index"].append(collection)
+        time.sleep(build_s)
+        return _Index(collection)
+
+    def llm(model):
+        calls["llm"] += 1
+        return SimpleNamespace(model=model)
+
+    return RagRuntime(client, index, llm, **kw), calls
+
+
+def test_pool_reuses_objects_bounds_collections_and_dedupes_builds():
+    rt, calls = _runtime(build_s=0.05, max_indexes=2)
+    threads = [threading.Thread(target=rt.query_engine, args=("docs",)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls["client"] == 1 and calls["index"] == ["docs"]
+    assert rt.index("docs") is rt.index("docs") and rt.llm("m") is rt.llm("m") and calls["llm"] == 1
+
+    rt.index("docs_tenant_1")
+    rt.index("docs_tenant_2")  # evicts "docs" (least recently used)
+    assert rt.info()["collections"] == ["docs_tenant_1", "docs_tenant_2"] and rt.stats["evictions"] == 1
+    rt.index("docs")
+    assert calls["index"].count("docs") == 2
+
+
+def test_health_failure_and_build_errors_rebuild_lazily():
+    state = {"healthy": True, "builds": 0, "fail": True}
+
+    def health(client):
+        if not state["healthy"]:
+            raise ConnectionError("down")
+
+    def client():
+        state["builds"] += 1
+        return object()
+
+    rt = RagRuntime(client, lambda c, n: _Index(n), lambda m: m, health_check=health, health_interval_s=0.01, retry_backoff_s=60)
+    first = rt.index("docs")
+    state["healthy"] = False
+    time.sleep(0.02)
+    rebuilt = rt.index("docs")
+    assert rebuilt is not first and state["builds"] == 2 and rt.stats["health_failures"] == 1
+
+    def flaky(c, n):
+        if state["fail"]:
+            raise ConnectionError("qdrant unreachable")
+        return _Index(n)
+
+    rt2 = RagRuntime(client, flaky, lambda m: m, retry_backoff_s=60)
+    for _ in range(3):
+        with pytest.raises(Exception):
+            rt2.index("docs")
+    assert rt2.stats["build_errors"] == 1  # later calls fail fast inside the backoff window
+    assert "index:docs" in rt2.info()["failing"]
+
+
+def test_answer_setup_cost_is_paid_once(monkeypatch):
+    rt, calls = _runtime(build_s=0.05)
+    monkeypatch.setattr(rag_runtime, "RUNTIME", rt)
+    monkeypatch.setattr(rag_service, "meili", None)
+    first = rag_service.answer_with_citations("what does ExampleAI do?")
+    second = rag_service.answer_with_citations("what does ExampleAI do?")
+    assert first["sources"] and first["sources"][0]["url"] == "https://example.ai"
+    assert first["timings_ms"]["setup"] >= 90 and second["timings_ms"]["setup"] < 10
+    assert calls["client"] == 1 and len(calls["index"]) == 1 and calls["llm"] == 1
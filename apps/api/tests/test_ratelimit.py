@@ -0,0 +1,50 @@
+from sqlmodel import create_engine
+
+from aurora.ratelimit import DbBackend, Limiter, MemoryBackend
+
+
+def _burst(lim, now, n=15):
+    return sum(lim.allow("client", "/x", limit=10, now=now) for _ in range(n))
+
+
+def test_sliding_window_blocks_boundary_bursts_on_both_backends(tmp_path):
+    for backend in (MemoryBackend(), DbBackend(create_engine(f"sqlite:///{tmp_path / 'rl.sqlite'}"))):
+        lim = Limiter(backend)
+        assert _burst(lim, 1259.0) == 10  # end of one window
+        assert _burst(lim, 1261.0) == 1  # start of the next: the previous window still counts
+        assert _burst(lim, 1290.0) == 4  # half of it has slid out
+        assert _burst(lim, 1500.0) == 10  # idle long enough to start over
+
+
+def test_db_backend_is_shared_between_limiters(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'rl.sqlite'}")
+    a, b = Limiter(DbBackend(eng)), Limiter(DbBackend(eng))  # e.g. two uvicorn workers
+    assert sum(a.allow("c", "/x", limit=6, now=30.0) for _ in range(4)) == 4
+    assert sum(b.allow("c", "/x", limit=6, now=31.0) for _ in range(4)) == 2
+
+
+def test_memory_backend_evicts_idle_and_excess_keys():
+    backend = MemoryBackend(max_keys=3)
+    lim = Limiter(backend)
+    for i in range(5):
+        lim.allow(f"c{i}", "/x", limit=5, now=10.0)
+    assert len(backend) == 3 and backend.evicted == 2
+    lim.allow("fresh", "/x", limit=5, now=200.0)  # two windows later every other key is idle
+    assert len(backend) == 1
+    assert lim.info()["keys"] == 1
+
+
+def test_db_backend_counts_errors_and_honours_fail_open(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'rl.sqlite'}")
+    backend = DbBackend(eng)
+    backend.ensure_schema()
+    with eng.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE rate_limit_buckets")  # every hit now fails
+    lim = Limiter(backend)
+    assert lim.blocking
+    assert lim.allow("c", "/x", limit=1, now=10.0)
+    backend.fail_open = False
+    assert not lim.allow("c", "/x", limit=1, now=10.0)
+    info = lim.info()
+    assert info["errors"] == 2 and info["last_error"]
+    assert not Limiter(MemoryBackend()).blocking
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import threading
+
+from aurora import retrieval
+from aurora.rerank import RerankService
+
+
+class _FakeCrossEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs):
+        self.calls.append(list(pairs))
+        return [float(sum(1 for w in q.split() if w in t.split())) for q, t in pairs]
+
+
+def test_scores_are_cached_and_batched_across_requests():
+    model = _FakeCrossEncoder()
+    svc = RerankService(lambda: model, "fake", batch_window_ms=50)
+    passages = ["alpha beta", "beta gamma", "gamma delta"]
+
+    results = {}
+    barrier = threading.Barrier(6)
+
+    def _worker(i):
+        barrier.wait()
+        results[i] = svc.score("beta  gamma" if i % 2 else "beta gamma", passages)
+
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 6 requests over the same 3 (normalized) pairs: one predict call with 3 pairs
+    assert len(model.calls) == 1 and len(model.calls[0]) == 3
+    assert all(r == [1.0, 2.0, 1.0] for r in results.values())
+
+    # Repeats are cache hits; only the new passage is scored
+    assert svc.score("beta gamma", passages + ["beta"]) == [1.0, 2.0, 1.0, 1.0]
+    assert len(model.calls) == 2 and model.calls[1] == [("beta gamma", "beta")]
+    assert svc.stats["hits"] >= 3
+
+    # Unavailable model: None (callers fall back to token overlap)
+    assert RerankService(lambda: None, "none", batch_window_ms=0).score("q", ["x"]) is None
+
+
+def test_bge_rerank_cuts_off_candidates_before_cross_encoder(monkeypatch):
+    model = _FakeCrossEncoder()
+    monkeypatch.setattr(retrieval, "_reranker", model)
+    monkeypatch.setattr(retrieval, "RERANK_MODEL_ID", "fake-cutoff")
+    docs = [{"id": str(i), "text": f"doc {i}" + (" match here" if i in (2, 7) else "")} for i in range(10)]
+    ranked = retrieval._bge_rerank("match here", docs, top_k=2, candidates=5)
+    assert [d["id"] for d in ranked][0] == "2" and len(ranked) == 2
+    assert sum(len(c) for c in model.calls) == 5  # doc 7 never reached the cross-encoder
+
+
+def test_failed_reranker_load_is_retried_after_backoff(monkeypatch):
+    import sys
+    import types
+
+    attempts = []
+
+    class _CrossEncoder:
+        def __init__(self, model_id):
+            attempts.append(model_id)
+            if len(attempts) == 1:
+                raise OSError("hub unreachable")
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(CrossEncoder=_CrossEncoder))
+    monkeypatch.setattr(retrieval, "_reranker", None)
+    monkeypatch.setattr(retrieval, "_reranker_failed_at", None)
+    monkeypatch.setenv("RERANK_RETRY_BACKOFF_SEC", "60")
+    assert retrieval._load_reranker() is None and retrieval._load_reranker() is None
+    assert len(attempts) == 1  # within the backoff: no new load attempt
+    monkeypatch.setattr(retrieval, "_reranker_failed_at", retrieval._reranker_failed_at - 61)
+    assert isinstance(retrieval._load_reranker(), _CrossEncoder) and len(attempts) == 2
@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+
+from sqlmodel import text
+
+from aurora.db import get_session, init_db
+from aurora.response_cache import ResponseCache
+
+
+def _rows(key):
+    with get_session() as s:
+        return list(s.exec(text("SELECT output_json, ttl FROM insight_cache WHERE key_hash = :k").bindparams(k=key)))
+
+
+def test_tiers_upsert_and_byte_budget():
+    init_db()
+    cache = ResponseCache(get_session, max_bytes=64, sweep_interval_s=0)
+    key = f"rc-{uuid.uuid4().hex}"
+    cache.set(key, {"v": 1}, ttl_sec=60)
+    cache.set(key, {"v": 2}, ttl_sec=60)
+    assert [r[0] for r in _rows(key)] == ['{"v": 2}']  # upsert, not append
+
+    got = cache.get(key)
+    got["v"] = 99  # callers get a copy
+    assert cache.get(key) == {"v": 2} and cache.stats["hits"] == 2
+
+    # Memory tier evicts by bytes; the DB tier still serves the evicted key
+    cache.set(f"{key}-big", {"pad": "x" * 50}, ttl_sec=60)
+    assert cache.info()["bytes"] <= 64 and cache.stats["evictions"] == 1
+    assert cache.get(key) == {"v": 2} and cache.stats["db_hits"] == 1
+
+    # Expired entries miss in both tiers
+    cache.set(f"{key}-old", {"v": 0}, ttl_sec=1)
+    time.sleep(1.1)
+    assert cache.get(f"{key}-old") is None
+
+
+def test_sweep_removes_expired_rows():
+    init_db()
+    key = f"rc-{uuid.uuid4().hex}"
+    with get_session() as s:
+        for k, out, created in [(f"{key}-old", '{"v": 1}', "2020-01-01T00:00:00+00:00"), (key, '{"v": 2}', "2999-01-01T00:00:00+00:00")]:
+            s.exec(text("INSERT INTO insight_cache (key_hash, output_json, created_at, ttl) VALUES (:k, :o, :c, 60)").bindparams(k=k, o=out, c=created))
+        s.commit()
+    assert ResponseCache(get_session, sweep_interval_s=0).sweep() >= 1
+    assert _rows(f"{key}-old") == [] and [r[0] for r in _rows(key)] == ['{"v": 2}']
+
+
+def test_db_writes_upsert_one_row_per_key():
+    init_db()
+    key = f"rc-{uuid.uuid4().hex}"
+    a, b = ResponseCache(get_session, sweep_interval_s=0), ResponseCache(get_session, sweep_interval_s=0)  # two workers
+    a.set(key, {"v": 1})
+    b.set(key, {"v": 2})
+    assert [r[0] for r in _rows(key)] == ['{"v": 2}']
+
+
+def test_flight_coalesces_concurrent_misses():
+    cache = ResponseCache(None, sweep_interval_s=0)
+    calls = []
+    results = []
+
+    def worker():
+        with cache.flight("k") as hit:
+            if hit is None:
+                calls.append(1)
+                time.sleep(0.05)
+                hit = {"n": len(calls)}
+                cache.set("k", hit)
+            results.append(hit)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [{"n": 1}] * 8
+
+
+def test_flight_waiters_read_results_kept_only_in_the_db_tier():
+    init_db()
+    # Payload too large for the memory tier: waiters must find it in the table
+    cache = ResponseCache(get_session, max_bytes=16, sweep_interval_s=0)
+    key = f"rc-{uuid.uuid4().hex}"
+    calls, results = [], []
+    gate = threading.Barrier(4)
+
+    def worker():
+        gate.wait(5)
+        with cache.flight(key) as hit:
+            if hit is None:
+                calls.append(1)
+                time.sleep(0.05)
+                hit = {"pad": "x" * 64}
+                cache.set(key, hit, ttl_sec=60)
+            results.append(hit)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [{"pad": "x" * 64}] * 4
+
+
+def test_company_writes_invalidate_company_views(monkeypatch):
+    init_db()
+    from aurora import etl, response_cache
+
+    cache = ResponseCache(get_session, sweep_interval_s=0)
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE", cache)
+    tag = uuid.uuid4().hex
+    market = response_cache.view_key("market_realtime", f"rc-{tag}")
+    other = response_cache.view_key("evals_report", f"rc-{tag}")
+    assert market.startswith("market_realtime:") and other == f"rc-{tag}"
+    cache.set(market, {"v": 1}, ttl_sec=3600)
+    cache.set(other, {"v": 2}, ttl_sec=3600)
+
+    etl.upsert_companies_from_items([{"canonical_name": f"rc-co-{tag}", "segments": ["rc"]}])
+    assert cache.get(market) is None and _rows(market) == []
+    assert cache.get(other) == {"v": 2}
+
+    cache.set(market, {"v": 3}, ttl_sec=3600)
+    with get_session() as s:
+        cid = int(list(s.exec(text("SELECT id FROM companies WHERE canonical_name = :n").bindparams(n=f"rc-co-{tag}")))[0][0])
+    etl.upsert_company_metrics([{"company_id": cid, "week_start": "2031-06-01", "mentions": 1}])
+    assert cache.get(market) is None and _rows(market) == []
@@ -1,3 +1,6 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from aurora import retrieval
 
 
@@ -12,3 +15,91 @@ def test_rrf_fuse_and_token_rerank_no_backends():
     ]
     ranked = retrieval._token_rerank("alpha", docs, top_k=1)
     assert len(ranked) == 1 and ranked[0]["id"] == "1"
+
+
+DENSE = [{"id": f"d{i}", "url": f"https://dense.example/{i}", "text": "dense doc"} for i in range(4)]
+SPARSE = [{"id": f"s{i}", "url": f"https://sparse.example/{i}", "text": "sparse doc"} for i in range(4)]
+
+
+def _gated_leg(docs, gate):
+    """Leg that returns only once `gate` (Barrier.wait or Event.wait) lets it through."""
+
+    def _leg(query, limit=12):
+        if gate(5) is False:
+            raise RuntimeError("gate not released")
+        return [dict(d) for d in docs[:limit]]
+
+    return _leg
+
+
+def test_hybrid_legs_run_concurrently_with_stub_backends():
+    # Both legs must be inside the barrier at once; run one after the other, it breaks
+    barrier = threading.Barrier(2)
+    docs, meta = retrieval.hybrid_with_meta(
+        "doc",
+        top_n=8,
+        rerank_k=8,
+        dense_fn=_gated_leg(DENSE, barrier.wait),
+        sparse_fn=_gated_leg(SPARSE, barrier.wait),
+        dense_timeout_ms=10000,
+        sparse_timeout_ms=10000,
+    )
+    assert not meta["partial"]
+    assert {d["id"] for d in docs} == {d["id"] for d in DENSE + SPARSE}
+    assert meta["legs"]["dense"]["status"] == meta["legs"]["sparse"]["status"] == "ok"
+    assert not meta["legs"]["dense"]["timed_out"] and not meta["legs"]["sparse"]["timed_out"]
+
+
+def test_hybrid_degrades_to_partial_on_late_or_failing_leg():
+    release = threading.Event()
+    try:
+        docs, meta = retrieval.hybrid_with_meta(
+            "doc",
+            top_n=8,
+            rerank_k=8,
+            dense_fn=_gated_leg(DENSE, release.wait),
+            sparse_fn=retrieval.make_stub_leg(SPARSE),
+            dense_timeout_ms=50,
+            sparse_timeout_ms=10000,
+        )
+    finally:
+        release.set()
+    assert meta["partial"] is True and meta["legs"]["dense"]["status"] == "timeout"
+    assert meta["legs"]["dense"]["timed_out"] and not meta["legs"]["sparse"]["timed_out"]
+    assert docs and all(d["id"].startswith("s") for d in docs)
+
+    docs, meta = retrieval.hybrid_with_meta(
+        "doc",
+        dense_fn=retrieval.make_stub_leg(DENSE),
+        sparse_fn=retrieval.make_stub_leg(SPARSE, fail=True),
+    )
+    assert meta["partial"] is True and meta["legs"]["sparse"]["status"] == "error"
+    assert docs and all(d["id"].startswith("d") for d in docs)
+
+
+def test_hybrid_skips_legs_instead_of_queueing_behind_overrunning_ones(monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(retrieval, "_leg_pool", pool)
+    monkeypatch.setattr(retrieval, "_leg_slots", slots)
+    release = threading.Event()
+    try:
+        _docs, meta = retrieval.hybrid_with_meta(
+            "doc",
+            dense_fn=_gated_leg(DENSE, release.wait),
+            sparse_fn=retrieval.make_stub_leg(SPARSE),
+            dense_timeout_ms=50,
+        )
+        assert meta["legs"]["dense"]["timed_out"]
+        assert meta["legs"]["sparse"]["status"] == "skipped" and not meta["legs"]["sparse"]["timed_out"]
+        # The overrunning leg still holds the only worker: nothing is queued behind it
+        _docs, meta = retrieval.hybrid_with_meta("doc", dense_fn=retrieval.make_stub_leg(DENSE), sparse_fn=retrieval.make_stub_leg(SPARSE))
+        assert {m["status"] for m in meta["legs"].values()} == {"skipped"} and meta["partial"]
+    finally:
+        release.set()
+    assert slots.acquire(timeout=5)
+    slots.release()
+    # Slot freed once the straggler finished; with one worker the second leg is still shed
+    docs, meta = retrieval.hybrid_with_meta("doc", dense_fn=retrieval.make_stub_leg(DENSE), sparse_fn=retrieval.make_stub_leg(SPARSE))
+    assert meta["legs"]["dense"]["status"] == "ok" and docs
+    pool.shutdown(wait=True)
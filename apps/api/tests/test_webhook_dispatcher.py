@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from sqlmodel import Session, create_engine, text
+
+from aurora.webhook_dispatcher import WebhookDispatcher, requeue_dead
+
+
+def _engine(tmp_path: Path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'wh.sqlite'}")
+    with Session(eng) as s:
+        # Pre-lease schema (as created by 0007); the dispatcher adds its columns on first claim
+        s.execute(text(
+            "CREATE TABLE webhook_queue (id INTEGER PRIMARY KEY, tenant_id VARCHAR, url TEXT NOT NULL, event VARCHAR NOT NULL, "
+            "body_json TEXT NOT NULL, secret VARCHAR, attempt INTEGER NOT NULL DEFAULT 0, next_at VARCHAR, status VARCHAR DEFAULT 'pending', created_at VARCHAR)"
+        ))
+        s.commit()
+    return eng
+
+
+def _enqueue(eng, url, n, status="pending"):
+    with Session(eng) as s:
+        s.execute(
+            text("INSERT INTO webhook_queue (url, event, body_json, secret, status) VALUES (:u, 'e', :b, 'k', :st)"),
+            [{"u": url, "b": f'{{"i": {i}}}', "st": status} for i in range(n)],
+        )
+        s.commit()
+
+
+def _statuses(eng):
+    with Session(eng) as s:
+        return {(r[0], r[1]): r[2] for r in s.execute(text("SELECT url, status, COUNT(1) FROM webhook_queue GROUP BY url, status"))}
+
+
+class _Sink:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+        self.active = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.calls = defaultdict(int)
+
+    def __call__(self, url, body, headers, timeout):
+        assert headers["X-Aurora-Signature"] == "sig"
+        with self.lock:
+            self.calls[url] += 1
+            self.active[url] += 1
+            self.peak[url] = max(self.peak[url], self.active[url])
+        time.sleep(0.01)
+        with self.lock:
+            self.active[url] -= 1
+        return 500 if url in self.fail else 200
+
+
+def _dispatcher(eng, sink, **kw):
+    return WebhookDispatcher(lambda: Session(eng), signer=lambda *_: "sig", sender=sink, backoff_base_s=0.0, **kw)
+
+
+def test_batches_deliver_concurrently_with_per_endpoint_limits_and_dead_letter(tmp_path):
+    eng = _engine(tmp_path)
+    _enqueue(eng, "http://a", 12)
+    _enqueue(eng, "http://b", 12)
+    _enqueue(eng, "http://down", 2)
+    _enqueue(eng, "http://a", 1, status="inflight")  # abandoned claim: no live lease
+    sink = _Sink(fail={"http://down"})
+    d = _dispatcher(eng, sink, workers=8, per_endpoint=2, max_attempts=3, breaker_threshold=100)
+    d.run_until_idle(timeout_s=20)
+
+    st = _statuses(eng)
+    assert st == {("http://a", "delivered"): 13, ("http://b", "delivered"): 12, ("http://down", "dead"): 2}
+    assert sink.peak["http://a"] == 2 and sink.peak["http://b"] == 2
+    assert sink.calls["http://down"] == 6
+    with Session(eng) as s:
+        assert {r[0] for r in s.execute(text("SELECT last_error FROM webhook_queue WHERE status = 'dead'"))} == {"http 500"}
+        assert requeue_dead(s) == 2
+    assert _statuses(eng)[("http://down", "pending")] == 2
+
+
+def test_circuit_breaker_parks_rows_without_burning_attempts(tmp_path):
+    eng = _engine(tmp_path)
+    _enqueue(eng, "http://down", 5)
+    _enqueue(eng, "http://ok", 3)
+    sink = _Sink(fail={"http://down"})
+    d = _dispatcher(eng, sink, workers=4, per_endpoint=1, max_attempts=10, breaker_threshold=2, breaker_cooldown_s=60)
+    d.run_until_idle(timeout_s=20)
+
+    assert sink.calls["http://down"] == 2 and d.info()["open_circuits"] == ["http://down"]
+    assert _statuses(eng) == {("http://down", "pending"): 5, ("http://ok", "delivered"): 3}
+    with Session(eng) as s:
+        attempts = sorted(r[0] for r in s.execute(text("SELECT attempt FROM webhook_queue WHERE url = 'http://down'")))
+    assert attempts == [0, 0, 0, 1, 1]
+
+
+def test_claims_for_a_saturated_endpoint_go_back_to_pending(tmp_path):
+    eng = _engine(tmp_path)
+    _enqueue(eng, "http://a", 2)
+    d = _dispatcher(eng, _Sink(), workers=8, per_endpoint=2)
+    d._inflight["http://a"] = 1  # another delivery still running: room for one more
+    assert d.tick() == 1
+    with Session(eng) as s:
+        rows = list(s.execute(text("SELECT status, lease_until, attempt FROM webhook_queue WHERE status = 'pending'")))
+    assert rows == [("pending", None, 0)] and d.stats["released"] == 1
@@ -0,0 +1,97 @@
+"""Benchmark citation post-processing: per-source rapidfuzz loop vs batched `score_sources`.
+
+Builds --answers synthetic answers for each source count in --sizes. Each
+source has a title, URL, ~1 KB of text and a vector score. The script times the
+ranking step of `answer_with_citations` in two ways:
+
+* legacy  – the pre-batching code: three rapidfuzz calls per source inside the
+  sort key, then the same calls again for each of the 6 emitted citations;
+* batched – `citation_scoring.score_sources` (one batched call per field, each
+  score computed once).
+
+Prints the mean and p95 milliseconds per answer.
+
+    python scripts/bench_citation_scoring.py --sizes 8,32,128,512 --answers 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from rapidfuzz import fuzz  # noqa: E402
+
+from apps.api.aurora import citation_scoring  # noqa: E402
+
+WORDS = "vector database startup funding series seed revenue growth hiring patent model inference latency gpu cloud".split()
+
+
+def _sources(n: int, rnd: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "title": " ".join(rnd.choice(WORDS) for _ in range(6)),
+            "url": f"https://news.example/{rnd.randrange(10**6)}/{rnd.choice(WORDS)}",
+            "text": " ".join(rnd.choice(WORDS) for _ in range(150)),
+            "vector_score": rnd.random(),
+        }
+        for _ in range(n)
+    ]
+
+
+def _legacy(question: str, merged: List[Dict[str, Any]]) -> List[Tuple[float, float, float]]:
+    def _components(src: Dict[str, Any]) -> Tuple[float, float]:
+        fz = float(max(
+            fuzz.token_set_ratio(question, str(src.get("title") or "")),
+            fuzz.partial_ratio(question, str(src.get("url") or "")),
+            fuzz.token_set_ratio(question, str(src.get("text") or "")[:256]),
+        ))
+        v = max(0.0, min(1.0, float(src.get("vector_score") or 0.0)))
+        return v, fz
+
+    def _hybrid(src: Dict[str, Any]) -> float:
+        v, fz = _components(src)
+        return 0.6 * v + 0.4 * (fz / 100.0)
+
+    ranked = sorted(merged, key=_hybrid, reverse=True)
+    return [(*_components(s), _hybrid(s)) for s in ranked[:6]]
+
+
+def _batched(question: str, merged: List[Dict[str, Any]]) -> List[Tuple[float, float, float]]:
+    scores = citation_scoring.score_sources(question, merged)
+    return [sc for sc, _ in sorted(zip(scores, merged), key=lambda x: x[0][2], reverse=True)[:6]]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="8,32,128,512")
+    ap.add_argument("--answers", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    print(f"numpy cdist: {'yes' if citation_scoring._HAVE_NUMPY else 'no (process.extract)'}")
+    print(f"{'sources':>8} {'mode':<8} {'mean_ms':>9} {'p95_ms':>9}")
+    for n in (int(x) for x in args.sizes.split(",") if x.strip()):
+        work = [(" ".join(rnd.choice(WORDS) for _ in range(8)), _sources(n, rnd)) for _ in range(args.answers)]
+        for mode, fn in (("legacy", _legacy), ("batched", _batched)):
+            samples = []
+            for q, merged in work:
+                t0 = time.perf_counter()
+                fn(q, merged)
+                samples.append((time.perf_counter() - t0) * 1000.0)
+            samples.sort()
+            print(f"{n:>8} {mode:<8} {statistics.fmean(samples):>9.3f} {samples[int(len(samples) * 0.95) - 1]:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+"""Benchmark copilot company detection: per-candidate fuzzy scan vs the token-indexed gazetteer.
+
+Builds --companies synthetic company names and --questions questions. Each
+question mentions one or two of the companies, sometimes with a typo. It times
+two ways of detecting them:
+
+* legacy    – the pre-gazetteer loop: `token_set_ratio` of every candidate name
+  against every question token. It was capped at the first 200 candidates
+  (`LIMIT 200`), so the run uses --legacy-limit candidates and prints its recall;
+* gazetteer – `entity_detect.detect` over the whole universe (spaCy disabled, so
+  only the matching cost is timed).
+
+Prints the mean and p95 microseconds per question, and the recall of the
+mentioned company ids.
+
+    python scripts/bench_entity_detect.py --companies 20000 --questions 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from rapidfuzz import fuzz  # noqa: E402
+
+from apps.api.aurora import entity_detect  # noqa: E402
+
+SYL = "ka lo mi ra ven tor zel qua bri sto nex ly dra fin por tek vo".split()
+SUFFIX = ["Inc", "Labs", "AI", "Corp", "Systems", ""]
+FILLER = "compare the funding and hiring of with versus over last quarter for".split()
+
+
+def _companies(n: int, rnd: random.Random) -> List[Tuple[int, str]]:
+    seen = set()
+    out: List[Tuple[int, str]] = []
+    while len(out) < n:
+        base = "".join(rnd.choice(SYL) for _ in range(rnd.randint(2, 4))).capitalize()
+        name = f"{base} {rnd.choice(SUFFIX)}".strip()
+        if name not in seen:
+            seen.add(name)
+            out.append((len(out) + 1, name))
+    return out
+
+
+def _typo(name: str, rnd: random.Random) -> str:
+    i = rnd.randrange(1, max(2, len(name) - 1))
+    return name[:i] + name[i] + name[i:]
+
+
+def _legacy(question: str, cands: List[Tuple[int, str]], top_k: int = 2) -> List[int]:
+    tokens = question.split()
+    scored = []
+    for cid, name in cands:
+        best = max((float(fuzz.token_set_ratio(name, t)) for t in tokens), default=0.0)
+        if best >= 70:
+            scored.append((cid, best))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [cid for cid, _ in scored[:top_k]]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--companies", type=int, default=20000)
+    ap.add_argument("--questions", type=int, default=2000)
+    ap.add_argument("--legacy-limit", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    rows = _companies(args.companies, rnd)
+    work = []
+    for _ in range(args.questions):
+        picked = rnd.sample(rows, rnd.randint(1, 2))
+        names = [_typo(n, rnd) if rnd.random() < 0.2 else n for _, n in picked]
+        words = [rnd.choice(FILLER) for _ in range(6)] + names
+        rnd.shuffle(words)
+        work.append((" ".join(words), {cid for cid, _ in picked}))
+
+    entity_detect.nlp = lambda: None  # time matching only
+    gz = entity_detect.Gazetteer()
+    t0 = time.perf_counter()
+    gz.load_rows(rows)
+    print(f"gazetteer: {len(gz)} companies loaded in {(time.perf_counter() - t0) * 1000.0:.1f} ms")
+
+    legacy_cands = rows[: args.legacy_limit]
+    modes = (
+        ("legacy", lambda q: _legacy(q, legacy_cands)),
+        ("gazetteer", lambda q: entity_detect.detect(q, top_k=2, gazetteer=gz)),
+    )
+    print(f"{'mode':<10} {'mean_us':>10} {'p95_us':>10} {'recall':>7}")
+    for mode, fn in modes:
+        samples, found, total = [], 0, 0
+        for q, want in work:
+            t0 = time.perf_counter()
+            got = fn(q)
+            samples.append((time.perf_counter() - t0) * 1e6)
+            found += len(want & set(got))
+            total += len(want)
+        samples.sort()
+        print(f"{mode:<10} {statistics.fmean(samples):>10.1f} {samples[int(len(samples) * 0.95) - 1]:>10.1f} {found / max(1, total):>7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
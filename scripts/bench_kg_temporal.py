@@ -0,0 +1,203 @@
+"""Benchmark KG time-travel lookups before/after the temporal indexes.
+
+Builds a synthetic graph in a throwaway database (SQLite by default, or any
+SQLAlchemy URL via --url). It has --nodes uids with --versions versions each,
+and --edges edges of which roughly a third are closed versions. Edge endpoints
+and looked-up uids follow a power-law (--skew), so hubs are included. The script
+times the as-of access patterns used by /kg/node, /kg/edges and the commit
+paths:
+
+* before – the pre-0022 schema: single-column indexes plus the 0014 indexes;
+* after  – 0022 applied: composite as-of and open-row partial indexes.
+
+Prints p50/p95/mean latency (ms) per query shape and phase.
+
+    python scripts/bench_kg_temporal.py --edges 1000000 --nodes 100000 --queries 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, create_engine, text  # noqa: E402
+
+from apps.api.aurora import kg_temporal  # noqa: E402
+
+STRING_ASOF = "(valid_from IS NULL OR valid_from <= :at) AND (valid_to IS NULL OR valid_to > :at)"
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SPAN_DAYS = 600
+
+
+def _tables(md: MetaData) -> Tuple[Table, Table]:
+    def common() -> List[Column]:
+        return [
+            Column("properties_json", Text),
+            Column("valid_from", String, index=True),
+            Column("valid_to", String, index=True),
+            Column("provenance_id", Integer, index=True),
+            Column("created_at", String, index=True),
+        ]
+
+    nodes = Table(
+        "kg_nodes", md,
+        Column("id", Integer, primary_key=True), Column("tenant_id", Integer, index=True),
+        Column("uid", String, index=True), Column("type", String, index=True), *common(),
+    )
+    edges = Table(
+        "kg_edges", md,
+        Column("id", Integer, primary_key=True), Column("tenant_id", Integer, index=True),
+        Column("src_uid", String, index=True), Column("dst_uid", String, index=True), Column("type", String, index=True), *common(),
+    )
+    return nodes, edges
+
+
+def _pick(rnd: random.Random, n: int, skew: float) -> int:
+    """Node index with a power-law skew, so a few hubs carry most edges (skew=1 is uniform)."""
+    return min(n - 1, int(n * rnd.random() ** skew))
+
+
+def _iso(day: float) -> str:
+    return (BASE + timedelta(days=day)).isoformat()
+
+
+def _load(eng: Any, nodes: Table, edges: Table, n_nodes: int, versions: int, n_edges: int, skew: float, rnd: random.Random) -> None:
+    batch: List[Dict[str, Any]] = []
+
+    def flush(table: Table) -> None:
+        if batch:
+            with eng.begin() as conn:
+                conn.execute(table.insert(), batch)
+            batch.clear()
+
+    step = SPAN_DAYS / max(1, versions)
+    for i in range(n_nodes):
+        for v in range(versions):
+            vf, vt = _iso(v * step), (_iso((v + 1) * step) if v < versions - 1 else None)
+            batch.append({"uid": f"n:{i}", "type": "Company", "properties_json": '{"v": %d}' % v, "valid_from": vf, "valid_to": vt, "created_at": vf})
+            if len(batch) >= 10000:
+                flush(nodes)
+    flush(nodes)
+    for _ in range(n_edges):
+        start = rnd.uniform(0, SPAN_DAYS)
+        closed = rnd.random() < 0.33
+        batch.append({
+            "src_uid": f"n:{_pick(rnd, n_nodes, skew)}", "dst_uid": f"n:{_pick(rnd, n_nodes, skew)}", "type": rnd.choice(("EMPLOYS", "INVESTED_IN", "MENTIONS")),
+            "properties_json": "{}", "valid_from": _iso(start), "valid_to": _iso(rnd.uniform(start, SPAN_DAYS)) if closed else None, "created_at": _iso(start),
+        })
+        if len(batch) >= 10000:
+            flush(edges)
+    flush(edges)
+    with eng.begin() as conn:
+        # The 0014 composite indexes existed before this change
+        for stmt in (
+            "CREATE INDEX ix_kg_nodes_uid_valid_from ON kg_nodes (uid, valid_from)",
+            "CREATE INDEX ix_kg_nodes_uid_valid_to ON kg_nodes (uid, valid_to)",
+            "CREATE INDEX ix_kg_edges_src_uid_valid_from ON kg_edges (src_uid, valid_from)",
+            "CREATE INDEX ix_kg_edges_dst_uid_valid_from ON kg_edges (dst_uid, valid_from)",
+            "CREATE INDEX ix_kg_edges_src_dst_type ON kg_edges (src_uid, dst_uid, type)",
+        ):
+            conn.exec_driver_sql(stmt)
+
+
+def _migrate(eng: Any) -> float:
+    t0 = time.perf_counter()
+    with eng.begin() as conn:
+        kg_temporal.install(conn)
+    return time.perf_counter() - t0
+
+
+def _analyze(eng: Any) -> None:
+    with eng.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+def _time(eng: Any, sql: str, params: List[Dict[str, Any]]) -> Tuple[float, float, float]:
+    stmt = text(sql)
+    samples: List[float] = []
+    with eng.connect() as conn:
+        for p in params:
+            t0 = time.perf_counter()
+            conn.execute(stmt, p).fetchall()
+            samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.95))], statistics.fmean(samples)
+
+
+def _shapes(asof: str) -> Dict[str, str]:
+    return {
+        "node_as_of": f"SELECT id, uid, type, properties_json FROM kg_nodes WHERE uid = :u AND {asof} ORDER BY id DESC LIMIT 1",
+        "out_edges_as_of": f"SELECT dst_uid, type, properties_json FROM kg_edges WHERE src_uid = :u AND {asof}",
+        "in_edges_as_of": f"SELECT src_uid, type, properties_json FROM kg_edges WHERE dst_uid = :u AND {asof}",
+        "open_node_probe": "SELECT id, properties_json FROM kg_nodes WHERE uid = :u AND type = 'Company' AND valid_to IS NULL ORDER BY id DESC LIMIT 1",
+        "open_edge_probe": "SELECT id FROM kg_edges WHERE src_uid = :u AND dst_uid = :d AND type = 'EMPLOYS' AND valid_to IS NULL",
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=None, help="SQLAlchemy URL (default: throwaway SQLite file)")
+    ap.add_argument("--nodes", type=int, default=100000)
+    ap.add_argument("--versions", type=int, default=3)
+    ap.add_argument("--edges", type=int, default=1000000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--skew", type=float, default=2.0)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    tmpdir = None
+    url = args.url
+    if not url:
+        tmpdir = tempfile.mkdtemp(prefix="kg-bench-")
+        url = f"sqlite:///{os.path.join(tmpdir, 'kg.sqlite')}"
+    eng = create_engine(url)
+    rnd = random.Random(args.seed)
+    md = MetaData()
+    nodes, edges = _tables(md)
+    md.drop_all(eng)
+    md.create_all(eng)
+
+    t0 = time.perf_counter()
+    _load(eng, nodes, edges, args.nodes, args.versions, args.edges, args.skew, rnd)
+    _analyze(eng)
+    print(f"loaded {args.nodes * args.versions} node versions, {args.edges} edges in {time.perf_counter() - t0:.1f}s ({eng.dialect.name})")
+
+    params = [
+        {"u": f"n:{_pick(rnd, args.nodes, args.skew)}", "d": f"n:{_pick(rnd, args.nodes, args.skew)}", "at": _iso(rnd.uniform(0, SPAN_DAYS + 30))}
+        for _ in range(args.queries)
+    ]
+    results: Dict[str, Dict[str, Tuple[float, float, float]]] = {}
+    results["before"] = {name: _time(eng, sql, params) for name, sql in _shapes(STRING_ASOF).items()}
+
+    print(f"migrated (temporal indexes) in {_migrate(eng):.1f}s")
+    _analyze(eng)
+    results["after"] = {name: _time(eng, sql, params) for name, sql in _shapes(STRING_ASOF).items()}
+
+    print(f"{'query':<18} {'phase':<12} {'p50_ms':>9} {'p95_ms':>9} {'mean_ms':>9}")
+    for name in _shapes(STRING_ASOF):
+        for phase in ("before", "after"):
+            p50, p95, mean = results[phase][name]
+            print(f"{name:<18} {phase:<12} {p50:>9.3f} {p95:>9.3f} {mean:>9.3f}")
+    if tmpdir:
+        eng.dispose()
+        try:
+            os.remove(os.path.join(tmpdir, "kg.sqlite"))
+            os.rmdir(tmpdir)
+        except OSError:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
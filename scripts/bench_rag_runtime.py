@@ -0,0 +1,113 @@
+"""Benchmark per-question RAG setup: fresh client/index/LLM per question vs the pooled runtime.
+
+Uses local stand-in stores, so no Qdrant or Ollama is needed. The stand-ins
+sleep for configurable times:
+
+* --connect-ms when a client is constructed (connection pool / handshake);
+* --index-ms when a vector store and index are built;
+* --llm-ms when an LLM wrapper is built;
+* --query-ms per retrieval.
+
+It runs `rag_service.answer_with_citations` for --questions questions in two
+modes:
+
+* fresh  – a new `RagRuntime` per question, as before pooling
+  (get_rag_index/get_llm rebuilt everything each time);
+* pooled – the process-wide runtime (after `warm`, as done at startup).
+
+Prints p50/p95 of the `timings_ms` breakdown (setup, query, total) per mode.
+
+    python scripts/bench_rag_runtime.py --questions 200 --connect-ms 15 --index-ms 25
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from apps.api.aurora import rag_runtime, rag_service  # noqa: E402
+from apps.api.aurora.rag_runtime import RagRuntime  # noqa: E402
+
+
+def _stand_in_runtime(args: argparse.Namespace) -> RagRuntime:
+    class _Engine:
+        def query(self, q: str) -> Any:
+            time.sleep(args.query_ms / 1000.0)
+            nodes = [
+                SimpleNamespace(node=SimpleNamespace(metadata={"url": f"https://docs.example/{i}"}, text=f"passage {i} about {q[-40:]}", node_id=f"n{i}"), score=0.9 - i * 0.05)
+                for i in range(8)
+            ]
+            return SimpleNamespace(source_nodes=nodes)
+
+    class _Index:
+        def as_query_engine(self, similarity_top_k: int = 8) -> Any:
+            return _Engine()
+
+    def client() -> Any:
+        time.sleep(args.connect_ms / 1000.0)
+        return SimpleNamespace(get_collections=lambda: [])
+
+    def index(_client: Any, _collection: str) -> Any:
+        time.sleep(args.index_ms / 1000.0)
+        return _Index()
+
+    def llm(model: str) -> Any:
+        time.sleep(args.llm_ms / 1000.0)
+        return SimpleNamespace(model=model)
+
+    return RagRuntime(client, index, llm)
+
+
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * q))]
+
+
+def _run(args: argparse.Namespace, fresh: bool) -> Dict[str, List[float]]:
+    out: Dict[str, List[float]] = {"setup": [], "query": [], "total": []}
+    pooled = None
+    if not fresh:
+        pooled = _stand_in_runtime(args)
+        pooled.warm([rag_runtime.collection_name()], rag_runtime.LLM_MODEL)
+    for i in range(args.questions):
+        rag_runtime.RUNTIME = pooled or _stand_in_runtime(args)
+        timings = rag_service.answer_with_citations(f"question {i % 20}: what changed at company {i % 7}?")["timings_ms"]
+        for k in out:
+            out[k].append(float(timings[k]))
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=200)
+    ap.add_argument("--connect-ms", type=float, default=15.0)
+    ap.add_argument("--index-ms", type=float, default=25.0)
+    ap.add_argument("--llm-ms", type=float, default=5.0)
+    ap.add_argument("--query-ms", type=float, default=10.0)
+    args = ap.parse_args()
+
+    rag_service.meili = None  # keyword leg off: measure the vector path only
+    original = rag_runtime.RUNTIME
+    try:
+        results = {"fresh": _run(args, fresh=True), "pooled": _run(args, fresh=False)}
+    finally:
+        rag_runtime.RUNTIME = original
+
+    print(f"{args.questions} questions; stand-in costs: connect={args.connect_ms}ms index={args.index_ms}ms llm={args.llm_ms}ms query={args.query_ms}ms")
+    print(f"{'mode':<8} {'part':<7} {'p50_ms':>9} {'p95_ms':>9}")
+    for mode, parts in results.items():
+        for part, xs in parts.items():
+            print(f"{mode:<8} {part:<7} {_pct(xs, 0.5):>9.2f} {_pct(xs, 0.95):>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,142 @@
+"""Benchmark cross-encoder reranking: per-request predict vs the batched, cached service.
+
+Simulates concurrent copilot traffic: --clients threads each issue --requests
+rerank calls of --candidates passages. Queries are drawn from a pool of
+--queries strings over a shared corpus, so popular (query, passage) pairs repeat
+the way they do in production. It runs three modes on CPU:
+
+* direct  – the old path: one `predict` call per request, no cache;
+* batched – `RerankService` starting cold: cross-request micro-batching, with
+  repeats served once the first copy is scored;
+* cached  – the same service again with a warm pair-score cache.
+
+It uses the real `BAAI/bge-reranker-base` when sentence-transformers is
+installed (or --model), and otherwise a synthetic CPU-bound stand-in with a fixed
+per-call overhead and a per-pair cost (--call-ms / --pair-ms). Prints requests/s,
+pairs served per second, and how many predict calls and pairs the model actually ran.
+
+    python scripts/bench_rerank.py --clients 16 --requests 20 --candidates 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from apps.api.aurora.rerank import RerankService  # noqa: E402
+
+
+class _SyntheticCrossEncoder:
+    """Busy-loops for call_ms per predict plus pair_ms per pair (GIL-bound, like a CPU model)."""
+
+    def __init__(self, call_ms: float, pair_ms: float) -> None:
+        self.call_s = call_ms / 1000.0
+        self.pair_s = pair_ms / 1000.0
+
+    def predict(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        end = time.perf_counter() + self.call_s + self.pair_s * len(pairs)
+        while time.perf_counter() < end:
+            pass
+        return [float(len(set(q.split()) & set(t.split()))) for q, t in pairs]
+
+
+def _load_model(name: str, call_ms: float, pair_ms: float) -> Tuple[Any, str]:
+    if name != "synthetic":
+        try:
+            from sentence_transformers import CrossEncoder  # type: ignore
+
+            return CrossEncoder(name, device="cpu"), name
+        except Exception as e:
+            print(f"cannot load {name} ({e.__class__.__name__}); using the synthetic model")
+    return _SyntheticCrossEncoder(call_ms, pair_ms), "synthetic"
+
+
+def _workload(n_queries: int, corpus: int, candidates: int, rnd: random.Random) -> List[Tuple[str, List[str]]]:
+    words = [f"w{i}" for i in range(500)]
+    docs = [" ".join(rnd.choice(words) for _ in range(60)) for _ in range(corpus)]
+    out = []
+    for _ in range(n_queries):
+        q = " ".join(rnd.choice(words) for _ in range(8))
+        out.append((q, rnd.sample(docs, candidates)))
+    return out
+
+
+def _run(score: Callable[[str, List[str]], Any], work: List[Tuple[str, List[str]]], clients: int, requests: int, seed: int) -> float:
+    barrier = threading.Barrier(clients + 1)
+
+    def _client(i: int) -> None:
+        rnd = random.Random(seed + i)
+        barrier.wait()
+        for _ in range(requests):
+            # Zipf-ish query popularity: a few questions dominate
+            q, docs = work[min(len(work) - 1, int(len(work) * rnd.random() ** 3))]
+            score(q, docs)
+
+    threads = [threading.Thread(target=_client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="BAAI/bge-reranker-base", help="CrossEncoder name, or 'synthetic'")
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=20, help="rerank calls per client")
+    ap.add_argument("--candidates", type=int, default=20, help="passages per call (after the first-pass cutoff)")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--corpus", type=int, default=400)
+    ap.add_argument("--window-ms", type=float, default=2.0)
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--call-ms", type=float, default=8.0, help="synthetic per-predict overhead")
+    ap.add_argument("--pair-ms", type=float, default=0.5, help="synthetic per-pair cost")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    model, name = _load_model(args.model, args.call_ms, args.pair_ms)
+    work = _workload(args.queries, args.corpus, args.candidates, random.Random(args.seed))
+    total_requests = args.clients * args.requests
+    total_pairs = total_requests * args.candidates
+
+    counts: Dict[str, int] = {"pairs": 0}
+    lock = threading.Lock()
+
+    def _direct(q: str, docs: List[str]) -> Any:
+        with lock:
+            counts["pairs"] += len(docs)
+        return model.predict([(q, d) for d in docs])
+
+    svc = RerankService(lambda: model, name, batch_window_ms=args.window_ms, max_batch=args.max_batch)
+    results = {"direct": _run(_direct, work, args.clients, args.requests, args.seed)}
+    direct_pairs = counts["pairs"]
+    results["batched"] = _run(svc.score, work, args.clients, args.requests, args.seed)
+    batched = dict(svc.stats)
+    results["cached"] = _run(svc.score, work, args.clients, args.requests, args.seed)
+
+    print(f"model={name} clients={args.clients} requests={total_requests} pairs/request={args.candidates}")
+    print(f"{'mode':<8} {'seconds':>8} {'req/s':>9} {'pairs/s':>10} {'predicts':>9} {'pairs_scored':>13}")
+    rows = [
+        ("direct", results["direct"], total_requests, direct_pairs),
+        ("batched", results["batched"], batched["batches"], batched["scored"]),
+        ("cached", results["cached"], svc.stats["batches"] - batched["batches"], svc.stats["scored"] - batched["scored"]),
+    ]
+    for mode, secs, predicts, scored in rows:
+        print(f"{mode:<8} {secs:>8.2f} {total_requests / secs:>9.1f} {total_pairs / secs:>10.1f} {predicts:>9} {scored:>13}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
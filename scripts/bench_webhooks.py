@@ -0,0 +1,87 @@
+"""Benchmark the webhook dispatcher against a local HTTP sink.
+
+Enqueues N rows into a throwaway SQLite `webhook_queue`, then drains them with
+`WebhookDispatcher` while a threaded HTTP server on localhost accepts (and
+optionally delays) every POST. Prints deliveries/second.
+
+    python scripts/bench_webhooks.py --n 2000 --endpoints 8 --delay-ms 20 --workers 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlmodel import Session, SQLModel, create_engine, text  # noqa: E402
+
+from apps.api.aurora.db import WebhookDelivery  # noqa: E402
+from apps.api.aurora.webhook_dispatcher import WebhookDispatcher  # noqa: E402
+
+
+def _sink(delay_s: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:  # noqa: N802
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if delay_s:
+                time.sleep(delay_s)
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *_: object) -> None:
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1000)
+    ap.add_argument("--endpoints", type=int, default=4)
+    ap.add_argument("--delay-ms", type=float, default=10.0)
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--per-endpoint", type=int, default=4)
+    ap.add_argument("--batch", type=int, default=64)
+    args = ap.parse_args()
+
+    srv = _sink(args.delay_ms / 1000.0)
+    port = srv.server_address[1]
+    db = os.path.join(tempfile.mkdtemp(), "bench_webhooks.sqlite")
+    eng = create_engine(f"sqlite:///{db}")
+    SQLModel.metadata.create_all(eng, tables=[WebhookDelivery.__table__])
+    with Session(eng) as s:
+        s.add_all(
+            [
+                WebhookDelivery(url=f"http://127.0.0.1:{port}/hook/{i % args.endpoints}", event="bench", body_json='{"i": %d}' % i, status="pending")
+                for i in range(args.n)
+            ]
+        )
+        s.commit()
+
+    d = WebhookDispatcher(lambda: Session(eng), workers=args.workers, per_endpoint=args.per_endpoint, batch=args.batch)
+    t0 = time.perf_counter()
+    d.run_until_idle(timeout_s=600)
+    dur = time.perf_counter() - t0
+    with Session(eng) as s:
+        delivered = int(list(s.execute(text("SELECT COUNT(1) FROM webhook_queue WHERE status = 'delivered'")))[0][0])
+    srv.shutdown()
+    print(f"delivered={delivered}/{args.n} seconds={dur:.2f} deliveries_per_sec={delivered / dur if dur else 0:.1f} stats={d.info()}")
+    return 0 if delivered == args.n else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -38,6 +38,7 @@ with ENGINE.connect() as conn:
     # Always drop and recreate temporal tables to avoid stale schemas (e.g. prior UNIQUE constraint on uid)
     conn.exec_driver_sql("DROP TABLE IF EXISTS kg_nodes;")
     conn.exec_driver_sql("DROP TABLE IF EXISTS kg_edges;")
+    conn.exec_driver_sql("DROP TABLE IF EXISTS kg_node_props;")
     conn.exec_driver_sql(
         """
         CREATE TABLE kg_nodes (
@@ -70,6 +71,13 @@ with ENGINE.connect() as conn:
         );
         """
     )
+    from apps.api.aurora import kg_changes, kg_stats, kg_temporal  # noqa: E402
+
+    conn.exec_driver_sql("DROP TABLE IF EXISTS kg_stats;")
+    conn.exec_driver_sql("DROP TABLE IF EXISTS kg_changes;")
+    kg_temporal.install(conn)
+    kg_stats.install(conn)
+    kg_changes.install(conn)
     # Minimal provenance tables for provenance bundle helper safety
     conn.exec_driver_sql(
         """
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from apps.api.aurora.main import app
+from apps.api.aurora.db import get_session
+
+client = TestClient(app)
+
+
+def _rows(sql, params=None):
+    with get_session() as s:
+        return [tuple(r) for r in s.exec(sql, params or {})]
+
+
+def _commit(events, mode=None):
+    body = {"events": events}
+    if mode:
+        body["mode"] = mode
+    return client.post("/kg/commit", json=body, headers={"X-Role": "admin"})
+
+
+def test_bulk_commit_matches_sequential_semantics():
+    with get_session() as s:
+        s.exec("DELETE FROM kg_nodes WHERE uid LIKE 'bulk:%'")
+        s.exec("DELETE FROM kg_edges WHERE src_uid LIKE 'bulk:%'")
+        s.commit()
+    prov_before = _rows("SELECT COUNT(1) FROM provenance_records")[0][0]
+    t1, t2, t3 = "2030-01-01T00:00:00+00:00", "2030-01-02T00:00:00+00:00", "2030-01-03T00:00:00+00:00"
+    events = [
+        {"operation": {"type": "create_node", "uid": "bulk:a", "node_type": "Company", "properties": {"stage": "seed"}}, "ingest_time": t1, "pipeline_version": "p1"},
+        {"operation": {"type": "create_edge", "from": "bulk:a", "to": "bulk:b", "edge_type": "RAISED", "properties": {"amt": 1}}, "ingest_time": t1, "pipeline_version": "p1"},
+        {"operation": {"type": "create_node", "uid": "bulk:a", "node_type": "Company", "properties": {"stage": "seed"}}, "ingest_time": t2, "pipeline_version": "p1"},
+        {"operation": {"type": "create_node", "uid": "bulk:a", "node_type": "Company", "properties": {"stage": "series_a"}}, "ingest_time": t3, "pipeline_version": "p1"},
+        {"operation": {"type": "create_edge", "from": "bulk:missing", "to": "bulk:a"}, "pipeline_version": "p1"},
+        {"operation": {"type": "create_node"}, "pipeline_version": "p1"},
+        {"operation": {"type": "explode"}, "pipeline_version": "p1"},
+    ]
+    r = _commit(events, mode="bulk")
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["mode"] == "bulk"
+    res = body["results"]
+    assert res[0]["ok"] and res[0]["id"] and res[0]["valid_from"] == t1
+    assert res[1]["ok"] and res[1]["src"] == "bulk:a" and res[1]["id"]
+    assert res[2].get("noop") is True and res[2]["valid_from"] == t1
+    assert res[3]["ok"] and res[3]["valid_from"] == t3
+    assert res[4] == {"ok": False, "reason": "src_not_found", "src": "bulk:missing", "dst": "bulk:a"}
+    assert res[5] == {"ok": False, "reason": "missing_uid"}
+    assert res[6] == {"ok": False, "reason": "unsupported_operation", "operation": "explode"}
+
+    versions = _rows("SELECT properties_json, valid_from, valid_to, provenance_id FROM kg_nodes WHERE uid = 'bulk:a' ORDER BY id")
+    assert [(v[1], v[2]) for v in versions] == [(t1, t3), (t3, None)]
+    assert versions[0][3] == versions[1][3] is not None
+    assert _rows("SELECT COUNT(1) FROM provenance_records")[0][0] == prov_before + 1
+
+    # Re-sending the last state is a no-op; a changed edge closes the open one
+    r2 = _commit(
+        [
+            {"operation": {"type": "create_node", "uid": "bulk:a", "node_type": "Company", "properties": {"stage": "series_a"}}},
+            {"operation": {"type": "create_edge", "from": "bulk:a", "to": "bulk:b", "edge_type": "RAISED", "properties": {"amt": 2}}, "ingest_time": t3},
+        ],
+        mode="bulk",
+    )
+    assert r2.status_code == 200
+    assert r2.json()["results"][0].get("noop") is True
+    edges = _rows("SELECT properties_json, valid_from, valid_to FROM kg_edges WHERE src_uid = 'bulk:a' ORDER BY id")
+    assert [(e[1], e[2]) for e in edges] == [(t1, t3), (t3, None)]
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from apps.api.aurora.db import get_session
+from apps.api.aurora.main import app
+
+
+def _write_history():
+    now = datetime.now(timezone.utc).isoformat()
+    with get_session() as s:
+        s.exec("DELETE FROM kg_nodes WHERE uid LIKE 'org:chg-%'")
+        s.exec("DELETE FROM kg_edges WHERE src_uid LIKE 'org:chg-%'")
+        top = s.exec("SELECT COALESCE(MAX(seq), 0) FROM kg_changes").scalar()
+        for uid in ("org:chg-a", "org:chg-b", "org:chg-c"):
+            s.exec(
+                "INSERT INTO kg_nodes (tenant_id, uid, type, properties_json, valid_from, valid_to, provenance_id, created_at) "
+                "VALUES (NULL, :u, 'Org', '{}', :t, NULL, NULL, :t)",
+                {"u": uid, "t": now},
+            )
+        s.exec(
+            "INSERT INTO kg_edges (tenant_id, src_uid, dst_uid, type, properties_json, valid_from, valid_to, provenance_id, created_at) "
+            "VALUES (NULL, 'org:chg-a', 'org:chg-b', 'PARTNERS', '{}', :t, NULL, NULL, :t)",
+            {"t": now},
+        )
+        s.exec("UPDATE kg_nodes SET valid_to = :t WHERE uid = 'org:chg-a' AND valid_to IS NULL", {"t": now})
+        s.exec("DELETE FROM kg_nodes WHERE uid = 'org:chg-c'")
+        s.commit()
+    return int(top)
+
+
+def test_changes_page_by_sequence_cursor():
+    top = _write_history()
+    with TestClient(app) as client:
+        d1 = client.get(f"/daas/kg/changed?cursor={top}&limit=4").json()
+        assert d1["has_more"] and [n.get("uid") for n in d1["nodes"]] == ["org:chg-a", "org:chg-b", None]  # chg-c is gone
+        assert d1["edges"][0]["src"] == "org:chg-a" and d1["edges"][0]["op"] == "insert"
+        d2 = client.get(f"/daas/kg/changed?cursor={d1['next_cursor']}&limit=4").json()
+        assert [n["op"] for n in d2["nodes"]] == ["close", "delete"] and not d2["has_more"]
+        assert d2["nodes"][0]["id"] == d1["nodes"][0]["id"] and d2["nodes"][0]["valid_to"]
+        assert d2["nodes"][1]["id"] == d1["nodes"][2]["id"] and "uid" not in d2["nodes"][1]
+        d3 = client.get(f"/daas/kg/changed?cursor={d2['next_cursor']}").json()
+        assert d3["nodes"] == [] and d3["next_cursor"] == d2["next_cursor"]
+        # No cursor: starts at `since` through the changed_at index
+        recent = client.get("/daas/kg/changed").json()
+        assert {"org:chg-a", "org:chg-b"} <= {n.get("uid") for n in recent["nodes"]}
+        assert client.get("/daas/kg/changed?cursor=x").status_code == 422
+
+
+def test_changes_stream_ndjson():
+    top = _write_history()
+    with TestClient(app) as client:
+        r = client.get(f"/daas/kg/changed?cursor={top}&format=ndjson&limit=5")
+        assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(x) for x in r.text.splitlines()]
+        assert [x["seq"] for x in lines] == list(range(top + 1, top + 6))
+        rest = client.get(f"/daas/kg/changed?cursor={lines[-1]['seq']}", headers={"Accept": "application/x-ndjson"}).text.splitlines()
+        assert [json.loads(x)["op"] for x in rest] == ["delete"]
+
+
+def test_postgres_pages_by_txid_below_oldest_in_flight():
+    from types import SimpleNamespace
+
+    from apps.api.aurora import kg_changes
+
+    class _Result(list):
+        def first(self):
+            return self[0] if self else None
+
+    class _PgSession:
+        def __init__(self):
+            self.calls = []
+
+        def get_bind(self):
+            return SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+        def execute(self, stmt, params=None):
+            sql = str(stmt)
+            self.calls.append((sql, dict(params or {})))
+            if sql.startswith("SELECT txid FROM kg_changes"):
+                return _Result([(42,)])
+            if "FROM kg_changes" in sql:
+                return _Result([(7, "node", "insert", 99, "2025-01-01T00:00:00.000Z")])
+            return _Result([])
+
+    s = _PgSession()
+    page = kg_changes.read_page(s, 10, 5, tenant_id=3)
+    assert [p["seq"] for p in page] == [7]
+    sql, params = s.calls[1]
+    assert "(txid, seq) > (:atx, :after)" in sql and "txid_snapshot_xmin(txid_current_snapshot())" in sql
+    assert sql.rstrip().endswith("ORDER BY txid, seq LIMIT :lim")
+    assert params["atx"] == 42 and params["after"] == 10 and params["tid"] == 3
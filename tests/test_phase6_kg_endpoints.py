@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 import pytest
 from fastapi.testclient import TestClient
 
+from apps.api.aurora import kg_props
 from apps.api.aurora.main import app
 from apps.api.aurora.db import get_session
 
@@ -55,6 +56,8 @@ def _seed_nodes_and_edges():
             {"vf": now, "now": now},
         )
         s.commit()
+        # Raw SQL writes are indexed for /kg/find by the background catch-up; do it now
+        kg_props.sync(s)
 
 
 def test_find_pagination_and_filters():
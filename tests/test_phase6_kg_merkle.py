@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from apps.api.aurora import kg_merkle
+from apps.api.aurora.main import app
+from apps.api.aurora.db import get_session
+
+client = TestClient(app)
+ADMIN = {"X-Dev-Token": "test-admin-token"}
+
+
+@pytest.fixture(autouse=True)
+def _admin_token(monkeypatch):
+    monkeypatch.setenv("DEV_ADMIN_TOKEN", "test-admin-token")
+
+
+def _commit(events):
+    r = client.post("/kg/commit", json={"events": events, "mode": "bulk"}, headers={"X-Role": "admin"})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _snapshot(**body):
+    r = client.post("/admin/kg/snapshot", json=body, headers=ADMIN)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_incremental_root_matches_rebuild_and_proves_inclusion():
+    with get_session() as s:
+        s.exec("DELETE FROM kg_nodes WHERE uid LIKE 'mk:%'")
+        s.exec("DELETE FROM kg_edges WHERE src_uid LIKE 'mk:%'")
+        s.commit()
+    _commit([{"operation": {"type": "create_node", "uid": f"mk:{i}", "node_type": "Company", "properties": {"i": i}}} for i in range(20)])
+    _commit([{"operation": {"type": "create_edge", "from": "mk:0", "to": f"mk:{i}", "edge_type": "LINKS"}} for i in range(1, 5)])
+    base = _snapshot(rebuild_index=True)
+    assert base["merkle_root"] and base["edge_count"] >= 4
+
+    # Untouched state: nothing rehashed, identical hashes
+    again = _snapshot()
+    assert (again["merkle_root"], again["snapshot_hash"]) == (base["merkle_root"], base["snapshot_hash"])
+
+    # One changed uid only dirties its own bucket; result equals a full rebuild
+    _commit([{"operation": {"type": "create_node", "uid": "mk:3", "node_type": "Company", "properties": {"i": 33}}}])
+    with get_session() as s:
+        pending = [r[0] for r in s.exec("SELECT uid FROM kg_merkle_dirty")]
+        assert pending == ["mk:3"]
+        assert kg_merkle.refresh(s) == 1
+        incremental = kg_merkle.summary(s)
+        kg_merkle.rebuild(s)
+        assert kg_merkle.summary(s) == incremental
+    snap = _snapshot()
+    assert snap["merkle_root"] == incremental["merkle_root"] != base["merkle_root"]
+
+    # Server-side proof for a uid, bound to the snapshot hash
+    r = client.post("/kg/snapshot/verify", json={"snapshot_hash": snap["snapshot_hash"], "uid": "mk:0"})
+    inc = r.json()["inclusion"]
+    assert inc["valid"] and inc["bound_to_snapshot"]
+    assert {p["kind"] for p in inc["proofs"]} == {"n", "e"} and len(inc["proofs"]) == 5
+    assert all(len(p["path"]) >= kg_merkle.BUCKET_BITS for p in inc["proofs"])
+
+    # The index has moved on from `base`: uid proofs against the older snapshot are rejected
+    old = client.post("/kg/snapshot/verify", json={"snapshot_hash": base["snapshot_hash"], "uid": "mk:0"}).json()["inclusion"]
+    assert old["valid"] is False and old["reason"] == "snapshot_not_current"
+    forged = client.post("/kg/snapshot/verify", json={"snapshot_hash": snap["snapshot_hash"], "merkle_root": base["merkle_root"], "uid": "mk:0"}).json()["inclusion"]
+    assert forged["valid"] is False and forged["reason"] == "merkle_root_mismatch"
+
+    # Stateless check of a client-held proof; a tampered leaf fails
+    p = inc["proofs"][0]
+    body = {"snapshot_hash": snap["snapshot_hash"], "merkle_root": snap["merkle_root"], "proof": p["path"]}
+    assert client.post("/kg/snapshot/verify", json={**body, "leaf_hash": p["leaf_hash"]}).json()["inclusion"]["valid"]
+    assert not client.post("/kg/snapshot/verify", json={**body, "leaf_hash": "0" * 64}).json()["inclusion"]["valid"]
+
+
+def test_fallback_root_matches_index_root(monkeypatch):
+    _commit([{"operation": {"type": "create_node", "uid": f"mk:fb{i}", "node_type": "Company", "properties": {"i": i}}} for i in range(5)])
+    _commit([{"operation": {"type": "create_edge", "from": "mk:fb0", "to": "mk:fb1", "edge_type": "LINKS"}}])
+    indexed = _snapshot()
+
+    def _unavailable(*a, **k):
+        raise RuntimeError("index tables unavailable")
+
+    monkeypatch.setattr(kg_merkle, "snapshot", _unavailable)
+    fallback = _snapshot()
+    assert fallback["merkle_root"] == indexed["merkle_root"]
+    assert (fallback["node_count"], fallback["edge_count"]) == (indexed["node_count"], indexed["edge_count"])
+
+
+def test_dirty_mark_is_part_of_the_write_transaction(monkeypatch):
+    def _fail(*a, **k):
+        raise RuntimeError("mark failed")
+
+    monkeypatch.setattr(kg_merkle, "mark_dirty", _fail)
+    r = client.post("/admin/kg/nodes/upsert", json={"uid": "mk:atomic", "type": "Company", "props": {"a": 1}}, headers=ADMIN)
+    assert r.status_code == 500
+    with get_session() as s:
+        assert not list(s.exec("SELECT 1 FROM kg_nodes WHERE uid = 'mk:atomic'"))
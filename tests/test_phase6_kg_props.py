@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from apps.api.aurora import kg_props
+from apps.api.aurora.db import get_session
+from apps.api.aurora.main import app
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _seed():
+    now = _now()
+    with get_session() as s:
+        s.exec("DELETE FROM kg_nodes WHERE uid LIKE 'fund:props-%'")
+        for uid, props in (
+            ("fund:props-a", '{"name": "Alpha Capital", "aum": 120, "tags": ["AI", "infra"]}'),
+            ("fund:props-b", '{"name":"Alphabet Ventures","aum":"45.5"}'),
+            ("fund:props-c", '{"name":"Beta Partners","aum":900,"tags":["bio"]}'),
+        ):
+            s.exec(
+                "INSERT INTO kg_nodes (tenant_id, uid, type, properties_json, valid_from, valid_to, provenance_id, created_at) "
+                "VALUES (NULL, :u, 'Fund', :p, :vf, NULL, NULL, :vf)",
+                {"u": uid, "p": props, "vf": now},
+            )
+        s.commit()
+        # Raw SQL writes are indexed by the background catch-up; do it now
+        kg_props.sync(s)
+    return now
+
+
+def _uids(client, qs):
+    r = client.get(f"/kg/find?type=Fund&uid_prefix=fund:props-&{qs}")
+    assert r.status_code == 200
+    return [n["uid"] for n in r.json()["nodes"]]
+
+
+def test_prop_rows_normalize_scalars_and_lists():
+    rows = kg_props.prop_rows(7, "x", '{"Name": " Acme ", "n": 3, "ok": true, "tags": ["A", "b", {"x": 1}], "nested": {"k": 1}}')
+    got = {(r["k"], r["v"], r["n"]) for r in rows}
+    assert got == {("Name", "acme", None), ("n", "3", 3.0), ("ok", "true", None), ("tags", "a", None), ("tags", "b", None)}
+    assert kg_props.prop_rows(1, "x", "not json") == []
+
+
+def test_find_uses_property_index_for_eq_prefix_and_ranges():
+    now = _seed()
+    with TestClient(app) as client:
+        at = f"as_of={now}"
+        assert _uids(client, f"prop_key=name&prop_value=ALPHA%20CAPITAL&prop_op=eq&{at}") == ["fund:props-a"]
+        assert _uids(client, f"prop_key=name&prop_value=alpha&prop_op=prefix&{at}") == ["fund:props-b", "fund:props-a"]
+        assert _uids(client, f"prop_key=aum&prop_value=100&prop_op=gte&{at}") == ["fund:props-c", "fund:props-a"]
+        assert _uids(client, f"prop_key=aum&prop_value=120&prop_op=lt&{at}") == ["fund:props-b"]
+        assert _uids(client, f"prop_key=tags&prop_value=ai&prop_op=eq&{at}") == ["fund:props-a"]
+        assert _uids(client, f"prop_key=name&prop_value=partners&{at}") == ["fund:props-c"]  # default op: contains
+        assert client.get(f"/kg/find?prop_key=name&prop_value=x&prop_op=regex&{at}").status_code == 400
+
+        # Keyset pages: next_cursor only while more rows exist
+        d1 = client.get(f"/kg/find?type=Fund&uid_prefix=fund:props-&prop_key=aum&prop_value=0&prop_op=gt&limit=2&{at}").json()
+        assert len(d1["nodes"]) == 2 and d1["next_cursor"]
+        d2 = client.get(f"/kg/find?type=Fund&uid_prefix=fund:props-&prop_key=aum&prop_value=0&prop_op=gt&limit=2&cursor={d1['next_cursor']}&{at}").json()
+        assert [n["uid"] for n in d2["nodes"]] == ["fund:props-a"] and d2["next_cursor"] is None
+
+    with get_session() as s:
+        sql, params = kg_props.predicate("aum", "100", "gte")
+        plan = " ".join(str(r[-1]) for r in s.exec("EXPLAIN QUERY PLAN SELECT node_id FROM kg_node_props WHERE key = :pk AND num >= :pn", params))
+        assert "SEARCH" in plan and "SCAN" not in plan
+        assert "kg_node_props" in sql
+
+
+def test_sync_indexes_versions_committed_out_of_id_order():
+    now = _now()
+    ins = (
+        "INSERT INTO kg_nodes (id, tenant_id, uid, type, properties_json, valid_from, valid_to, provenance_id, created_at) "
+        "VALUES (:id, NULL, :u, 'Fund', :p, :vf, NULL, NULL, :vf)"
+    )
+    with get_session() as s:
+        kg_props.sync(s)
+        top = int(s.exec("SELECT COALESCE(MAX(id), 0) FROM kg_nodes").first()[0])
+        # A later transaction commits first, far above a still-open one's id
+        s.exec(ins, {"id": top + 500, "u": "fund:props-late-hi", "p": '{"stage": "hi"}', "vf": now})
+        s.commit()
+        kg_props.sync(s)
+        s.exec(ins, {"id": top + 3, "u": "fund:props-late-lo", "p": '{"stage": "lo"}', "vf": now})
+        s.commit()
+        kg_props.sync(s)
+        got = {r[0] for r in s.exec("SELECT uid FROM kg_node_props WHERE key = 'stage'")}
+        assert {"fund:props-late-hi", "fund:props-late-lo"} <= got
+        # The filled id no longer counts as a hole; the rest of the range still does
+        gaps = kg_props._GAPS[kg_props._bind_key(s)]
+        assert not any(lo < top + 3 < hi for lo, hi, _ in gaps)
+        assert any(lo < top + 4 < hi for lo, hi, _ in gaps)
+        s.exec("DELETE FROM kg_nodes WHERE uid LIKE 'fund:props-late-%'")
+        s.commit()
+
+
+def test_holes_lists_uncovered_ranges():
+    assert kg_props.holes(0, 10, [1, 2, 5, 9], 0.0) == [(2, 5, 0.0), (5, 9, 0.0)]
+    assert kg_props.holes(3, 4, [], 1.0) == []
+    assert kg_props.holes(3, 8, [], 1.0) == [(3, 8, 1.0)]
+
+
+def test_prefix_bounds_cover_astral_continuations():
+    assert kg_props.prefix_bounds("abc") == ("abc", "abd")
+    assert kg_props.prefix_bounds("a\U0010ffff") == ("a\U0010ffff", "b")
+    assert kg_props.prefix_bounds("\ud7ff") == ("\ud7ff", "\ue000")
+    assert kg_props.prefix_bounds("") == ("", None)
+    with get_session() as s:
+        cond, params = kg_props.prefix_condition("v", "abc", "p")
+        got = [r[0] for r in s.exec(f"SELECT v FROM (SELECT 'abc\U0001f600' AS v UNION ALL SELECT 'abd' UNION ALL SELECT 'abc') WHERE {cond} ORDER BY v", params)]
+        assert got == ["abc", "abc\U0001f600"]
+    pg, _ = kg_props.prefix_condition("uid", "x", "p", "postgresql")
+    assert pg == 'uid COLLATE "C" >= :p AND uid COLLATE "C" < :p_hi'
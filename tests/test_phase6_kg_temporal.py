@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from apps.api.aurora.db import get_session
+
+
+def _plan(s, sql, params):
+    return " ".join(str(r[-1]) for r in s.exec("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def test_temporal_indexes_cover_asof_and_open_row_probes():
+    with get_session() as s:
+        at = "2025-09-01T12:00:00+00:00"
+        asof = "SELECT id FROM kg_nodes WHERE uid = :u AND (valid_from IS NULL OR valid_from <= :at) AND (valid_to IS NULL OR valid_to > :at)"
+        assert "ix_kg_nodes_uid_asof" in _plan(s, asof, {"u": "ts:node", "at": at})
+        open_probe = "SELECT id FROM kg_edges WHERE src_uid = :s AND dst_uid = :d AND type = :t AND valid_to IS NULL"
+        assert "ix_kg_edges_open_src_dst_type" in _plan(s, open_probe, {"s": "a", "d": "b", "t": "X"})
+        # No trigger rewrites inserted rows any more
+        triggers = [r[0] for r in s.exec("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%typed_ts%'")]
+        assert triggers == []
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from apps.api.aurora import kg_traversal
+from apps.api.aurora.main import app
+from apps.api.aurora.db import get_session
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _seed_star():
+    """hub -> 12 spokes, each spoke -> one leaf (depth 2 reaches 24 nodes)."""
+    now = _now()
+    with get_session() as s:
+        s.exec("DELETE FROM kg_nodes WHERE uid LIKE 'trav:%'")
+        s.exec("DELETE FROM kg_edges WHERE src_uid LIKE 'trav:%'")
+        s.exec(
+            "INSERT INTO kg_nodes (tenant_id, uid, type, properties_json, valid_from, valid_to, provenance_id, created_at) "
+            "VALUES (NULL, 'trav:hub', 'Company', '{\"name\":\"Hub\"}', :vf, NULL, NULL, :now)",
+            {"vf": now, "now": now},
+        )
+        for i in range(12):
+            for uid in (f"trav:spoke{i}", f"trav:leaf{i}"):
+                s.exec(
+                    "INSERT INTO kg_nodes (tenant_id, uid, type, properties_json, valid_from, valid_to, provenance_id, created_at) "
+                    "VALUES (NULL, :u, 'Person', '{}', :vf, NULL, NULL, :now)",
+                    {"u": uid, "vf": now, "now": now},
+                )
+            s.exec(
+                "INSERT INTO kg_edges (tenant_id, src_uid, dst_uid, type, properties_json, valid_from, valid_to, provenance_id, created_at) "
+                "VALUES (NULL, 'trav:hub', :d, 'EMPLOYS', '{}', :vf, NULL, NULL, :now)",
+                {"d": f"trav:spoke{i}", "vf": now, "now": now},
+            )
+            s.exec(
+                "INSERT INTO kg_edges (tenant_id, src_uid, dst_uid, type, properties_json, valid_from, valid_to, provenance_id, created_at) "
+                "VALUES (NULL, :s, :d, 'KNOWS', '{}', :vf, NULL, NULL, :now)",
+                {"s": f"trav:spoke{i}", "d": f"trav:leaf{i}", "vf": now, "now": now},
+            )
+        s.commit()
+
+
+class _CountingSession:
+    def __init__(self, s):
+        self._s = s
+        self.calls = 0
+
+    def execute(self, *args, **kwargs):
+        self.calls += 1
+        return self._s.execute(*args, **kwargs)
+
+
+def test_neighborhood_queries_bounded_per_level():
+    _seed_star()
+    at = _now()
+    with get_session() as s:
+        cs = _CountingSession(s)
+        neighbors, expanded = kg_traversal.neighborhood(cs, "trav:hub", at, depth=2, limit=200)
+        # one edge expansion + one node hydration per level, regardless of fan-out
+        assert cs.calls == 4
+    assert len(neighbors) == 24
+    assert "trav:leaf7" in neighbors
+    assert expanded[0] == "trav:hub" and len(expanded) == 13
+
+
+def test_node_edges_paged_in_sql_with_cursor():
+    _seed_star()
+    with TestClient(app) as client:
+        at = _now()
+        r = client.get("/kg/node/trav:hub", params={"as_of": at, "depth": 2, "edges_limit": 10})
+        assert r.status_code == 200
+        d = r.json()
+        assert len(d["neighbors"]) == 24
+        assert len(d["edges"]) == 10
+        assert d["next_edges_offset"] == 10
+        seen = [(e["src"], e["dst"]) for e in d["edges"]]
+        cur = d["next_edges_cursor"]
+        while cur:
+            nxt = client.get("/kg/node/trav:hub", params={"as_of": at, "depth": 2, "edges_limit": 10, "edges_cursor": cur}).json()
+            seen.extend((e["src"], e["dst"]) for e in nxt["edges"])
+            cur = nxt["next_edges_cursor"]
+        # 12 hub edges + 12 spoke->leaf edges, each exactly once
+        assert len(seen) == 24
+        assert len(set(seen)) == 24
+
+
+def test_batch_nodes_one_query_request_order_and_etag():
+    _seed_star()
+    at = _now()
+    with get_session() as s:
+        cs = _CountingSession(s)
+        versions = kg_traversal.node_versions_as_of(cs, [f"trav:leaf{i}" for i in range(12)] + ["trav:missing"], at)
+        assert cs.calls == 1
+    assert len(versions) == 12
+
+    ids = "trav:leaf3,trav:hub,trav:missing,trav:spoke0"
+    with TestClient(app) as client:
+        r = client.get("/kg/nodes", params={"ids": ids, "as_of": at})
+        assert r.status_code == 200
+        assert [n["uid"] for n in r.json()["nodes"]] == ["trav:leaf3", "trav:hub", "trav:spoke0"]
+        assert r.json()["nodes"][1]["props"] == {"name": "Hub"}
+        etag = r.headers["ETag"]
+        again = client.get("/kg/nodes", params={"ids": ids, "as_of": at}, headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        other = client.get("/kg/nodes", params={"ids": "trav:leaf3", "as_of": at}, headers={"If-None-Match": etag})
+        assert other.status_code == 200 and other.headers["ETag"] != etag